@@ -0,0 +1,161 @@
+# backend/asgi.py
+"""
+Aplicación ASGI: las lecturas más frecuentes con vistas asyncio y el resto, Flask tal cual.
+
+    uvicorn --factory backend.asgi:create_asgi_app --workers 4
+
+Los GET/HEAD cuya regla de Flask tiene vista asíncrona en ``ASYNC_VIEWS``
+(dashboard, historial de transacciones y páginas de cuentas y clientes del
+admin) se atienden en el bucle de eventos: mientras esperan a la base de datos
+(motores de ``backend.database.async_engines``) no ocupan un hilo, así que un
+proceso puede tener miles de lecturas en vuelo. Todo lo demás (escrituras,
+login, exportaciones en streaming, /metrics) pasa a la aplicación WSGI por
+``a2wsgi`` con ``ASGI_WSGI_WORKERS`` hilos.
+
+Las vistas asíncronas corren dentro del contexto de petición de la misma
+aplicación Flask y con su mismo ciclo (``before_request``, manejadores de
+errores, ``after_request``, ``teardown_request``), así que JWT, lista de
+revocación, límites de tasa, métricas, CORS e ``X-Request-ID`` se aplican
+igual. El descarte de carga es otro (``ASYNC_READS_*``): estas peticiones no
+ocupan un hilo, así que esperan turno en el bucle (ver ``ASYNC_ENVIRON_KEY``).
+
+Necesita ``a2wsgi``, un servidor ASGI y el driver asíncrono de la base de datos
+(``aiosqlite`` o ``asyncpg``); el servidor WSGI no los usa.
+"""
+import asyncio
+import io
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import request
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.routing import RequestRedirect
+
+from backend.database.async_engines import init_async_engines
+from backend.database.models import db
+from backend.logging_setup import get_logger
+from backend.main import create_app
+from backend.routes.async_read_routes import ASYNC_VIEWS
+from backend.services.metrics import instrument_engine
+from backend.services.rate_limiting import ASYNC_ENVIRON_KEY, saturated_response
+from backend.services.token_revocation import get_token_denylist
+
+log = get_logger("asgi")
+
+ASYNC_METHODS = ("GET", "HEAD")
+
+
+class AsyncReadsApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get("ASGI_WSGI_WORKERS", 10))
+        self.enabled = flask_app.config.get("ASYNC_READS_ENABLED", True)
+        self.limiter = flask_app.extensions.get("async_concurrency_limiter")
+        endpoints = {rule.endpoint for rule in flask_app.url_map.iter_rules()}
+        for endpoint in ASYNC_VIEWS.keys() - endpoints:
+            log.warning("La vista asíncrona %s no tiene regla en la aplicación Flask", endpoint)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        view = self._async_view(scope) if scope["type"] == "http" and self.enabled else None
+        if view is None:
+            return await self.wsgi(scope, receive, send)
+        await self._serve(view, scope, send)
+
+    def _async_view(self, scope):
+        if scope["method"] not in ASYNC_METHODS:
+            return None
+        adapter = self.flask_app.url_map.bind("", script_name=scope.get("root_path") or None)
+        try:
+            endpoint, _ = adapter.match(scope["path"], method="GET")
+        except (NotFound, MethodNotAllowed, RequestRedirect):
+            return None  # Flask arma la respuesta de error o la redirección
+        return ASYNC_VIEWS.get(endpoint)
+
+    async def _serve(self, view, scope, send):
+        app = self.flask_app
+        environ = build_environ(scope, io.BytesIO(b""))
+        environ[ASYNC_ENVIRON_KEY] = True
+        ctx = app.request_context(environ)
+        error = None
+        ctx.push()
+        try:
+            # Mismo ciclo que Flask.full_dispatch_request, con la vista esperada
+            try:
+                response = app.preprocess_request()
+                if response is None:
+                    response = await self._dispatch(view)
+            except Exception as e:
+                response = app.handle_user_exception(e)
+            response = app.finalize_request(response)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        finally:
+            ctx.pop(error)
+
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers],
+            })
+            await send({"type": "http.response.body", "body": b"".join(app_iter)})
+        finally:
+            response.close()
+
+    async def _dispatch(self, view):
+        limiter = self.limiter
+        if limiter is None:
+            return await view(**request.view_args)
+        if await limiter.acquire() is not None:
+            return saturated_response(limiter.retry_after())
+        try:
+            return await view(**request.view_args)
+        finally:
+            limiter.release()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self._startup()
+                except Exception as e:
+                    log.exception("No se pudo arrancar la aplicación ASGI")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                engines = self.flask_app.extensions.get("async_engines")
+                if engines is not None:
+                    await engines.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _startup(self):
+        app = self.flask_app
+        if not self.enabled:
+            return
+        engines = init_async_engines(app)
+        registry = app.extensions.get("metrics")
+        if registry is not None:
+            for engine in engines.engines:
+                instrument_engine(engine.sync_engine, registry)
+        # La lista de revocación se carga en la primera petición con una consulta
+        # síncrona: mejor ahora, fuera del bucle de eventos
+        await asyncio.to_thread(self._load_denylist)
+
+    def _load_denylist(self):
+        with self.flask_app.app_context():
+            denylist = get_token_denylist()
+            if denylist.mode == "bloom":
+                with db.engine.connect() as conn:
+                    denylist.load(conn)
+
+
+def create_asgi_app(config_overrides=None, flask_app=None):
+    """Aplicación ASGI sobre ``flask_app`` (por defecto, ``create_app(config_overrides)``)."""
+    return AsyncReadsApp(flask_app if flask_app is not None else create_app(config_overrides))
@@ -0,0 +1,194 @@
+# backend/cli.py
+"""
+Comandos de línea de ``flask`` para operaciones masivas.
+
+Ejemplos:
+    flask --app backend.main transfers batch nomina.csv --mode best_effort
+    flask --app backend.main clients import clientes.ndjson --chunk-size 2000
+    flask --app backend.main accounts compact
+    flask --app backend.main ledger snapshot
+    flask --app backend.main rollups check --from 2025-03-01 --to 2025-03-31
+    flask --app backend.main tokens revoke-client 42
+"""
+import csv
+import json
+import os
+
+import click
+from flask.cli import AppGroup
+
+from backend.database.models import db
+from backend.services.batch_transfers import BATCH_MODES, MODE_ALL_OR_NOTHING, execute_batch
+from backend.services.bulk_onboarding import DEFAULT_CHUNK_SIZE, BulkOnboarding, load_checkpoint, save_checkpoint
+from backend.services.hot_accounts import compact_hot_accounts
+from backend.services.ledger import DEFAULT_SNAPSHOT_CHUNK, backfill_ledger, build_snapshots
+from backend.services.rollups import check_rollups, rebuild_rollups
+from backend.services.token_revocation import get_token_denylist, revoke_client_tokens
+from backend.services.transfer_engine import TransferError
+
+transfers_cli = AppGroup("transfers", help="Operaciones masivas sobre transferencias.")
+clients_cli = AppGroup("clients", help="Operaciones masivas sobre clientes.")
+accounts_cli = AppGroup("accounts", help="Mantenimiento de cuentas.")
+ledger_cli = AppGroup("ledger", help="Libro mayor y fotos de saldos.")
+rollups_cli = AppGroup("rollups", help="Totales diarios para la analítica de administración.")
+tokens_cli = AppGroup("tokens", help="Revocación de tokens JWT.")
+
+
+def iter_records(path, key=None):
+    """
+    Recorre los registros de un archivo .csv, .ndjson/.jsonl (en streaming, sin
+    cargarlo entero) o .json (una lista, o un objeto con la lista en ``key``).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if extension == ".csv":
+            yield from csv.DictReader(f)
+        elif extension in (".ndjson", ".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(f)
+            yield from (data.get(key, []) if isinstance(data, dict) else data)
+
+
+def read_records(path):
+    """Lee registros desde un archivo .json (lista), .ndjson/.jsonl o .csv."""
+    return list(iter_records(path, key="transfers"))
+
+
+@transfers_cli.command("batch")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--mode", type=click.Choice(BATCH_MODES), default=MODE_ALL_OR_NOTHING, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False), default=None,
+              help="Archivo JSON donde guardar el resultado de cada transferencia.")
+def batch_command(path, mode, output):
+    """Aplica un lote de transferencias leído de PATH (CSV, JSON o NDJSON)."""
+    legs = read_records(path)
+    click.echo(f"Procesando {len(legs)} transferencias en modo {mode}...")
+    try:
+        summary = execute_batch(legs, mode=mode)
+    except TransferError as e:
+        raise click.ClickException(e.message)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False)
+
+    click.echo(f"Aplicadas: {summary['applied']}  Rechazadas: {summary['rejected']}  "
+               f"Revertidas: {summary['aborted']}")
+    failed = [r for r in summary["results"] if r["status"] != "applied"]
+    for result in failed[:50]:
+        click.echo(f"  #{result['index']}: {result['status']} - {result.get('message', '')}")
+    if len(failed) > 50:
+        click.echo(f"  ... y {len(failed) - 50} más (usa --output para ver el detalle completo)")
+    if summary["aborted"]:
+        raise SystemExit(1)
+
+
+@clients_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", type=click.IntRange(1, 50000), default=DEFAULT_CHUNK_SIZE, show_default=True,
+              help="Clientes por bloque (un commit por bloque).")
+@click.option("--workers", type=click.IntRange(0), default=None,
+              help="Procesos para hashear contraseñas (por defecto, uno por CPU; 0 = en línea).")
+@click.option("--checkpoint", type=click.Path(dir_okay=False), default=None,
+              help="Archivo de checkpoint (por defecto PATH.checkpoint.json).")
+@click.option("--restart", is_flag=True, help="Ignora el checkpoint y empieza desde el primer registro.")
+@click.option("--errors", "errors_path", type=click.Path(dir_okay=False), default=None,
+              help="Archivo NDJSON donde anotar los registros rechazados.")
+def import_clients_command(path, chunk_size, workers, checkpoint, restart, errors_path):
+    """Da de alta los clientes de PATH (CSV, NDJSON o JSON) con su cuenta de ahorro."""
+    checkpoint = checkpoint or f"{path}.checkpoint.json"
+    start_index = 0 if restart else load_checkpoint(checkpoint, path)
+    if start_index:
+        click.echo(f"Reanudando desde el registro {start_index} (checkpoint {checkpoint}).")
+
+    totals = {"created": 0, "duplicates": 0, "invalid": 0}
+    errors_file = open(errors_path, "a" if start_index else "w", encoding="utf-8") if errors_path else None
+    try:
+        with BulkOnboarding(chunk_size=chunk_size, hash_workers=workers) as onboarding:
+            for summary in onboarding.run(iter_records(path, key="clients"), start_index):
+                for key in totals:
+                    totals[key] += summary[key]
+                save_checkpoint(checkpoint, path, summary["next_index"], totals)
+                if errors_file:
+                    for error in summary["errors"]:
+                        errors_file.write(json.dumps(error, ensure_ascii=False) + "\n")
+                click.echo(f"  registros {summary['start']}-{summary['next_index'] - 1}: "
+                           f"{summary['created']} creados, {summary['duplicates']} duplicados, "
+                           f"{summary['invalid']} inválidos")
+    finally:
+        if errors_file:
+            errors_file.close()
+
+    click.echo(f"Creados: {totals['created']}  Duplicados: {totals['duplicates']}  Inválidos: {totals['invalid']}")
+
+
+@accounts_cli.command("compact")
+def compact_accounts_command():
+    """Traslada los sub-saldos de las cuentas calientes a su saldo principal."""
+    compacted = compact_hot_accounts()
+    click.echo(f"Cuentas calientes compactadas: {compacted}")
+
+
+@ledger_cli.command("snapshot")
+@click.option("--until", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Último día a fotografiar (por defecto, el último día cerrado).")
+@click.option("--chunk-size", type=click.IntRange(1), default=DEFAULT_SNAPSHOT_CHUNK, show_default=True,
+              help="Cuentas por commit.")
+def snapshot_command(until, chunk_size):
+    """Construye las fotos diarias de saldo pendientes (incremental, reanudable)."""
+    days, written = build_snapshots(until=until, chunk_size=chunk_size)
+    click.echo(f"Días procesados: {days}  Fotos escritas: {written}")
+
+
+@ledger_cli.command("backfill")
+@click.option("--chunk-size", type=click.IntRange(1), default=DEFAULT_SNAPSHOT_CHUNK, show_default=True)
+def backfill_command(chunk_size):
+    """Asienta las transferencias anteriores al libro y los saldos de apertura."""
+    transfers, openings = backfill_ledger(chunk_size=chunk_size)
+    click.echo(f"Transferencias asentadas: {transfers}  Asientos de apertura: {openings}")
+    if transfers or openings:
+        click.echo("Los totales diarios no incluyen estos asientos: ejecuta 'rollups rebuild'.")
+
+
+@rollups_cli.command("rebuild")
+def rollups_rebuild_command():
+    """Recalcula los totales diarios desde el libro mayor (una transacción)."""
+    type_rows, account_rows = rebuild_rollups()
+    click.echo(f"Filas por tipo de cuenta: {type_rows}  Filas por cuenta: {account_rows}")
+
+
+@rollups_cli.command("check")
+@click.option("--from", "date_from", type=click.DateTime(formats=["%Y-%m-%d"]), required=True)
+@click.option("--to", "date_to", type=click.DateTime(formats=["%Y-%m-%d"]), required=True)
+@click.option("--limit", type=click.IntRange(1, 100), default=10, show_default=True,
+              help="Cuentas del ranking de receptores.")
+def rollups_check_command(date_from, date_to, limit):
+    """Compara los totales diarios con un recorrido completo de cuentas y transferencias."""
+    with db.engine.connect() as conn:
+        report = check_rollups(conn, date_from.date(), date_to.date(), limit)
+    for name, check in report["checks"].items():
+        status = "OK" if check["consistent"] else f"{len(check['mismatches'])} DIFERENCIAS"
+        click.echo(f"{name:<18} {status:<16} rollups {check['rollup_ms']:>9.2f} ms  "
+                   f"recorrido {check['scan_ms']:>9.2f} ms")
+        for mismatch in check["mismatches"]:
+            click.echo(f"    recorrido={mismatch['scan']}  rollups={mismatch['rollup']}")
+    if not report["consistent"]:
+        raise SystemExit(1)
+
+
+@tokens_cli.command("revoke-client")
+@click.argument("client_id", type=int)
+@click.option("--reason", default="cli", show_default=True)
+def revoke_client_command(client_id, reason):
+    """Revoca todos los tokens emitidos hasta ahora para el cliente."""
+    revoke_client_tokens(client_id, reason=reason)
+    click.echo(f"Tokens del cliente {client_id} revocados (los workers lo ven en la próxima sincronización).")
+
+
+@tokens_cli.command("purge")
+def purge_tokens_command():
+    """Borra de la lista de revocación las entradas de tokens ya vencidos."""
+    click.echo(f"Entradas purgadas: {get_token_denylist().purge()}")
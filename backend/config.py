@@ -1,6 +1,7 @@
 # backend/config.py
 
 from dotenv import load_dotenv
+from datetime import timedelta
 import os
 
 # Cargar variables desde el archivo .env
@@ -10,5 +11,179 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "supersecreto")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Respuestas en MessagePack para los clientes que lo pidan en Accept (requiere el paquete msgpack)
+    API_MSGPACK_ENABLED = os.getenv("API_MSGPACK_ENABLED", "true").lower() == "true"
+
+    # Motores de la base de datos: pool por worker (tamaño, desborde, segundos de espera por
+    # una conexión y de reciclado), pre-ping antes de usar una conexión del pool, timeout por
+    # sentencia en ms (0 = sin límite) y modo compatible con PgBouncer en modo transacción
+    # (timeout con SET LOCAL, sin sentencias preparadas; con DB_POOL_DISABLED no hay pool propio)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_DISABLED = os.getenv("DB_POOL_DISABLED", "false").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+    # Réplicas de lectura (URLs separadas por comas) para las vistas de solo lectura, y segundos
+    # que las lecturas de un cliente siguen yendo al primario después de que escriba (backend
+    # compartido opcional, "local" o "none", para que valga entre workers)
+    DATABASE_REPLICA_URLS = os.getenv("DATABASE_REPLICA_URLS", "")
+    DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+    DB_REPLICA_STICKY_MAX_ENTRIES = int(os.getenv("DB_REPLICA_STICKY_MAX_ENTRIES", "100000"))
+    DB_REPLICA_STICKY_BACKEND = os.getenv("DB_REPLICA_STICKY_BACKEND", "none")
+
+    # Servidor ASGI (backend.asgi): dashboard, historial y listados de admin con vistas asyncio.
+    # URL con driver asíncrono (vacía = la de DATABASE_URL cambiando el driver), pool de sus
+    # motores e hilos para el resto de rutas, que siguen siendo las vistas síncronas de Flask
+    ASYNC_READS_ENABLED = os.getenv("ASYNC_READS_ENABLED", "true").lower() == "true"
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+    ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+    ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "20"))
+    ASGI_WSGI_WORKERS = int(os.getenv("ASGI_WSGI_WORKERS", "10"))
+    # Descarte de carga de esas vistas (como LOAD_SHED_*, pero la espera no ocupa un hilo):
+    # lecturas en curso (0 = sin límite; las que necesitan conexión esperan además al pool),
+    # en espera y segundos
+    ASYNC_READS_MAX_INFLIGHT = int(os.getenv("ASYNC_READS_MAX_INFLIGHT", "64"))
+    ASYNC_READS_MAX_QUEUE = int(os.getenv("ASYNC_READS_MAX_QUEUE", "5000"))
+    ASYNC_READS_QUEUE_TIMEOUT = float(os.getenv("ASYNC_READS_QUEUE_TIMEOUT", "10"))
+
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-secreto")
-    JWT_HEADER_TYPE = "Bearer"
\ No newline at end of file
+    JWT_HEADER_TYPE = "Bearer"
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES", "3600")))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv("JWT_REFRESH_TOKEN_EXPIRES", str(30 * 86400))))
+
+    # Motor de transferencias: reintentos ante fallos de serialización / bloqueos
+    TRANSFER_MAX_RETRIES = int(os.getenv("TRANSFER_MAX_RETRIES", "5"))
+    TRANSFER_RETRY_BASE_DELAY = float(os.getenv("TRANSFER_RETRY_BASE_DELAY", "0.01"))  # segundos
+    TRANSFER_RETRY_MAX_DELAY = float(os.getenv("TRANSFER_RETRY_MAX_DELAY", "0.5"))  # segundos
+    # Máximo de transferencias aceptadas por petición en /api/transactions/transfer/batch
+    BATCH_TRANSFER_MAX_LEGS = int(os.getenv("BATCH_TRANSFER_MAX_LEGS", "10000"))
+
+    # Caché del dashboard por cliente (LRU en proceso + backend compartido opcional: "local" o "none").
+    # Con varios workers hace falta un backend compartido para que las invalidaciones lleguen a todos:
+    # una caché solo por worker sirve dashboards viejos tras una escritura atendida por otro worker,
+    # así que sin backend compartido la caché se desactiva salvo que se declare un único proceso
+    # (DASHBOARD_CACHE_SINGLE_PROCESS=true, p. ej. el servidor de desarrollo o un solo worker).
+    # Con réplicas de lectura, un backend compartido exige también DB_REPLICA_STICKY_BACKEND compartido.
+    DASHBOARD_CACHE_ENABLED = os.getenv("DASHBOARD_CACHE_ENABLED", "true").lower() == "true"
+    DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "10000"))
+    DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "30"))  # segundos
+    DASHBOARD_CACHE_BACKEND = os.getenv("DASHBOARD_CACHE_BACKEND", "none")
+    DASHBOARD_CACHE_SINGLE_PROCESS = os.getenv("DASHBOARD_CACHE_SINGLE_PROCESS", "false").lower() == "true"
+
+    # Sincronización por deltas (/dashboard?since=<versión>): fotos de las versiones servidas
+    # (0 = sin deltas, siempre respuesta completa), solape en segundos al buscar transacciones
+    # nuevas desde la foto y máximo de transacciones por delta
+    DASHBOARD_SNAPSHOT_MAX_ENTRIES = int(os.getenv("DASHBOARD_SNAPSHOT_MAX_ENTRIES", "10000"))
+    DASHBOARD_SNAPSHOT_TTL = float(os.getenv("DASHBOARD_SNAPSHOT_TTL", "3600"))  # segundos
+    DASHBOARD_DELTA_OVERLAP = float(os.getenv("DASHBOARD_DELTA_OVERLAP", "5"))
+    DASHBOARD_DELTA_MAX_TRANSACTIONS = int(os.getenv("DASHBOARD_DELTA_MAX_TRANSACTIONS", "200"))
+
+    # Logging estructurado: nivel base, niveles y tasas de muestreo por blueprint
+    # (formato "auth=DEBUG,admin_bp=WARNING" y "auth=0.1") y tamaño de la cola
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_BLUEPRINT_LEVELS = os.getenv("LOG_BLUEPRINT_LEVELS", "")
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    # Métricas por ruta (latencia, consultas SQL, tamaño de respuesta) en /metrics (formato
+    # Prometheus, por worker): repeticiones de una misma sentencia en una petición a partir
+    # de las que se avisa de un posible N+1 (0 = sin detector), cabecera Server-Timing y
+    # token que /metrics exige como "Authorization: Bearer <token>" (sin token, /metrics
+    # solo responde al JWT de un administrador)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", "5"))
+    METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "true").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+    # Límites de tasa por token bucket: "<endpoint o blueprint>@<ip|client>=<n>/<segundos>[:<ráfaga>]"
+    # separados por comas ("client" es la identidad del JWT; en el login, el correo). Backend de los
+    # buckets: "none" (LRU del proceso, límite por worker) o "local" (compartido). Proxies de confianza
+    # delante de la aplicación (para tomar la IP de X-Forwarded-For)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMITS = os.getenv(
+        "RATE_LIMITS",
+        "auth.login@ip=30/60:10,auth.login@client=10/300:5,"
+        "transaction_bp.transfer@client=20/1:40,transaction_bp.transfer@ip=100/1:200",
+    )
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "none")
+    RATE_LIMIT_MAX_ENTRIES = int(os.getenv("RATE_LIMIT_MAX_ENTRIES", "100000"))
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+
+    # Descarte de carga por worker: peticiones en curso (0 = sin límite), peticiones esperando
+    # turno y segundos de espera máxima; por encima se responde 503 con Retry-After
+    LOAD_SHED_MAX_INFLIGHT = int(os.getenv("LOAD_SHED_MAX_INFLIGHT", "64"))
+    LOAD_SHED_MAX_QUEUE = int(os.getenv("LOAD_SHED_MAX_QUEUE", "128"))
+    LOAD_SHED_QUEUE_TIMEOUT = float(os.getenv("LOAD_SHED_QUEUE_TIMEOUT", "2"))
+
+    # Hashing de contraseñas: algoritmo/coste ("scrypt", "pbkdf2:sha256:600000" o "bcrypt"),
+    # procesos del pool (0 = en línea), peticiones en espera antes de responder 503 y timeout
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "0")) or None  # por defecto 4 x workers
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))  # segundos
+
+    # Asignador de números de cuenta/tarjeta: seriales reservados por worker en cada viaje
+    # a la base de datos y BIN de cada proveedor de tarjetas ("VISA=400000,MasterCard=510000")
+    NUMBER_ALLOCATOR_BLOCK_SIZE = int(os.getenv("NUMBER_ALLOCATOR_BLOCK_SIZE", "100"))
+    CARD_BIN_PREFIXES = os.getenv("CARD_BIN_PREFIXES", "VISA=400000,MasterCard=510000,Clave=600000")
+
+    # Cuentas calientes: segundos que cada worker cachea qué cuentas tienen sub-saldos
+    # y cada cuántos segundos se trasladan los sub-saldos a la fila principal (0 = nunca)
+    HOT_ACCOUNT_REGISTRY_TTL = float(os.getenv("HOT_ACCOUNT_REGISTRY_TTL", "5"))
+    HOT_ACCOUNT_COMPACTION_INTERVAL = float(os.getenv("HOT_ACCOUNT_COMPACTION_INTERVAL", "60"))
+
+    # Libro mayor: segundos que deben pasar desde el fin de un día para construir sus fotos de saldo
+    LEDGER_SNAPSHOT_LAG = int(os.getenv("LEDGER_SNAPSHOT_LAG", "300"))
+
+    # Estados de cuenta: días que se sirven en streaming en la propia petición (más allá,
+    # job de fondo), máximo de días por job, hilos de jobs por worker, carpeta de salida
+    # y filas leídas por consulta
+    STATEMENT_INLINE_MAX_DAYS = int(os.getenv("STATEMENT_INLINE_MAX_DAYS", "31"))
+    STATEMENT_MAX_DAYS = int(os.getenv("STATEMENT_MAX_DAYS", "3660"))
+    STATEMENT_JOB_WORKERS = int(os.getenv("STATEMENT_JOB_WORKERS", "2"))
+    STATEMENT_OUTPUT_DIR = os.getenv("STATEMENT_OUTPUT_DIR") or None  # por defecto, <tmp>/novabank_statements
+    STATEMENT_CHUNK_SIZE = int(os.getenv("STATEMENT_CHUNK_SIZE", "5000"))
+
+    # Totales diarios (rollups): filas entre las que se reparte cada (día, tipo de cuenta)
+    # para que las transferencias concurrentes no compitan por la misma
+    ROLLUP_SHARDS = int(os.getenv("ROLLUP_SHARDS", "8"))
+
+    # Claves de idempotencia: segundos que se guarda cada respuesta, entradas del LRU por
+    # worker y cada cuántos segundos se purgan las vencidas (0 = nunca)
+    IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+    IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "10000"))
+    IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300"))
+
+    # Transferencias asíncronas: "off" (siempre en línea), "prefer" (en cola si la petición
+    # trae "Prefer: respond-async") o "always". Hilos que vacían la cola, transferencias por
+    # lote, segundos de espera para completar un lote y tamaño máximo de la cola
+    TRANSFER_ASYNC_MODE = os.getenv("TRANSFER_ASYNC_MODE", "prefer")
+    TRANSFER_QUEUE_WORKERS = int(os.getenv("TRANSFER_QUEUE_WORKERS", "2"))
+    TRANSFER_QUEUE_BATCH_SIZE = int(os.getenv("TRANSFER_QUEUE_BATCH_SIZE", "500"))
+    TRANSFER_QUEUE_BATCH_WAIT = float(os.getenv("TRANSFER_QUEUE_BATCH_WAIT", "0.005"))
+    TRANSFER_QUEUE_MAX_PENDING = int(os.getenv("TRANSFER_QUEUE_MAX_PENDING", "10000"))
+
+    # Pagos con tarjeta: segundos que dura una autorización sin capturar, cada cuántos
+    # segundos se barren las vencidas (0 = nunca) y cuántas por transacción, tamaño y TTL
+    # del índice de tarjetas por worker y cuenta recaudadora para pagos sin merchant_account_id
+    CARD_HOLD_TTL = int(os.getenv("CARD_HOLD_TTL", str(7 * 86400)))
+    CARD_HOLD_SWEEP_INTERVAL = float(os.getenv("CARD_HOLD_SWEEP_INTERVAL", "60"))
+    CARD_HOLD_SWEEP_CHUNK = int(os.getenv("CARD_HOLD_SWEEP_CHUNK", "1000"))
+    CARD_INDEX_MAX_ENTRIES = int(os.getenv("CARD_INDEX_MAX_ENTRIES", "100000"))
+    CARD_INDEX_TTL = float(os.getenv("CARD_INDEX_TTL", "300"))
+    PAYMENTS_SETTLEMENT_ACCOUNT_ID = int(os.getenv("PAYMENTS_SETTLEMENT_ACCOUNT_ID", "0")) or None
+
+    # Revocación de tokens: "bloom" (filtro de Bloom por worker delante de la tabla), "db"
+    # (consulta en cada petición) u "off"; capacidad y tasa de falsos positivos del filtro,
+    # cada cuántos segundos se sincroniza con la tabla y cada cuántos se purga y reconstruye
+    TOKEN_REVOCATION_CHECK = os.getenv("TOKEN_REVOCATION_CHECK", "bloom")
+    TOKEN_DENYLIST_CAPACITY = int(os.getenv("TOKEN_DENYLIST_CAPACITY", "100000"))
+    TOKEN_DENYLIST_ERROR_RATE = float(os.getenv("TOKEN_DENYLIST_ERROR_RATE", "0.001"))
+    TOKEN_DENYLIST_SYNC_INTERVAL = float(os.getenv("TOKEN_DENYLIST_SYNC_INTERVAL", "5"))
+    TOKEN_DENYLIST_REBUILD_INTERVAL = float(os.getenv("TOKEN_DENYLIST_REBUILD_INTERVAL", "3600"))
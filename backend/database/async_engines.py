@@ -0,0 +1,117 @@
+# backend/database/async_engines.py
+"""
+Motores asyncio de SQLAlchemy para las lecturas del servidor ASGI (``backend.asgi``).
+
+Apuntan a las mismas bases de datos que los motores síncronos (primario y
+réplicas de ``DATABASE_REPLICA_URLS``) con un driver asíncrono: la URL de
+``ASYNC_DATABASE_URL`` o, si está vacía, la del primario cambiando el driver
+(``sqlite`` -> ``sqlite+aiosqlite``, ``postgresql`` -> ``postgresql+asyncpg``;
+``postgresql+psycopg`` ya sirve tal cual). Las opciones del pool y del timeout
+por sentencia salen de la misma configuración ``DB_*`` (``ASYNC_DB_POOL_SIZE``
+y ``ASYNC_DB_MAX_OVERFLOW`` aparte: las peticiones que esperan conexión no
+ocupan un hilo, así que el pool puede ser otro).
+
+``read_session(client_id)`` abre una ``AsyncSession`` sobre el motor que
+``ReadRouter`` elige para ese cliente (réplica por turnos, o el primario si
+escribió hace poco), así que el enrutado y sus contadores son los mismos que en
+las vistas ``@read_replica``. Las consultas se escriben una sola vez, sobre una
+sesión síncrona: ``AsyncSession.run_sync`` las ejecuta con la E/S del driver
+asíncrono.
+"""
+from flask import current_app
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from backend.database.routing import engine_options, get_read_router
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+ASYNC_CAPABLE_DRIVERS = ("aiosqlite", "asyncpg", "psycopg")
+
+
+class AsyncEngineConfigError(ValueError):
+    """No se puede derivar un motor asíncrono de la configuración."""
+
+
+def async_database_url(database_url):
+    """URL equivalente con un driver asíncrono."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # Cada conexión asíncrona vería otra base de datos en memoria
+        raise AsyncEngineConfigError("Una base de datos SQLite en memoria no se puede compartir con el motor asíncrono.")
+    if "+" in url.drivername and url.get_driver_name() in ASYNC_CAPABLE_DRIVERS:
+        return url  # driver explícito que ya es asíncrono
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise AsyncEngineConfigError(f"No hay driver asíncrono para {url.get_backend_name()} (usa ASYNC_DATABASE_URL).")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+def async_engine_options(config, url):
+    """Opciones de ``create_async_engine``: las de ``engine_options`` adaptadas al driver."""
+    options = engine_options(config, url)
+    if "pool_size" in options:
+        options["pool_size"] = config.get("ASYNC_DB_POOL_SIZE", options["pool_size"])
+        options["max_overflow"] = config.get("ASYNC_DB_MAX_OVERFLOW", options["max_overflow"])
+    connect_args = options.get("connect_args", {})
+    if url.get_driver_name() == "asyncpg":
+        # asyncpg no acepta "options" (se pasa como server_settings) y con PgBouncer
+        # tampoco puede cachear sentencias preparadas
+        timeout = connect_args.pop("options", None)
+        if timeout is not None:
+            connect_args["server_settings"] = {"statement_timeout": timeout.rsplit("=", 1)[1]}
+        if config.get("DB_PGBOUNCER", False):
+            connect_args["statement_cache_size"] = 0
+    if connect_args:
+        options["connect_args"] = connect_args
+    else:
+        options.pop("connect_args", None)
+    return options
+
+
+class AsyncReadEngines:
+    """Motor asíncrono del primario y de cada réplica (emparejados con los síncronos de ``ReadRouter``)."""
+
+    def __init__(self, primary, replicas=None):
+        self.primary = primary
+        self.replicas = dict(replicas or {})  # motor síncrono de la réplica -> motor asíncrono
+        self._sessions = {
+            engine: async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+            for engine in [primary, *self.replicas.values()]
+        }
+
+    @property
+    def engines(self):
+        return [self.primary, *self.replicas.values()]
+
+    def read_session(self, client_id=None):
+        """``AsyncSession`` de solo lectura en la réplica elegida para ``client_id`` (o en el primario)."""
+        router = get_read_router()
+        replica = router.choose(client_id) if router is not None else None
+        return self._sessions[self.replicas.get(replica, self.primary)]()
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+def init_async_engines(app):
+    """Crea los motores asíncronos (llamar desde la aplicación ASGI, después de ``create_app``)."""
+    config = app.config
+    url = async_database_url(config.get("ASYNC_DATABASE_URL") or config["SQLALCHEMY_DATABASE_URI"])
+    explicit = config.get("ASYNC_ENGINE_OPTIONS") or {}
+    primary = create_async_engine(url, **{**async_engine_options(config, url), **explicit})
+    replicas = {}
+    with app.app_context():
+        router = get_read_router()
+        for sync_engine in (router.replicas.values() if router is not None else ()):
+            replica_url = async_database_url(sync_engine.url)
+            replicas[sync_engine] = create_async_engine(
+                replica_url, **{**async_engine_options(config, replica_url), **explicit}
+            )
+    engines = AsyncReadEngines(primary, replicas)
+    app.extensions["async_engines"] = engines
+    return engines
+
+
+def get_async_engines():
+    return current_app.extensions.get("async_engines")
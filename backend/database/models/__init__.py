@@ -1,8 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from backend.database.routing import RoutingSession
+
+# La sesión envía las lecturas de las vistas @read_replica a una réplica (ver backend/database/routing.py)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # Importa los modelos para que SQLAlchemy los registre
 from .client import Client
+from .account_balance_slot import AccountBalanceSlot
 from .account import Account
 from .card import Card
+from .transaction import Transaction
+from .number_sequence import NumberSequence
+from .ledger import LedgerEntry, BalanceSnapshot
+from .statement_job import StatementJob
+from .rollups import DailyTypeRollup, DailyAccountRollup
+from .idempotency_key import IdempotencyKey
+from .queued_transfer import QueuedTransfer
+from .payment_hold import PaymentHold
+from .revoked_token import RevokedToken
@@ -1,5 +1,10 @@
 # backend/database/models/account.py
+from datetime import datetime
+
+from sqlalchemy import case, func, select
+
 from backend.database.models import db
+from backend.database.models.account_balance_slot import AccountBalanceSlot
 
 class Account(db.Model):
     __tablename__ = "accounts"
@@ -10,6 +15,27 @@ class Account(db.Model):
     balance = db.Column(db.Float, default=0.0)
   # ¡FINAL! Ahora es NOT NULL y sin default si no lo quieres para nuevas entradas
     account_number = db.Column(db.String(10), unique=True, nullable=False)
+    # Cuenta "caliente": número de sub-saldos entre los que se reparten los créditos (0 = normal)
+    balance_slots = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Suma de las retenciones de pagos con tarjeta autorizados y aún sin capturar
+    # (saldo disponible = saldo real - retenido)
+    held_amount = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+    # Fecha de apertura (NULL en las cuentas anteriores a la columna)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Saldo real: el de la fila más lo acumulado en los sub-saldos, si los tiene
+    total_balance = db.column_property(
+        case(
+            (
+                balance_slots > 0,
+                balance + select(func.coalesce(func.sum(AccountBalanceSlot.balance), 0.0))
+                .where(AccountBalanceSlot.account_id == id)
+                .correlate_except(AccountBalanceSlot)
+                .scalar_subquery(),
+            ),
+            else_=balance,
+        )
+    )
     
 sent_transactions = db.relationship('Transaction', foreign_keys='Transaction.sender_account_id', backref='sender', lazy=True)
 received_transactions = db.relationship('Transaction', foreign_keys='Transaction.receiver_account_id', backref='receiver', lazy=True)
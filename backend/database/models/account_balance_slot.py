@@ -0,0 +1,10 @@
+# backend/database/models/account_balance_slot.py
+from backend.database.models import db
+
+class AccountBalanceSlot(db.Model):
+    """Sub-saldo de una cuenta "caliente" (ver backend/services/hot_accounts.py)."""
+    __tablename__ = "account_balance_slots"
+
+    account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True)
+    balance = db.Column(db.Float, nullable=False, default=0.0)
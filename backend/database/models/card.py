@@ -9,3 +9,5 @@ class Card(db.Model):
     card_number = db.Column(db.String(16), unique=True, nullable=False)
     card_type = db.Column(db.String(10), nullable=False)  # Ejemplo: "debito" o "credito"
     provider = db.Column(db.String(20), nullable=False)  # Ejemplo: "VISA", "MasterCard", "Clave"
+    # Cuenta contra la que se autorizan y capturan los pagos con la tarjeta
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=True)
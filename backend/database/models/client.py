@@ -1,7 +1,7 @@
 
 # backend/database/models/client.py
 from backend.database.models import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from backend.services.password_hashing import hash_password, verify_password
 
 class Client(db.Model):
     __tablename__ = "clients"
@@ -18,18 +18,15 @@ class Client(db.Model):
     accounts = db.relationship('Account', backref='client', lazy=True)
     cards = db.relationship('Card', backref='client', lazy=True)
 
+    # El KDF se ejecuta en el pool de procesos del servicio de hashing
+    # (ver backend/services/password_hashing.py)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     def to_dict(self): # <--- Asegúrate de que este método exista y incluya 'is_admin'
-        return {
-            'id': self.id,
-            'full_name': self.full_name,
-            'email': self.email,
-            'phone_number': self.phone_number,
-            'cip': self.cip,
-            'is_admin': self.is_admin
-        }
+        # Mismos campos que el serializador "client" del registro (backend/services/serialization.py)
+        from backend.services.serialization import CLIENT
+        return CLIENT.from_object(self)
@@ -0,0 +1,18 @@
+# backend/database/models/idempotency_key.py
+from backend.database.models import db
+from datetime import datetime
+
+class IdempotencyKey(db.Model):
+    """Respuesta guardada de una petición con ``Idempotency-Key`` (ver backend/services/idempotency.py)."""
+    __tablename__ = "idempotency_keys"
+    # Purga de claves vencidas por rango de fecha
+    __table_args__ = (
+        db.Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+
+    client_id = db.Column(db.Integer, db.ForeignKey("clients.id"), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # sha256 de método, ruta y cuerpo
+    status_code = db.Column(db.SmallInteger)  # NULL mientras la transacción que la reclamó no termina
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
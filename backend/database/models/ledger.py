@@ -0,0 +1,29 @@
+# backend/database/models/ledger.py
+from backend.database.models import db
+from datetime import datetime
+
+class LedgerEntry(db.Model):
+    """Asiento contable inmutable: cada transferencia genera un débito y un crédito que suman cero."""
+    __tablename__ = "ledger_entries"
+    # Saldo a una fecha: recorrido por rango de (account_id, created_at) desde la última foto.
+    # Construcción de fotos: recorrido por rango de created_at (un día por pasada)
+    __table_args__ = (
+        db.Index("ix_ledger_entries_account_created_id", "account_id", "created_at", "id"),
+        db.Index("ix_ledger_entries_created_at", "created_at"),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey("transactions.id"), nullable=True, index=True)
+    entry_type = db.Column(db.String(20), nullable=False)  # Ejemplo: "transfer", "opening"
+    amount = db.Column(db.Float, nullable=False)  # negativo = débito, positivo = crédito
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class BalanceSnapshot(db.Model):
+    """Saldo de una cuenta con todos los asientos anteriores a ``as_of`` (inicio de un día, UTC)."""
+    __tablename__ = "balance_snapshots"
+
+    account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), primary_key=True)
+    as_of = db.Column(db.DateTime, primary_key=True)
+    balance = db.Column(db.Float, nullable=False)
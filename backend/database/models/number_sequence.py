@@ -0,0 +1,9 @@
+# backend/database/models/number_sequence.py
+from backend.database.models import db
+
+class NumberSequence(db.Model):
+    """Marca de agua alta de cada serie de números (cuentas, tarjetas por BIN)."""
+    __tablename__ = "number_sequences"
+
+    name = db.Column(db.String(40), primary_key=True)  # Ejemplo: "account", "card:400000"
+    next_value = db.Column(db.BigInteger, nullable=False)  # primer serial aún no reservado
@@ -0,0 +1,41 @@
+# backend/database/models/payment_hold.py
+from backend.database.models import db
+from datetime import datetime
+
+class PaymentHold(db.Model):
+    """Retención de un pago autorizado (ver backend/services/card_payments.py)."""
+    __tablename__ = "payment_holds"
+    # Barrido de retenciones vencidas: recorrido por rango de (status, expires_at)
+    __table_args__ = (
+        db.Index("ix_payment_holds_status_expires_at", "status", "expires_at"),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 en hexadecimal
+    client_id = db.Column(db.Integer, db.ForeignKey("clients.id"), nullable=False)
+    card_id = db.Column(db.Integer, db.ForeignKey("cards.id"), nullable=True)  # NULL = pago desde la cuenta
+    account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), nullable=False, index=True)
+    merchant_account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), nullable=False)
+    amount = db.Column(db.Float, nullable=False)  # monto retenido
+    captured_amount = db.Column(db.Float)
+    description = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False)  # authorized, captured, voided, expired
+    transaction_id = db.Column(db.Integer, db.ForeignKey("transactions.id"))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    resolved_at = db.Column(db.DateTime)  # captura, anulación o vencimiento
+
+    def to_dict(self):
+        return {
+            "payment_id": self.id,
+            "status": self.status,
+            "card_id": self.card_id,
+            "account_id": self.account_id,
+            "merchant_account_id": self.merchant_account_id,
+            "amount": self.amount,
+            "captured_amount": self.captured_amount,
+            "description": self.description,
+            "transaction_id": self.transaction_id,
+            "created_at": self.created_at.isoformat(),
+            "expires_at": self.expires_at.isoformat(),
+            "resolved_at": self.resolved_at.isoformat() if self.resolved_at else None,
+        }
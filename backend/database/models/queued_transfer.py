@@ -0,0 +1,32 @@
+# backend/database/models/queued_transfer.py
+from backend.database.models import db
+from datetime import datetime
+
+class QueuedTransfer(db.Model):
+    """Estado de una transferencia aceptada en modo asíncrono (ver backend/services/transfer_queue.py)."""
+    __tablename__ = "queued_transfers"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 en hexadecimal, devuelto con el 202
+    requested_by = db.Column(db.Integer, db.ForeignKey("clients.id"), nullable=False)
+    sender_account_id = db.Column(db.Integer, nullable=False)
+    receiver_account_id = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    description = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False)  # applied, rejected, failed
+    transaction_id = db.Column(db.Integer, db.ForeignKey("transactions.id"))
+    message = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False)  # cuándo se aceptó
+    processed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "transfer_id": self.id,
+            "status": self.status,
+            "sender_account_id": self.sender_account_id,
+            "receiver_account_id": self.receiver_account_id,
+            "amount": self.amount,
+            "transaction_id": self.transaction_id,
+            "message": self.message,
+            "created_at": self.created_at.isoformat(),
+            "processed_at": self.processed_at.isoformat() if self.processed_at else None,
+        }
@@ -0,0 +1,18 @@
+# backend/database/models/revoked_token.py
+from backend.database.models import db
+from datetime import datetime
+
+class RevokedToken(db.Model):
+    """
+    Entrada de la lista de revocación de tokens JWT (ver backend/services/token_revocation.py).
+    ``key`` es ``jti:<jti>`` (un token) o ``client:<id>`` (todos los tokens del
+    cliente emitidos antes de ``revoked_at``).
+    """
+    __tablename__ = "revoked_tokens"
+
+    key = db.Column(db.String(64), primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("clients.id"), nullable=True)
+    token_type = db.Column(db.String(10))  # access, refresh (NULL en las revocaciones por cliente)
+    reason = db.Column(db.String(100))
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # después ya no hace falta guardarla
@@ -0,0 +1,33 @@
+# backend/database/models/rollups.py
+from backend.database.models import db
+
+class DailyTypeRollup(db.Model):
+    """
+    Totales diarios por tipo de cuenta, mantenidos en la misma transacción que las
+    transferencias y los registros. Cada (día, tipo) se reparte en varias filas
+    (``shard``) para que las transferencias concurrentes no compitan por una sola.
+    """
+    __tablename__ = "rollup_daily_account_type"
+
+    day = db.Column(db.Date, primary_key=True)
+    account_type = db.Column(db.String(20), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, default=0)
+    accounts_opened = db.Column(db.Integer, nullable=False, default=0)
+    transfers_in = db.Column(db.Integer, nullable=False, default=0)
+    amount_in = db.Column(db.Float, nullable=False, default=0.0)
+    transfers_out = db.Column(db.Integer, nullable=False, default=0)
+    amount_out = db.Column(db.Float, nullable=False, default=0.0)
+    other_amount = db.Column(db.Float, nullable=False, default=0.0)  # asientos que no son transferencias (aperturas)
+
+
+class DailyAccountRollup(db.Model):
+    """Totales diarios de transferencias por cuenta (``shard`` > 0 solo en cuentas calientes)."""
+    __tablename__ = "rollup_daily_account"
+
+    day = db.Column(db.Date, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, default=0)
+    transfers_in = db.Column(db.Integer, nullable=False, default=0)
+    amount_in = db.Column(db.Float, nullable=False, default=0.0)
+    transfers_out = db.Column(db.Integer, nullable=False, default=0)
+    amount_out = db.Column(db.Float, nullable=False, default=0.0)
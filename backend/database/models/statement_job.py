@@ -0,0 +1,40 @@
+# backend/database/models/statement_job.py
+from backend.database.models import db
+from datetime import datetime
+
+class StatementJob(db.Model):
+    """Generación en segundo plano de un estado de cuenta (ver backend/services/statements.py)."""
+    __tablename__ = "statement_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 en hexadecimal
+    account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), nullable=False)
+    requested_by = db.Column(db.Integer, db.ForeignKey("clients.id"), nullable=False)
+    output_format = db.Column(db.String(10), nullable=False)  # "csv" o "json"
+    date_from = db.Column(db.Date, nullable=False)
+    date_to = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending")  # pending, running, done, failed
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    rows_total = db.Column(db.Integer)
+    file_path = db.Column(db.String(255))
+    error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        percent = None
+        if self.rows_total:
+            percent = round(100.0 * self.rows_written / self.rows_total, 1)
+        elif self.status == "done":
+            percent = 100.0
+        return {
+            "job_id": self.id,
+            "account_id": self.account_id,
+            "format": self.output_format,
+            "from": self.date_from.isoformat(),
+            "to": self.date_to.isoformat(),
+            "status": self.status,
+            "progress": {"rows_written": self.rows_written, "rows_total": self.rows_total, "percent": percent},
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
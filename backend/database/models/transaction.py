@@ -3,6 +3,11 @@ from datetime import datetime
 
 class Transaction(db.Model):
     __tablename__ = "transactions"
+    # Índices compuestos para el historial paginado por cursor (timestamp, id)
+    __table_args__ = (
+        db.Index("ix_transactions_sender_timestamp_id", "sender_account_id", "timestamp", "id"),
+        db.Index("ix_transactions_receiver_timestamp_id", "receiver_account_id", "timestamp", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     sender_account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), nullable=False)
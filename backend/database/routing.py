@@ -0,0 +1,244 @@
+# backend/database/routing.py
+"""
+Motores de la base de datos y enrutado de lecturas a réplicas.
+
+``init_database`` arma las opciones de los motores a partir de la configuración
+``DB_*`` (tamaño del pool, desborde, reciclado, pre-ping, timeout por sentencia
+y modo compatible con PgBouncer) y crea un motor por cada URL de
+``DATABASE_REPLICA_URLS``. Las réplicas no son binds de Flask-SQLAlchemy: no
+tienen metadata propia y ``db.create_all`` nunca las toca.
+
+``RoutingSession`` es la clase de ``db.session``: durante una petición marcada
+con ``@read_replica`` las consultas van a una réplica (por turnos); los flush,
+las sentencias de escritura y todo lo demás van al primario. Para que un
+cliente lea lo que acaba de escribir, ``stick_to_primary`` (se llama desde
+``invalidate_clients``, es decir, después de cada escritura que le afecta)
+manda sus lecturas al primario durante ``DB_REPLICA_STICKY_SECONDS``, que debe
+ser mayor que el retraso habitual de las réplicas.
+"""
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql.expression import UpdateBase
+
+from backend.services.cache import MISSING, LRUCache, make_shared_backend
+
+REPLICA_NAME_PREFIX = "replica_"
+SQLITE_PROGRESS_STEPS = 10000  # instrucciones de la VM de SQLite entre comprobaciones del timeout
+
+
+class RoutingSession(Session):
+    """Sesión que envía las lecturas de las peticiones ``@read_replica`` a la réplica elegida."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase) and has_app_context():
+            replica = g.get("db_replica")
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReadRouter:
+    """Elige réplica por turnos y recuerda qué clientes escribieron hace poco (lecturas al primario)."""
+
+    def __init__(self, replicas, sticky_seconds, max_entries=100000, shared=None):
+        self.replicas = dict(replicas)  # nombre -> Engine
+        self.sticky_seconds = sticky_seconds
+        self.local = LRUCache(max_entries=max_entries, ttl=sticky_seconds)
+        self.shared = shared
+        self._turns = itertools.cycle(list(self.replicas.values()))
+        self._lock = threading.Lock()
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    @staticmethod
+    def _key(client_id):
+        return f"sticky:{client_id}"
+
+    def stick(self, client_ids):
+        if self.sticky_seconds <= 0:
+            return
+        for client_id in client_ids:
+            key = self._key(client_id)
+            self.local.set(key, True)
+            if self.shared is not None:
+                self.shared.set(key, True, self.sticky_seconds)
+
+    def is_sticky(self, client_id):
+        key = self._key(client_id)
+        if self.local.get(key) is not MISSING:
+            return True
+        return self.shared is not None and self.shared.get(key) is not MISSING
+
+    def choose(self, client_id):
+        """Motor de la réplica para esta petición, o ``None`` para leer del primario."""
+        if client_id is not None and self.is_sticky(int(client_id)):
+            with self._lock:
+                self.primary_reads += 1
+            return None
+        with self._lock:
+            self.replica_reads += 1
+            return next(self._turns)
+
+    def stats(self):
+        return {
+            "replicas": list(self.replicas),
+            "sticky_seconds": self.sticky_seconds,
+            "replica_reads": self.replica_reads,
+            "sticky_primary_reads": self.primary_reads,
+            "sticky_clients": self.local.stats()["entries"],
+            "shared_backend": type(self.shared).__name__ if self.shared is not None else None,
+        }
+
+
+def get_read_router():
+    return current_app.extensions.get("read_router")
+
+
+def read_replica(view):
+    """
+    Marca una vista de solo lectura: sus consultas por ``db.session`` van a una
+    réplica salvo que el cliente autenticado haya escrito hace poco. Va debajo
+    de ``@jwt_required()`` (necesita la identidad del token).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = get_read_router()
+        if router is not None:
+            g.db_replica = router.choose(get_jwt_identity())
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def stick_to_primary(client_ids):
+    """Lecturas de estos clientes al primario durante un rato (llamar después del commit)."""
+    router = get_read_router()
+    if router is not None and client_ids:
+        router.stick({int(client_id) for client_id in client_ids})
+
+
+def _is_sqlite_memory(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(config, database_url):
+    """Opciones de ``create_engine`` para ``database_url`` según la configuración ``DB_*``."""
+    url = make_url(database_url)
+    options = {"pool_pre_ping": config.get("DB_POOL_PRE_PING", True)}
+    if config.get("DB_POOL_DISABLED", False):
+        # Con PgBouncer en modo transacción el pool real es el suyo
+        options["poolclass"] = NullPool
+    elif not _is_sqlite_memory(url):
+        options.update(
+            pool_size=config.get("DB_POOL_SIZE", 5),
+            max_overflow=config.get("DB_MAX_OVERFLOW", 10),
+            pool_timeout=config.get("DB_POOL_TIMEOUT", 30),
+            pool_recycle=config.get("DB_POOL_RECYCLE", 1800),
+        )
+
+    connect_args = {}
+    timeout_ms = config.get("DB_STATEMENT_TIMEOUT_MS", 0)
+    if url.get_backend_name() == "postgresql":
+        if timeout_ms and not config.get("DB_PGBOUNCER", False):
+            connect_args["options"] = f"-c statement_timeout={int(timeout_ms)}"
+        if config.get("DB_PGBOUNCER", False) and url.get_driver_name() == "psycopg":
+            # Las sentencias preparadas del servidor no sobreviven a un cambio de conexión en PgBouncer
+            connect_args["prepare_threshold"] = None
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def _merge_options(base, overrides):
+    merged = {**base, **overrides}
+    if "connect_args" in base and "connect_args" in overrides:
+        merged["connect_args"] = {**base["connect_args"], **overrides["connect_args"]}
+    return merged
+
+
+def _install_statement_timeout(engine, timeout_ms, pgbouncer):
+    """Timeout por sentencia que no se puede pasar al conectar (SQLite, o PostgreSQL tras PgBouncer)."""
+    if not timeout_ms:
+        return
+    backend = engine.dialect.name
+
+    if backend == "sqlite":
+        # SQLite no tiene statement_timeout: un progress handler interrumpe la
+        # sentencia (OperationalError "interrupted") cuando vence su plazo
+        @event.listens_for(engine, "connect")
+        def _install_progress_handler(dbapi_connection, connection_record):
+            info = connection_record.info
+
+            def check_deadline():
+                deadline = info.get("statement_deadline")
+                return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+            dbapi_connection.set_progress_handler(check_deadline, SQLITE_PROGRESS_STEPS)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _start_deadline(conn, cursor, statement, parameters, context, executemany):
+            conn.info["statement_deadline"] = time.monotonic() + timeout_ms / 1000
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _clear_deadline(conn, cursor, statement, parameters, context, executemany):
+            conn.info.pop("statement_deadline", None)
+
+    elif backend == "postgresql" and pgbouncer:
+        # PgBouncer rechaza "options" al conectar y en modo transacción un SET de
+        # sesión acabaría en otra conexión del servidor: SET LOCAL en cada transacción
+        @event.listens_for(engine, "begin")
+        def _set_local_timeout(conn):
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+            finally:
+                cursor.close()
+
+
+def init_database(app, db):
+    """Configura los motores (primario y réplicas) e inicializa ``db`` sobre la aplicación."""
+    config = app.config
+    explicit = config.get("SQLALCHEMY_ENGINE_OPTIONS") or {}
+    primary_url = config.get("SQLALCHEMY_DATABASE_URI")
+    if primary_url:
+        config["SQLALCHEMY_ENGINE_OPTIONS"] = _merge_options(engine_options(config, primary_url), explicit)
+
+    replica_urls = [url.strip() for url in (config.get("DATABASE_REPLICA_URLS") or "").split(",") if url.strip()]
+    replicas = {
+        f"{REPLICA_NAME_PREFIX}{n}": create_engine(url, **_merge_options(engine_options(config, url), explicit))
+        for n, url in enumerate(replica_urls)
+    }
+
+    db.init_app(app)
+    with app.app_context():
+        for engine in [*db.engines.values(), *replicas.values()]:
+            _install_statement_timeout(engine, config.get("DB_STATEMENT_TIMEOUT_MS", 0),
+                                       config.get("DB_PGBOUNCER", False))
+
+    router = None
+    if replicas:
+        router = ReadRouter(
+            replicas,
+            config.get("DB_REPLICA_STICKY_SECONDS", 5),
+            max_entries=config.get("DB_REPLICA_STICKY_MAX_ENTRIES", 100000),
+            shared=make_shared_backend(config.get("DB_REPLICA_STICKY_BACKEND")),
+        )
+    app.extensions["read_router"] = router
+    return router
+
+
+def pool_stats(db):
+    """Estado del pool del primario y de cada réplica."""
+    stats = {"primary": db.engine.pool.status()}
+    router = get_read_router()
+    if router is not None:
+        stats.update((name, engine.pool.status()) for name, engine in router.replicas.items())
+    return stats
@@ -0,0 +1,182 @@
+# backend/logging_setup.py
+"""
+Logging estructurado y no bloqueante para las rutas de la API.
+
+* Los registros se encolan (``QueueHandler``) y un hilo aparte (``QueueListener``)
+  los formatea como JSON y los escribe; la petición nunca espera por stdout/stderr.
+  Si la cola se llena, el registro se descarta y se cuenta en ``dropped_records``.
+* Cada petición recibe un id de correlación (``X-Request-ID``, o uno nuevo) que se
+  añade a todos sus registros y se devuelve en la respuesta.
+* Nivel y tasa de muestreo configurables por blueprint (``LOG_BLUEPRINT_LEVELS``,
+  ``LOG_SAMPLE_RATES``). El muestreo se decide por petición y solo afecta a
+  DEBUG/INFO; los avisos y errores se registran siempre.
+* Los campos sensibles (password, token, cip, card_number...) se enmascaran.
+* ``LazyJson`` difiere el ``json.dumps`` hasta que el registro se escribe de
+  verdad: si el nivel no está activo o la petición no fue muestreada, no se serializa.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+LOGGER_PREFIX = "novabank"
+REDACTED = "***"
+DEFAULT_REDACT_FIELDS = ("password", "password_hash", "token", "access_token", "refresh_token",
+                         "cip", "card_number", "authorization")
+
+_listener = None
+_queue_handler = None
+
+
+def get_logger(name):
+    """Logger de la aplicación, p. ej. ``get_logger("auth")`` para el blueprint ``auth``."""
+    return logging.getLogger(f"{LOGGER_PREFIX}.{name}")
+
+
+def redact(value, fields=DEFAULT_REDACT_FIELDS):
+    """Copia de ``value`` con los campos sensibles enmascarados (recorre dicts y listas)."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in fields else redact(item, fields)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item, fields) for item in value]
+    return value
+
+
+class LazyJson:
+    """Serializa ``payload`` (ya enmascarado) solo cuando el mensaje se formatea."""
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return json.dumps(redact(self.payload), ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Añade ``request_id`` y ``blueprint`` al registro y aplica el muestreo de la
+    petición. Corre en el hilo de la petición, antes de encolar (y de formatear).
+    """
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = getattr(g, "request_id", None)
+            record.blueprint = request.blueprint
+            if record.levelno < logging.WARNING and not getattr(g, "log_sampled", True):
+                return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, redact_fields=DEFAULT_REDACT_FIELDS):
+        super().__init__()
+        self.redact_fields = redact_fields
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for attribute in ("request_id", "blueprint"):
+            value = getattr(record, attribute, None)
+            if value is not None:
+                entry[attribute] = value
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry["fields"] = redact(fields, self.redact_fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """``QueueHandler`` que descarta (y cuenta) en lugar de bloquear cuando la cola está llena."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped_records = 0
+
+    def prepare(self, record):
+        # El formateo (y cualquier LazyJson) se hace en el hilo del listener
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped_records += 1
+
+
+def _parse_mapping(raw, cast):
+    """Convierte ``"auth=DEBUG,admin_bp=WARNING"`` en un dict (o devuelve el dict tal cual)."""
+    if isinstance(raw, dict):
+        return {key: cast(value) for key, value in raw.items()}
+    mapping = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            mapping[key.strip()] = cast(value.strip())
+    return mapping
+
+
+def _configure_handlers(config):
+    """Instala la cola y el hilo escritor una sola vez por proceso."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue(maxsize=config.get("LOG_QUEUE_SIZE", 10000))
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter(tuple(config.get("LOG_REDACT_FIELDS", DEFAULT_REDACT_FIELDS))))
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # vacía la cola al terminar el proceso
+
+    # Se instala en el logger raíz para que también pasen por la cola los
+    # registros de los servicios (backend.services.*) y de las librerías
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(RequestContextFilter())
+    logging.getLogger().addHandler(_queue_handler)
+
+
+def logging_stats():
+    return {"dropped_records": _queue_handler.dropped_records if _queue_handler else 0}
+
+
+def init_logging(app):
+    config = app.config
+    _configure_handlers(config)
+
+    base_level = config.get("LOG_LEVEL", "INFO")
+    logging.getLogger().setLevel(base_level)
+    blueprint_levels = _parse_mapping(config.get("LOG_BLUEPRINT_LEVELS"), str.upper)
+    sample_rates = _parse_mapping(config.get("LOG_SAMPLE_RATES"), float)
+
+    for name in list(app.blueprints) + list(blueprint_levels):
+        get_logger(name).setLevel(blueprint_levels.get(name, base_level))
+
+    @app.before_request
+    def _assign_request_id():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        rate = sample_rates.get(request.blueprint, 1.0)
+        g.log_sampled = rate >= 1.0 or random.random() < rate
+
+    @app.after_request
+    def _return_request_id(response):
+        request_id = getattr(g, "request_id", None)
+        if request_id:
+            response.headers["X-Request-ID"] = request_id
+        return response
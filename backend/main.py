@@ -4,20 +4,40 @@ from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from .config import Config
 from backend.database.models import db
+from backend.database.routing import init_database
 from flask_bcrypt import Bcrypt
 from backend.routes.auth_routes import auth_bp
 from backend.routes.admin_routes import admin_bp # <--- ¡IMPORTA admin_bp!
+from backend.routes.transaction_routes import transaction_bp
+from backend.routes.payment_routes import payment_bp
+from backend.cli import accounts_cli, clients_cli, ledger_cli, rollups_cli, tokens_cli, transfers_cli
+from backend.services.dashboard import init_dashboard_cache
+from backend.logging_setup import init_logging
+from backend.services.password_hashing import init_password_hasher
+from backend.services.number_allocator import init_number_allocator
+from backend.services.hot_accounts import init_hot_accounts
+from backend.services.statements import init_statement_jobs
+from backend.services.idempotency import init_idempotency
+from backend.services.transfer_queue import init_transfer_queue
+from backend.services.card_payments import init_card_payments
+from backend.services.token_revocation import init_token_revocation
+from backend.services.serialization import init_serialization
+from backend.services.rate_limiting import init_admission_control
+from backend.services.metrics import init_metrics
 
 # Inicialización de extensiones
 bcrypt = Bcrypt()
 jwt = JWTManager()
 migrate = Migrate()
 
-def create_app():
+def create_app(config_overrides=None):
     app = Flask(__name__)
 
     # Configuración principal
     app.config.from_object(Config)
+    # Permite sobrescribir valores (p. ej. otra base de datos para pruebas de carga)
+    if config_overrides:
+        app.config.update(config_overrides)
 
     # Configuración adicional necesaria para evitar errores 422
     app.config['JWT_TOKEN_LOCATION'] = ['headers']
@@ -25,10 +45,20 @@ def create_app():
     app.config['JWT_HEADER_TYPE'] = 'Bearer'
 
     # Inicializar extensiones
-    db.init_app(app)
+    init_serialization(app)  # orjson para jsonify y MessagePack por Accept
+    init_database(app, db)  # opciones de los motores, réplicas de lectura y db.init_app
     bcrypt.init_app(app)
     jwt.init_app(app)
     migrate.init_app(app, db)
+    init_dashboard_cache(app)
+    init_password_hasher(app)
+    init_number_allocator(app)
+    init_hot_accounts(app)
+    init_statement_jobs(app)
+    init_idempotency(app)
+    init_transfer_queue(app)
+    init_card_payments(app)
+    init_token_revocation(app, jwt)
     CORS(app, resources={r"/api/*": {"origins": "http://localhost:5173"}}, supports_credentials=True)
 
     # Registrar rutas
@@ -38,6 +68,27 @@ def create_app():
     app.register_blueprint(admin_bp, url_prefix="/api/admin") # <--- ¡REGISTRA admin_bp!
     print("Blueprint admin_bp registrado con el prefijo /api/admin") # Log para verificar
 
+    app.register_blueprint(transaction_bp) # El prefijo /api/transactions está definido en el blueprint
+    print("Blueprint transaction_bp registrado con el prefijo /api/transactions")
+
+    app.register_blueprint(payment_bp) # El prefijo /api/payments está definido en el blueprint
+    print("Blueprint payment_bp registrado con el prefijo /api/payments")
+
+    # Logging estructurado (después de registrar los blueprints: niveles por blueprint)
+    init_logging(app)
+    # Métricas por ruta y /metrics (antes del control de admisión: también se miden los 429/503)
+    init_metrics(app)
+    # Límites de tasa y descarte de carga (después del logging: los rechazos llevan X-Request-ID)
+    init_admission_control(app)
+
+    # Comandos de la CLI de flask (operaciones masivas)
+    app.cli.add_command(transfers_cli)
+    app.cli.add_command(clients_cli)
+    app.cli.add_command(accounts_cli)
+    app.cli.add_command(ledger_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(tokens_cli)
+
     return app
 
 # Para desarrollo local
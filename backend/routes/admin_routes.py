@@ -1,14 +1,43 @@
 # backend/routes/admin_routes.py
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, make_response, request, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt 
 from functools import wraps
 # <<< INICIO DE CORRECCIÓN: Importar db >>>
 from backend.database.models import db, Client, Account, Card # Asegúrate de importar db
 # <<< FIN DE CORRECCIÓN >>>
-import traceback # Para depuración
+from backend.database.routing import get_read_router, pool_stats, read_replica
+from backend.services.admin_listings import (
+    EXPORT_FORMATS,
+    EXPORT_MIMETYPES,
+    ListingQueryError,
+    export_accounts,
+    fetch_accounts_page,
+    fetch_clients_page,
+    parse_account_filters,
+    parse_client_fields,
+    parse_client_filters,
+    parse_page_args,
+)
+from backend.services.dashboard import current_listings_version, get_dashboard_cache, invalidate_clients
+from backend.services.hot_accounts import HotAccountError, disable_hot_account, enable_hot_account
+from backend.services.ledger import LedgerQueryError, parse_series_range
+from backend.services.rollups import (
+    RollupQueryError,
+    check_rollups,
+    daily_volume,
+    deposits_by_type,
+    parse_top_limit,
+    top_receivers,
+)
+from backend.services.metrics import get_metrics
+from backend.services.rate_limiting import admission_stats
+from backend.services.serialization import not_modified, response_etag, set_etag
+from backend.services.token_revocation import get_token_denylist, revoke_client_tokens
+from backend.logging_setup import get_logger
 
 admin_bp = Blueprint('admin_bp', __name__)
+log = get_logger("admin_bp")
 
 # Decorador para verificar si el usuario es administrador
 def admin_required():
@@ -22,93 +51,283 @@ def admin_required():
         return decorator
     return wrapper
 
+# GET condicional de los listados: el ETag es la versión global de los listados
+# (sube con cualquier escritura que invalide un cliente), así que un
+# If-None-Match vigente se responde 304 sin consultar la base de datos
+# (``@listing_etag(negotiated=False)`` si la vista responde siempre JSON)
+def listing_etag(fn=None, negotiated=True):
+    if fn is None:
+        return lambda view: listing_etag(view, negotiated)
+
+    @wraps(fn)
+    def decorator(*args, **kwargs):
+        version = current_listings_version()
+        if version is None:
+            return fn(*args, **kwargs)
+        etag = response_etag(f"L{version}", negotiated)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        # La versión se leyó antes de consultar: una escritura concurrente solo
+        # puede hacer que la respuesta sea más nueva que su ETag, nunca más vieja
+        response = make_response(fn(*args, **kwargs))
+        if response.status_code == 200:
+            set_etag(response, etag)
+        return response
+    return decorator
+
+# Las respuestas en streaming ya enviaron el estado 200 cuando la consulta falla a
+# mitad de camino: se registra el error y se relanza para que el servidor corte
+# la conexión y el cliente no tome el cuerpo truncado por completo
+def logged_stream(body, description):
+    try:
+        yield from body
+    except Exception:
+        log.exception("Error en el servidor durante el envío de %s", description)
+        raise
+
 # Ruta para obtener todas las cuentas (solo para administradores)
 # Incluye el nombre completo del cliente asociado a cada cuenta
 @admin_bp.route('/accounts', methods=['GET']) 
 @jwt_required() 
 @admin_required() # Asegura que solo los administradores puedan acceder
+@read_replica
+@listing_etag(negotiated=False)  # array JSON en streaming también para clientes MessagePack
 def get_all_accounts(): 
+    log.debug("Usuario administrador validado por decorador, recuperando todas las cuentas con nombres de cliente.")
+    try:
+        filters = parse_account_filters(request.args)
+    except ListingQueryError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # Se mantiene el mismo formato (array JSON), pero la respuesta se emite por
+    # bloques desde un cursor del servidor en lugar de armar la lista completa
+    body = logged_stream(export_accounts(db.session, "json", filters), "todas las cuentas (admin)")
+    return Response(stream_with_context(body), mimetype="application/json"), 200
+
+# Exportación en streaming de todas las cuentas (NDJSON o CSV, opcionalmente con gzip)
+# Ejemplo: /api/admin/accounts/export?format=csv&gzip=1&account_type=ahorro
+@admin_bp.route('/accounts/export', methods=['GET'])
+@jwt_required()
+@admin_required()
+@read_replica
+def export_all_accounts():
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": f"Formato no soportado. Usa uno de: {', '.join(EXPORT_FORMATS)}."}), 400
+
+    try:
+        filters = parse_account_filters(request.args)
+    except ListingQueryError as e:
+        return jsonify({"message": str(e)}), 400
+
+    use_gzip = request.args.get("gzip") in ("1", "true")
+    body = logged_stream(export_accounts(db.session, export_format, filters, gzip=use_gzip),
+                         f"la exportación de cuentas ({export_format})")
+    response = Response(stream_with_context(body), mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers["Content-Disposition"] = f"attachment; filename=cuentas.{export_format}"
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+# Listado paginado y filtrado de cuentas para el AdminDashboard
+# Ejemplo: /api/admin/accounts/page?limit=100&cursor=<next_cursor>&account_type=corriente
+@admin_bp.route('/accounts/page', methods=['GET'])
+@jwt_required()
+@admin_required()
+@read_replica
+@listing_etag
+def get_accounts_page():
     try:
-        print(">>> Usuario administrador validado por decorador, recuperando todas las cuentas con nombres de cliente.")
-
-        # Obtener todas las cuentas y sus clientes asociados
-        # Usamos .all() para ejecutar la consulta y obtener los objetos
-        all_accounts_with_clients = db.session.query(Account, Client).\
-                                    join(Client, Account.client_id == Client.id).\
-                                    all()
-        
-        accounts_data = []
-
-        for account, client in all_accounts_with_clients:
-            accounts_data.append({
-                "id": account.id,
-                "client_id": account.client_id, 
-                "client_full_name": client.full_name, # Nombre del cliente
-                "account_number": account.account_number,
-                "account_type": account.account_type,
-                "balance": account.balance,
-            })
-
-        print(f">>> Total de cuentas recuperadas con nombres de cliente: {len(accounts_data)}")
-
-        return jsonify(accounts_data), 200 # Devuelve directamente el array de cuentas
+        filters = parse_account_filters(request.args)
+        limit, after_id = parse_page_args(request.args)
+    except ListingQueryError as e:
+        return jsonify({"message": str(e)}), 400
 
+    try:
+        return jsonify(fetch_accounts_page(db.session, filters, limit, after_id)), 200
     except Exception as e:
-        error_message = f"Error en el servidor al obtener todas las cuentas (admin): {str(e)}"
-        print(f">>> {error_message}")
-        print(traceback.format_exc())
+        error_message = f"Error en el servidor al obtener la página de cuentas (admin): {str(e)}"
+        log.exception(error_message)
         return jsonify({"message": error_message}), 500
 
-# Opcional: Ruta para obtener todos los clientes con sus detalles (si la necesitas)
+# Activa el modo "cuenta caliente" (sub-saldos) para un comercio con muchos pagos entrantes
+# Cuerpo: {"slots": 16}
+@admin_bp.route('/accounts/<int:account_id>/hot', methods=['PUT'])
+@jwt_required()
+@admin_required()
+def enable_hot_account_route(account_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        slots = int(data.get("slots", 16))
+    except (TypeError, ValueError):
+        return jsonify({"message": "El número de sub-saldos debe ser un entero."}), 400
+    try:
+        enable_hot_account(account_id, slots)
+    except HotAccountError as e:
+        return jsonify({"message": e.message}), e.status_code
+    log.info("Cuenta %s marcada como caliente con %s sub-saldos", account_id, slots)
+    return jsonify({"message": "Cuenta marcada como caliente.", "account_id": account_id, "slots": slots}), 200
+
+# Devuelve una cuenta caliente al modo normal (traslada los sub-saldos a la cuenta)
+@admin_bp.route('/accounts/<int:account_id>/hot', methods=['DELETE'])
+@jwt_required()
+@admin_required()
+def disable_hot_account_route(account_id):
+    try:
+        disable_hot_account(account_id)
+    except HotAccountError as e:
+        return jsonify({"message": e.message}), e.status_code
+    log.info("Cuenta %s devuelta al modo normal", account_id)
+    return jsonify({"message": "La cuenta volvió al modo normal.", "account_id": account_id}), 200
+
+# Analítica desde los totales diarios (rollups): no recorre accounts ni transactions
+# Saldo total y número de cuentas por tipo de cuenta
+@admin_bp.route('/analytics/deposits', methods=['GET'])
+@jwt_required()
+@admin_required()
+@read_replica
+def get_deposits_by_type():
+    return jsonify({"deposits": deposits_by_type(db.session.connection())}), 200
+
+# Número y monto de transferencias por día. Parámetros: ?from=2025-03-01&to=2025-03-31
+@admin_bp.route('/analytics/daily-volume', methods=['GET'])
+@jwt_required()
+@admin_required()
+@read_replica
+def get_daily_volume():
+    try:
+        date_from, date_to = parse_series_range(request.args)
+    except LedgerQueryError as e:
+        return jsonify({"message": str(e)}), 400
+    return jsonify({"series": daily_volume(db.session.connection(), date_from, date_to)}), 200
+
+# Cuentas que más recibieron en el rango. Parámetros: ?from=...&to=...&limit=10
+@admin_bp.route('/analytics/top-receivers', methods=['GET'])
+@jwt_required()
+@admin_required()
+@read_replica
+def get_top_receivers():
+    try:
+        date_from, date_to = parse_series_range(request.args)
+        limit = parse_top_limit(request.args)
+    except (LedgerQueryError, RollupQueryError) as e:
+        return jsonify({"message": str(e)}), 400
+    accounts = top_receivers(db.session.connection(), date_from, date_to, limit)
+    return jsonify({"from": date_from.isoformat(), "to": date_to.isoformat(), "accounts": accounts}), 200
+
+# Compara los rollups con un recorrido completo (costoso: solo para diagnóstico)
+@admin_bp.route('/analytics/check', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_analytics_check():
+    try:
+        date_from, date_to = parse_series_range(request.args)
+        limit = parse_top_limit(request.args)
+    except (LedgerQueryError, RollupQueryError) as e:
+        return jsonify({"message": str(e)}), 400
+    report = check_rollups(db.session.connection(), date_from, date_to, limit)
+    if not report["consistent"]:
+        log.warning("Los rollups no coinciden con el recorrido completo: %s", report)
+    return jsonify(report), 200
+
+# Contadores de la caché del dashboard (aciertos, fallos, desalojos)
+@admin_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_cache_stats():
+    cache = get_dashboard_cache()
+    if cache is None:
+        return jsonify({"dashboard": None, "message": "La caché del dashboard está desactivada."}), 200
+    return jsonify({"dashboard": cache.stats()}), 200
+
+# Estado de los pools de conexiones (primario y réplicas) y del enrutado de lecturas de este worker
+@admin_bp.route('/db/stats', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_db_stats():
+    router = get_read_router()
+    return jsonify({"pools": pool_stats(db), "read_routing": router.stats() if router is not None else None}), 200
+
+# Contadores del control de admisión de este worker (permitidas y rechazadas por regla, descarte de carga)
+@admin_bp.route('/limits/stats', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_admission_stats():
+    return jsonify(admission_stats()), 200
+
+# Resumen por ruta de este worker: latencia media, consultas SQL por petición y avisos de N+1
+@admin_bp.route('/metrics/routes', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_route_metrics():
+    metrics = get_metrics()
+    if metrics is None:
+        return jsonify({"message": "Las métricas están desactivadas (METRICS_ENABLED)."}), 404
+    return jsonify(metrics.route_summary()), 200
+
+# Revoca todas las sesiones (access y refresh tokens) de un cliente, p. ej. credenciales comprometidas
+@admin_bp.route('/clients/<int:client_id>/revoke-tokens', methods=['POST'])
+@jwt_required()
+@admin_required()
+def revoke_client_tokens_route(client_id):
+    if not db.session.get(Client, client_id):
+        return jsonify({"message": "Cliente no encontrado."}), 404
+    reason = str((request.get_json(silent=True) or {}).get("reason") or "admin")[:100]
+    revoke_client_tokens(client_id, reason=reason)
+    log.info("Tokens del cliente %s revocados por el administrador %s", client_id, get_jwt_identity())
+    return jsonify({"message": "Sesiones del cliente revocadas.", "client_id": client_id}), 200
+
+# Cambia el rol de administrador de un cliente. Sus tokens anteriores llevan el claim
+# is_admin viejo, así que se revocan: el cliente debe iniciar sesión de nuevo
+@admin_bp.route('/clients/<int:client_id>/admin', methods=['PUT'])
+@jwt_required()
+@admin_required()
+def set_client_admin(client_id):
+    is_admin = (request.get_json(silent=True) or {}).get("is_admin")
+    if not isinstance(is_admin, bool):
+        return jsonify({"message": "El campo is_admin debe ser true o false."}), 400
+    client = db.session.get(Client, client_id)
+    if not client:
+        return jsonify({"message": "Cliente no encontrado."}), 404
+    client.is_admin = is_admin
+    db.session.commit()
+    revoke_client_tokens(client_id, reason="role_change")
+    invalidate_clients({client_id})
+    log.info("Rol de administrador del cliente %s cambiado a %s por %s", client_id, is_admin, get_jwt_identity())
+    return jsonify({"message": "Rol actualizado; las sesiones del cliente fueron revocadas.",
+                    "client_id": client_id, "is_admin": is_admin}), 200
+
+# Contadores de la lista de revocación de tokens de este worker (consultas, positivos del filtro)
+@admin_bp.route('/tokens/stats', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_token_denylist_stats():
+    return jsonify(get_token_denylist().stats()), 200
+
+# Ruta para obtener los clientes con sus cuentas y tarjetas, paginada y sin N+1
 @admin_bp.route('/clients', methods=['GET'])
 @jwt_required()
 @admin_required()
+@read_replica
+@listing_etag
 def get_all_clients_with_details():
+    # Parámetros: ?limit=100&cursor=<next_cursor>&is_admin=false&account_type=ahorro
+    #             &card_provider=VISA&fields=id,full_name,accounts
+    try:
+        filters = parse_client_filters(request.args)
+        fields = parse_client_fields(request.args)
+        limit, after_id = parse_page_args(request.args)
+    except ListingQueryError as e:
+        return jsonify({"message": str(e)}), 400
+
     try:
-        print(">>> Usuario administrador validado, recuperando todos los clientes con detalles.")
-        all_clients = Client.query.all()
-        clients_data = []
-
-        for client in all_clients:
-            accounts = Account.query.filter_by(client_id=client.id).all()
-            accounts_data = [
-                {
-                    "id": account.id,
-                    "account_type": account.account_type,
-                    "balance": account.balance,
-                    "account_number": account.account_number,
-                }
-                for account in accounts
-            ]
-
-            cards = Card.query.filter_by(client_id=client.id).all()
-            cards_data = [
-                {
-                    "id": card.id,
-                    "card_type": card.card_type,
-                    "card_number": card.card_number,
-                    "provider": card.provider,
-                }
-                for card in cards
-            ]
-
-            client_data = {
-                "id": client.id,
-                "full_name": client.full_name,
-                "email": client.email,
-                "phone_number": client.phone_number,
-                "cip": client.cip,
-                "is_admin": client.is_admin,
-                "accounts": accounts_data,
-                "cards": cards_data,
-            }
-            clients_data.append(client_data)
-
-        print(f">>> Total de clientes con detalles recuperados: {len(clients_data)}")
-        return jsonify({"clients": clients_data}), 200
+        log.debug("Usuario administrador validado, recuperando página de clientes con detalles.")
+        page = fetch_clients_page(db.session, filters, fields, limit, after_id)
+        log.debug("Clientes con detalles recuperados en la página: %s", len(page["clients"]))
+        return jsonify(page), 200
 
     except Exception as e:
         error_message = f"Error en el servidor al obtener todos los clientes con detalles: {str(e)}"
-        print(f">>> {error_message}")
-        print(traceback.format_exc())
+        log.exception(error_message)
         return jsonify({"message": error_message}), 500
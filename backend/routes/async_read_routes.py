@@ -0,0 +1,199 @@
+# backend/routes/async_read_routes.py
+"""
+Vistas asyncio de las lecturas más frecuentes, servidas por ``backend.asgi``.
+
+Mismas URL, mismas respuestas (ETag y 304 incluidos) y misma validación del JWT
+que las vistas de Flask a las que sustituyen (``ASYNC_VIEWS``: endpoint de Flask
+-> vista asíncrona), pero sus consultas van por el motor asíncrono, así que
+mientras esperan a la base de datos no ocupan un hilo. Corren dentro del
+contexto de petición de Flask que arma ``backend.asgi`` (``request``,
+``jsonify``, ``get_jwt``... funcionan igual) y las consultas son las mismas
+funciones de los servicios, ejecutadas con ``AsyncSession.run_sync``.
+
+La validación del JWT consulta la lista de revocación, que puede ir a la base de
+datos (sincronización del filtro, positivos del filtro de Bloom) con el motor
+síncrono: se hace en un hilo (``verify_jwt``) para no bloquear el bucle.
+"""
+import asyncio
+
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import select
+
+from backend.database.async_engines import get_async_engines
+from backend.database.models.account import Account
+from backend.services.admin_listings import (
+    ListingQueryError,
+    fetch_accounts_page,
+    fetch_clients_page,
+    parse_account_filters,
+    parse_client_fields,
+    parse_client_filters,
+    parse_page_args,
+)
+from backend.services.dashboard import (
+    cached_dashboard_version,
+    current_listings_version,
+    get_dashboard_delta,
+    get_versioned_dashboard,
+)
+from backend.services.serialization import not_modified, response_etag, set_etag
+from backend.services.transaction_history import HistoryQueryError, fetch_history_page, parse_history_args
+from backend.logging_setup import get_logger, LazyJson
+
+log = get_logger("async_reads")
+
+
+async def verify_jwt():
+    """``verify_jwt_in_request`` en un hilo; ``to_thread`` copia el contexto, así que ve la misma petición."""
+    await asyncio.to_thread(verify_jwt_in_request)
+
+
+async def run_read(client_id, fn):
+    """Ejecuta ``fn(session)`` (consultas síncronas) en una sesión asíncrona de lectura para el cliente."""
+    async with get_async_engines().read_session(client_id) as session:
+        return await session.run_sync(fn)
+
+
+# Dashboard del cliente autenticado (como auth.dashboard)
+async def dashboard():
+    await verify_jwt()
+    try:
+        client_id = get_jwt_identity()
+        since = request.args.get("since")
+
+        # Si el payload vigente está en la caché compartida, su versión basta para el 304
+        cached_version = cached_dashboard_version(client_id)
+        if cached_version is not None:
+            response = not_modified(response_etag(cached_version))
+            if response is not None:
+                return response
+
+        if since:
+            body, version = await run_read(client_id, lambda session: get_dashboard_delta(client_id, since, session))
+        else:
+            payload, version = await run_read(client_id, lambda session: get_versioned_dashboard(client_id, session))
+            body = None if payload is None else {**payload, "version": version, "full": True}
+        if body is None:
+            log.info("Cliente no encontrado con ID: %s", client_id)
+            return jsonify({"message": "Cliente no encontrado"}), 404
+
+        etag = response_etag(version) if version else None
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        log.debug("Respuesta JSON de /dashboard: %s", LazyJson(body))
+        response = jsonify(body)
+        return (set_etag(response, etag) if etag else response), 200
+
+    except Exception as e:
+        error_message = f"Error en el servidor durante el dashboard: {str(e)}"
+        log.exception(error_message)
+        return jsonify({"message": error_message}), 500
+
+
+def _history_page(session, account_id, params, client_id, is_admin):
+    """``(estado, cuerpo)``: la página, o el 404/403 de ``_statement_access_error``."""
+    owner = session.execute(select(Account.client_id).where(Account.id == account_id)).scalar()
+    if owner is None:
+        return 404, {"message": "Cuenta no encontrada."}
+    if str(owner) != client_id and not is_admin:
+        return 403, {"message": "No tienes acceso a esta cuenta."}
+    return 200, fetch_history_page(session, account_id, **params)
+
+
+# Historial de transacciones de una cuenta (como transaction_bp.get_history)
+async def get_history(account_id):
+    await verify_jwt()
+    try:
+        params = parse_history_args(request.args)
+    except HistoryQueryError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # Solo el titular de la cuenta o un administrador (como /balance y /statements)
+    client_id, is_admin = get_jwt_identity(), get_jwt().get("is_admin")
+    status, body = await run_read(client_id,
+                                  lambda session: _history_page(session, account_id, params, client_id, is_admin))
+    return jsonify(body), status
+
+
+def _admin_denied():
+    if not get_jwt().get("is_admin"):
+        return jsonify({"message": "Acceso de administrador requerido"}), 403
+    return None
+
+
+async def _listing_response(build):
+    """GET condicional de los listados (como ``listing_etag`` en admin_routes)."""
+    version = current_listings_version()
+    if version is None:
+        return await build()
+    etag = response_etag(f"L{version}")
+    response = not_modified(etag)
+    if response is not None:
+        return response
+    response = make_response(await build())
+    if response.status_code == 200:
+        set_etag(response, etag)
+    return response
+
+
+# Página de cuentas del AdminDashboard (como admin_bp.get_accounts_page)
+async def get_accounts_page():
+    await verify_jwt()
+    denied = _admin_denied()
+    if denied is not None:
+        return denied
+
+    async def build():
+        try:
+            filters = parse_account_filters(request.args)
+            limit, after_id = parse_page_args(request.args)
+        except ListingQueryError as e:
+            return jsonify({"message": str(e)}), 400
+
+        try:
+            page = await run_read(get_jwt_identity(),
+                                  lambda session: fetch_accounts_page(session, filters, limit, after_id))
+            return jsonify(page), 200
+        except Exception as e:
+            error_message = f"Error en el servidor al obtener la página de cuentas (admin): {str(e)}"
+            log.exception(error_message)
+            return jsonify({"message": error_message}), 500
+
+    return await _listing_response(build)
+
+
+# Página de clientes con cuentas y tarjetas (como admin_bp.get_all_clients_with_details)
+async def get_all_clients_with_details():
+    await verify_jwt()
+    denied = _admin_denied()
+    if denied is not None:
+        return denied
+
+    async def build():
+        try:
+            filters = parse_client_filters(request.args)
+            fields = parse_client_fields(request.args)
+            limit, after_id = parse_page_args(request.args)
+        except ListingQueryError as e:
+            return jsonify({"message": str(e)}), 400
+
+        try:
+            page = await run_read(get_jwt_identity(),
+                                  lambda session: fetch_clients_page(session, filters, fields, limit, after_id))
+            return jsonify(page), 200
+        except Exception as e:
+            error_message = f"Error en el servidor al obtener todos los clientes con detalles: {str(e)}"
+            log.exception(error_message)
+            return jsonify({"message": error_message}), 500
+
+    return await _listing_response(build)
+
+
+ASYNC_VIEWS = {
+    "auth.dashboard": dashboard,
+    "transaction_bp.get_history": get_history,
+    "admin_bp.get_accounts_page": get_accounts_page,
+    "admin_bp.get_all_clients_with_details": get_all_clients_with_details,
+}
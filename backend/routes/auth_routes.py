@@ -1,33 +1,36 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, get_jwt 
-from datetime import timedelta
-import traceback
-import json
-import random 
-import time   
+from flask_jwt_extended import (
+    jwt_required,
+    get_jwt_identity,
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    get_jwt,
+)
 
 from backend.database.models import db
+from backend.database.routing import read_replica
 from backend.database.models.client import Client
 from backend.database.models.account import Account
 from backend.database.models.card import Card
+from backend.services.dashboard import (
+    cached_dashboard_version,
+    get_dashboard_delta,
+    get_versioned_dashboard,
+    invalidate_clients,
+)
+from backend.services.serialization import ACCOUNT, CARD, not_modified, response_etag, set_etag
+from backend.services.password_hashing import get_password_hasher, PasswordHashingUnavailableError
+from backend.services.number_allocator import allocate_account_number, NumberAllocationError
+from backend.services.rollups import record_accounts_opened
+from backend.services.token_revocation import revoke_token
+from backend.logging_setup import get_logger, LazyJson
 
 # Imprime la ruta del archivo para depuración, asegurando que se está ejecutando el correcto
 print(f"Archivo auth_routes.py: {__file__}")
 
 auth_bp = Blueprint("auth", __name__)
-
-# Función auxiliar para generar un número de cuenta único de 10 dígitos
-def generate_unique_account_number():
-    while True:
-        account_num = str(int(time.time() * 1000) % 10000000000).zfill(10)
-        
-        if len(account_num) > 10:
-            account_num = account_num[:10]
-        elif len(account_num) < 10:
-            account_num = account_num.zfill(10)
-
-        if not Account.query.filter_by(account_number=account_num).first():
-            return account_num
+log = get_logger("auth")
 
 @auth_bp.route("/register", methods=["POST"])
 def register():
@@ -37,7 +40,7 @@ def register():
     """
     try:
         data = request.get_json()
-        print(f">>> Datos recibidos en /register: {json.dumps(data, indent=2)}")
+        log.debug("Datos recibidos en /register: %s", LazyJson(data))
 
         full_name = data.get("full_name", "").strip()
         email = data.get("email", "").strip()
@@ -52,21 +55,25 @@ def register():
 
         # Validaciones de entrada de datos
         if not all([full_name, email, phone_number, cip, password]):
-            print(">>> Error de validación: Campos obligatorios faltantes.")
+            log.info("Error de validación: campos obligatorios faltantes.")
             return jsonify({"message": "Todos los campos son obligatorios"}), 400
 
         if len(password) < 6:
-            print(">>> Error de validación: Contraseña demasiado corta.")
+            log.info("Error de validación: contraseña demasiado corta.")
             return jsonify({"message": "La contraseña debe tener al menos 6 caracteres"}), 400
 
         if Client.query.filter_by(email=email).first():
-            print(f">>> Error de validación: Correo ya registrado: {email}")
+            log.info("Error de validación: correo ya registrado.", extra={"fields": {"email": email}})
             return jsonify({"message": "El correo ya está registrado"}), 409
 
         if Client.query.filter_by(cip=cip).first():
-            print(f">>> Error de validación: CIP ya registrada: {cip}")
+            log.info("Error de validación: CIP ya registrada.", extra={"fields": {"cip": cip}})
             return jsonify({"message": "La CIP ya está registrada"}), 409
 
+        # El número de cuenta se asigna antes de crear el cliente: si no hay
+        # números disponibles no queda un cliente sin cuenta
+        new_account_number = allocate_account_number()
+
         # Crear y guardar el nuevo cliente en la base de datos
         client = Client(
             full_name=full_name,
@@ -78,13 +85,12 @@ def register():
         client.set_password(password) 
         
         db.session.add(client)
-        print(">>> Cliente añadido a la sesión de la base de datos.")
+        log.debug("Cliente añadido a la sesión de la base de datos.")
         db.session.commit() 
-        print(f">>> Cliente guardado en la base de datos con ID: {client.id}")
+        log.info("Cliente guardado en la base de datos con ID: %s", client.id)
 
         # Crear automáticamente una cuenta de ahorro para el nuevo cliente
         if client.id: 
-            new_account_number = generate_unique_account_number() 
             account = Account(
                 client_id=client.id,
                 account_type="ahorro",
@@ -92,24 +98,45 @@ def register():
                 account_number=new_account_number 
             )
             db.session.add(account)
-            print(">>> Cuenta añadida a la sesión de la base de datos.")
+            record_accounts_opened(db.session.connection(), [account.account_type])
+            log.debug("Cuenta añadida a la sesión de la base de datos.")
             db.session.commit() 
-            print(f">>> Cuenta guardada en la base de datos con ID: {account.id} para el cliente ID: {client.id} y número de cuenta: {account.account_number}")
+            log.info("Cuenta guardada en la base de datos con ID: %s para el cliente ID: %s", account.id, client.id)
+            invalidate_clients([client.id])
         else:
-            print(">>> ERROR: client.id no disponible después del commit del cliente. No se pudo crear la cuenta.")
+            log.error("client.id no disponible después del commit del cliente. No se pudo crear la cuenta.")
             db.session.rollback() 
             return jsonify({"message": "Error al crear la cuenta del cliente."}), 500
 
         return jsonify({"message": "Cliente registrado exitosamente"}), 201
 
+    except PasswordHashingUnavailableError as e:
+        db.session.rollback()
+        log.warning("Hashing de contraseñas saturado: %s", e.message)
+        response = jsonify({"message": e.message})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, e.status_code
+
+    except NumberAllocationError as e:
+        db.session.rollback()
+        log.error("No se pudo asignar el número de cuenta: %s", e.message)
+        return jsonify({"message": e.message}), e.status_code
+
     except Exception as e:
         error_message = f"Error en el servidor durante el registro: {str(e)}"
-        print(f">>> {error_message}")
-        print(traceback.format_exc()) 
+        log.exception(error_message)
         db.session.rollback() 
         return jsonify({"message": error_message}), 500
 
 
+def _issue_tokens(client):
+    access_token = create_access_token(
+        identity=str(client.id), # Asegúrate de que client.id sea str
+        additional_claims={"is_admin": client.is_admin} # <--- Incluye is_admin en el token
+    )
+    return access_token, create_refresh_token(identity=str(client.id))
+
+
 @auth_bp.route("/login", methods=["POST"])
 def login():
     """
@@ -118,7 +145,7 @@ def login():
     """
     try:
         data = request.get_json()
-        print(f">>> Datos recibidos en /login: {json.dumps(data, indent=2)}")
+        log.debug("Datos recibidos en /login: %s", LazyJson(data))
 
         email = data.get("email", "").strip()
         password = data.get("password", "").strip()
@@ -131,137 +158,140 @@ def login():
         if not client or not client.check_password(password):
             return jsonify({"message": "Correo o contraseña incorrectos"}), 401
 
-        # Traer todas las cuentas asociadas a este cliente
-        accounts = Account.query.filter_by(client_id=client.id).all()
-        accounts_data = [
-            {
-                "id": account.id,
-                "account_type": account.account_type,
-                "balance": account.balance,
-                "account_number": account.account_number 
-            }
-            for account in accounts
-        ]
-        print(f">>> Datos de las cuentas en /login: {json.dumps(accounts_data, indent=2)}")
-
-        # Traer todas las tarjetas asociadas a este cliente
-        cards = Card.query.filter_by(client_id=client.id).all()
-        cards_data = [
-            {
-                "id": card.id,
-                "card_type": card.card_type,
-                "card_number": card.card_number,
-                "provider": card.provider,
-            }
-            for card in cards
-        ]
-        print(f">>> Datos de las tarjetas en /login: {json.dumps(cards_data, indent=2)}")
-
-        # Crear un token JWT válido por 1 hora, con el ID del cliente como identidad
-        # y el claim 'is_admin' para el control de acceso de administrador
-        access_token = create_access_token(
-            identity=str(client.id), # Asegúrate de que client.id sea str
-            expires_delta=timedelta(hours=1),
-            additional_claims={"is_admin": client.is_admin} # <--- Incluye is_admin en el token
-        )
+        # Migración transparente: si el hash se generó con otro algoritmo o coste,
+        # se recalcula con los parámetros actuales aprovechando la contraseña en claro
+        hasher = get_password_hasher()
+        if hasher is not None and hasher.needs_rehash(client.password_hash):
+            try:
+                client.set_password(password)
+                db.session.commit()
+                log.info("Hash de contraseña actualizado a %s para el cliente ID: %s", hasher.target_parameters, client.id)
+            except PasswordHashingUnavailableError:
+                # El login ya es válido: la migración del hash queda para el próximo inicio de sesión
+                log.info("Actualización del hash pospuesta por saturación para el cliente ID: %s", client.id)
+
+        # Cuentas y tarjetas del cliente: columnas sueltas, sin hidratar entidades
+        accounts_data = ACCOUNT.fetch(db.session, Account.client_id == client.id, order_by=Account.id)
+        log.debug("Datos de las cuentas en /login: %s", LazyJson(accounts_data))
+        cards_data = CARD.fetch(db.session, Card.client_id == client.id, order_by=Card.id)
+        log.debug("Datos de las tarjetas en /login: %s", LazyJson(cards_data))
+
+        # Token de acceso (JWT_ACCESS_TOKEN_EXPIRES, 1 hora por defecto) con el ID del cliente
+        # como identidad y el claim 'is_admin' para el control de acceso de administrador,
+        # y refresh token para renovarlo sin volver a pedir la contraseña (ver /refresh)
+        access_token, refresh_token = _issue_tokens(client)
 
         # Construir la respuesta JSON con el token, información del cliente, cuentas y tarjetas
-        response_data = jsonify(
-            {
-                "token": access_token,
-                "client": {
-                    "id": client.id,
-                    "full_name": client.full_name,
-                    "email": client.email,
-                    "phone_number": client.phone_number,
-                    "cip": client.cip,
-                    "is_admin": client.is_admin # <--- Incluye is_admin en la respuesta del cliente
-                },
-                "accounts": accounts_data,
-                "cards": cards_data,
-            }
-        )
-        print(f">>> Respuesta de /login: {json.dumps(response_data.json, indent=2)}")
-        return response_data, 200
+        response_body = {
+            "token": access_token,
+            "refresh_token": refresh_token,
+            "client": client.to_dict(),  # incluye is_admin
+            "accounts": accounts_data,
+            "cards": cards_data,
+        }
+        log.debug("Respuesta de /login: %s", LazyJson(response_body))
+        return jsonify(response_body), 200
+
+    except PasswordHashingUnavailableError as e:
+        log.warning("Hashing de contraseñas saturado: %s", e.message)
+        response = jsonify({"message": e.message})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, e.status_code
 
     except Exception as e:
         error_message = f"Error en el servidor durante el login: {str(e)}"
-        print(f">>> {error_message}")
-        print(traceback.format_exc())
+        log.exception(error_message)
         return jsonify({"message": error_message}), 500
 
 
 @auth_bp.route("/dashboard", methods=["GET"])
 @jwt_required()
+@read_replica
 def dashboard():
     """
     Ruta protegida para obtener la información del dashboard de un cliente autenticado,
     incluyendo sus datos personales, cuentas y tarjetas.
+
+    La respuesta lleva la versión de los datos (campo "version" y ETag): con
+    If-None-Match se responde 304 sin consultar la base de datos si no cambió, y
+    con ?since=<versión> solo lo que cambió desde esa versión ("full": false).
     """
     try:
         client_id = get_jwt_identity()
-        print(">>> ID del cliente autenticado:", client_id)
-
-        # Buscar cliente
-        client = Client.query.get(client_id)
-        if not client:
-            print(f">>> Cliente no encontrado con ID: {client_id}")
+        log.debug("ID del cliente autenticado: %s", client_id)
+        since = request.args.get("since")
+
+        # Si el payload vigente está en la caché compartida, su versión basta para el 304
+        cached_version = cached_dashboard_version(client_id)
+        if cached_version is not None:
+            response = not_modified(response_etag(cached_version))
+            if response is not None:
+                return response
+
+        # El payload (cliente, cuentas y tarjetas) sale de la caché por cliente si
+        # está vigente; si no, se arma desde la base de datos y se guarda
+        if since:
+            body, version = get_dashboard_delta(client_id, since)
+        else:
+            payload, version = get_versioned_dashboard(client_id)
+            body = None if payload is None else {**payload, "version": version, "full": True}
+        if body is None:
+            log.info("Cliente no encontrado con ID: %s", client_id)
             return jsonify({"message": "Cliente no encontrado"}), 404
 
-        print(">>> Datos del cliente:", client.__dict__)
-
-        # Traer todas las cuentas asociadas a este cliente
-        accounts = Account.query.filter_by(client_id=client.id).all()
-        accounts_data = [
-            {
-                "id": account.id,
-                "account_type": account.account_type,
-                "balance": account.balance,
-                "account_number": account.account_number 
-            }
-            for account in accounts
-        ]
-        print(">>> Datos de las cuentas en /dashboard:", json.dumps(accounts_data, indent=2))
-        print(">>> Cuentas (objetos SQLA):", accounts) 
-
-        # Traer todas las tarjetas asociadas a este cliente
-        cards = Card.query.filter_by(client_id=client.id).all()
-        cards_data = [
-            {
-                "id": card.id,
-                "card_type": card.card_type,
-                "card_number": card.card_number,
-                "provider": card.provider,
-            }
-            for card in cards
-        ]
-        print(">>> Datos de las tarjetas en /dashboard:", json.dumps(cards_data, indent=2))
-        print(">>> Tarjetas (objetos SQLA):", cards) 
-
-        # Retornar los datos del cliente, cuentas y tarjetas en formato JSON
-        response_data = jsonify(
-            {
-                "client": {
-                    "id": client.id,
-                    "full_name": client.full_name,
-                    "email": client.email,
-                    "phone_number": client.phone_number,
-                    "cip": client.cip,
-                    "is_admin": client.is_admin # <--- Incluye is_admin en la respuesta del dashboard
-                },
-                "accounts": accounts_data,
-                "cards": cards_data,
-            }
-        )
-        print(">>> Respuesta JSON de /dashboard:", json.dumps(response_data.json, indent=2))
-        return response_data, 200
+        etag = response_etag(version) if version else None
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        log.debug("Respuesta JSON de /dashboard: %s", LazyJson(body))
+        response = jsonify(body)
+        return (set_etag(response, etag) if etag else response), 200
 
     except Exception as e:
         error_message = f"Error en el servidor durante el dashboard: {str(e)}"
-        print(f">>> {error_message}")
-        print(traceback.format_exc())
+        log.exception(error_message)
         return jsonify({"message": error_message}), 500
 
+@auth_bp.route("/refresh", methods=["POST"])
+@jwt_required(refresh=True)
+def refresh():
+    """
+    Canjea un refresh token por un token de acceso nuevo y otro refresh token
+    (rotación: el presentado queda revocado). Los datos del cliente se leen de
+    nuevo, así que un cambio de rol llega al token en la siguiente renovación.
+    """
+    claims = get_jwt()
+    client = db.session.get(Client, int(get_jwt_identity()))
+    if not client:
+        return jsonify({"message": "Cliente no encontrado"}), 401
+
+    if not revoke_token(claims, reason="rotated"):
+        # Otra petición ya canjeó este refresh token
+        log.warning("Refresh token reutilizado por el cliente ID: %s", client.id)
+        return jsonify({"message": "La sesión fue revocada. Inicia sesión de nuevo."}), 401
+
+    access_token, refresh_token = _issue_tokens(client)
+    return jsonify({"token": access_token, "refresh_token": refresh_token}), 200
+
+
+@auth_bp.route("/logout", methods=["POST"])
+@jwt_required(verify_type=False)
+def logout():
+    """Revoca el token presentado y, si viene en el cuerpo, el refresh token de la sesión."""
+    claims = get_jwt()
+    revoke_token(claims, reason="logout")
+
+    refresh_token = (request.get_json(silent=True) or {}).get("refresh_token")
+    if refresh_token:
+        try:
+            refresh_claims = decode_token(refresh_token)
+        except Exception:
+            refresh_claims = None
+        if refresh_claims and refresh_claims.get("sub") == claims["sub"] and refresh_claims.get("type") == "refresh":
+            revoke_token(refresh_claims, reason="logout")
+    return jsonify({"message": "Sesión cerrada"}), 200
+
+
 # <<< INICIO DE CAMBIO: SE ELIMINA ESTA RUTA DE auth_routes.py >>>
 # @auth_bp.route("/admin/all_clients", methods=["GET"])
 # @jwt_required()
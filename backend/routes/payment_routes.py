@@ -0,0 +1,108 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from backend.services.card_payments import (
+    parse_payment_request,
+    authorize_payment,
+    capture_payment,
+    void_payment,
+    get_payment,
+    PaymentError,
+)
+from backend.services.transfer_engine import TransferError
+from backend.services.idempotency import begin_idempotent_request, IdempotencyError, IdempotencyKeyInUse
+from backend.logging_setup import get_logger
+
+payment_bp = Blueprint("payment_bp", __name__, url_prefix="/api/payments")
+log = get_logger("payment_bp")
+
+def _caller():
+    return int(get_jwt_identity()), bool(get_jwt().get("is_admin"))
+
+# 💳 Autorizar un pago (retención sobre el saldo disponible); con "capture": true se cobra en el acto
+@payment_bp.route("", methods=["POST"])
+@jwt_required()
+def authorize():
+    client_id, is_admin = _caller()
+    try:
+        payment = parse_payment_request(request.get_json(silent=True),
+                                        current_app.config.get("PAYMENTS_SETTLEMENT_ACCOUNT_ID"))
+    except PaymentError as e:
+        return jsonify({"message": e.message}), e.status_code
+
+    # Idempotency-Key: los reintentos devuelven la misma autorización sin retener dos veces
+    try:
+        idempotency = begin_idempotent_request(request, client_id)
+        replay = idempotency.replay() if idempotency is not None else None
+    except IdempotencyError as e:
+        return jsonify({"message": e.message}), e.status_code
+    if replay is not None:
+        return replay.to_response()
+
+    try:
+        body = authorize_payment(payment, client_id, is_admin, idempotency=idempotency)
+        log.info("Pago %s por %s (%s)", body["payment_id"], payment.amount, body["status"])
+        if idempotency is not None:
+            return idempotency.response.to_response(replayed=False)
+        return jsonify(body), 201
+
+    except IdempotencyKeyInUse:
+        try:
+            return idempotency.stored_response().to_response()
+        except IdempotencyError as e:
+            return jsonify({"message": e.message}), e.status_code
+
+    except (PaymentError, TransferError) as e:
+        if idempotency is not None and e.status_code < 500:
+            try:
+                return idempotency.record({"message": e.message}, e.status_code)
+            except IdempotencyError as conflict:
+                return jsonify({"message": conflict.message}), conflict.status_code
+        return jsonify({"message": e.message}), e.status_code
+
+    except Exception as e:
+        log.exception("Error al autorizar el pago")
+        return jsonify({"message": f"Ocurrió un error inesperado al procesar el pago: {str(e)}"}), 500
+
+# 🔎 Estado de un pago
+@payment_bp.route("/<payment_id>", methods=["GET"])
+@jwt_required()
+def get_payment_status(payment_id):
+    try:
+        return jsonify(get_payment(payment_id, *_caller())), 200
+    except PaymentError as e:
+        return jsonify({"message": e.message}), e.status_code
+
+# ✅ Capturar un pago autorizado (opcionalmente por un monto menor: {"amount": 12.5})
+@payment_bp.route("/<payment_id>/capture", methods=["POST"])
+@jwt_required()
+def capture(payment_id):
+    data = request.get_json(silent=True) or {}
+    amount = data.get("amount")
+    if amount is not None:
+        try:
+            amount = float(amount)
+        except (TypeError, ValueError):
+            return jsonify({"message": "El monto a capturar no es un número válido."}), 400
+    try:
+        body = capture_payment(payment_id, *_caller(), amount=amount)
+        log.info("Pago %s capturado por %s", payment_id, body["captured_amount"])
+        return jsonify(body), 200
+    except (PaymentError, TransferError) as e:
+        return jsonify({"message": e.message}), e.status_code
+    except Exception as e:
+        log.exception("Error al capturar el pago")
+        return jsonify({"message": f"Ocurrió un error inesperado al capturar el pago: {str(e)}"}), 500
+
+# ↩️ Anular un pago autorizado (libera la retención)
+@payment_bp.route("/<payment_id>/void", methods=["POST"])
+@jwt_required()
+def void(payment_id):
+    try:
+        body = void_payment(payment_id, *_caller())
+        log.info("Pago %s anulado", payment_id)
+        return jsonify(body), 200
+    except (PaymentError, TransferError) as e:
+        return jsonify({"message": e.message}), e.status_code
+    except Exception as e:
+        log.exception("Error al anular el pago")
+        return jsonify({"message": f"Ocurrió un error inesperado al anular el pago: {str(e)}"}), 500
@@ -1,14 +1,41 @@
-from flask import Blueprint, request, jsonify
+import math
+from flask import Blueprint, request, jsonify, current_app, Response, send_file, stream_with_context, url_for
 from backend.database.models import db
+from backend.database.routing import read_replica
 from backend.database.models.account import Account
 from backend.database.models.transaction import Transaction
-from flask_jwt_extended import jwt_required, get_jwt_identity
-import logging # Importar logging para registrar errores
+from backend.services.transfer_engine import execute_transfer, transfer_response_body, TransferError
+from backend.services.idempotency import (
+    begin_idempotent_request,
+    IdempotencyError,
+    IdempotencyKeyInUse,
+    IDEMPOTENCY_HEADER,
+)
+from backend.services.batch_transfers import execute_batch, parse_leg, MODE_ALL_OR_NOTHING
+from backend.services.transfer_queue import get_transfer_queue, wants_async, TransferQueueFullError, STATUS_QUEUED
+from backend.services.transaction_history import parse_history_args, fetch_history_page, HistoryQueryError
+from backend.services.ledger import (
+    balance_as_of,
+    daily_balances,
+    parse_as_of,
+    parse_series_range,
+    LedgerQueryError,
+)
+from backend.services.statements import (
+    get_statement_jobs,
+    parse_statement_args,
+    statement_filename,
+    stream_statement,
+    StatementQueryError,
+    STATEMENT_MIMETYPES,
+)
+from backend.database.models.statement_job import StatementJob
+from backend.database.models.queued_transfer import QueuedTransfer
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from backend.logging_setup import get_logger
 
 transaction_bp = Blueprint("transaction_bp", __name__, url_prefix="/api/transactions")
-
-# Configuración básica de logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log = get_logger("transaction_bp")
 
 # 📤 Realizar transferencia
 @transaction_bp.route("/transfer", methods=["POST"])
@@ -26,96 +53,305 @@ def transfer():
 
     try:
         amount = float(amount) # Asegurarse de que el monto sea un número
+        if not math.isfinite(amount):
+            return jsonify({"message": "El monto de la transferencia no es un número válido."}), 400
         if amount <= 0:
             return jsonify({"message": "El monto de la transferencia debe ser positivo."}), 400
-    except ValueError:
+    except (TypeError, ValueError):
         return jsonify({"message": "El monto de la transferencia no es un número válido."}), 400
 
+    try:
+        sender_id = int(sender_id)
+        receiver_id = int(receiver_id)
+    except (TypeError, ValueError):
+        return jsonify({"message": "Los identificadores de cuenta no son válidos."}), 400
+
     if sender_id == receiver_id:
         return jsonify({"message": "No puedes transferir fondos a la misma cuenta."}), 400
 
-    # Iniciar la transacción de la base de datos
+    access_error = _sender_access_error(sender_id)
+    if access_error:
+        return access_error
+
+    # Modo asíncrono (Prefer: respond-async, o TRANSFER_ASYNC_MODE=always): se encola, se
+    # aplica en un micro-lote con un solo commit y se responde 202 (ver services/transfer_queue.py).
+    # Las peticiones con Idempotency-Key se procesan siempre en línea
+    if request.headers.get(IDEMPOTENCY_HEADER) is None and wants_async(request):
+        # Tras el 202 ya no se puede responder 400: se valida todo antes de encolar
+        leg, error = parse_leg(data)
+        if error:
+            return jsonify({"message": error}), 400
+        try:
+            transfer_id = get_transfer_queue().submit(get_jwt_identity(), leg)
+        except TransferQueueFullError as e:
+            log.warning("Cola de transferencias llena: %s", e.message)
+            response = jsonify({"message": e.message})
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response, e.status_code
+        status_url = url_for("transaction_bp.get_transfer_status", transfer_id=transfer_id)
+        return jsonify({"message": "Transferencia en cola.", "transfer_id": transfer_id, "status": STATUS_QUEUED,
+                        "status_url": status_url}), 202, {"Location": status_url}
+
+    # Idempotency-Key: un reintento con la misma clave devuelve la respuesta guardada
+    # sin volver a mover saldos (ver services/idempotency.py)
     try:
-        sender = Account.query.get(sender_id)
-        receiver = Account.query.get(receiver_id)
-
-        if not sender:
-            return jsonify({"message": "Cuenta de origen no encontrada."}), 404
-        if not receiver:
-            return jsonify({"message": "Cuenta de destino no encontrada."}), 404
-
-        # Validación de fondos
-        if sender.balance < amount:
-            return jsonify({"message": "Fondos insuficientes en la cuenta de origen."}), 400
-
-        # --- Operaciones que deben ser atómicas ---
-        sender.balance -= amount
-        receiver.balance += amount
-
-        # Registrar transacción
-        transaction = Transaction(
-            sender_account_id=sender.id, # Usar sender.id y receiver.id para asegurar que son los IDs de los objetos encontrados
-            receiver_account_id=receiver.id,
-            amount=amount,
-            description=description
-        )
-        db.session.add(transaction)
+        idempotency = begin_idempotent_request(request, get_jwt_identity())
+        replay = idempotency.replay() if idempotency is not None else None
+    except IdempotencyError as e:
+        return jsonify({"message": e.message}), e.status_code
+    if replay is not None:
+        return replay.to_response()
 
-        # Confirmar todos los cambios
-        db.session.commit()
+    # El motor hace el débito condicionado, bloquea las cuentas en orden de id
+    # y reintenta los conflictos de concurrencia (ver services/transfer_engine.py)
+    try:
+        result = execute_transfer(sender_id, receiver_id, amount, description, idempotency=idempotency)
+        log.info("Transferencia exitosa de %s a %s por %s (intentos: %s)", sender_id, receiver_id, amount, result.attempts)
+        if idempotency is not None:
+            return idempotency.response.to_response(replayed=False)
+        return jsonify(transfer_response_body(result)), 200
 
-        logging.info(f"Transferencia exitosa de {sender.id} a {receiver.id} por {amount}")
-        return jsonify({"message": "Transferencia realizada con éxito."}), 200
+    except IdempotencyKeyInUse:
+        try:
+            return idempotency.stored_response().to_response()
+        except IdempotencyError as e:
+            return jsonify({"message": e.message}), e.status_code
+
+    except TransferError as e:
+        if idempotency is not None and e.status_code < 500:
+            try:
+                return idempotency.record({"message": e.message}, e.status_code)
+            except IdempotencyError as conflict:
+                return jsonify({"message": conflict.message}), conflict.status_code
+        return jsonify({"message": e.message}), e.status_code
 
     except Exception as e:
-        db.session.rollback() # Si algo falla, revertir todos los cambios
-        logging.error(f"Error al procesar la transferencia: {e}")
+        log.exception("Error al procesar la transferencia")
         return jsonify({"message": f"Ocurrió un error inesperado al procesar la transferencia: {str(e)}"}), 500
 
+# 🔎 Estado de una transferencia aceptada en modo asíncrono
+@transaction_bp.route("/transfer/<transfer_id>", methods=["GET"])
+@jwt_required()
+def get_transfer_status(transfer_id):
+    client_id = int(get_jwt_identity())
+    pending = get_transfer_queue().pending(transfer_id)
+    if pending is not None and pending.client_id == client_id:
+        return jsonify({"transfer_id": transfer_id, "status": STATUS_QUEUED,
+                        "created_at": pending.created_at.isoformat()}), 200
+
+    queued = db.session.get(QueuedTransfer, transfer_id)
+    if not queued or queued.requested_by != client_id:
+        # Con varios procesos, una transferencia aceptada por otro aún puede estar en su cola
+        return jsonify({"message": "Transferencia no encontrada (o todavía en cola en otro proceso)."}), 404
+    return jsonify(queued.to_dict()), 200
+
+def _sender_access_error(sender_id):
+    """Solo se debitan cuentas del cliente autenticado, salvo que sea administrador."""
+    if get_jwt().get("is_admin"):
+        return None
+    owner = db.session.query(Account.client_id).filter_by(id=sender_id).scalar()
+    if owner is None:
+        return jsonify({"message": "Cuenta de origen no encontrada."}), 404
+    if str(owner) != get_jwt_identity():
+        return jsonify({"message": "No tienes acceso a la cuenta de origen."}), 403
+    return None
+
+def _batch_ownership_error(legs):
+    """Un lote solo debita cuentas del cliente autenticado, salvo que sea administrador."""
+    if get_jwt().get("is_admin"):
+        return None
+    sender_ids = set()
+    for raw in legs:
+        leg, error = parse_leg(raw)
+        if leg is not None:
+            sender_ids.add(leg["sender_account_id"])
+    if not sender_ids:
+        return None  # todas las transferencias se rechazarán por datos no válidos
+    # Una sola consulta para todo el lote
+    owners = db.session.query(Account.id).filter(
+        Account.id.in_(sender_ids), Account.client_id == int(get_jwt_identity())
+    ).all()
+    if len(owners) != len(sender_ids):
+        return jsonify({"message": "No tienes acceso a todas las cuentas de origen del lote."}), 403
+    return None
+
+# 📦 Transferencias por lotes (nóminas, liquidaciones)
+@transaction_bp.route("/transfer/batch", methods=["POST"])
+@jwt_required()
+def transfer_batch():
+    """
+    Aplica miles de transferencias en una sola transacción.
+    Cuerpo: {"mode": "all_or_nothing" | "best_effort", "transfers": [{...}, ...]}
+    """
+    data = request.get_json(silent=True) or {}
+    legs = data.get("transfers")
+    mode = data.get("mode", MODE_ALL_OR_NOTHING)
+
+    if not isinstance(legs, list) or not legs:
+        return jsonify({"message": "Se requiere una lista 'transfers' con al menos una transferencia."}), 400
+
+    max_legs = current_app.config.get("BATCH_TRANSFER_MAX_LEGS", 10000)
+    if len(legs) > max_legs:
+        return jsonify({"message": f"El lote excede el máximo de {max_legs} transferencias."}), 413
+
+    ownership_error = _batch_ownership_error(legs)
+    if ownership_error:
+        return ownership_error
+
+    try:
+        summary = execute_batch(legs, mode=mode)
+        log.info("Lote de transferencias (%s): %s/%s aplicadas", mode, summary["applied"], summary["total"])
+        status = 400 if summary["aborted"] else 200
+        return jsonify(summary), status
+
+    except TransferError as e:
+        return jsonify({"message": e.message}), e.status_code
+
+    except Exception as e:
+        log.exception("Error al procesar el lote de transferencias")
+        return jsonify({"message": f"Ocurrió un error inesperado al procesar el lote: {str(e)}"}), 500
+
 # 📄 Historial de transacciones
 @transaction_bp.route("/history/<int:account_id>", methods=["GET"])
 @jwt_required()
+@read_replica
 def get_history(account_id):
-    # NOTA IMPORTANTE: Para una seguridad completa, aquí deberías verificar que
-    # get_jwt_identity() (el ID del usuario autenticado) es el propietario de la cuenta
-    # o tiene permisos para ver el historial de account_id.
-    # Por ejemplo:
-    # current_user_id = get_jwt_identity()
-    # account = Account.query.get(account_id)
-    # if not account or account.user_id != current_user_id:
-    #     return jsonify({"message": "Acceso denegado o cuenta no encontrada."}), 403
-
-    account = Account.query.get(account_id)
+    # Parámetros: ?limit=50&cursor=<next_cursor>&from=2025-01-01&to=2025-02-01&direction=all|sent|received
+    try:
+        params = parse_history_args(request.args)
+    except HistoryQueryError as e:
+        return jsonify({"message": str(e)}), 400
+
+    access_error = _statement_access_error(account_id)
+    if access_error:
+        return access_error
+
+    page = fetch_history_page(db.session, account_id, **params)
+    return jsonify(page), 200
+
+# 📈 Saldo de una cuenta a una fecha (foto diaria más cercana + asientos posteriores)
+@transaction_bp.route("/balance/<int:account_id>", methods=["GET"])
+@jwt_required()
+def get_balance_as_of(account_id):
+    # Parámetros: ?as_of=2025-03-31T23:59:59 (por defecto, ahora)
+    access_error = _statement_access_error(account_id)
+    if access_error:
+        return access_error
+
+    try:
+        as_of = parse_as_of(request.args)
+    except LedgerQueryError as e:
+        return jsonify({"message": str(e)}), 400
+
+    balance = balance_as_of(db.session.connection(), account_id, as_of)
+    return jsonify({"account_id": account_id, "as_of": as_of.isoformat(), "balance": round(balance, 2)}), 200
+
+# 📊 Serie de saldos al cierre de cada día (gráficos del dashboard)
+@transaction_bp.route("/balance/<int:account_id>/daily", methods=["GET"])
+@jwt_required()
+def get_daily_balances(account_id):
+    # Parámetros: ?from=2025-03-01&to=2025-03-31 (por defecto, los últimos 30 días)
+    access_error = _statement_access_error(account_id)
+    if access_error:
+        return access_error
+
+    try:
+        date_from, date_to = parse_series_range(request.args)
+    except LedgerQueryError as e:
+        return jsonify({"message": str(e)}), 400
+
+    series = daily_balances(db.session.connection(), account_id, date_from, date_to)
+    return jsonify({"account_id": account_id, "series": series}), 200
+
+def _statement_access_error(account_id):
+    """Historial, estados de cuenta y saldos: solo los ve el titular de la cuenta o un administrador."""
+    account = db.session.query(Account.id, Account.client_id).filter_by(id=account_id).first()
     if not account:
         return jsonify({"message": "Cuenta no encontrada."}), 404
+    if str(account.client_id) != get_jwt_identity() and not get_jwt().get("is_admin"):
+        return jsonify({"message": "No tienes acceso a esta cuenta."}), 403
+    return None
+
+# 🧾 Estado de cuenta con saldo corrido (en streaming, para rangos cortos)
+@transaction_bp.route("/statements/<int:account_id>", methods=["GET"])
+@jwt_required()
+def get_statement(account_id):
+    # Parámetros: ?from=2025-03-01&to=2025-03-31&format=csv|json
+    max_days = current_app.config.get("STATEMENT_INLINE_MAX_DAYS", 31)
+    try:
+        date_from, date_to, output_format = parse_statement_args(request.args, max_days)
+    except StatementQueryError as e:
+        return jsonify({"message": f"{e} Para rangos mayores usa POST /api/transactions/statements/jobs."}), 400
+
+    access_error = _statement_access_error(account_id)
+    if access_error:
+        return access_error
+
+    filename = statement_filename(account_id, date_from, date_to, output_format)
+    chunk_size = current_app.config.get("STATEMENT_CHUNK_SIZE", 5000)
+    return Response(
+        stream_with_context(stream_statement(output_format, account_id, date_from, date_to, chunk_size)),
+        mimetype=STATEMENT_MIMETYPES[output_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+# 🗂️ Estado de cuenta de un rango largo: se genera en segundo plano
+@transaction_bp.route("/statements/jobs", methods=["POST"])
+@jwt_required()
+def create_statement_job():
+    data = request.get_json(silent=True) or {}
+    account_id = data.get("account_id")
+    if not isinstance(account_id, int):
+        return jsonify({"message": "El campo 'account_id' es obligatorio y debe ser un entero."}), 400
+    try:
+        date_from, date_to, output_format = parse_statement_args(
+            data, current_app.config.get("STATEMENT_MAX_DAYS", 3660)
+        )
+    except StatementQueryError as e:
+        return jsonify({"message": str(e)}), 400
 
-    transactions = Transaction.query.filter(
-        (Transaction.sender_account_id == account_id) |
-        (Transaction.receiver_account_id == account_id)
-    ).order_by(Transaction.timestamp.desc()).all()
-
-    result = []
-    for t in transactions:
-        # Aquí puedes agregar lógica para mostrar si es un envío o una recepción
-        # y quizás el nombre del remitente/destinatario si lo necesitas.
-        
-        # Para el frontend, podría ser útil indicar el tipo de transacción
-        transaction_type = "sent" if t.sender_account_id == account_id else "received"
-        
-        # Opcional: Obtener nombres de las cuentas para una mejor visualización
-        sender_name = t.sender_account.user.username if t.sender_account and t.sender_account.user else "N/A"
-        receiver_name = t.receiver_account.user.username if t.receiver_account and t.receiver_account.user else "N/A"
-
-        result.append({
-            "id": t.id,
-            "sender_account_id": t.sender_account_id,
-            "receiver_account_id": t.receiver_account_id,
-            "amount": t.amount,
-            "description": t.description,
-            "timestamp": t.timestamp.isoformat(),
-            "type": transaction_type,
-            "sender_username": sender_name,
-            "receiver_username": receiver_name
-        })
-
-    return jsonify(result), 200
+    access_error = _statement_access_error(account_id)
+    if access_error:
+        return access_error
+
+    job = get_statement_jobs().submit(account_id, int(get_jwt_identity()), date_from, date_to, output_format)
+    log.info("Job de estado de cuenta %s creado para la cuenta %s (%s a %s)", job.id, account_id, date_from, date_to)
+    body = job.to_dict()
+    body["status_url"] = url_for("transaction_bp.get_statement_job", job_id=job.id)
+    return jsonify(body), 202
+
+def _find_statement_job(job_id):
+    job = db.session.get(StatementJob, job_id)
+    if not job or str(job.requested_by) != get_jwt_identity():
+        return None
+    return job
+
+# ⏳ Estado y progreso de un job de estado de cuenta
+@transaction_bp.route("/statements/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def get_statement_job(job_id):
+    job = _find_statement_job(job_id)
+    if not job:
+        return jsonify({"message": "Job no encontrado."}), 404
+    body = job.to_dict()
+    if job.status == "done":
+        body["download_url"] = url_for("transaction_bp.download_statement_job", job_id=job.id)
+    return jsonify(body), 200
+
+# ⬇️ Descarga del archivo generado (admite Range para descargar por partes o reanudar)
+@transaction_bp.route("/statements/jobs/<job_id>/download", methods=["GET"])
+@jwt_required()
+def download_statement_job(job_id):
+    job = _find_statement_job(job_id)
+    if not job:
+        return jsonify({"message": "Job no encontrado."}), 404
+    if job.status != "done":
+        return jsonify({"message": f"El estado de cuenta todavía no está listo (estado: {job.status})."}), 409
+    return send_file(
+        job.file_path,
+        mimetype=STATEMENT_MIMETYPES[job.output_format],
+        as_attachment=True,
+        download_name=statement_filename(job.account_id, job.date_from, job.date_to, job.output_format),
+        conditional=True,
+        etag=job.id,
+    )
@@ -0,0 +1,248 @@
+# backend/services/admin_listings.py
+"""
+Listados de administración que no cargan el banco entero en memoria.
+
+Las consultas seleccionan solo las columnas necesarias (sin hidratar entidades
+del ORM). La exportación recorre la tabla con un cursor del lado del servidor
+(``yield_per`` / ``stream_results``) y emite NDJSON o CSV por bloques, de modo
+que la memoria del worker se mantiene plana sin importar el número de filas.
+"""
+import csv
+import io
+import zlib
+
+from backend.database.models.account import Account
+from backend.database.models.card import Card
+from backend.database.models.client import Client
+from backend.services.serialization import ACCOUNT, ACCOUNT_EXPORT, CARD, CLIENT, dumps
+
+CLIENT_SCALAR_FIELDS = ("id", "full_name", "email", "phone_number", "cip", "is_admin")
+CLIENT_RELATION_FIELDS = ("accounts", "cards")
+CLIENT_FIELDS = CLIENT_SCALAR_FIELDS + CLIENT_RELATION_FIELDS
+
+ACCOUNT_EXPORT_FIELDS = ACCOUNT_EXPORT.keys
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+STREAM_BATCH_SIZE = 1000  # filas por viaje del cursor del servidor
+STREAM_CHUNK_BYTES = 64 * 1024  # tamaño aproximado de cada bloque enviado al cliente
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class ListingQueryError(ValueError):
+    """Parámetro de filtrado o paginación no válido."""
+
+
+def parse_account_filters(args):
+    """Filtros comunes: ``account_type``, ``client_id``, ``min_balance`` y ``max_balance``."""
+    filters = {}
+    if args.get("account_type"):
+        filters["account_type"] = args["account_type"]
+    for name, cast in (("client_id", int), ("min_balance", float), ("max_balance", float)):
+        value = args.get(name)
+        if value not in (None, ""):
+            try:
+                filters[name] = cast(value)
+            except ValueError:
+                raise ListingQueryError(f"El parámetro '{name}' no es válido.")
+    return filters
+
+
+def parse_page_args(args):
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+        after_id = int(args["cursor"]) if args.get("cursor") else None
+    except ValueError:
+        raise ListingQueryError("Los parámetros 'limit' y 'cursor' deben ser números enteros.")
+    return max(1, min(limit, MAX_PAGE_SIZE)), after_id
+
+
+def accounts_statement(filters=None, after_id=None, limit=None):
+    """SELECT de columnas de cuentas + nombre del cliente, ordenado por id de cuenta."""
+    filters = filters or {}
+    stmt = ACCOUNT_EXPORT.select().join(Client, Account.client_id == Client.id).order_by(Account.id)
+    if "account_type" in filters:
+        stmt = stmt.where(Account.account_type == filters["account_type"])
+    if "client_id" in filters:
+        stmt = stmt.where(Account.client_id == filters["client_id"])
+    if "min_balance" in filters:
+        stmt = stmt.where(Account.total_balance >= filters["min_balance"])
+    if "max_balance" in filters:
+        stmt = stmt.where(Account.total_balance <= filters["max_balance"])
+    if after_id is not None:
+        stmt = stmt.where(Account.id > after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def fetch_accounts_page(session, filters, limit, after_id=None):
+    """Página de cuentas por keyset sobre ``accounts.id``."""
+    rows = session.execute(accounts_statement(filters, after_id, limit + 1)).all()
+    has_more = len(rows) > limit
+    accounts = ACCOUNT_EXPORT.from_rows(rows[:limit])
+    return {
+        "accounts": accounts,
+        "next_cursor": str(accounts[-1]["id"]) if has_more else None,
+        "has_more": has_more,
+    }
+
+
+def stream_account_rows(session, filters=None):
+    """Itera las filas con un cursor del lado del servidor, sin materializar el resultado."""
+    result = session.execute(
+        accounts_statement(filters).execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    for partition in result.partitions():
+        for row in partition:
+            yield row
+
+
+def _encode_ndjson(rows):
+    from_row = ACCOUNT_EXPORT.from_row
+    for row in rows:
+        yield dumps(from_row(row)) + "\n"
+
+
+def _encode_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ACCOUNT_EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _encode_json_array(rows):
+    from_row = ACCOUNT_EXPORT.from_row
+    yield "["
+    first = True
+    for row in rows:
+        yield ("" if first else ",") + dumps(from_row(row))
+        first = False
+    yield "]"
+
+
+ENCODERS = {"ndjson": _encode_ndjson, "csv": _encode_csv, "json": _encode_json_array}
+
+
+def chunked_utf8(pieces):
+    """Agrupa los fragmentos de texto en bloques de ~64 KB codificados en UTF-8."""
+    pending = []
+    size = 0
+    for piece in pieces:
+        pending.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_BYTES:
+            yield "".join(pending).encode("utf-8")
+            pending = []
+            size = 0
+    if pending:
+        yield "".join(pending).encode("utf-8")
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_accounts(session, export_format, filters=None, gzip=False):
+    """Generador de bytes con la exportación de cuentas en ``export_format`` (ndjson, csv o json)."""
+    chunks = chunked_utf8(ENCODERS[export_format](stream_account_rows(session, filters)))
+    return _gzipped(chunks) if gzip else chunks
+
+
+def parse_client_filters(args):
+    """Filtros del listado de clientes: ``is_admin``, ``account_type`` y ``card_provider``."""
+    filters = {}
+    is_admin = args.get("is_admin")
+    if is_admin not in (None, ""):
+        if is_admin.lower() not in ("true", "false", "1", "0"):
+            raise ListingQueryError("El parámetro 'is_admin' debe ser true o false.")
+        filters["is_admin"] = is_admin.lower() in ("true", "1")
+    for name in ("account_type", "card_provider"):
+        if args.get(name):
+            filters[name] = args[name]
+    return filters
+
+
+def parse_client_fields(args):
+    """Selección de campos (``?fields=id,full_name,accounts``). Por defecto, todos."""
+    raw = args.get("fields")
+    if not raw:
+        return CLIENT_FIELDS
+    fields = tuple(f.strip() for f in raw.split(",") if f.strip())
+    unknown = [f for f in fields if f not in CLIENT_FIELDS]
+    if unknown:
+        raise ListingQueryError(f"Campos no válidos: {', '.join(unknown)}.")
+    # El id siempre se incluye: es el cursor de paginación
+    return ("id",) + tuple(f for f in fields if f != "id")
+
+
+def clients_statement(filters, fields, limit, after_id=None):
+    """
+    SELECT de las columnas pedidas de los clientes de una página. Las cuentas y
+    tarjetas se leen aparte con una consulta por relación pedida para toda la
+    página (ver ``fetch_clients_page``), sin importar cuántos clientes tenga.
+    """
+    serializer = CLIENT.only(f for f in fields if f in CLIENT_SCALAR_FIELDS)
+    stmt = serializer.select().order_by(Client.id).limit(limit)
+    if "is_admin" in filters:
+        stmt = stmt.where(Client.is_admin == filters["is_admin"])
+    if "account_type" in filters:
+        stmt = stmt.where(Client.accounts.any(Account.account_type == filters["account_type"]))
+    if "card_provider" in filters:
+        stmt = stmt.where(Client.cards.any(Card.provider == filters["card_provider"]))
+    if after_id is not None:
+        stmt = stmt.where(Client.id > after_id)
+    return serializer, stmt
+
+
+def _related_by_client(session, serializer, owner_column, order_column, client_ids):
+    """Filas de una relación para todos los clientes de la página, agrupadas por cliente."""
+    grouped = {client_id: [] for client_id in client_ids}
+    if not client_ids:
+        return grouped
+    stmt = (
+        serializer.select()
+        .add_columns(owner_column)
+        .where(owner_column.in_(client_ids))
+        .order_by(order_column)
+    )
+    keys = serializer.keys
+    for row in session.execute(stmt):
+        grouped[row[-1]].append(dict(zip(keys, row)))
+    return grouped
+
+
+def fetch_clients_page(session, filters, fields, limit, after_id=None):
+    """Página de clientes con detalles por keyset sobre ``clients.id``."""
+    serializer, stmt = clients_statement(filters, fields, limit + 1, after_id)
+    rows = session.execute(stmt).all()
+    has_more = len(rows) > limit
+    clients = serializer.from_rows(rows[:limit])
+    client_ids = [client["id"] for client in clients]
+    if "accounts" in fields:
+        accounts = _related_by_client(session, ACCOUNT, Account.client_id, Account.id, client_ids)
+        for client in clients:
+            client["accounts"] = accounts[client["id"]]
+    if "cards" in fields:
+        cards = _related_by_client(session, CARD, Card.client_id, Card.id, client_ids)
+        for client in clients:
+            client["cards"] = cards[client["id"]]
+    return {
+        "clients": clients,
+        "next_cursor": str(client_ids[-1]) if has_more else None,
+        "has_more": has_more,
+    }
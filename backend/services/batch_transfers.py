@@ -0,0 +1,258 @@
+# backend/services/batch_transfers.py
+"""
+Transferencias por lotes (nóminas, liquidaciones de comercios).
+
+Un lote de miles de transferencias se procesa en una sola transacción:
+  1. se bloquean y leen de una vez todas las cuentas involucradas (en orden de id),
+  2. cada transferencia se valida en memoria contra el saldo acumulado,
+  3. se aplica el delta neto de cada cuenta con un UPDATE por conjuntos (CASE), y
+  4. se insertan todas las filas de ``transactions`` y sus asientos del libro
+     mayor con un executemany cada uno, y se suman a los totales diarios.
+
+Modos:
+  * ``all_or_nothing``: si una transferencia falla, no se aplica ninguna.
+  * ``best_effort``: se aplican las válidas y se informa el error de las demás.
+"""
+import math
+from datetime import datetime
+
+from sqlalchemy import case, insert, select, update
+
+from backend.logging_setup import get_logger
+from backend.services.dashboard import invalidate_clients
+from backend.services.hot_accounts import fold_slots
+from backend.services.ledger import record_entries, transfer_entries
+from backend.services.rollups import apply_entries
+from backend.services.transfer_engine import (
+    TransferError,
+    accounts_table,
+    lock_accounts,
+    run_with_retries,
+    transactions_table,
+)
+
+logger = get_logger("batch_transfers")
+
+MODE_ALL_OR_NOTHING = "all_or_nothing"
+MODE_BEST_EFFORT = "best_effort"
+BATCH_MODES = (MODE_ALL_OR_NOTHING, MODE_BEST_EFFORT)
+
+STATUS_APPLIED = "applied"
+STATUS_REJECTED = "rejected"
+STATUS_ABORTED = "aborted"  # válida, pero no aplicada porque el lote completo se revirtió
+
+# Número máximo de cuentas por sentencia UPDATE ... CASE
+UPDATE_CHUNK_SIZE = 500
+
+
+class BatchConflictError(Exception):
+    """Un saldo cambió entre la lectura y la escritura (solo posible sin FOR UPDATE, p. ej. SQLite)."""
+
+
+class _BatchAborted(Exception):
+    """Señal interna para revertir la transacción en modo todo-o-nada."""
+
+
+def parse_leg(raw):
+    """
+    Normaliza una transferencia del lote. Devuelve ``(leg, None)`` si es válida
+    o ``(None, mensaje)`` si no lo es.
+    """
+    if not isinstance(raw, dict):
+        return None, "Formato de transferencia no válido."
+    sender_id = raw.get("sender_account_id")
+    receiver_id = raw.get("receiver_account_id")
+    amount = raw.get("amount")
+    if sender_id in (None, "") or receiver_id in (None, "") or amount in (None, ""):
+        return None, "Datos incompletos. Se requieren sender_account_id, receiver_account_id y amount."
+    try:
+        sender_id = int(sender_id)
+        receiver_id = int(receiver_id)
+    except (TypeError, ValueError):
+        return None, "Los identificadores de cuenta no son válidos."
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        return None, "El monto de la transferencia no es un número válido."
+    if not math.isfinite(amount):
+        # NaN pasaría todas las comparaciones del plan y del UPDATE
+        return None, "El monto de la transferencia no es un número válido."
+    if amount <= 0:
+        return None, "El monto de la transferencia debe ser positivo."
+    if sender_id == receiver_id:
+        return None, "No puedes transferir fondos a la misma cuenta."
+    return {
+        "sender_account_id": sender_id,
+        "receiver_account_id": receiver_id,
+        "amount": amount,
+        "description": str(raw.get("description") or "")[:255],
+    }, None
+
+
+def _plan(legs, balances, results):
+    """
+    Valida cada transferencia, en orden, contra el saldo acumulado en memoria.
+    Devuelve ``(deltas, aplicables)`` donde ``deltas`` es el cambio neto por cuenta.
+    """
+    running = dict(balances)
+    deltas = {}
+    applicable = []
+    for index, leg in legs:
+        sender_id = leg["sender_account_id"]
+        receiver_id = leg["receiver_account_id"]
+        amount = leg["amount"]
+        if sender_id not in running:
+            results[index] = {"index": index, "status": STATUS_REJECTED, "message": "Cuenta de origen no encontrada."}
+            continue
+        if receiver_id not in running:
+            results[index] = {"index": index, "status": STATUS_REJECTED, "message": "Cuenta de destino no encontrada."}
+            continue
+        if (running[sender_id] or 0.0) < amount:
+            results[index] = {"index": index, "status": STATUS_REJECTED,
+                              "message": "Fondos insuficientes en la cuenta de origen."}
+            continue
+        running[sender_id] = (running[sender_id] or 0.0) - amount
+        running[receiver_id] = (running[receiver_id] or 0.0) + amount
+        deltas[sender_id] = deltas.get(sender_id, 0.0) - amount
+        deltas[receiver_id] = deltas.get(receiver_id, 0.0) + amount
+        applicable.append((index, leg))
+    return deltas, applicable
+
+
+def apply_balance_deltas(conn, deltas):
+    """Aplica ``{account_id: delta}`` con una sentencia UPDATE ... CASE por bloque de cuentas."""
+    items = sorted((account_id, delta) for account_id, delta in deltas.items() if delta)
+    for start in range(0, len(items), UPDATE_CHUNK_SIZE):
+        chunk = dict(items[start:start + UPDATE_CHUNK_SIZE])
+        conn.execute(
+            update(accounts_table)
+            .where(accounts_table.c.id.in_(list(chunk)))
+            .values(balance=accounts_table.c.balance + case(chunk, value=accounts_table.c.id, else_=0.0))
+        )
+
+    # Verificación optimista: con FOR UPDATE nunca se dispara, pero en bases de
+    # datos sin bloqueo de filas otro escritor pudo cambiar un saldo entretanto.
+    debited = [account_id for account_id, delta in items if delta < 0]
+    if debited:
+        overdrawn = conn.execute(
+            select(accounts_table.c.id)
+            .where(accounts_table.c.id.in_(debited))
+            .where(accounts_table.c.balance < accounts_table.c.held_amount)
+            .limit(1)
+        ).first()
+        if overdrawn is not None:
+            raise BatchConflictError(f"El saldo de la cuenta {overdrawn.id} cambió durante el lote.")
+
+
+def _insert_transactions(conn, applicable, account_types):
+    now = datetime.utcnow()
+    rows = [
+        {
+            "sender_account_id": leg["sender_account_id"],
+            "receiver_account_id": leg["receiver_account_id"],
+            "amount": leg["amount"],
+            "description": leg["description"],
+            "timestamp": now,
+        }
+        for _, leg in applicable
+    ]
+    if not rows:
+        return []
+    if conn.dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = conn.execute(
+            insert(transactions_table).returning(transactions_table.c.id, sort_by_parameter_order=True),
+            rows,
+        )
+        transaction_ids = [row.id for row in result]
+    else:
+        conn.execute(insert(transactions_table), rows)
+        transaction_ids = [None] * len(rows)
+    entries = [
+        entry
+        for (_, leg), transaction_id in zip(applicable, transaction_ids)
+        for entry in transfer_entries(transaction_id, leg["sender_account_id"], leg["receiver_account_id"],
+                                      leg["amount"], now)
+    ]
+    record_entries(conn, entries)
+    apply_entries(conn, entries, account_types)
+    return transaction_ids
+
+
+def execute_batch(raw_legs, mode=MODE_ALL_OR_NOTHING, max_conflict_retries=3, before_commit=None):
+    """
+    Procesa un lote de transferencias. Devuelve un dict con el resumen y el
+    resultado de cada transferencia (en el mismo orden de entrada).
+
+    ``before_commit(conn, results)`` se llama dentro de la transacción del lote,
+    con ``{índice: resultado}``, para escribir datos que deben confirmarse junto
+    con los saldos (p. ej. el estado de las transferencias encoladas).
+    """
+    if mode not in BATCH_MODES:
+        raise TransferError(f"Modo de lote no válido. Usa uno de: {', '.join(BATCH_MODES)}.")
+
+    parsed = []
+    invalid = {}
+    for index, raw in enumerate(raw_legs):
+        leg, error = parse_leg(raw)
+        if error:
+            invalid[index] = {"index": index, "status": STATUS_REJECTED, "message": error}
+        else:
+            parsed.append((index, leg))
+
+    touched_clients = set()
+
+    def work(conn):
+        touched_clients.clear()
+        results = dict(invalid)
+        account_ids = set()
+        for _, leg in parsed:
+            account_ids.add(leg["sender_account_id"])
+            account_ids.add(leg["receiver_account_id"])
+        locked = lock_accounts(conn, account_ids) if account_ids else {}
+        # Se valida contra el saldo disponible: lo retenido por pagos con tarjeta no se puede transferir
+        balances = {account_id: (row.balance or 0.0) - row.held_amount for account_id, row in locked.items()}
+        # Cuentas calientes: sus sub-saldos se trasladan a la fila para validar con el saldo real
+        for account_id, moved in (fold_slots(conn, locked) if locked else {}).items():
+            balances[account_id] = (balances[account_id] or 0.0) + moved
+
+        deltas, applicable = _plan(parsed, balances, results)
+        if mode == MODE_ALL_OR_NOTHING and len(results) > 0:
+            raise _BatchAborted(results)
+
+        apply_balance_deltas(conn, deltas)
+        transaction_ids = _insert_transactions(
+            conn, applicable, {account_id: row.account_type for account_id, row in locked.items()}
+        )
+        for (index, _), transaction_id in zip(applicable, transaction_ids):
+            results[index] = {"index": index, "status": STATUS_APPLIED, "transaction_id": transaction_id}
+        touched_clients.update(locked[account_id].client_id for account_id, delta in deltas.items() if delta)
+        if before_commit is not None:
+            before_commit(conn, results)
+        return results
+
+    for conflict_attempt in range(1, max_conflict_retries + 1):
+        try:
+            results, _ = run_with_retries(work)
+            break
+        except _BatchAborted as aborted:
+            results = aborted.args[0]
+            for index, _ in parsed:
+                results.setdefault(index, {"index": index, "status": STATUS_ABORTED,
+                                           "message": "No aplicada: el lote se revirtió por otros errores."})
+            break
+        except BatchConflictError as e:
+            if conflict_attempt == max_conflict_retries:
+                raise TransferError(f"No se pudo aplicar el lote por cambios concurrentes: {e}") from e
+            logger.info("Conflicto en lote de transferencias, reintentando: %s", e)
+
+    invalidate_clients(touched_clients)
+    ordered = [results[index] for index in range(len(raw_legs))]
+    applied = sum(1 for r in ordered if r["status"] == STATUS_APPLIED)
+    return {
+        "mode": mode,
+        "total": len(ordered),
+        "applied": applied,
+        "rejected": sum(1 for r in ordered if r["status"] == STATUS_REJECTED),
+        "aborted": sum(1 for r in ordered if r["status"] == STATUS_ABORTED),
+        "results": ordered,
+    }
@@ -0,0 +1,255 @@
+# backend/services/bulk_onboarding.py
+"""
+Alta masiva de clientes (migraciones desde otros bancos).
+
+Los registros se procesan por bloques de ``chunk_size``:
+  1. se validan igual que en ``/api/auth/register``,
+  2. se descartan los email/CIP repetidos con un conjunto en memoria y una sola
+     consulta por bloque contra ``clients``,
+  3. las contraseñas se hashean en paralelo en un pool de procesos (los
+     registros que ya traen un ``password_hash`` reconocible se conservan y se
+     actualizan en el primer login),
+  4. se insertan los clientes y sus cuentas de ahorro con dos executemany, se
+     suman las cuentas abiertas a los totales diarios y se hace un único
+     commit por bloque.
+
+Después de cada bloque se guarda un checkpoint con el índice del siguiente
+registro, de modo que una importación interrumpida puede reanudarse. Si se cae
+entre el commit y el checkpoint, al reanudar ese bloque se detecta como
+duplicado y no se inserta dos veces.
+"""
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice, repeat
+
+from flask import current_app
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.client import Client
+from backend.logging_setup import get_logger
+from backend.services import password_kdf
+from backend.services.dashboard import invalidate_listings
+from backend.services.number_allocator import NumberAllocator, parse_bin_prefixes
+from backend.services.rollups import record_accounts_opened
+
+logger = get_logger("bulk_onboarding")
+
+clients_table = Client.__table__
+accounts_table = Account.__table__
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_ACCOUNT_TYPE = "ahorro"
+REQUIRED_FIELDS = ("full_name", "email", "phone_number", "cip")
+
+
+def parse_client_record(raw):
+    """
+    Normaliza un cliente del archivo. Devuelve ``(registro, None)`` si es válido
+    o ``(None, mensaje)`` si no lo es.
+    """
+    if not isinstance(raw, dict):
+        return None, "Formato de cliente no válido."
+    record = {field: str(raw.get(field) or "").strip() for field in REQUIRED_FIELDS}
+    if not all(record.values()):
+        return None, "Faltan campos obligatorios (full_name, email, phone_number, cip)."
+    if len(record["full_name"]) > 120 or len(record["email"]) > 120:
+        return None, "El nombre o el correo superan los 120 caracteres."
+    if len(record["phone_number"]) > 20 or len(record["cip"]) > 20:
+        return None, "El teléfono o la CIP superan los 20 caracteres."
+
+    password_hash = str(raw.get("password_hash") or "").strip()
+    password = str(raw.get("password") or "").strip()
+    if password_hash:
+        if not password_kdf.is_known_hash(password_hash):
+            return None, "El formato de password_hash no es compatible."
+        record["password_hash"] = password_hash
+    elif len(password) < 6:
+        return None, "La contraseña debe tener al menos 6 caracteres."
+    else:
+        record["password"] = password
+    return record, None
+
+
+def load_checkpoint(path, source):
+    """Índice del primer registro pendiente según el checkpoint (0 si no hay o es de otro archivo)."""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != os.path.abspath(source):
+        return 0
+    return int(checkpoint.get("next_index", 0))
+
+
+def save_checkpoint(path, source, next_index, totals):
+    """Escribe el checkpoint de forma atómica (archivo temporal + ``os.replace``)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(source), "next_index": next_index, "totals": totals}, f)
+    os.replace(tmp_path, path)
+
+
+class BulkOnboarding:
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, hash_workers=None, account_type=DEFAULT_ACCOUNT_TYPE):
+        config = current_app.config
+        self.chunk_size = chunk_size
+        self.account_type = account_type
+        self.hash_method = config.get("PASSWORD_HASH_METHOD", "scrypt")
+        self.bcrypt_rounds = config.get("PASSWORD_BCRYPT_ROUNDS", 12)
+        self.hash_workers = (os.cpu_count() or 1) if hash_workers is None else hash_workers
+        # Asignador propio: un bloque de números de cuenta por bloque de clientes
+        self.allocator = NumberAllocator(
+            block_size=chunk_size, bin_prefixes=parse_bin_prefixes(config.get("CARD_BIN_PREFIXES"))
+        )
+        self.seen_emails = set()
+        self.seen_cips = set()
+        self._executor = None
+
+    def __enter__(self):
+        if self.hash_workers:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.hash_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _hash_passwords(self, passwords):
+        if not passwords:
+            return []
+        args = (passwords, repeat(self.hash_method), repeat(self.bcrypt_rounds))
+        if self._executor is None:
+            return list(map(password_kdf.hash_password, *args))
+        chunksize = max(1, len(passwords) // (self.hash_workers * 4))
+        return list(self._executor.map(password_kdf.hash_password, *args, chunksize=chunksize))
+
+    def _existing(self, conn, records):
+        """Emails y CIPs del bloque que ya existen en la base de datos (una consulta)."""
+        emails = [r["email"] for r in records]
+        cips = [r["cip"] for r in records]
+        rows = conn.execute(
+            select(clients_table.c.email, clients_table.c.cip)
+            .where(or_(clients_table.c.email.in_(emails), clients_table.c.cip.in_(cips)))
+        ).all()
+        return {row.email for row in rows}, {row.cip for row in rows}
+
+    def _insert(self, conn, records):
+        """Inserta clientes y cuentas; devuelve los ids de los clientes en el orden de ``records``."""
+        client_rows = [
+            {
+                "full_name": r["full_name"],
+                "email": r["email"],
+                "phone_number": r["phone_number"],
+                "cip": r["cip"],
+                "password_hash": r["password_hash"],
+                "is_admin": False,
+            }
+            for r in records
+        ]
+        if conn.dialect.insert_executemany_returning_sort_by_parameter_order:
+            result = conn.execute(
+                insert(clients_table).returning(clients_table.c.id, sort_by_parameter_order=True), client_rows
+            )
+            client_ids = [row.id for row in result]
+        else:
+            conn.execute(insert(clients_table), client_rows)
+            ids_by_email = dict(conn.execute(
+                select(clients_table.c.email, clients_table.c.id)
+                .where(clients_table.c.email.in_([r["email"] for r in records]))
+            ).all())
+            client_ids = [ids_by_email[r["email"]] for r in records]
+
+        now = datetime.utcnow()
+        conn.execute(insert(accounts_table), [
+            {
+                "client_id": client_id,
+                "account_type": self.account_type,
+                "balance": 0.0,
+                "account_number": record["account_number"],
+                "created_at": now,
+            }
+            for client_id, record in zip(client_ids, records)
+        ])
+        record_accounts_opened(conn, [self.account_type] * len(records), at=now)
+        return client_ids
+
+    def process_chunk(self, start_index, raw_records):
+        """Procesa un bloque y devuelve su resumen (con los errores de cada registro)."""
+        errors = []
+        candidates = []
+        for offset, raw in enumerate(raw_records):
+            index = start_index + offset
+            record, error = parse_client_record(raw)
+            if error:
+                errors.append({"index": index, "status": "invalid", "message": error})
+            elif record["email"] in self.seen_emails or record["cip"] in self.seen_cips:
+                errors.append({"index": index, "status": "duplicate",
+                               "message": "Correo o CIP repetido en el archivo."})
+            else:
+                self.seen_emails.add(record["email"])
+                self.seen_cips.add(record["cip"])
+                candidates.append((index, record))
+
+        pending = [record for _, record in candidates if "password_hash" not in record]
+        for record, password_hash in zip(pending, self._hash_passwords([r.pop("password") for r in pending])):
+            record["password_hash"] = password_hash
+
+        # Los números de cuenta se reservan fuera de la transacción del bloque;
+        # los de registros que resulten duplicados quedan como huecos
+        for _, record in candidates:
+            record["account_number"] = self.allocator.account_number()
+
+        to_insert = []
+        for attempt in range(2):
+            try:
+                with db.engine.begin() as conn:
+                    existing_emails, existing_cips = self._existing(conn, [r for _, r in candidates])
+                    to_insert = [
+                        (index, record) for index, record in candidates
+                        if record["email"] not in existing_emails and record["cip"] not in existing_cips
+                    ]
+                    if to_insert:
+                        self._insert(conn, [record for _, record in to_insert])
+                break
+            except IntegrityError:
+                # Alguien registró el mismo correo/CIP entre la consulta y el insert: se repite una vez
+                if attempt:
+                    raise
+                logger.info("Conflicto de unicidad en el bloque que empieza en %s, reintentando", start_index)
+        if to_insert:
+            invalidate_listings()
+
+        inserted = {index for index, _ in to_insert}
+        errors.extend(
+            {"index": index, "status": "duplicate", "message": "El correo o la CIP ya están registrados."}
+            for index, _ in candidates if index not in inserted
+        )
+        errors.sort(key=lambda e: e["index"])
+        return {
+            "start": start_index,
+            "next_index": start_index + len(raw_records),
+            "created": len(to_insert),
+            "duplicates": sum(1 for e in errors if e["status"] == "duplicate"),
+            "invalid": sum(1 for e in errors if e["status"] == "invalid"),
+            "errors": errors,
+        }
+
+    def run(self, records, start_index=0):
+        """Procesa ``records`` (un iterable, se consume en streaming) desde ``start_index``; genera un resumen por bloque."""
+        iterator = islice(iter(records), start_index, None)
+        index = start_index
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            yield self.process_chunk(index, chunk)
+            index += len(chunk)
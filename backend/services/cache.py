@@ -0,0 +1,180 @@
+# backend/services/cache.py
+"""
+Piezas genéricas de caché: un LRU en proceso con TTL, el paso de un token
+bucket y una interfaz para un backend compartido entre workers (p. ej. Redis).
+``LocalSharedBackend`` es un sustituto local de ese backend compartido,
+suficiente para desarrollo y pruebas.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache:
+    """LRU acotado en número de entradas, con expiración por TTL y contadores."""
+
+    def __init__(self, max_entries=10000, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expira_en, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def token_bucket(state, rate, burst, cost, now):
+    """
+    Un paso del token bucket. ``state`` es ``(fichas, actualizado_en)`` o ``None``.
+    Devuelve ``(nuevo_estado, permitido, segundos_hasta_tener_fichas)``.
+    """
+    tokens, updated_at = state if state is not None else (burst, now)
+    tokens = min(burst, tokens + (now - updated_at) * rate)
+    if tokens >= cost:
+        return (tokens - cost, now), True, 0.0
+    return (tokens, now), False, (cost - tokens) / rate
+
+
+class CacheBackend:
+    """Interfaz de un backend compartido entre workers."""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def incr(self, key):
+        """Incrementa atómicamente un contador entero y devuelve el nuevo valor."""
+        raise NotImplementedError
+
+    def take_tokens(self, key, rate, burst, cost=1):
+        """
+        Paso atómico de un token bucket (en Redis, un script Lua). Devuelve
+        ``(permitido, segundos_hasta_tener_fichas)``.
+        """
+        raise NotImplementedError
+
+
+class LocalSharedBackend(CacheBackend):
+    """
+    Sustituto local de un backend compartido: un diccionario del proceso con TTL.
+    Todas las aplicaciones creadas en el mismo proceso comparten la misma instancia
+    (``LocalSharedBackend.instance()``), igual que compartirían un Redis.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            expires_at, value = self._data.get(key, (None, 0))
+            self._data[key] = (expires_at, value + 1)
+            return value + 1
+
+    def take_tokens(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            state = entry[1] if entry is not None and (entry[0] is None or entry[0] > now) else None
+            state, allowed, retry_after = token_bucket(state, rate, burst, cost, now)
+            # Un bucket que se llenaría del todo no hace falta guardarlo más tiempo
+            self._data[key] = (now + burst / rate, state)
+            return allowed, retry_after
+
+
+BACKENDS = {"local": LocalSharedBackend.instance}
+
+
+def make_shared_backend(name):
+    """Devuelve el backend compartido configurado (``None`` si no se usa ninguno)."""
+    if not name or name == "none":
+        return None
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Backend de caché desconocido: {name}")
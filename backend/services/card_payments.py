@@ -0,0 +1,458 @@
+# backend/services/card_payments.py
+"""
+Pagos con tarjeta: autorización con retención, captura, anulación y vencimiento.
+
+Autorizar un pago no mueve dinero. Solo retiene el monto en la cuenta asociada
+a la tarjeta: suma a ``accounts.held_amount`` con un único UPDATE condicionado
+(``WHERE balance - held_amount >= :monto``) y guarda la retención en
+``payment_holds`` con su vencimiento, en una transacción corta. No se hace
+``SELECT ... FOR UPDATE`` sobre la cuenta; el bloqueo de la fila dura lo que
+ese UPDATE. La tarjeta se resuelve con un índice en proceso
+(``número -> tarjeta, titular, cuenta``), así que una autorización es un
+viaje a la base de datos.
+
+Capturar convierte la retención en una transferencia normal hacia la cuenta del
+comercio (``transfer_engine.apply_transfer``, con libro mayor y totales
+diarios): el débito libera lo retenido en el mismo UPDATE. Se puede capturar
+menos de lo autorizado; el resto se libera. Anular libera la retención. Un hilo
+de fondo marca como vencidas las retenciones sin capturar y libera su monto,
+por bloques y con un UPDATE por bloque de cuentas.
+
+Las transiciones de estado son UPDATE condicionados a ``status = 'authorized'``:
+una captura, una anulación y el barrido concurrentes nunca liberan dos veces la
+misma retención.
+"""
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, insert, select, update
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.card import Card
+from backend.database.models.payment_hold import PaymentHold
+from backend.logging_setup import get_logger
+from backend.services.cache import MISSING, LRUCache
+from backend.services.dashboard import invalidate_clients
+from backend.services.hot_accounts import fold_slots, get_hot_accounts
+from backend.services.transfer_engine import apply_transfer, run_with_retries
+
+logger = get_logger("card_payments")
+
+accounts_table = Account.__table__
+cards_table = Card.__table__
+holds_table = PaymentHold.__table__
+
+STATUS_AUTHORIZED = "authorized"
+STATUS_CAPTURED = "captured"
+STATUS_VOIDED = "voided"
+STATUS_EXPIRED = "expired"
+
+DEFAULT_SWEEP_CHUNK = 1000
+RELEASE_CHUNK_SIZE = 500
+
+
+class PaymentError(Exception):
+    """Error de negocio de un pago (se traduce a una respuesta HTTP)."""
+
+    status_code = 400
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class PaymentNotFoundError(PaymentError):
+    status_code = 404
+
+
+class PaymentForbiddenError(PaymentError):
+    status_code = 403
+
+
+class PaymentDeclinedError(PaymentError):
+    status_code = 402
+
+
+class PaymentStateError(PaymentError):
+    status_code = 409
+
+
+@dataclass(frozen=True)
+class CardRef:
+    card_id: int
+    client_id: int
+    account_id: int
+
+
+class CardIndex:
+    """
+    Índice en proceso ``card_number -> CardRef`` (LRU con TTL). Un fallo se
+    resuelve con una consulta por el índice único de ``card_number``; las tarjetas que no
+    existen también se recuerdan, con un TTL corto.
+    """
+
+    def __init__(self, max_entries=100000, ttl=300.0, negative_ttl=5.0):
+        self.negative_ttl = negative_ttl
+        self.cache = LRUCache(max_entries=max_entries, ttl=ttl)
+
+    def lookup(self, conn, card_number):
+        ref = self.cache.get(card_number)
+        if ref is not MISSING:
+            return ref
+        row = conn.execute(
+            select(cards_table.c.id, cards_table.c.client_id, cards_table.c.account_id)
+            .where(cards_table.c.card_number == card_number)
+        ).first()
+        if row is None:
+            self.cache.set(card_number, None, ttl=self.negative_ttl)
+            return None
+        ref = CardRef(row.id, row.client_id, row.account_id)
+        self.cache.set(card_number, ref)
+        return ref
+
+    def warm(self, conn, limit=None):
+        """Carga de una vez hasta ``limit`` tarjetas (por defecto, la capacidad del LRU)."""
+        limit = limit or self.cache.max_entries
+        rows = conn.execute(
+            select(cards_table.c.card_number, cards_table.c.id, cards_table.c.client_id, cards_table.c.account_id)
+            .order_by(cards_table.c.id)
+            .limit(limit)
+        )
+        loaded = 0
+        for row in rows:
+            self.cache.set(row.card_number, CardRef(row.id, row.client_id, row.account_id))
+            loaded += 1
+        return loaded
+
+    def invalidate(self, card_number):
+        self.cache.delete(card_number)
+
+
+@dataclass
+class PaymentRequest:
+    amount: float
+    merchant_account_id: int
+    description: str
+    card_number: str = None
+    account_id: int = None  # pago desde la cuenta, sin tarjeta
+    capture: bool = False
+
+
+def parse_payment_request(data, default_merchant_account_id=None):
+    """
+    Valida el cuerpo de ``POST /api/payments``. El origen es ``card_number`` o,
+    sin tarjeta, ``sender_account_id``; el destino es ``merchant_account_id`` o
+    la cuenta recaudadora configurada (``PAYMENTS_SETTLEMENT_ACCOUNT_ID``).
+    """
+    if not isinstance(data, dict):
+        raise PaymentError("Formato de pago no válido.")
+    card_number = data.get("card_number")
+    account_id = data.get("sender_account_id")
+    if card_number in (None, "") and account_id in (None, ""):
+        raise PaymentError("Datos incompletos. Se requiere card_number o sender_account_id, y amount.")
+    try:
+        amount = float(data.get("amount"))
+    except (TypeError, ValueError):
+        raise PaymentError("El monto del pago no es un número válido.")
+    if amount <= 0:
+        raise PaymentError("El monto del pago debe ser positivo.")
+    merchant_account_id = data.get("merchant_account_id") or default_merchant_account_id
+    if merchant_account_id in (None, ""):
+        raise PaymentError("Falta merchant_account_id (no hay una cuenta recaudadora configurada).")
+    try:
+        merchant_account_id = int(merchant_account_id)
+        account_id = int(account_id) if account_id not in (None, "") else None
+    except (TypeError, ValueError):
+        raise PaymentError("Los identificadores de cuenta no son válidos.")
+
+    description = data.get("description") or ""
+    entity, reference = data.get("payment_entity_name"), data.get("reference_number")
+    if not description and entity:
+        description = f"Pago a {entity}" + (f" (ref. {reference})" if reference else "")
+    return PaymentRequest(
+        amount=amount,
+        merchant_account_id=merchant_account_id,
+        description=str(description)[:255],
+        card_number=str(card_number).strip() if card_number not in (None, "") else None,
+        account_id=account_id,
+        capture=bool(data.get("capture", False)),
+    )
+
+
+def _hold_funds(conn, account_id, amount):
+    """Suma ``amount`` a lo retenido si hay saldo disponible. Devuelve si pudo."""
+    hold = (
+        update(accounts_table)
+        .where(accounts_table.c.id == account_id)
+        .where(accounts_table.c.balance - accounts_table.c.held_amount >= amount)
+        .values(held_amount=accounts_table.c.held_amount + amount)
+    )
+    if conn.execute(hold).rowcount == 1:
+        return True
+    # Cuenta caliente: los fondos pueden estar en los sub-saldos
+    return any(fold_slots(conn, [account_id]).values()) and conn.execute(hold).rowcount == 1
+
+
+def release_held(conn, released):
+    """Resta ``{account_id: monto}`` de lo retenido, con un UPDATE ... CASE por bloque de cuentas."""
+    items = sorted((account_id, amount) for account_id, amount in released.items() if amount)
+    for start in range(0, len(items), RELEASE_CHUNK_SIZE):
+        chunk = dict(items[start:start + RELEASE_CHUNK_SIZE])
+        conn.execute(
+            update(accounts_table)
+            .where(accounts_table.c.id.in_(list(chunk)))
+            .values(held_amount=accounts_table.c.held_amount - case(chunk, value=accounts_table.c.id, else_=0.0))
+        )
+
+
+def _account_exists(conn, account_id):
+    if account_id in get_hot_accounts(conn):
+        return True
+    return conn.execute(select(accounts_table.c.id).where(accounts_table.c.id == account_id)).first() is not None
+
+
+def _resolve_funding(conn, payment, client_id, is_admin):
+    """``(card_id, account_id, titular)`` que paga, comprobando que pertenece al cliente."""
+    if payment.card_number is not None:
+        ref = get_card_index().lookup(conn, payment.card_number)
+        if ref is None:
+            raise PaymentNotFoundError("Tarjeta no encontrada.")
+        if ref.client_id != client_id and not is_admin:
+            raise PaymentForbiddenError("No tienes acceso a esta tarjeta.")
+        if ref.account_id is None:
+            raise PaymentError("La tarjeta no tiene una cuenta asociada.")
+        return ref.card_id, ref.account_id, ref.client_id
+    owner = conn.execute(
+        select(accounts_table.c.client_id).where(accounts_table.c.id == payment.account_id)
+    ).scalar_one_or_none()
+    if owner is None:
+        raise PaymentNotFoundError("Cuenta de origen no encontrada.")
+    if owner != client_id and not is_admin:
+        raise PaymentForbiddenError("No tienes acceso a esta cuenta.")
+    return None, payment.account_id, owner
+
+
+def _hold_row(conn, hold_id):
+    row = conn.execute(select(holds_table).where(holds_table.c.id == hold_id)).first()
+    return dict(row._mapping) if row is not None else None
+
+
+def _transition(conn, hold_id, status, now, **values):
+    """Pasa la retención de ``authorized`` a ``status``. Devuelve si la transición ocurrió."""
+    return conn.execute(
+        update(holds_table)
+        .where(holds_table.c.id == hold_id)
+        .where(holds_table.c.status == STATUS_AUTHORIZED)
+        .where(holds_table.c.expires_at > now)
+        .values(status=status, resolved_at=now, **values)
+    ).rowcount == 1
+
+
+def _check_open(hold, client_id, is_admin, now):
+    if hold is None or (hold["client_id"] != client_id and not is_admin):
+        raise PaymentNotFoundError("Pago no encontrado.")
+    if hold["status"] != STATUS_AUTHORIZED:
+        raise PaymentStateError(f"El pago ya no está autorizado (estado: {hold['status']}).")
+    if hold["expires_at"] <= now:
+        raise PaymentStateError("La autorización del pago venció.")
+
+
+def _capture(conn, hold, amount, now):
+    """Captura la retención ``hold`` (dict de la fila) y lo actualiza. Devuelve el ``TransferResult``."""
+    if amount is None:
+        amount = hold["amount"]
+    if amount <= 0 or amount > hold["amount"] + 1e-9:
+        raise PaymentError("El monto a capturar debe ser positivo y no mayor que el autorizado.")
+    if not _transition(conn, hold["id"], STATUS_CAPTURED, now, captured_amount=amount):
+        raise PaymentStateError("El pago cambió de estado mientras se capturaba. Consulta su estado.")
+    result = apply_transfer(conn, hold["account_id"], hold["merchant_account_id"], amount,
+                            hold["description"] or "", release_hold=hold["amount"])
+    conn.execute(
+        update(holds_table).where(holds_table.c.id == hold["id"]).values(transaction_id=result.transaction_id)
+    )
+    hold.update(status=STATUS_CAPTURED, captured_amount=amount, transaction_id=result.transaction_id,
+                resolved_at=now)
+    return result
+
+
+def payment_response_body(hold, message):
+    """Cuerpo de la respuesta de un pago (el mismo que se guarda para los reintentos con Idempotency-Key)."""
+    return {"message": message, **PaymentHold(**hold).to_dict()}
+
+
+def authorize_payment(payment, client_id, is_admin=False, idempotency=None):
+    """
+    Autoriza un pago: retiene el monto en la cuenta de origen y crea la
+    retención. Con ``payment.capture`` además la captura en la misma
+    transacción (venta en un paso). Devuelve el cuerpo de la respuesta.
+    """
+    ttl = current_app.config.get("CARD_HOLD_TTL", 7 * 86400)
+    touched = set()
+
+    def work(conn):
+        touched.clear()
+        if idempotency is not None:
+            idempotency.claim(conn)
+        card_id, account_id, owner_id = _resolve_funding(conn, payment, client_id, is_admin)
+        if account_id == payment.merchant_account_id:
+            raise PaymentError("La cuenta de origen y la del comercio no pueden ser la misma.")
+        if not _account_exists(conn, payment.merchant_account_id):
+            raise PaymentNotFoundError("Cuenta del comercio no encontrada.")
+        if not _hold_funds(conn, account_id, payment.amount):
+            if not _account_exists(conn, account_id):
+                raise PaymentNotFoundError("Cuenta de origen no encontrada.")
+            raise PaymentDeclinedError("Fondos insuficientes: pago rechazado.")
+
+        now = datetime.utcnow()
+        # La retención es del titular de la cuenta, aunque la autorice un administrador
+        hold = {
+            "id": uuid.uuid4().hex, "client_id": owner_id, "card_id": card_id, "account_id": account_id,
+            "merchant_account_id": payment.merchant_account_id, "amount": payment.amount,
+            "description": payment.description, "status": STATUS_AUTHORIZED, "created_at": now,
+            "expires_at": now + timedelta(seconds=ttl),
+        }
+        conn.execute(insert(holds_table).values(hold))
+        touched.add(owner_id)
+        message = "Pago autorizado."
+        if payment.capture:
+            result = _capture(conn, hold, None, now)
+            touched.update(result.client_ids)
+            message = "Pago realizado exitosamente."
+        body = payment_response_body(hold, message)
+        if idempotency is not None:
+            idempotency.complete(conn, body, 201)
+        return body
+
+    body, _ = run_with_retries(work)
+    if idempotency is not None:
+        idempotency.committed()
+    invalidate_clients(touched)
+    return body
+
+
+def capture_payment(hold_id, client_id, is_admin=False, amount=None):
+    """Captura (total o parcialmente) un pago autorizado. Devuelve el cuerpo de la respuesta."""
+    touched = set()
+
+    def work(conn):
+        touched.clear()
+        now = datetime.utcnow()
+        hold = _hold_row(conn, hold_id)
+        _check_open(hold, client_id, is_admin, now)
+        result = _capture(conn, hold, amount, now)
+        touched.update(result.client_ids)
+        return payment_response_body(hold, "Pago capturado.")
+
+    body, _ = run_with_retries(work)
+    invalidate_clients(touched)
+    return body
+
+
+def void_payment(hold_id, client_id, is_admin=False):
+    """Anula un pago autorizado y libera la retención. Devuelve el cuerpo de la respuesta."""
+    touched = set()
+
+    def work(conn):
+        touched.clear()
+        now = datetime.utcnow()
+        hold = _hold_row(conn, hold_id)
+        _check_open(hold, client_id, is_admin, now)
+        if not _transition(conn, hold_id, STATUS_VOIDED, now):
+            raise PaymentStateError("El pago cambió de estado mientras se anulaba. Consulta su estado.")
+        release_held(conn, {hold["account_id"]: hold["amount"]})
+        hold.update(status=STATUS_VOIDED, resolved_at=now)
+        touched.add(hold["client_id"])
+        return payment_response_body(hold, "Pago anulado.")
+
+    body, _ = run_with_retries(work)
+    invalidate_clients(touched)
+    return body
+
+
+def get_payment(hold_id, client_id, is_admin=False):
+    hold = db.session.get(PaymentHold, hold_id)
+    if hold is None or (hold.client_id != client_id and not is_admin):
+        raise PaymentNotFoundError("Pago no encontrado.")
+    return hold.to_dict()
+
+
+def sweep_expired_holds(chunk_size=DEFAULT_SWEEP_CHUNK, now=None):
+    """
+    Marca como vencidas las retenciones sin capturar cuyo plazo pasó y libera su
+    monto. Un bloque por transacción; después de cada commit se invalida el
+    dashboard de los dueños de las cuentas liberadas. Devuelve cuántas venció.
+    """
+    now = now or datetime.utcnow()
+    expired = 0
+    while True:
+        with db.engine.begin() as conn:
+            due = (
+                select(holds_table.c.id)
+                .where(holds_table.c.status == STATUS_AUTHORIZED)
+                .where(holds_table.c.expires_at <= now)
+                .limit(chunk_size)
+            )
+            expire = (
+                update(holds_table)
+                .where(holds_table.c.id.in_(due.scalar_subquery()))
+                .where(holds_table.c.status == STATUS_AUTHORIZED)
+                .values(status=STATUS_EXPIRED, resolved_at=now)
+            )
+            if conn.dialect.update_returning:
+                rows = conn.execute(expire.returning(holds_table.c.account_id, holds_table.c.amount)).all()
+            else:
+                rows = conn.execute(
+                    select(holds_table.c.id, holds_table.c.account_id, holds_table.c.amount)
+                    .where(holds_table.c.id.in_(due.scalar_subquery()))
+                    .with_for_update()
+                ).all()
+                conn.execute(
+                    update(holds_table)
+                    .where(holds_table.c.id.in_([row.id for row in rows]))
+                    .values(status=STATUS_EXPIRED, resolved_at=now)
+                )
+            released = {}
+            for row in rows:
+                released[row.account_id] = released.get(row.account_id, 0.0) + row.amount
+            release_held(conn, released)
+            touched = set(conn.execute(
+                select(accounts_table.c.client_id).where(accounts_table.c.id.in_(list(released)))
+            ).scalars()) if released else set()
+        invalidate_clients(touched)
+        expired += len(rows)
+        if len(rows) < chunk_size:
+            return expired
+
+
+def get_card_index():
+    return current_app.extensions["card_index"]
+
+
+def _sweep_loop(app, interval, stop):
+    while not stop.wait(interval):
+        with app.app_context():
+            try:
+                expired = sweep_expired_holds(app.config.get("CARD_HOLD_SWEEP_CHUNK", DEFAULT_SWEEP_CHUNK))
+                if expired:
+                    logger.info("Vencidas %s retenciones de pagos", expired)
+            except Exception:
+                logger.exception("Error en el barrido de retenciones vencidas")
+
+
+def init_card_payments(app):
+    config = app.config
+    app.extensions["card_index"] = CardIndex(
+        max_entries=config.get("CARD_INDEX_MAX_ENTRIES", 100000),
+        ttl=config.get("CARD_INDEX_TTL", 300.0),
+    )
+    interval = config.get("CARD_HOLD_SWEEP_INTERVAL", 60.0)
+    if interval:
+        stop = threading.Event()
+        thread = threading.Thread(target=_sweep_loop, args=(app, interval, stop),
+                                  name="payment-hold-sweeper", daemon=True)
+        thread.start()
+        app.extensions["card_hold_sweeper"] = stop
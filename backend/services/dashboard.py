@@ -0,0 +1,364 @@
+# backend/services/dashboard.py
+"""
+Armado y caché del payload de ``/api/auth/dashboard``.
+
+El payload se guarda por id de cliente en un LRU en proceso con TTL y,
+opcionalmente, en un backend compartido. Cada escritura que afecte a un cliente
+(transferencias, registro, altas o cambios de cuentas y tarjetas) debe llamar a
+``invalidate_clients``, que borra la entrada y sube la "generación" del cliente.
+Un lector que armó el payload con datos anteriores a la escritura no puede
+guardarlo después, porque su generación ya no coincide.
+
+Cada payload guardado lleva su versión (``<cliente>.<generación>.<crc32 del
+cuerpo>``; el crc hace que la versión siga siendo exacta si los contadores
+vuelven a cero, p. ej. al reiniciar sin backend compartido). Con ella la ruta
+responde ``If-None-Match`` con 304 (sin consultar la base de datos si la
+caché es compartida) y, con ``?since=<versión>``, devuelve solo lo que cambió
+respecto de la foto guardada de esa versión. Además hay una generación global
+de los listados de administración que sube con cualquier invalidación.
+
+Con varios workers la caché necesita un backend compartido
+(``DASHBOARD_CACHE_BACKEND``): sin él cada worker tendría su propia copia y
+sus propias generaciones, y serviría un dashboard viejo tras una escritura
+atendida por otro. Por eso sin backend compartido la caché solo se activa si
+se declara un único proceso (``DASHBOARD_CACHE_SINGLE_PROCESS``). Con réplicas
+de lectura, además, el enrutado al primario tras una escritura tiene que ser
+compartido (``DB_REPLICA_STICKY_BACKEND``): el payload que se guarda con la
+generación nueva no puede salir de una réplica atrasada.
+"""
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, union
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.card import Card
+from backend.database.models.client import Client
+from backend.database.models.transaction import Transaction
+from backend.database.routing import stick_to_primary
+from backend.logging_setup import get_logger
+from backend.services.cache import MISSING, LRUCache, make_shared_backend
+from backend.services.serialization import CARD, CLIENT, DASHBOARD_ACCOUNT, dumps_bytes
+
+
+EPOCH_KEY = "dashboard-epoch"
+LISTINGS_GENERATION_KEY = "listings-gen"
+
+log = get_logger("dashboard")
+
+
+class DashboardCache:
+    def __init__(self, local, shared=None, shared_ttl=None, snapshots=None, snapshot_ttl=None):
+        self.local = local
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self.snapshots = snapshots  # LRU versión -> (armado_en, payload), para ?since=
+        self.snapshot_ttl = snapshot_ttl
+        self._generations = {}
+        self._listings_generation = 0
+        self._epoch = uuid.uuid4().hex[:8]
+
+    @staticmethod
+    def _key(client_id):
+        return f"dashboard:{client_id}"
+
+    @staticmethod
+    def _generation_key(client_id):
+        return f"dashboard-gen:{client_id}"
+
+    def generation(self, client_id):
+        """Generación actual del cliente; hay que leerla ANTES de consultar la base de datos."""
+        if self.shared is not None:
+            value = self.shared.get(self._generation_key(client_id))
+            return 0 if value is MISSING else value
+        return self._generations.get(client_id, 0)
+
+    @staticmethod
+    def _snapshot_key(version):
+        return f"dashboard-snap:{version}"
+
+    def epoch(self):
+        """Identifica los contadores de los listados (por proceso, o el del backend compartido)."""
+        if self.shared is None:
+            return self._epoch
+        value = self.shared.get(EPOCH_KEY)
+        if value is MISSING:
+            value = uuid.uuid4().hex[:8]
+            self.shared.set(EPOCH_KEY, value)
+        return value
+
+    @staticmethod
+    def make_version(client_id, generation, payload):
+        return f"{client_id}.{generation}.{zlib.crc32(dumps_bytes(payload)):08x}"
+
+    def listings_version(self):
+        if self.shared is not None:
+            value = self.shared.get(LISTINGS_GENERATION_KEY)
+            generation = 0 if value is MISSING else value
+        else:
+            generation = self._listings_generation
+        return f"{self.epoch()}.{generation}"
+
+    def get(self, client_id):
+        entry = self.get_entry(client_id)
+        return None if entry is None else entry[1]
+
+    def get_entry(self, client_id):
+        """``(versión, payload)`` vigente del cliente, o ``None``."""
+        key = self._key(client_id)
+        entry = self.local.get(key)
+        if entry is MISSING and self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not MISSING:
+                self.local.set(key, entry)
+        if entry is MISSING:
+            return None
+        generation, version, payload = entry
+        if generation != self.generation(client_id):
+            self.local.delete(key)
+            return None
+        return version, payload
+
+    def store(self, client_id, payload, generation, built_at=None):
+        """
+        Guarda el payload solo si nadie invalidó al cliente desde que se leyó
+        ``generation``. Devuelve su versión, o ``None`` si no se guardó.
+        """
+        if generation != self.generation(client_id):
+            return None
+        key = self._key(client_id)
+        version = self.make_version(client_id, generation, payload)
+        self.local.set(key, (generation, version, payload))
+        if self.shared is not None:
+            self.shared.set(key, (generation, version, payload), self.shared_ttl)
+        if self.snapshots is not None:
+            snapshot = (built_at or datetime.utcnow(), payload)
+            snapshot_key = self._snapshot_key(version)
+            self.snapshots.set(snapshot_key, snapshot)
+            if self.shared is not None:
+                self.shared.set(snapshot_key, snapshot, self.snapshot_ttl)
+        return version
+
+    def snapshot(self, client_id, version):
+        """``(armado_en, payload)`` que se sirvió con esa versión del cliente, si todavía se conserva."""
+        if self.snapshots is None or not str(version).startswith(f"{client_id}."):
+            return None
+        key = self._snapshot_key(version)
+        snapshot = self.snapshots.get(key)
+        if snapshot is MISSING and self.shared is not None:
+            snapshot = self.shared.get(key)
+        return None if snapshot is MISSING else snapshot
+
+    def invalidate(self, client_ids):
+        for client_id in client_ids:
+            if self.shared is not None:
+                self.shared.incr(self._generation_key(client_id))
+                self.shared.delete(self._key(client_id))
+            else:
+                self._generations[client_id] = self._generations.get(client_id, 0) + 1
+            self.local.delete(self._key(client_id))
+        self.invalidate_listings()
+
+    def invalidate_listings(self):
+        if self.shared is not None:
+            self.shared.incr(LISTINGS_GENERATION_KEY)
+        else:
+            self._listings_generation += 1
+
+    def stats(self):
+        stats = self.local.stats()
+        stats["shared_backend"] = type(self.shared).__name__ if self.shared is not None else None
+        return stats
+
+
+def _check_sticky_reads(app):
+    """
+    Con réplicas, la caché compartida necesita que el enrutado al primario tras una
+    escritura también sea compartido: si no, otro worker arma el payload en una
+    réplica atrasada y lo guarda con la generación nueva (viejo hasta la próxima escritura).
+    """
+    router = app.extensions.get("read_router")
+    if router is not None and (router.shared is None or router.sticky_seconds <= 0):
+        raise ValueError(
+            "DASHBOARD_CACHE_BACKEND compartido con réplicas de lectura requiere "
+            "DB_REPLICA_STICKY_BACKEND compartido y DB_REPLICA_STICKY_SECONDS > 0."
+        )
+
+
+def init_dashboard_cache(app):
+    config = app.config
+    cache = None
+    shared = make_shared_backend(config.get("DASHBOARD_CACHE_BACKEND"))
+    if shared is not None and config.get("DASHBOARD_CACHE_ENABLED", True):
+        _check_sticky_reads(app)
+    if shared is None and not config.get("DASHBOARD_CACHE_SINGLE_PROCESS", False):
+        # Una caché solo de este worker no se entera de las escrituras de los demás
+        log.info("Caché del dashboard desactivada: no hay backend compartido (DASHBOARD_CACHE_BACKEND)")
+    elif config.get("DASHBOARD_CACHE_ENABLED", True):
+        ttl = config.get("DASHBOARD_CACHE_TTL", 30)
+        snapshot_ttl = config.get("DASHBOARD_SNAPSHOT_TTL", 3600)
+        cache = DashboardCache(
+            LRUCache(max_entries=config.get("DASHBOARD_CACHE_MAX_ENTRIES", 10000), ttl=ttl),
+            shared=shared,
+            shared_ttl=ttl,
+            snapshots=LRUCache(max_entries=config.get("DASHBOARD_SNAPSHOT_MAX_ENTRIES", 10000), ttl=snapshot_ttl)
+            if snapshot_ttl > 0 else None,
+            snapshot_ttl=snapshot_ttl,
+        )
+    app.extensions["dashboard_cache"] = cache
+    return cache
+
+
+def get_dashboard_cache():
+    return current_app.extensions.get("dashboard_cache")
+
+
+def invalidate_clients(client_ids):
+    """
+    Invalida el dashboard cacheado de los clientes indicados y manda sus lecturas
+    al primario un rato (llamar después del commit de cada escritura que les afecte).
+    """
+    stick_to_primary(client_ids)
+    cache = get_dashboard_cache()
+    if cache is not None and client_ids:
+        cache.invalidate({int(client_id) for client_id in client_ids})
+
+
+def invalidate_listings():
+    """Sube la versión de los listados de administración (altas sin dashboard que invalidar)."""
+    cache = get_dashboard_cache()
+    if cache is not None:
+        cache.invalidate_listings()
+
+
+def build_dashboard_payload(client_id, session=None):
+    """Consulta el cliente, sus cuentas y tarjetas (solo columnas). Devuelve ``None`` si el cliente no existe."""
+    session = db.session if session is None else session
+    client = session.execute(CLIENT.select().where(Client.id == client_id)).first()
+    if client is None:
+        return None
+    return {
+        "client": CLIENT.from_row(client),
+        "accounts": DASHBOARD_ACCOUNT.fetch(session, Account.client_id == client_id, order_by=Account.id),
+        "cards": CARD.fetch(session, Card.client_id == client_id, order_by=Card.id),
+    }
+
+
+def get_dashboard_payload(client_id):
+    """Payload del dashboard desde la caché, o armado desde la base de datos si no está."""
+    return get_versioned_dashboard(client_id)[0]
+
+
+def get_versioned_dashboard(client_id, session=None):
+    """
+    ``(payload, versión)``. La versión es ``None`` si la caché está desactivada o si
+    el cliente fue invalidado mientras se armaba (ese payload no se puede fotografiar).
+    ``session`` es la sesión de las consultas (por defecto ``db.session``).
+    """
+    client_id = int(client_id)
+    cache = get_dashboard_cache()
+    if cache is None:
+        return build_dashboard_payload(client_id, session), None
+
+    entry = cache.get_entry(client_id)
+    if entry is not None:
+        version, payload = entry
+        return payload, version
+
+    generation = cache.generation(client_id)
+    built_at = datetime.utcnow()
+    payload = build_dashboard_payload(client_id, session)
+    if payload is None:
+        return None, None
+    return payload, cache.store(client_id, payload, generation, built_at)
+
+
+def cached_dashboard_version(client_id):
+    """
+    Versión del dashboard en caché, sin tocar la base de datos (``None`` si no está).
+    Solo con backend compartido: la copia local de un worker no basta para
+    responder 304 sin consultar, así que sin él la versión se valida armando el payload.
+    """
+    cache = get_dashboard_cache()
+    if cache is None or cache.shared is None:
+        return None
+    entry = cache.get_entry(int(client_id))
+    return None if entry is None else entry[0]
+
+
+def current_listings_version():
+    """Versión de los listados de administración (``None`` sin caché: no hay quien la suba)."""
+    cache = get_dashboard_cache()
+    return None if cache is None else cache.listings_version()
+
+
+def _diff_by_id(old_items, new_items):
+    old_by_id = {item["id"]: item for item in old_items}
+    new_ids = {item["id"] for item in new_items}
+    changed = [item for item in new_items if old_by_id.get(item["id"]) != item]
+    removed = [item_id for item_id in old_by_id if item_id not in new_ids]
+    return changed, removed
+
+
+def recent_transactions(session, account_ids, since_at, limit):
+    """Transacciones de las cuentas desde ``since_at`` (por los índices (cuenta, timestamp, id))."""
+    t = Transaction.__table__.c
+    columns = (t.id, t.sender_account_id, t.receiver_account_id, t.amount, t.description, t.timestamp)
+    sides = [
+        select(*columns).where(account_column.in_(account_ids)).where(t.timestamp >= since_at)
+        for account_column in (t.sender_account_id, t.receiver_account_id)
+    ]
+    merged = union(*sides).subquery()  # UNION: las transferencias entre cuentas propias salen una vez
+    rows = session.execute(select(merged).order_by(merged.c.timestamp, merged.c.id).limit(limit + 1)).all()
+    return [
+        {
+            "id": row.id,
+            "sender_account_id": row.sender_account_id,
+            "receiver_account_id": row.receiver_account_id,
+            "amount": row.amount,
+            "description": row.description,
+            "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        }
+        for row in rows[:limit]
+    ], len(rows) > limit
+
+
+def get_dashboard_delta(client_id, since, session=None):
+    """
+    Cuerpo de ``/dashboard?since=<versión>``: solo lo que cambió desde esa versión
+    (cuentas y tarjetas nuevas o modificadas, ids eliminados y transacciones
+    recientes de las cuentas del cliente; el cliente las deduplica por id). Si la
+    versión no se reconoce o su foto ya no está, devuelve el payload completo con
+    ``"full": true``. Devuelve ``(cuerpo, versión)``, o ``(None, None)`` si el cliente no existe.
+    """
+    client_id = int(client_id)
+    session = db.session if session is None else session
+    payload, version = get_versioned_dashboard(client_id, session)
+    if payload is None:
+        return None, None
+    cache = get_dashboard_cache()
+    snapshot = cache.snapshot(client_id, since) if cache is not None and since else None
+    if version is None or snapshot is None:
+        return {**payload, "version": version, "full": True}, version
+
+    built_at, previous = snapshot
+    body = {"version": version, "since": since, "full": False}
+    if version == since:
+        return {**body, "accounts": [], "removed_accounts": [], "cards": [], "removed_cards": [],
+                "transactions": [], "transactions_truncated": False}, version
+
+    config = current_app.config
+    if previous["client"] != payload["client"]:
+        body["client"] = payload["client"]
+    body["accounts"], body["removed_accounts"] = _diff_by_id(previous["accounts"], payload["accounts"])
+    body["cards"], body["removed_cards"] = _diff_by_id(previous["cards"], payload["cards"])
+    account_ids = [account["id"] for account in payload["accounts"]]
+    since_at = built_at - timedelta(seconds=config.get("DASHBOARD_DELTA_OVERLAP", 5))
+    body["transactions"], body["transactions_truncated"] = (
+        recent_transactions(session, account_ids, since_at, config.get("DASHBOARD_DELTA_MAX_TRANSACTIONS", 200))
+        if account_ids else ([], False)
+    )
+    return body, version
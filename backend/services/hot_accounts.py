@@ -0,0 +1,225 @@
+# backend/services/hot_accounts.py
+"""
+Cuentas "calientes": saldo repartido en sub-saldos para comercios muy solicitados.
+
+Cada crédito a una cuenta normal actualiza (y bloquea) su fila en ``accounts``,
+así que los pagos entrantes a un mismo comercio se serializan en un único
+bloqueo de fila. En una cuenta caliente los créditos no tocan esa fila: suman a
+uno de sus N sub-saldos (``account_balance_slots``), elegido al azar, y los
+créditos concurrentes solo compiten si caen en el mismo sub-saldo.
+
+Invariante: saldo real = ``accounts.balance`` + suma de sus sub-saldos
+(``Account.total_balance``). Los débitos se hacen sobre la fila principal; si
+no alcanza, se "pide prestado" a los sub-saldos trasladándolos a la fila
+(``fold_slots``). Un hilo de fondo repite ese traslado cada
+``HOT_ACCOUNT_COMPACTION_INTERVAL`` segundos.
+
+Qué cuentas son calientes se cachea por worker unos segundos. Un dato viejo
+solo afecta al rendimiento: si un worker cree que la cuenta es caliente y ya
+no tiene sub-saldos, el UPDATE no afecta filas y el crédito vuelve al camino normal.
+"""
+import random
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import DBAPIError
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.account_balance_slot import AccountBalanceSlot
+from backend.logging_setup import get_logger
+
+logger = get_logger("hot_accounts")
+
+accounts_table = Account.__table__
+slots_table = AccountBalanceSlot.__table__
+
+MAX_SLOTS = 256
+
+
+class HotAccountError(Exception):
+    status_code = 400
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class HotAccountNotFoundError(HotAccountError):
+    status_code = 404
+
+
+class HotAccountRegistry:
+    """Cuentas calientes conocidas por el worker: ``{account_id: (client_id, sub-saldos, tipo)}``, con TTL."""
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._accounts = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, conn):
+        now = time.monotonic()
+        if now >= self._expires_at:
+            rows = conn.execute(
+                select(slots_table.c.account_id, accounts_table.c.client_id, func.count(),
+                       accounts_table.c.account_type)
+                .join(accounts_table, accounts_table.c.id == slots_table.c.account_id)
+                .group_by(slots_table.c.account_id, accounts_table.c.client_id, accounts_table.c.account_type)
+            ).all()
+            with self._lock:
+                self._accounts = {
+                    account_id: (client_id, slots, account_type)
+                    for account_id, client_id, slots, account_type in rows
+                }
+                self._expires_at = now + self.ttl
+        return self._accounts
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+
+def get_hot_accounts(conn):
+    registry = current_app.extensions.get("hot_accounts")
+    return registry.get(conn) if registry is not None else {}
+
+
+def credit_slot(conn, account_id, amount, n_slots):
+    """Suma ``amount`` a un sub-saldo al azar. Devuelve False si la cuenta ya no tiene sub-saldos."""
+    return conn.execute(
+        update(slots_table)
+        .where(slots_table.c.account_id == account_id)
+        .where(slots_table.c.slot == random.randrange(n_slots))
+        .values(balance=slots_table.c.balance + amount)
+    ).rowcount == 1
+
+
+def fold_slots(conn, account_ids, remove=False):
+    """
+    Traslada los sub-saldos de ``account_ids`` a su fila en ``accounts`` (y los
+    borra si ``remove``). Devuelve ``{account_id: monto trasladado}``.
+
+    A cada sub-saldo se le resta lo que se leyó (no se pone a cero), así que un
+    crédito que entre entre la lectura y la escritura no se pierde aunque la
+    base de datos ignore el FOR UPDATE (SQLite).
+    """
+    account_ids = sorted(set(account_ids))
+    if remove and conn.dialect.delete_returning:
+        rows = conn.execute(
+            delete(slots_table)
+            .where(slots_table.c.account_id.in_(account_ids))
+            .returning(slots_table.c.account_id, slots_table.c.slot, slots_table.c.balance)
+        ).all()
+    else:
+        rows = conn.execute(
+            select(slots_table.c.account_id, slots_table.c.slot, slots_table.c.balance)
+            .where(slots_table.c.account_id.in_(account_ids))
+            .order_by(slots_table.c.account_id, slots_table.c.slot)
+            .with_for_update()
+        ).all()
+        if remove:
+            conn.execute(delete(slots_table).where(slots_table.c.account_id.in_(account_ids)))
+    if not rows:
+        return {}
+
+    moved = {}
+    by_account = {}
+    for account_id, slot, balance in rows:
+        moved[account_id] = moved.get(account_id, 0.0) + (balance or 0.0)
+        if balance:
+            by_account.setdefault(account_id, {})[slot] = balance
+
+    if not remove:
+        for account_id, slot_balances in by_account.items():
+            conn.execute(
+                update(slots_table)
+                .where(slots_table.c.account_id == account_id)
+                .where(slots_table.c.slot.in_(list(slot_balances)))
+                .values(balance=slots_table.c.balance - case(slot_balances, value=slots_table.c.slot, else_=0.0))
+            )
+    deltas = {account_id: amount for account_id, amount in moved.items() if amount}
+    if deltas:
+        conn.execute(
+            update(accounts_table)
+            .where(accounts_table.c.id.in_(list(deltas)))
+            .values(balance=accounts_table.c.balance + case(deltas, value=accounts_table.c.id, else_=0.0))
+        )
+    return moved
+
+
+def _lock_account(conn, account_id):
+    row = conn.execute(
+        select(accounts_table.c.id, accounts_table.c.balance_slots)
+        .where(accounts_table.c.id == account_id)
+        .with_for_update()
+    ).first()
+    if row is None:
+        raise HotAccountNotFoundError("Cuenta no encontrada.")
+    return row
+
+
+def enable_hot_account(account_id, n_slots):
+    """Activa (o redimensiona) el modo caliente de una cuenta con ``n_slots`` sub-saldos."""
+    if not 1 <= n_slots <= MAX_SLOTS:
+        raise HotAccountError(f"El número de sub-saldos debe estar entre 1 y {MAX_SLOTS}.")
+    with db.engine.begin() as conn:
+        _lock_account(conn, account_id)
+        fold_slots(conn, [account_id], remove=True)
+        conn.execute(insert(slots_table), [
+            {"account_id": account_id, "slot": slot, "balance": 0.0} for slot in range(n_slots)
+        ])
+        conn.execute(update(accounts_table).where(accounts_table.c.id == account_id).values(balance_slots=n_slots))
+    current_app.extensions["hot_accounts"].invalidate()
+
+
+def disable_hot_account(account_id):
+    """Devuelve la cuenta al modo normal, trasladando y borrando sus sub-saldos."""
+    with db.engine.begin() as conn:
+        _lock_account(conn, account_id)
+        fold_slots(conn, [account_id], remove=True)
+        conn.execute(update(accounts_table).where(accounts_table.c.id == account_id).values(balance_slots=0))
+    current_app.extensions["hot_accounts"].invalidate()
+
+
+def compact_hot_accounts():
+    """Traslada los sub-saldos de todas las cuentas calientes, una transacción corta por cuenta."""
+    with db.engine.connect() as conn:
+        account_ids = conn.execute(select(slots_table.c.account_id).distinct()).scalars().all()
+    compacted = 0
+    for account_id in account_ids:
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(
+                    select(accounts_table.c.id).where(accounts_table.c.id == account_id).with_for_update()
+                )
+                if any(fold_slots(conn, [account_id]).values()):
+                    compacted += 1
+        except DBAPIError as e:
+            # Bloqueo o conflicto con una transferencia: se reintenta en la próxima pasada
+            logger.info("No se pudo compactar la cuenta %s: %s", account_id, e)
+    return compacted
+
+
+def _compaction_loop(app, interval, stop):
+    while not stop.wait(interval):
+        with app.app_context():
+            try:
+                compacted = compact_hot_accounts()
+                if compacted:
+                    logger.debug("Compactadas %s cuentas calientes", compacted)
+            except Exception:
+                logger.exception("Error en la compactación de cuentas calientes")
+
+
+def init_hot_accounts(app):
+    config = app.config
+    app.extensions["hot_accounts"] = HotAccountRegistry(ttl=config.get("HOT_ACCOUNT_REGISTRY_TTL", 5.0))
+    interval = config.get("HOT_ACCOUNT_COMPACTION_INTERVAL", 60.0)
+    if interval:
+        stop = threading.Event()
+        thread = threading.Thread(target=_compaction_loop, args=(app, interval, stop),
+                                  name="hot-account-compaction", daemon=True)
+        thread.start()
+        app.extensions["hot_accounts_compaction"] = stop
@@ -0,0 +1,269 @@
+# backend/services/idempotency.py
+"""
+Claves de idempotencia (cabecera ``Idempotency-Key``) para operaciones con dinero.
+
+El cliente manda la misma clave en todos los reintentos de una operación. La
+primera petición "reclama" la clave insertando su fila en ``idempotency_keys``
+dentro de la misma transacción que la operación, y guarda ahí la respuesta
+antes del commit: o se confirman ambas cosas o ninguna. Los reintentos
+devuelven la respuesta guardada (con ``Idempotent-Replayed: true``) sin tocar
+los saldos.
+
+Si dos peticiones con la misma clave llegan a la vez, la segunda choca con la
+clave primaria (en PostgreSQL espera al commit de la primera) y, tras revertir
+su transacción, responde con lo que guardó la primera. Reutilizar una clave con
+otro cuerpo u otra ruta es un error 422.
+
+Las respuestas se cachean en un LRU por worker delante de la tabla; un worker
+que no tiene la clave en su LRU la encuentra al intentar reclamarla. Las claves
+vencen a las ``IDEMPOTENCY_KEY_TTL`` segundos y un hilo de fondo las purga.
+Los errores de negocio (4xx) también se guardan; los 5xx no, para que el
+reintento pueda funcionar.
+"""
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from backend.database.models import db
+from backend.database.models.idempotency_key import IdempotencyKey
+from backend.logging_setup import get_logger
+from backend.services.cache import MISSING, LRUCache
+from backend.services.serialization import dumps
+
+logger = get_logger("idempotency")
+
+keys_table = IdempotencyKey.__table__
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+PURGE_CHUNK_SIZE = 5000
+
+_INSERTS_IGNORING_CONFLICTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class IdempotencyError(Exception):
+    status_code = 400
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class IdempotencyKeyReusedError(IdempotencyError):
+    status_code = 422
+
+
+class IdempotencyInProgressError(IdempotencyError):
+    status_code = 409
+
+
+class IdempotencyKeyInUse(Exception):
+    """Señal interna: la clave ya estaba reclamada; la transacción de la operación se revierte."""
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: str  # JSON ya serializado
+    created_at: datetime
+
+    def to_response(self, replayed=True):
+        # También la primera respuesta sale de aquí: los reintentos reciben exactamente los mismos bytes
+        response = current_app.response_class(self.body, status=self.status_code, mimetype="application/json")
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
+        return response
+
+
+class IdempotencyStore:
+    """LRU de respuestas completadas delante de ``idempotency_keys``."""
+
+    def __init__(self, ttl=86400, max_entries=10000):
+        self.ttl = ttl
+        self.cache = LRUCache(max_entries=max_entries, ttl=ttl)
+
+    def cutoff(self):
+        return datetime.utcnow() - timedelta(seconds=self.ttl)
+
+    def cached(self, client_id, key):
+        stored = self.cache.get((client_id, key))
+        return None if stored is MISSING else stored
+
+    def remember(self, client_id, key, stored):
+        remaining = self.ttl - (datetime.utcnow() - stored.created_at).total_seconds()
+        if remaining > 0:
+            self.cache.set((client_id, key), stored, ttl=remaining)
+
+    def load(self, conn, client_id, key):
+        row = conn.execute(
+            select(keys_table.c.fingerprint, keys_table.c.status_code, keys_table.c.response_body,
+                   keys_table.c.created_at)
+            .where(keys_table.c.client_id == client_id)
+            .where(keys_table.c.key == key)
+            .where(keys_table.c.created_at >= self.cutoff())
+        ).first()
+        if row is None:
+            return None
+        if row.status_code is None:
+            raise IdempotencyInProgressError("Hay una petición en curso con esta clave de idempotencia.")
+        stored = StoredResponse(row.fingerprint, row.status_code, row.response_body, row.created_at)
+        self.remember(client_id, key, stored)
+        return stored
+
+    def purge(self, chunk_size=PURGE_CHUNK_SIZE):
+        """Borra las claves vencidas por bloques (transacciones cortas). Devuelve cuántas borró."""
+        cutoff = self.cutoff()
+        purged = 0
+        while True:
+            with db.engine.begin() as conn:
+                batch = (
+                    select(keys_table.c.client_id, keys_table.c.key)
+                    .where(keys_table.c.created_at < cutoff)
+                    .limit(chunk_size)
+                )
+                deleted = conn.execute(
+                    delete(keys_table).where(tuple_(keys_table.c.client_id, keys_table.c.key).in_(batch))
+                ).rowcount
+            purged += deleted
+            if deleted < chunk_size:
+                return purged
+
+
+def request_fingerprint(req):
+    """Huella de la petición: método, ruta y cuerpo JSON normalizado."""
+    body = req.get_json(silent=True)
+    canonical = json.dumps([req.method, req.path, body], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotentRequest:
+    """Una petición con ``Idempotency-Key`` de un cliente."""
+
+    def __init__(self, store, client_id, key, fingerprint):
+        self.store = store
+        self.client_id = client_id
+        self.key = key
+        self.fingerprint = fingerprint
+        self.response = None
+        self._created_at = None
+
+    def _check(self, stored):
+        if stored is not None and stored.fingerprint != self.fingerprint:
+            raise IdempotencyKeyReusedError("La clave de idempotencia ya se usó con otra petición.")
+        return stored
+
+    def replay(self):
+        """Respuesta guardada si el LRU del worker la tiene (sin ir a la base de datos)."""
+        return self._check(self.store.cached(self.client_id, self.key))
+
+    def claim(self, conn):
+        """Reclama la clave dentro de la transacción de la operación; lanza ``IdempotencyKeyInUse`` si ya existe."""
+        key_match = and_(keys_table.c.client_id == self.client_id, keys_table.c.key == self.key)
+        # Una clave vencida que la purga aún no borró se puede reutilizar
+        conn.execute(delete(keys_table).where(key_match).where(keys_table.c.created_at < self.store.cutoff()))
+        row = {"client_id": self.client_id, "key": self.key, "fingerprint": self.fingerprint,
+               "created_at": datetime.utcnow()}
+        dialect_insert = _INSERTS_IGNORING_CONFLICTS.get(conn.dialect.name)
+        if dialect_insert is not None:
+            claimed = conn.execute(dialect_insert(keys_table).values(row).on_conflict_do_nothing()).rowcount
+        else:
+            try:
+                with conn.begin_nested():
+                    claimed = conn.execute(insert(keys_table).values(row)).rowcount
+            except IntegrityError:
+                claimed = 0
+        if claimed != 1:
+            raise IdempotencyKeyInUse(self.key)
+        self._created_at = row["created_at"]
+
+    def complete(self, conn, body, status_code=200):
+        """Guarda la respuesta en la fila reclamada (misma transacción que la operación)."""
+        serialized = dumps(body)  # mismo codificador que jsonify
+        conn.execute(
+            update(keys_table)
+            .where(keys_table.c.client_id == self.client_id)
+            .where(keys_table.c.key == self.key)
+            .values(status_code=status_code, response_body=serialized)
+        )
+        self.response = StoredResponse(self.fingerprint, status_code, serialized, self._created_at)
+
+    def committed(self):
+        """Llamar después del commit: deja la respuesta en el LRU del worker."""
+        if self.response is not None:
+            self.store.remember(self.client_id, self.key, self.response)
+
+    def stored_response(self):
+        """Respuesta de quien reclamó la clave antes (tras un ``IdempotencyKeyInUse``)."""
+        with db.engine.connect() as conn:
+            stored = self.store.load(conn, self.client_id, self.key)
+        if stored is None:
+            # Se venció y purgó entre el choque y la lectura: el cliente puede reintentar
+            raise IdempotencyInProgressError("La clave de idempotencia no está disponible. Intenta de nuevo.")
+        return self._check(stored)
+
+    def record(self, body, status_code):
+        """
+        Guarda una respuesta de error (la transacción de la operación ya se
+        revirtió) en su propia transacción. Devuelve la respuesta HTTP, que es
+        la de otra petición si esta clave se reclamó entretanto.
+        """
+        try:
+            with db.engine.begin() as conn:
+                self.claim(conn)
+                self.complete(conn, body, status_code)
+        except IdempotencyKeyInUse:
+            return self.stored_response().to_response()
+        self.committed()
+        return self.response.to_response(replayed=False)
+
+
+def begin_idempotent_request(req, client_id):
+    """``IdempotentRequest`` de la petición, o ``None`` si no trae la cabecera ``Idempotency-Key``."""
+    key = req.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(f"La cabecera {IDEMPOTENCY_HEADER} debe tener entre 1 y {MAX_KEY_LENGTH} caracteres.")
+    return IdempotentRequest(get_idempotency_store(), int(client_id), key, request_fingerprint(req))
+
+
+def get_idempotency_store():
+    return current_app.extensions["idempotency"]
+
+
+def _purge_loop(app, interval, stop):
+    while not stop.wait(interval):
+        with app.app_context():
+            try:
+                purged = get_idempotency_store().purge()
+                if purged:
+                    logger.debug("Purgadas %s claves de idempotencia vencidas", purged)
+            except Exception:
+                logger.exception("Error en la purga de claves de idempotencia")
+
+
+def init_idempotency(app):
+    config = app.config
+    store = IdempotencyStore(
+        ttl=config.get("IDEMPOTENCY_KEY_TTL", 86400),
+        max_entries=config.get("IDEMPOTENCY_CACHE_MAX_ENTRIES", 10000),
+    )
+    app.extensions["idempotency"] = store
+    interval = config.get("IDEMPOTENCY_PURGE_INTERVAL", 300)
+    if interval:
+        stop = threading.Event()
+        thread = threading.Thread(target=_purge_loop, args=(app, interval, stop),
+                                  name="idempotency-purge", daemon=True)
+        thread.start()
+        app.extensions["idempotency_purge"] = stop
+    return store
@@ -0,0 +1,300 @@
+# backend/services/ledger.py
+"""
+Libro mayor de partida doble y saldos a una fecha.
+
+Cada transferencia escribe, en la misma transacción que la fila de
+``transactions``, dos asientos en ``ledger_entries``: ``-monto`` en la cuenta de
+origen y ``+monto`` en la de destino. Los asientos no se modifican nunca.
+
+``balance_snapshots`` guarda, por cuenta y por día (UTC), el saldo con todos los
+asientos anteriores a ese día. El saldo a una fecha T es la foto más reciente
+anterior a T más los asientos entre la foto y T: solo se recorre la "cola" del
+libro, no toda la historia de la cuenta.
+
+Las fotos se construyen de forma incremental (``flask ledger snapshot``): se
+avanza día a día desde la última foto, solo por los días con asientos, y en
+cada día solo se escriben fotos de las cuentas con movimientos, por bloques y
+con un commit por bloque. Un día solo se procesa cuando ya pasaron
+``LEDGER_SNAPSHOT_LAG`` segundos desde su fin, para que ninguna transacción en
+curso escriba asientos anteriores a una foto ya construida.
+
+``backfill_ledger`` crea los asientos de las transferencias anteriores al libro
+y un asiento de apertura por cuenta que cuadra el libro con el saldo actual.
+"""
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, exists, func, insert, literal, select
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.ledger import BalanceSnapshot, LedgerEntry
+from backend.database.models.transaction import Transaction
+from backend.logging_setup import get_logger
+
+logger = get_logger("ledger")
+
+ledger_table = LedgerEntry.__table__
+snapshots_table = BalanceSnapshot.__table__
+transactions_table = Transaction.__table__
+
+ENTRY_TRANSFER = "transfer"
+ENTRY_OPENING = "opening"
+OPENING_TIMESTAMP = datetime(1970, 1, 1)  # fecha de los asientos de apertura del backfill
+
+DEFAULT_SNAPSHOT_CHUNK = 5000
+DEFAULT_SERIES_DAYS = 30
+MAX_SERIES_DAYS = 366
+
+
+class LedgerQueryError(ValueError):
+    """Parámetro de consulta de saldos no válido."""
+
+
+def transfer_entries(transaction_id, sender_id, receiver_id, amount, created_at):
+    """Los dos asientos (débito y crédito) de una transferencia."""
+    return [
+        {"account_id": sender_id, "transaction_id": transaction_id, "entry_type": ENTRY_TRANSFER,
+         "amount": -amount, "created_at": created_at},
+        {"account_id": receiver_id, "transaction_id": transaction_id, "entry_type": ENTRY_TRANSFER,
+         "amount": amount, "created_at": created_at},
+    ]
+
+
+def record_entries(conn, entries):
+    """Inserta asientos dentro de la transacción abierta en ``conn`` (un executemany)."""
+    if entries:
+        conn.execute(insert(ledger_table), entries)
+
+
+def _start_of_day(value):
+    return datetime(value.year, value.month, value.day)
+
+
+def balance_before(conn, account_id, boundary):
+    """Saldo con todos los asientos anteriores a ``boundary``: foto más cercana + cola del libro."""
+    snapshot = conn.execute(
+        select(snapshots_table.c.as_of, snapshots_table.c.balance)
+        .where(snapshots_table.c.account_id == account_id)
+        .where(snapshots_table.c.as_of <= boundary)
+        .order_by(snapshots_table.c.as_of.desc())
+        .limit(1)
+    ).first()
+    tail = (
+        select(func.coalesce(func.sum(ledger_table.c.amount), 0.0))
+        .where(ledger_table.c.account_id == account_id)
+        .where(ledger_table.c.created_at < boundary)
+    )
+    if snapshot is not None:
+        tail = tail.where(ledger_table.c.created_at >= snapshot.as_of)
+    return (snapshot.balance if snapshot is not None else 0.0) + conn.execute(tail).scalar_one()
+
+
+def balance_as_of(conn, account_id, at):
+    """Saldo de la cuenta en el instante ``at`` (incluye los asientos de ese instante)."""
+    return balance_before(conn, account_id, at + timedelta(microseconds=1))
+
+
+def daily_balances(conn, account_id, date_from, date_to):
+    """
+    Saldo al cierre de cada día entre ``date_from`` y ``date_to`` (inclusive), para
+    gráficos. Tres consultas sin importar el número de días.
+    """
+    start = datetime.combine(date_from, datetime.min.time())
+    end = datetime.combine(date_to, datetime.min.time()) + timedelta(days=1)
+    balance = balance_before(conn, account_id, start)
+    day = func.date(ledger_table.c.created_at)
+    movements = {
+        str(row.day): row.total
+        for row in conn.execute(
+            select(day.label("day"), func.sum(ledger_table.c.amount).label("total"))
+            .where(ledger_table.c.account_id == account_id)
+            .where(ledger_table.c.created_at >= start)
+            .where(ledger_table.c.created_at < end)
+            .group_by(day)
+        )
+    }
+    series = []
+    current = date_from
+    while current <= date_to:
+        balance += movements.get(current.isoformat(), 0.0)
+        series.append({"date": current.isoformat(), "balance": round(balance, 2)})
+        current += timedelta(days=1)
+    return series
+
+
+def parse_as_of(args):
+    value = args.get("as_of")
+    if not value:
+        return datetime.utcnow()
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise LedgerQueryError("El parámetro 'as_of' debe ser una fecha ISO 8601.")
+
+
+def parse_series_range(args):
+    """Valida ``from`` y ``to`` (fechas YYYY-MM-DD); por defecto, los últimos 30 días."""
+    try:
+        date_to = date.fromisoformat(args["to"]) if args.get("to") else datetime.utcnow().date()
+        date_from = (date.fromisoformat(args["from"]) if args.get("from")
+                     else date_to - timedelta(days=DEFAULT_SERIES_DAYS - 1))
+    except ValueError:
+        raise LedgerQueryError("Los parámetros 'from' y 'to' deben ser fechas YYYY-MM-DD.")
+    if date_from > date_to:
+        raise LedgerQueryError("La fecha 'from' no puede ser posterior a 'to'.")
+    if (date_to - date_from).days + 1 > MAX_SERIES_DAYS:
+        raise LedgerQueryError(f"El rango no puede superar {MAX_SERIES_DAYS} días.")
+    return date_from, date_to
+
+
+def _next_boundary(conn, previous):
+    """Fin del siguiente día con asientos a partir de ``previous`` (``None`` si no hay más)."""
+    stmt = select(func.min(ledger_table.c.created_at))
+    if previous is not None:
+        stmt = stmt.where(ledger_table.c.created_at >= previous)
+    first = conn.execute(stmt).scalar_one()
+    return _start_of_day(first) + timedelta(days=1) if first is not None else None
+
+
+def _build_boundary(boundary, previous, chunk_size):
+    """Fotos a ``boundary`` de las cuentas con asientos en ``[previous, boundary)``."""
+    with db.engine.connect() as conn:
+        window = (
+            select(ledger_table.c.account_id, func.sum(ledger_table.c.amount).label("total"))
+            .where(ledger_table.c.created_at < boundary)
+            .group_by(ledger_table.c.account_id)
+            .order_by(ledger_table.c.account_id)
+        )
+        if previous is not None:
+            window = window.where(ledger_table.c.created_at >= previous)
+        movements = conn.execute(window).all()
+
+    written = 0
+    for start in range(0, len(movements), chunk_size):
+        chunk = dict(movements[start:start + chunk_size])
+        with db.engine.begin() as conn:
+            # Reanudación: se saltan las cuentas que ya tienen foto en este día
+            done = set(conn.execute(
+                select(snapshots_table.c.account_id)
+                .where(snapshots_table.c.as_of == boundary)
+                .where(snapshots_table.c.account_id.in_(list(chunk)))
+            ).scalars())
+            pending = [account_id for account_id in chunk if account_id not in done]
+            if not pending:
+                continue
+            latest = (
+                select(snapshots_table.c.account_id, func.max(snapshots_table.c.as_of).label("as_of"))
+                .where(snapshots_table.c.account_id.in_(pending))
+                .where(snapshots_table.c.as_of < boundary)
+                .group_by(snapshots_table.c.account_id)
+                .subquery()
+            )
+            previous_balances = dict(conn.execute(
+                select(snapshots_table.c.account_id, snapshots_table.c.balance)
+                .join(latest, and_(snapshots_table.c.account_id == latest.c.account_id,
+                                   snapshots_table.c.as_of == latest.c.as_of))
+            ).all())
+            conn.execute(insert(snapshots_table), [
+                {"account_id": account_id, "as_of": boundary,
+                 "balance": previous_balances.get(account_id, 0.0) + chunk[account_id]}
+                for account_id in pending
+            ])
+            written += len(pending)
+    return written
+
+
+def build_snapshots(until=None, chunk_size=DEFAULT_SNAPSHOT_CHUNK):
+    """
+    Construye las fotos pendientes hasta ``until`` (por defecto, el último día
+    cerrado hace más de ``LEDGER_SNAPSHOT_LAG`` segundos). Devuelve
+    ``(días procesados, fotos escritas)``. Se puede interrumpir y volver a lanzar.
+    """
+    lag = current_app.config.get("LEDGER_SNAPSHOT_LAG", 300)
+    cutoff = _start_of_day(min(until or datetime.max, datetime.utcnow() - timedelta(seconds=lag)))
+
+    with db.engine.connect() as conn:
+        last = conn.execute(select(func.max(snapshots_table.c.as_of))).scalar_one()
+        if last is None:
+            boundary = _next_boundary(conn, None)
+        else:
+            # El último día pudo quedar a medias: se vuelve a procesar (las cuentas hechas se saltan)
+            boundary = last
+    days = written = 0
+    while boundary is not None and boundary <= cutoff:
+        with db.engine.connect() as conn:
+            previous = conn.execute(
+                select(func.max(snapshots_table.c.as_of)).where(snapshots_table.c.as_of < boundary)
+            ).scalar_one()
+        written += _build_boundary(boundary, previous, chunk_size)
+        days += 1
+        logger.info("Fotos de saldo al %s construidas", boundary.date())
+        with db.engine.connect() as conn:
+            boundary = _next_boundary(conn, boundary)
+    return days, written
+
+
+def backfill_ledger(chunk_size=DEFAULT_SNAPSHOT_CHUNK):
+    """
+    Crea los asientos de las transferencias que no los tienen (anteriores al
+    libro) y un asiento de apertura por cuenta igual a su saldo real menos lo que
+    ya suma en el libro (si no es cero). Es idempotente. Si crea asientos, borra
+    las fotos existentes para que se reconstruyan. Devuelve
+    ``(transferencias asentadas, aperturas)``.
+    """
+    transfer_count = 0
+    last_id = 0
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(
+                select(transactions_table.c.id, transactions_table.c.sender_account_id,
+                       transactions_table.c.receiver_account_id, transactions_table.c.amount,
+                       transactions_table.c.timestamp)
+                .where(transactions_table.c.id > last_id)
+                .where(~exists().where(ledger_table.c.transaction_id == transactions_table.c.id))
+                .order_by(transactions_table.c.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            record_entries(conn, [
+                entry
+                for row in rows
+                for entry in transfer_entries(row.id, row.sender_account_id, row.receiver_account_id,
+                                              row.amount, row.timestamp or OPENING_TIMESTAMP)
+            ])
+            transfer_count += len(rows)
+            last_id = rows[-1].id
+
+    opening_count = 0
+    last_id = 0
+    with db.engine.connect() as conn:
+        max_account_id = conn.execute(select(func.max(Account.id))).scalar_one() or 0
+    already_booked = (
+        select(func.coalesce(func.sum(ledger_table.c.amount), 0.0))
+        .where(ledger_table.c.account_id == Account.id)
+        .scalar_subquery()
+    )
+    while last_id < max_account_id:
+        upper = last_id + chunk_size
+        with db.engine.begin() as conn:
+            # Una sola sentencia: saldo y asientos se leen en la misma instantánea
+            opening_count += conn.execute(
+                insert(ledger_table).from_select(
+                    ["account_id", "entry_type", "amount", "created_at"],
+                    select(Account.id, literal(ENTRY_OPENING), Account.total_balance - already_booked,
+                           literal(OPENING_TIMESTAMP))
+                    .where(Account.id > last_id)
+                    .where(Account.id <= upper)
+                    .where(Account.total_balance - already_booked != 0)
+                    .where(~exists().where(and_(ledger_table.c.account_id == Account.id,
+                                                ledger_table.c.entry_type == ENTRY_OPENING))),
+                )
+            ).rowcount
+        last_id = upper
+
+    if transfer_count or opening_count:
+        # Los asientos nuevos son anteriores a las fotos existentes: se descartan y se reconstruyen
+        with db.engine.begin() as conn:
+            conn.execute(snapshots_table.delete())
+    return transfer_count, opening_count
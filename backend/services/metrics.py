@@ -0,0 +1,324 @@
+# backend/services/metrics.py
+"""
+Métricas por ruta: latencia, consultas SQL, tamaño de respuesta y detector de N+1.
+
+Cada petición lleva un ``RequestMetrics`` (en un ``ContextVar``) que los eventos
+``before/after_cursor_execute`` de todos los motores (primario y réplicas)
+alimentan con el número de sentencias y el tiempo de SQL. Al terminar la
+petición se acumula por ruta (la regla de Flask, ``/api/transactions/history/<int:account_id>``,
+no la URL, para que la cardinalidad sea acotada) en histogramas de latencia,
+de consultas por petición y de tamaño de respuesta, y se añade la cabecera
+``Server-Timing`` (``db`` y ``app``, visible en las herramientas del navegador).
+
+Detector de N+1: se cuenta cuántas veces se ejecuta cada sentencia (el SQL
+compilado, con parámetros ligados, es la "forma" de la consulta); si una misma
+forma se repite ``METRICS_N_PLUS_ONE_THRESHOLD`` veces en una petición se
+registra un aviso con la ruta, la sentencia y las repeticiones, y se cuenta.
+
+``/metrics`` sirve el formato de texto de Prometheus y exige ``METRICS_TOKEN``
+como ``Authorization: Bearer <token>`` o, si no hay token configurado, el JWT
+de un administrador. Las métricas son por worker (como el resto de
+estadísticas): Prometheus debe raspar cada proceso.
+El coste por sentencia es un par de ``perf_counter`` y un incremento en un
+dict; por petición, unos ``bisect`` bajo un lock.
+
+Las sentencias que se ejecutan fuera de una petición (hilos de fondo, CLI)
+solo se cuentan en un total aparte. El tamaño de las respuestas en streaming
+(exportaciones) se cuenta a medida que se envía el cuerpo y se registra al terminar.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from flask import Response, current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from sqlalchemy import event
+
+from backend.database.models import db
+from backend.database.routing import get_read_router
+from backend.logging_setup import get_logger, logging_stats
+
+log = get_logger("metrics")
+
+PREFIX = "novabank"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+UNMATCHED_ROUTE = "unmatched"  # 404: todas las URL sin regla comparten etiqueta
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    """Histograma acumulativo al estilo de Prometheus (``le`` = valor <= límite)."""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # el último es +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class RequestMetrics:
+    """Lo que se mide durante una petición."""
+
+    __slots__ = ("started", "statements", "sql_seconds", "shapes")
+
+    def __init__(self, track_shapes):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.shapes = {} if track_shapes else None
+
+    def repeated_statements(self, threshold):
+        """``(sentencia, repeticiones)`` de las formas que alcanzan el umbral, de más a menos."""
+        if not self.shapes:
+            return []
+        repeated = [(statement, count) for statement, count in self.shapes.items() if count >= threshold]
+        return sorted(repeated, key=lambda item: item[1], reverse=True)
+
+
+class RouteStats:
+    __slots__ = ("statuses", "latency", "queries", "size", "sql_seconds", "n_plus_one")
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.sql_seconds = 0.0
+        self.n_plus_one = 0
+
+
+class MetricsRegistry:
+    def __init__(self, n_plus_one_threshold=5):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.routes = {}  # (ruta, método) -> RouteStats
+        self.statements_outside_request = 0
+        self._lock = threading.Lock()
+
+    def start_request(self):
+        return _current.set(RequestMetrics(self.n_plus_one_threshold > 0))
+
+    @staticmethod
+    def end_request(token):
+        _current.reset(token)
+
+    def record_statement(self, statement, seconds):
+        current = _current.get()
+        if current is None:
+            with self._lock:
+                self.statements_outside_request += 1
+            return
+        current.statements += 1
+        current.sql_seconds += seconds
+        if current.shapes is not None:
+            current.shapes[statement] = current.shapes.get(statement, 0) + 1
+
+    def record_request(self, route, method, status, seconds, size, current, n_plus_one):
+        key = (route, method)
+        with self._lock:
+            stats = self.routes.get(key)
+            if stats is None:
+                stats = self.routes[key] = RouteStats()
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.latency.observe(seconds)
+            stats.queries.observe(current.statements)
+            stats.sql_seconds += current.sql_seconds
+            if size is not None:
+                stats.size.observe(size)
+            if n_plus_one:
+                stats.n_plus_one += 1
+
+    def record_size(self, route, method, size):
+        """Tamaño de una respuesta en streaming, que solo se conoce al terminar de enviarla."""
+        with self._lock:
+            stats = self.routes.get((route, method))
+            if stats is not None:
+                stats.size.observe(size)
+
+    def route_summary(self):
+        """Resumen JSON por ruta (peticiones, latencia media, consultas por petición, N+1)."""
+        with self._lock:
+            return {
+                f"{method} {route}": {
+                    "requests": stats.latency.count,
+                    "statuses": {str(status): count for status, count in sorted(stats.statuses.items())},
+                    "mean_ms": round(stats.latency.sum / max(stats.latency.count, 1) * 1000, 3),
+                    "queries_per_request": round(stats.queries.sum / max(stats.queries.count, 1), 3),
+                    "sql_ms_per_request": round(stats.sql_seconds / max(stats.latency.count, 1) * 1000, 3),
+                    "n_plus_one": stats.n_plus_one,
+                }
+                for (route, method), stats in sorted(self.routes.items())
+            }
+
+    def render(self):
+        """Texto de exposición de Prometheus."""
+        with self._lock:
+            routes = sorted(self.routes.items())
+            lines = []
+            _family(lines, "http_requests_total", "counter", "Peticiones por ruta, método y estado")
+            for (route, method), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'{PREFIX}_http_requests_total{_labels(route, method, status=status)} {count}')
+            _family(lines, "http_request_duration_seconds", "histogram", "Latencia de las peticiones")
+            for (route, method), stats in routes:
+                _histogram(lines, "http_request_duration_seconds", _labels(route, method), stats.latency)
+            _family(lines, "http_response_size_bytes", "histogram", "Tamaño del cuerpo de las respuestas")
+            for (route, method), stats in routes:
+                _histogram(lines, "http_response_size_bytes", _labels(route, method), stats.size)
+            _family(lines, "db_queries_per_request", "histogram", "Sentencias SQL por petición")
+            for (route, method), stats in routes:
+                _histogram(lines, "db_queries_per_request", _labels(route, method), stats.queries)
+            _family(lines, "db_query_seconds_total", "counter", "Tiempo total de SQL por ruta")
+            for (route, method), stats in routes:
+                lines.append(f"{PREFIX}_db_query_seconds_total{_labels(route, method)} {_number(stats.sql_seconds)}")
+            _family(lines, "db_n_plus_one_total", "counter", "Peticiones con una sentencia repetida (posible N+1)")
+            for (route, method), stats in routes:
+                lines.append(f"{PREFIX}_db_n_plus_one_total{_labels(route, method)} {stats.n_plus_one}")
+            _family(lines, "db_queries_outside_request_total", "counter", "Sentencias SQL fuera de una petición")
+            lines.append(f"{PREFIX}_db_queries_outside_request_total {self.statements_outside_request}")
+        _family(lines, "log_dropped_records_total", "counter", "Registros de log descartados con la cola llena")
+        lines.append(f"{PREFIX}_log_dropped_records_total {logging_stats()['dropped_records']}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(route, method, **extra):
+    pairs = [("route", route), ("method", method), *extra.items()]
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _family(lines, name, kind, help_text):
+    lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+    lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+
+def _histogram(lines, name, labels, histogram):
+    inner = labels[1:-1]
+    cumulative = 0
+    for bound, count in zip((*histogram.bounds, "+Inf"), histogram.counts):
+        cumulative += count
+        lines.append(f'{PREFIX}_{name}_bucket{{{inner},le="{bound}"}} {cumulative}')
+    lines.append(f"{PREFIX}_{name}_sum{labels} {_number(histogram.sum)}")
+    lines.append(f"{PREFIX}_{name}_count{labels} {cumulative}")
+
+
+def instrument_engine(engine, registry):
+    """Cuenta las sentencias de ``engine`` en las métricas de la petición en curso."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_statement(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("metrics_started", None)
+        if started is not None:
+            registry.record_statement(statement, time.perf_counter() - started)
+
+
+def _count_bytes(body, done):
+    """Entrega el cuerpo tal cual y llama a ``done(bytes)`` al terminar (o si el cliente corta)."""
+    total = 0
+    try:
+        for chunk in body:
+            total += len(chunk)
+            yield chunk
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+        done(total)
+
+
+def get_metrics():
+    return current_app.extensions.get("metrics")
+
+
+def init_metrics(app):
+    config = app.config
+    if not config.get("METRICS_ENABLED", True):
+        app.extensions["metrics"] = None
+        return None
+    registry = MetricsRegistry(config.get("METRICS_N_PLUS_ONE_THRESHOLD", 5))
+    server_timing = config.get("METRICS_SERVER_TIMING", True)
+    token = config.get("METRICS_TOKEN") or None
+    app.extensions["metrics"] = registry
+
+    with app.app_context():
+        router = get_read_router()
+        for engine in [*db.engines.values(), *(router.replicas.values() if router is not None else ())]:
+            instrument_engine(engine, registry)
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_token = registry.start_request()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        current = _current.get()
+        if current is None:
+            return response
+        elapsed = time.perf_counter() - current.started
+        route = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+        repeated = current.repeated_statements(registry.n_plus_one_threshold)
+        if repeated:
+            statement, count = repeated[0]
+            log.warning("Posible N+1 en %s %s: la misma sentencia se ejecutó %s veces", request.method, route, count,
+                        extra={"fields": {"statement": statement[:500], "repetitions": count,
+                                          "repeated_shapes": len(repeated), "statements": current.statements}})
+        size = response.calculate_content_length()
+        method = request.method
+        if size is None and response.is_streamed:
+            response.response = _count_bytes(response.iter_encoded(),
+                                             lambda total: registry.record_size(route, method, total))
+        registry.record_request(route, method, response.status_code, elapsed, size, current,
+                                bool(repeated))
+        if server_timing:
+            db_ms = current.sql_seconds * 1000
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={db_ms:.2f};desc="{current.statements} consultas", '
+                f"app;dur={max(elapsed * 1000 - db_ms, 0):.2f}",
+            )
+        return response
+
+    @app.teardown_request
+    def _end_request_metrics(exc):
+        metrics_token = g.pop("metrics_token", None)
+        if metrics_token is not None:
+            registry.end_request(metrics_token)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        if token is not None:
+            supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(supplied, token):
+                return jsonify({"message": "No autorizado"}), 401
+        else:
+            # Sin token, solo un administrador: las rutas y los volúmenes no son públicos
+            verify_jwt_in_request()
+            if not get_jwt().get("is_admin"):
+                return jsonify({"message": "Acceso de administrador requerido"}), 403
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return registry
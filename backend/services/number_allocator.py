@@ -0,0 +1,255 @@
+# backend/services/number_allocator.py
+"""
+Asignación de números de cuenta y de tarjeta sin colisiones y sin consultas de sondeo.
+
+Cada serie (``account`` o ``card:<BIN>``) tiene una marca de agua alta en la
+tabla ``number_sequences``. Un worker reserva de una vez un bloque de seriales
+(``UPDATE ... SET next_value = next_value + bloque``, en su propia transacción)
+y los va entregando desde memoria, de modo que emitir un número no cuesta
+ningún viaje a la base de datos salvo cuando se agota el bloque. Los bloques
+son disjuntos entre workers, así que la unicidad no depende de comprobar antes
+si el número existe. Los seriales de un bloque que no llegue a usarse (p. ej.
+si el worker se reinicia) se pierden: quedan huecos, nunca duplicados.
+
+Formato:
+  * Cuenta (10 dígitos): serial de 9 dígitos + dígito de control módulo 10 con
+    pesos 7-3-1.
+  * Tarjeta (16 dígitos): BIN del proveedor + serial + dígito de control Luhn.
+
+Los números del generador anterior (milisegundos de ``time.time()``) no tienen
+dígito de control y están repartidos por todo el rango de 10 dígitos, así que
+la serie de cuentas ocupa todo el espacio de seriales desde el 1 y, al reservar
+cada bloque, una sola consulta contra el índice único descarta los seriales
+cuyo número ya existe. Las series de tarjetas arrancan por encima del mayor
+número existente con su BIN.
+"""
+import os
+import threading
+
+from flask import current_app
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from backend.database.models.account import Account
+from backend.database.models.card import Card
+from backend.database.models.number_sequence import NumberSequence
+from backend.logging_setup import get_logger
+from backend.services.transfer_engine import TransferRetryExhaustedError, run_with_retries
+
+logger = get_logger("number_allocator")
+
+sequences_table = NumberSequence.__table__
+
+ACCOUNT_SEQUENCE = "account"
+ACCOUNT_NUMBER_LENGTH = 10
+CARD_NUMBER_LENGTH = 16
+ACCOUNT_CHECK_WEIGHTS = (7, 3, 1)
+
+
+class NumberAllocationError(Exception):
+    """No se pudo asignar un número (serie agotada, proveedor desconocido o base de datos ocupada)."""
+
+    status_code = 503
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def account_check_digit(body):
+    """Dígito de control módulo 10 con pesos 7-3-1 (como los códigos de ruta ABA)."""
+    total = sum(int(digit) * ACCOUNT_CHECK_WEIGHTS[i % 3] for i, digit in enumerate(body))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_account_number(number):
+    return (len(number) == ACCOUNT_NUMBER_LENGTH and number.isdigit()
+            and account_check_digit(number[:-1]) == number[-1])
+
+
+def luhn_check_digit(body):
+    """Dígito de control Luhn para ``body`` (el número sin su último dígito)."""
+    total = 0
+    for i, digit in enumerate(reversed(body)):
+        value = int(digit)
+        if i % 2 == 0:  # se duplican los dígitos en posición impar contando desde el de control
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_card_number(number):
+    return (len(number) == CARD_NUMBER_LENGTH and number.isdigit()
+            and luhn_check_digit(number[:-1]) == number[-1])
+
+
+def parse_bin_prefixes(raw):
+    """Convierte ``"VISA=400000,MasterCard=510000"`` en un dict (o devuelve el dict tal cual)."""
+    if isinstance(raw, dict):
+        return dict(raw)
+    prefixes = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            provider, prefix = item.split("=", 1)
+            prefixes[provider.strip()] = prefix.strip()
+    return prefixes
+
+
+def _next_serial_after(conn, column, prefix, length, serial_width):
+    """
+    Primer serial libre para una serie nueva: uno más que el mayor número
+    existente de ``length`` dígitos que empiece por ``prefix``. Solo se ejecuta
+    una vez por serie, al crear su fila en ``number_sequences``.
+    """
+    rows = conn.execute(
+        select(column)
+        .where(func.length(column) == length)
+        .where(column.like(f"{prefix}%"))
+        .order_by(column.desc())
+    )
+    for (number,) in rows:
+        serial = number[len(prefix):len(prefix) + serial_width]
+        if serial.isdigit():
+            return int(serial) + 1
+    return 1
+
+
+def _taken_account_serials(conn, start, end):
+    """Seriales de ``[start, end)`` cuyo número de cuenta ya existe (emitido por el generador anterior)."""
+    serial_width = ACCOUNT_NUMBER_LENGTH - 1
+    numbers = {}
+    for serial in range(start, end):
+        body = str(serial).zfill(serial_width)
+        numbers[body + account_check_digit(body)] = serial
+    column = Account.__table__.c.account_number
+    return {numbers[number] for (number,) in conn.execute(select(column).where(column.in_(numbers)))}
+
+
+def lease_block(conn, name, size, first_serial):
+    """
+    Reserva ``size`` seriales de la serie ``name`` y devuelve el primero. Si la
+    serie no existe, la crea empezando en ``first_serial(conn)``.
+    """
+    updated = conn.execute(
+        update(sequences_table)
+        .where(sequences_table.c.name == name)
+        .values(next_value=sequences_table.c.next_value + size)
+    ).rowcount
+    if updated:
+        end = conn.execute(
+            select(sequences_table.c.next_value).where(sequences_table.c.name == name)
+        ).scalar_one()
+        return end - size
+    start = first_serial(conn)
+    conn.execute(insert(sequences_table).values(name=name, next_value=start + size))
+    return start
+
+
+class NumberAllocator:
+    """Entrega seriales desde bloques reservados en memoria, uno por serie."""
+
+    def __init__(self, block_size=100, bin_prefixes=None):
+        self.block_size = block_size
+        self.bin_prefixes = dict(bin_prefixes or {})
+        self._blocks = {}  # serie -> [siguiente, fin, seriales ya ocupados]
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self.leases = 0
+        self.issued = 0
+
+    def _lease(self, name, first_serial, taken=None):
+        def work(conn):
+            start = lease_block(conn, name, self.block_size, first_serial)
+            skipped = taken(conn, start, start + self.block_size) if taken is not None else set()
+            return start, skipped
+
+        for attempt in range(2):
+            try:
+                leased, _ = run_with_retries(work)
+                self.leases += 1
+                return leased
+            except IntegrityError:
+                # Otro worker creó la serie a la vez; ahora basta con el UPDATE
+                if attempt:
+                    raise
+            except TransferRetryExhaustedError as e:
+                raise NumberAllocationError("No se pudo reservar un bloque de números. Intenta de nuevo.") from e
+
+    def next_serial(self, name, first_serial, max_serial, taken=None):
+        """
+        Siguiente serial de la serie. ``taken(conn, inicio, fin)``, si se indica,
+        devuelve los seriales de cada bloque reservado que no se pueden emitir.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # Proceso hijo tras un fork: los bloques heredados también los tiene el padre
+                self._blocks.clear()
+                self._pid = os.getpid()
+            block = self._blocks.get(name)
+            while True:
+                if block is None or block[0] >= block[1]:
+                    start, skipped = self._lease(name, first_serial, taken)
+                    block = self._blocks[name] = [start, start + self.block_size, skipped]
+                serial = block[0]
+                block[0] += 1
+                if serial not in block[2]:
+                    break
+            self.issued += 1
+        if serial > max_serial:
+            raise NumberAllocationError(f"La serie de números '{name}' está agotada.")
+        return serial
+
+    def account_number(self):
+        serial_width = ACCOUNT_NUMBER_LENGTH - 1
+        serial = self.next_serial(ACCOUNT_SEQUENCE, lambda conn: 1, 10 ** serial_width - 1,
+                                  taken=_taken_account_serials)
+        body = str(serial).zfill(serial_width)
+        return body + account_check_digit(body)
+
+    def card_number(self, provider):
+        prefix = self.bin_prefixes.get(provider)
+        if not prefix:
+            raise NumberAllocationError(f"No hay un BIN configurado para el proveedor '{provider}'.")
+        serial_width = CARD_NUMBER_LENGTH - 1 - len(prefix)
+        serial = self.next_serial(
+            f"card:{prefix}",
+            lambda conn: _next_serial_after(conn, Card.__table__.c.card_number, prefix,
+                                            CARD_NUMBER_LENGTH, serial_width),
+            10 ** serial_width - 1,
+        )
+        body = prefix + str(serial).zfill(serial_width)
+        return body + luhn_check_digit(body)
+
+    def stats(self):
+        return {
+            "block_size": self.block_size,
+            "leases": self.leases,
+            "issued": self.issued,
+            "remaining": {name: end - start for name, (start, end, _) in self._blocks.items()},
+        }
+
+
+def init_number_allocator(app):
+    config = app.config
+    allocator = NumberAllocator(
+        block_size=config.get("NUMBER_ALLOCATOR_BLOCK_SIZE", 100),
+        bin_prefixes=parse_bin_prefixes(config.get("CARD_BIN_PREFIXES")),
+    )
+    app.extensions["number_allocator"] = allocator
+    return allocator
+
+
+def get_number_allocator():
+    return current_app.extensions["number_allocator"]
+
+
+def allocate_account_number():
+    """Nuevo número de cuenta de 10 dígitos, único y con dígito de control."""
+    return get_number_allocator().account_number()
+
+
+def allocate_card_number(provider):
+    """Nuevo número de tarjeta de 16 dígitos para ``provider``, único y con dígito Luhn."""
+    return get_number_allocator().card_number(provider)
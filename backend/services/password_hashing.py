@@ -0,0 +1,169 @@
+# backend/services/password_hashing.py
+"""
+Servicio de hashing de contraseñas.
+
+El KDF es deliberadamente caro, así que no se ejecuta en el hilo de la petición:
+se envía a un ``ProcessPoolExecutor`` con una cola acotada. Si la cola está
+llena la petición falla de inmediato con ``PasswordHashingUnavailableError``
+(503) en lugar de acumular workers bloqueados, así los health checks y el
+dashboard siguen respondiendo durante una avalancha de logins. Si un proceso
+del pool muere, las peticiones en curso reciben 503 y se crea un pool nuevo.
+
+Algoritmo y coste se configuran en ``Config`` (``PASSWORD_HASH_METHOD``,
+``PASSWORD_BCRYPT_ROUNDS``). Los hashes generados con otros parámetros se
+detectan con ``needs_rehash`` y se recalculan en el siguiente login exitoso.
+Con ``PASSWORD_HASH_WORKERS = 0`` el KDF se ejecuta en línea (útil en la CLI).
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, has_app_context
+
+from backend.services import password_kdf
+
+DEFAULT_METHOD = "scrypt"
+DEFAULT_BCRYPT_ROUNDS = 12
+
+
+class PasswordHashingUnavailableError(Exception):
+    """El pool de hashing está saturado o no respondió a tiempo (se traduce a 503)."""
+
+    status_code = 503
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, bcrypt_rounds=DEFAULT_BCRYPT_ROUNDS,
+                 workers=None, max_pending=None, timeout=10.0):
+        self.method = method
+        self.bcrypt_rounds = bcrypt_rounds
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(self.workers * 4, 1)
+        self.timeout = timeout
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._target_parameters = None
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # "spawn": los hijos no heredan hilos ni conexiones del proceso web
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers == 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHashingUnavailableError(
+                "El servicio de autenticación está saturado. Intenta de nuevo en unos segundos."
+            )
+        executor = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard_executor(executor)
+            raise PasswordHashingUnavailableError("El servicio de autenticación se está reiniciando.")
+        except BaseException:
+            self._slots.release()
+            raise
+        # El turno se libera cuando el KDF termina de verdad, no cuando la petición
+        # deja de esperarlo: los hashes que vencen el timeout siguen ocupando un worker
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHashingUnavailableError("El servicio de autenticación no respondió a tiempo.")
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise PasswordHashingUnavailableError("El servicio de autenticación se está reiniciando.")
+
+    def _discard_executor(self, executor):
+        """Un worker murió (OOM, señal): el pool queda roto y el siguiente hash crea otro."""
+        with self._executor_lock:
+            if executor is not None and self._executor is executor:
+                self._executor = None
+            else:
+                return
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def hash(self, password):
+        return self._run(password_kdf.hash_password, password, self.method, self.bcrypt_rounds)
+
+    def verify(self, stored_hash, password):
+        return self._run(password_kdf.verify_password, stored_hash, password)
+
+    @property
+    def target_parameters(self):
+        """Parámetros que debe tener un hash vigente (p. ej. ``"scrypt:32768:8:1"``)."""
+        if self._target_parameters is None:
+            if self.method == "bcrypt":
+                self._target_parameters = f"bcrypt:{self.bcrypt_rounds}"
+            elif self.method.count(":") >= 2 or self.method.startswith("scrypt:"):
+                self._target_parameters = self.method
+            else:
+                # "scrypt" o "pbkdf2:sha256" sin coste explícito: se usan los
+                # valores por defecto de werkzeug, que se obtienen generando un hash
+                sample = password_kdf.hash_password("x", self.method, self.bcrypt_rounds)
+                self._target_parameters = password_kdf.hash_parameters(sample)
+        return self._target_parameters
+
+    def needs_rehash(self, stored_hash):
+        return password_kdf.hash_parameters(stored_hash) != self.target_parameters
+
+    def stats(self):
+        return {"workers": self.workers, "max_pending": self.max_pending, "rejected": self.rejected}
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def init_password_hasher(app):
+    config = app.config
+    hasher = PasswordHasher(
+        method=config.get("PASSWORD_HASH_METHOD", DEFAULT_METHOD),
+        bcrypt_rounds=config.get("PASSWORD_BCRYPT_ROUNDS", DEFAULT_BCRYPT_ROUNDS),
+        workers=config.get("PASSWORD_HASH_WORKERS"),
+        max_pending=config.get("PASSWORD_HASH_MAX_PENDING"),
+        timeout=config.get("PASSWORD_HASH_TIMEOUT", 10.0),
+    )
+    app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+def get_password_hasher():
+    if has_app_context():
+        return current_app.extensions.get("password_hasher")
+    return None
+
+
+def hash_password(password):
+    """Hash con el servicio de la aplicación, o en línea con werkzeug fuera de una app."""
+    hasher = get_password_hasher()
+    if hasher is None:
+        return password_kdf.hash_password(password, DEFAULT_METHOD, DEFAULT_BCRYPT_ROUNDS)
+    return hasher.hash(password)
+
+
+def verify_password(stored_hash, password):
+    hasher = get_password_hasher()
+    if hasher is None:
+        return password_kdf.verify_password(stored_hash, password)
+    return hasher.verify(stored_hash, password)
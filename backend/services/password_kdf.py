@@ -0,0 +1,54 @@
+# backend/services/password_kdf.py
+"""
+Funciones puras de derivación de claves (KDF) que se ejecutan en los procesos
+del pool de hashing. Este módulo no importa Flask ni los modelos para que los
+procesos hijos arranquen rápido.
+
+Esquemas soportados:
+  * los de werkzeug: ``scrypt``, ``scrypt:32768:8:1``, ``pbkdf2:sha256:600000``...
+  * ``bcrypt`` (con ``rounds`` como coste), vía el paquete ``bcrypt`` que ya
+    instala flask_bcrypt.
+"""
+from werkzeug.security import check_password_hash, generate_password_hash
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+WERKZEUG_PREFIXES = ("scrypt:", "pbkdf2:")
+
+
+def is_bcrypt_hash(stored_hash):
+    return stored_hash.startswith(BCRYPT_PREFIXES)
+
+
+def is_known_hash(stored_hash):
+    """Indica si ``stored_hash`` tiene un formato que ``verify_password`` sabe comprobar."""
+    if not stored_hash:
+        return False
+    return is_bcrypt_hash(stored_hash) or (stored_hash.startswith(WERKZEUG_PREFIXES) and "$" in stored_hash)
+
+
+def hash_password(password, method, bcrypt_rounds):
+    if method == "bcrypt":
+        import bcrypt
+
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(bcrypt_rounds)).decode("utf-8")
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(stored_hash, password):
+    if not stored_hash:
+        return False
+    if is_bcrypt_hash(stored_hash):
+        import bcrypt
+
+        return bcrypt.checkpw(password.encode("utf-8"), stored_hash.encode("utf-8"))
+    return check_password_hash(stored_hash, password)
+
+
+def hash_parameters(stored_hash):
+    """
+    Parámetros con los que se generó un hash: ``"bcrypt:12"`` para bcrypt o el
+    prefijo de werkzeug (``"scrypt:32768:8:1"``, ``"pbkdf2:sha256:600000"``).
+    """
+    if is_bcrypt_hash(stored_hash):
+        return f"bcrypt:{int(stored_hash.split('$')[2])}"
+    return stored_hash.split("$", 1)[0]
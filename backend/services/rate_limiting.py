@@ -0,0 +1,379 @@
+# backend/services/rate_limiting.py
+"""
+Control de admisión: límites de tasa por token bucket y descarte de carga.
+
+Límites de tasa (``RATE_LIMITS``): cada regla se aplica a un endpoint
+(``auth.login``) o a un blueprint entero (``transaction_bp``) y a un ámbito:
+  * ``ip``: la dirección del cliente (con ``RATE_LIMIT_TRUSTED_PROXIES`` proxies
+    delante se toma de ``X-Forwarded-For``),
+  * ``client``: la identidad del token JWT; en el login, que no lleva token, el
+    correo del cuerpo (frena el relleno de credenciales contra una cuenta
+    aunque llegue desde muchas IP).
+El formato es ``"auth.login@ip=20/60:10,transaction_bp.transfer@client=10/1"``:
+20 peticiones cada 60 segundos con ráfagas de hasta 10 (por defecto, la ráfaga
+es el propio límite). Una petición sin fichas se rechaza con 429 y
+``Retry-After`` antes de llegar a la vista (en el login, antes del hash).
+Los buckets viven en un LRU del proceso o, con ``RATE_LIMIT_BACKEND``, en el
+backend compartido (``take_tokens`` es atómico allí), de modo que el límite
+es global entre workers.
+
+Descarte de carga (``LOAD_SHED_*``): un limitador de concurrencia por proceso.
+Con ``LOAD_SHED_MAX_INFLIGHT`` peticiones en curso, las siguientes esperan
+turno; si ya hay ``LOAD_SHED_MAX_QUEUE`` esperando, o la espera supera
+``LOAD_SHED_QUEUE_TIMEOUT``, se responde 503 con ``Retry-After``. Así una
+ráfaga no alarga la latencia de todas las peticiones: las que no caben se
+rechazan pronto y el cliente reintenta.
+
+Las lecturas que sirve el camino asyncio (``backend.asgi``) no pasan por ese
+limitador: no ocupan un hilo mientras esperan, y esperar turno bloquearía el
+bucle de eventos. Tienen el suyo (``ASYNC_READS_*``), con los mismos rechazos
+pero esperando turno en el bucle: sin él, miles de peticiones aceptadas a la vez
+se disputan el pool del motor asíncrono y las últimas agotan su timeout. Los
+límites de tasa se aplican igual a las dos.
+
+Todo lo rechazado se cuenta (``stats()``, ``/api/admin/limits/stats``).
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from backend.services.cache import make_shared_backend, token_bucket
+
+SCOPES = ("ip", "client")
+# Rutas sin JWT en las que el ámbito "client" es el correo del cuerpo
+LOGIN_ENDPOINTS = ("auth.login",)
+# Marca en el environ de las peticiones que sirve el camino asyncio (backend.asgi)
+ASYNC_ENVIRON_KEY = "novabank.async"
+
+
+class RateLimitConfigError(ValueError):
+    """Regla de ``RATE_LIMITS`` mal escrita."""
+
+
+class LocalBuckets:
+    """Buckets en memoria del proceso (LRU acotado: las claves inactivas se pierden llenas)."""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take_tokens(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            state, allowed, retry_after = token_bucket(self._data.get(key), rate, burst, cost, now)
+            self._data[key] = state
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return allowed, retry_after
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RateLimitRule:
+    def __init__(self, target, scope, limit, period, burst=None):
+        if scope not in SCOPES:
+            raise RateLimitConfigError(f"Ámbito desconocido en la regla de {target}: {scope}")
+        if limit <= 0 or period <= 0:
+            raise RateLimitConfigError(f"Límite no válido en la regla de {target}@{scope}")
+        self.target = target
+        self.scope = scope
+        self.rate = limit / period  # fichas por segundo
+        self.burst = burst or limit
+        self.name = f"{target}@{scope}"
+        self.allowed = 0
+        self.rejected = 0
+
+    def stats(self):
+        return {"rate_per_second": self.rate, "burst": self.burst, "allowed": self.allowed,
+                "rejected": self.rejected}
+
+
+def parse_rules(raw):
+    """``"auth.login@ip=20/60:10,..."`` (o un dict ``{"auth.login@ip": "20/60:10"}``) -> reglas."""
+    items = raw.items() if isinstance(raw, dict) else (
+        item.split("=", 1) for item in (raw or "").split(",") if "=" in item
+    )
+    rules = []
+    for name, spec in items:
+        target, _, scope = name.strip().partition("@")
+        try:
+            amount, _, burst = str(spec).strip().partition(":")
+            limit, _, period = amount.partition("/")
+            rules.append(RateLimitRule(target, scope or "ip", int(limit), float(period or 1),
+                                       int(burst) if burst else None))
+        except ValueError as e:
+            if isinstance(e, RateLimitConfigError):
+                raise
+            raise RateLimitConfigError(f"Regla no válida: {name}={spec}")
+    return rules
+
+
+class RateLimiter:
+    def __init__(self, rules, buckets, trusted_proxies=0):
+        self.buckets = buckets
+        self.trusted_proxies = trusted_proxies
+        self.rules = {}  # endpoint o blueprint -> reglas
+        for rule in rules:
+            self.rules.setdefault(rule.target, []).append(rule)
+        self._lock = threading.Lock()
+
+    def rules_for(self, endpoint, blueprint):
+        return self.rules.get(endpoint, []) + self.rules.get(blueprint, [])
+
+    def client_address(self, req):
+        if self.trusted_proxies:
+            chain = [*req.headers.getlist("X-Forwarded-For"), req.remote_addr]
+            hops = [hop.strip() for value in chain if value for hop in value.split(",")]
+            return hops[max(0, len(hops) - 1 - self.trusted_proxies)]
+        return req.remote_addr
+
+    @staticmethod
+    def client_key(req):
+        if req.endpoint in LOGIN_ENDPOINTS:
+            email = (req.get_json(silent=True) or {}).get("email")
+            return f"email:{str(email).strip().lower()}" if email else None
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+        except Exception:
+            return None  # token inválido: la vista responderá 401; cuenta solo el límite por IP
+        return None if identity is None else f"client:{identity}"
+
+    def check(self, req):
+        """``None`` si se admite la petición; si no, ``(regla, segundos de espera)``."""
+        keys = {}
+        for rule in self.rules_for(req.endpoint, req.blueprint):
+            if rule.scope not in keys:
+                keys[rule.scope] = self.client_address(req) if rule.scope == "ip" else self.client_key(req)
+            subject = keys[rule.scope]
+            if subject is None:
+                continue
+            allowed, retry_after = self.buckets.take_tokens(f"ratelimit:{rule.name}:{subject}", rule.rate,
+                                                            rule.burst)
+            with self._lock:
+                if allowed:
+                    rule.allowed += 1
+                else:
+                    rule.rejected += 1
+            if not allowed:
+                return rule, retry_after
+        return None
+
+    def stats(self):
+        return {
+            "backend": type(self.buckets).__name__,
+            "rules": {rule.name: rule.stats() for rules in self.rules.values() for rule in rules},
+        }
+
+
+class ConcurrencyLimiter:
+    """Peticiones en curso acotadas, con una cola de espera acotada en tamaño y en tiempo."""
+
+    def __init__(self, max_inflight, max_queue, queue_timeout):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self.inflight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.peak_inflight = 0
+        self.max_wait = 0.0
+
+    def acquire(self):
+        """``None`` si la petición entra; si no, el motivo del rechazo."""
+        with self._condition:
+            if self.inflight >= self.max_inflight:
+                if self.waiting >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    return "queue_full"
+                self.waiting += 1
+                self.queued += 1
+                begin = time.monotonic()
+                deadline = begin + self.queue_timeout
+                try:
+                    while self.inflight >= self.max_inflight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected_timeout += 1
+                            return "queue_timeout"
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                    self.max_wait = max(self.max_wait, time.monotonic() - begin)
+            self.inflight += 1
+            self.admitted += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+            return None
+
+    def release(self):
+        with self._condition:
+            self.inflight -= 1
+            self._condition.notify()
+
+    def retry_after(self):
+        return max(1, math.ceil(self.queue_timeout))
+
+    def stats(self):
+        return {
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "peak_inflight": self.peak_inflight,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "max_wait_seconds": round(self.max_wait, 4),
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+class AsyncConcurrencyLimiter(ConcurrencyLimiter):
+    """``ConcurrencyLimiter`` para las vistas asyncio: la espera es un future en el bucle, por orden de llegada."""
+
+    def __init__(self, max_inflight, max_queue, queue_timeout):
+        super().__init__(max_inflight, max_queue, queue_timeout)
+        self._waiters = deque()
+
+    async def acquire(self):
+        # Con un turno libre no hay nadie esperando: release() lo habría pasado
+        if self.inflight < self.max_inflight:
+            self._admit()
+            return None
+        if self.waiting >= self.max_queue:
+            self.rejected_queue_full += 1
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.waiting += 1
+        self.queued += 1
+        begin = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except TimeoutError:
+            self.rejected_timeout += 1
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # el turno llegó justo cuando se cancelaba la petición
+            raise
+        finally:
+            self.waiting -= 1
+            self.max_wait = max(self.max_wait, time.monotonic() - begin)
+        # release() pasó su turno a esta petición sin bajar ``inflight``
+        self.admitted += 1
+        return None
+
+    def _admit(self):
+        self.inflight += 1
+        self.admitted += 1
+        self.peak_inflight = max(self.peak_inflight, self.inflight)
+
+    def release(self):
+        # Las esperas que vencieron siguen en la cola como futures cancelados: se saltan
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.inflight -= 1
+
+
+def get_rate_limiter():
+    return current_app.extensions.get("rate_limiter")
+
+
+def get_concurrency_limiter():
+    return current_app.extensions.get("concurrency_limiter")
+
+
+def get_async_concurrency_limiter():
+    return current_app.extensions.get("async_concurrency_limiter")
+
+
+def admission_stats():
+    limiter, shedder, async_shedder = get_rate_limiter(), get_concurrency_limiter(), get_async_concurrency_limiter()
+    return {
+        "rate_limits": limiter.stats() if limiter is not None else None,
+        "load_shedding": shedder.stats() if shedder is not None else None,
+        "async_reads": async_shedder.stats() if async_shedder is not None else None,
+    }
+
+
+def _reject(message, status_code, retry_after):
+    response = jsonify({"message": message})
+    response.status_code = status_code
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def saturated_response(retry_after):
+    """503 del descarte de carga, con ``Retry-After``."""
+    return _reject("El servidor está saturado. Intenta de nuevo en unos segundos.", 503, retry_after)
+
+
+def init_admission_control(app):
+    config = app.config
+    limiter = None
+    if config.get("RATE_LIMIT_ENABLED", True):
+        rules = parse_rules(config.get("RATE_LIMITS"))
+        if rules:
+            buckets = make_shared_backend(config.get("RATE_LIMIT_BACKEND"))
+            limiter = RateLimiter(
+                rules,
+                buckets if buckets is not None else LocalBuckets(config.get("RATE_LIMIT_MAX_ENTRIES", 100000)),
+                trusted_proxies=config.get("RATE_LIMIT_TRUSTED_PROXIES", 0),
+            )
+    shedder = None
+    if config.get("LOAD_SHED_MAX_INFLIGHT", 0) > 0:
+        shedder = ConcurrencyLimiter(
+            config["LOAD_SHED_MAX_INFLIGHT"],
+            config.get("LOAD_SHED_MAX_QUEUE", 0),
+            config.get("LOAD_SHED_QUEUE_TIMEOUT", 1.0),
+        )
+    async_shedder = None
+    if config.get("ASYNC_READS_MAX_INFLIGHT", 0) > 0:
+        async_shedder = AsyncConcurrencyLimiter(
+            config["ASYNC_READS_MAX_INFLIGHT"],
+            config.get("ASYNC_READS_MAX_QUEUE", 0),
+            config.get("ASYNC_READS_QUEUE_TIMEOUT", 10.0),
+        )
+    app.extensions["rate_limiter"] = limiter
+    app.extensions["concurrency_limiter"] = shedder
+    app.extensions["async_concurrency_limiter"] = async_shedder
+
+    @app.before_request
+    def _admit_request():
+        if request.method == "OPTIONS":
+            return None  # preflight de CORS
+        if limiter is not None:
+            rejected = limiter.check(request)
+            if rejected is not None:
+                _, retry_after = rejected
+                return _reject("Demasiadas solicitudes. Intenta de nuevo más tarde.", 429, retry_after)
+        if shedder is not None and not request.environ.get(ASYNC_ENVIRON_KEY):
+            reason = shedder.acquire()
+            if reason is not None:
+                return saturated_response(shedder.retry_after())
+            g.admission_slot = True
+        return None
+
+    @app.teardown_request
+    def _release_slot(exc):
+        if g.pop("admission_slot", False):
+            shedder.release()
+
+    return limiter, shedder
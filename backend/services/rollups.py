@@ -0,0 +1,358 @@
+# backend/services/rollups.py
+"""
+Totales diarios (rollups) para la analítica de administración.
+
+Dos tablas acumulan, en la misma transacción que cada transferencia o registro:
+  * ``rollup_daily_account_type``: por día y tipo de cuenta, cuentas abiertas,
+    transferencias entrantes/salientes (número y monto) y otros asientos
+    (aperturas del libro). La suma de ``amount_in - amount_out + other_amount``
+    de un tipo es el total depositado en ese tipo de cuenta.
+  * ``rollup_daily_account``: por día y cuenta, transferencias entrantes y
+    salientes (ranking de cuentas que más reciben).
+
+Las actualizaciones son ``INSERT ... ON CONFLICT DO UPDATE`` que suman al valor
+existente, agregadas por transacción (un lote de miles de transferencias hace
+dos sentencias). Para que las transferencias concurrentes no compitan por la
+fila (día, tipo), cada una suma en una de ``ROLLUP_SHARDS`` filas al azar; en
+las cuentas calientes se hace lo mismo con la fila de la cuenta, con tantas
+filas como sub-saldos. Las consultas suman las filas de cada grupo.
+
+Las tablas se derivan del libro mayor: ``rebuild_rollups`` las recalcula desde
+``ledger_entries`` y ``accounts`` (requiere el libro completo, ver
+``flask ledger backfill``) y ``check_rollups`` las compara con un recorrido
+completo de ``accounts`` y ``transactions``.
+"""
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, case, delete, func, insert, literal, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.rollups import DailyAccountRollup, DailyTypeRollup
+from backend.database.models.transaction import Transaction
+from backend.logging_setup import get_logger
+from backend.services.ledger import ENTRY_TRANSFER, OPENING_TIMESTAMP, ledger_table
+
+logger = get_logger("rollups")
+
+type_table = DailyTypeRollup.__table__
+account_rollup_table = DailyAccountRollup.__table__
+accounts_table = Account.__table__
+transactions_table = Transaction.__table__
+
+TYPE_KEYS = ("day", "account_type", "shard")
+ACCOUNT_KEYS = ("day", "account_id", "shard")
+TYPE_VALUES = ("accounts_opened", "transfers_in", "amount_in", "transfers_out", "amount_out", "other_amount")
+ACCOUNT_VALUES = ("transfers_in", "amount_in", "transfers_out", "amount_out")
+
+DEFAULT_TOP_LIMIT = 10
+MAX_TOP_LIMIT = 100
+FLOAT_TOLERANCE = 1e-6  # relativa: las sumas en otro orden difieren en el último decimal
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class RollupQueryError(ValueError):
+    """Parámetro de analítica no válido."""
+
+
+def _upsert(conn, table, keys, value_columns, rows):
+    """Suma ``rows`` (dicts con claves y valores) a las filas existentes, creándolas si no existen."""
+    if not rows:
+        return
+    # Mismo orden de bloqueo en todas las transacciones: sin interbloqueos entre filas de rollups
+    rows = sorted(rows, key=lambda row: tuple(row[k] for k in keys))
+    dialect_insert = _UPSERT_INSERTS.get(conn.dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + stmt.excluded[column] for column in value_columns},
+        )
+        conn.execute(stmt, rows)
+        return
+    for row in rows:
+        updated = conn.execute(
+            update(table)
+            .where(and_(*(table.c[k] == row[k] for k in keys)))
+            .values({column: table.c[column] + row[column] for column in value_columns})
+        ).rowcount
+        if not updated:
+            conn.execute(insert(table).values(row))
+
+
+def _shard_count():
+    return max(1, current_app.config.get("ROLLUP_SHARDS", 8))
+
+
+def apply_entries(conn, entries, account_types, hot_slots=None):
+    """
+    Suma a los rollups los asientos ``entries`` (los de ``ledger.transfer_entries``).
+    ``account_types`` es ``{account_id: tipo}`` de las cuentas de los asientos y
+    ``hot_slots`` ``{account_id: sub-saldos}`` de las cuentas calientes acreditadas.
+    """
+    shard = random.randrange(_shard_count())
+    by_type = {}
+    by_account = {}
+    for entry in entries:
+        day = entry["created_at"].date()
+        account_id = entry["account_id"]
+        amount = entry["amount"]
+        totals = by_type.setdefault((day, account_types[account_id]), dict.fromkeys(TYPE_VALUES, 0))
+        if entry["entry_type"] != ENTRY_TRANSFER:
+            totals["other_amount"] += amount
+            continue
+        direction = "in" if amount > 0 else "out"
+        totals[f"transfers_{direction}"] += 1
+        totals[f"amount_{direction}"] += abs(amount)
+        account_shard = random.randrange(hot_slots[account_id]) if hot_slots and account_id in hot_slots else 0
+        account_totals = by_account.setdefault((day, account_id, account_shard), dict.fromkeys(ACCOUNT_VALUES, 0))
+        account_totals[f"transfers_{direction}"] += 1
+        account_totals[f"amount_{direction}"] += abs(amount)
+
+    _upsert(conn, type_table, TYPE_KEYS, TYPE_VALUES, [
+        {"day": day, "account_type": account_type, "shard": shard, **totals}
+        for (day, account_type), totals in by_type.items()
+    ])
+    _upsert(conn, account_rollup_table, ACCOUNT_KEYS, ACCOUNT_VALUES, [
+        {"day": day, "account_id": account_id, "shard": account_shard, **totals}
+        for (day, account_id, account_shard), totals in by_account.items()
+    ])
+
+
+def record_accounts_opened(conn, account_types, at=None):
+    """Suma las cuentas abiertas (una entrada de ``account_types`` por cuenta) al día de ``at``."""
+    counts = {}
+    for account_type in account_types:
+        counts[account_type] = counts.get(account_type, 0) + 1
+    day = (at or datetime.utcnow()).date()
+    shard = random.randrange(_shard_count())
+    _upsert(conn, type_table, TYPE_KEYS, TYPE_VALUES, [
+        {"day": day, "account_type": account_type, "shard": shard,
+         **dict.fromkeys(TYPE_VALUES, 0), "accounts_opened": count}
+        for account_type, count in counts.items()
+    ])
+
+
+def parse_top_limit(args):
+    raw = args.get("limit", DEFAULT_TOP_LIMIT)
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        raise RollupQueryError("El parámetro 'limit' debe ser un entero.")
+    if not 1 <= limit <= MAX_TOP_LIMIT:
+        raise RollupQueryError(f"El parámetro 'limit' debe estar entre 1 y {MAX_TOP_LIMIT}.")
+    return limit
+
+
+def _as_date(value):
+    # func.date() devuelve texto en SQLite y date en PostgreSQL
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _bounds(date_from, date_to):
+    return datetime.combine(date_from, datetime.min.time()), datetime.combine(date_to + timedelta(days=1),
+                                                                             datetime.min.time())
+
+
+def deposits_by_type(conn):
+    """Cuentas y saldo total por tipo de cuenta, desde los rollups."""
+    t = type_table.c
+    rows = conn.execute(
+        select(t.account_type, func.sum(t.accounts_opened),
+               func.sum(t.amount_in - t.amount_out + t.other_amount))
+        .group_by(t.account_type)
+        .order_by(t.account_type)
+    ).all()
+    return [{"account_type": account_type, "accounts": int(accounts or 0), "balance": round(balance or 0.0, 2)}
+            for account_type, accounts, balance in rows]
+
+
+def _fill_days(date_from, date_to, values):
+    days = (date_to - date_from).days + 1
+    series = []
+    for offset in range(days):
+        day = date_from + timedelta(days=offset)
+        transfers, volume = values.get(day, (0, 0.0))
+        series.append({"date": day.isoformat(), "transfers": int(transfers), "volume": round(volume, 2)})
+    return series
+
+
+def daily_volume(conn, date_from, date_to):
+    """Número y monto de transferencias por día (cada transferencia tiene un solo débito)."""
+    t = type_table.c
+    rows = conn.execute(
+        select(t.day, func.sum(t.transfers_out), func.sum(t.amount_out))
+        .where(t.day >= date_from)
+        .where(t.day <= date_to)
+        .group_by(t.day)
+    ).all()
+    return _fill_days(date_from, date_to, {_as_date(day): (n, v or 0.0) for day, n, v in rows})
+
+
+def top_receivers(conn, date_from, date_to, limit=DEFAULT_TOP_LIMIT):
+    """Cuentas que más recibieron en el rango, desde los rollups por cuenta."""
+    r = account_rollup_table.c
+    amount = func.sum(r.amount_in)
+    totals = (
+        select(r.account_id, amount.label("amount"), func.sum(r.transfers_in).label("transfers"))
+        .where(r.day >= date_from)
+        .where(r.day <= date_to)
+        .where(r.transfers_in > 0)
+        .group_by(r.account_id)
+        .order_by(amount.desc(), r.account_id)
+        .limit(limit)
+        .subquery()
+    )
+    rows = conn.execute(
+        select(totals.c.account_id, accounts_table.c.account_number, totals.c.amount, totals.c.transfers)
+        .join(accounts_table, accounts_table.c.id == totals.c.account_id)
+        .order_by(totals.c.amount.desc(), totals.c.account_id)
+    ).all()
+    return [{"account_id": row.account_id, "account_number": row.account_number,
+             "amount": round(row.amount, 2), "transfers": int(row.transfers)} for row in rows]
+
+
+def scan_deposits_by_type(conn):
+    """Lo mismo que ``deposits_by_type`` recorriendo ``accounts`` completa."""
+    rows = conn.execute(
+        select(Account.account_type, func.count(), func.sum(Account.total_balance))
+        .group_by(Account.account_type)
+        .order_by(Account.account_type)
+    ).all()
+    return [{"account_type": account_type, "accounts": int(accounts), "balance": round(balance or 0.0, 2)}
+            for account_type, accounts, balance in rows]
+
+
+def scan_daily_volume(conn, date_from, date_to):
+    start, end = _bounds(date_from, date_to)
+    tx = transactions_table.c
+    day = func.date(tx.timestamp)
+    rows = conn.execute(
+        select(day, func.count(), func.sum(tx.amount))
+        .where(tx.timestamp >= start)
+        .where(tx.timestamp < end)
+        .group_by(day)
+    ).all()
+    return _fill_days(date_from, date_to, {_as_date(d): (n, v or 0.0) for d, n, v in rows})
+
+
+def scan_top_receivers(conn, date_from, date_to, limit=DEFAULT_TOP_LIMIT):
+    start, end = _bounds(date_from, date_to)
+    tx = transactions_table.c
+    amount = func.sum(tx.amount)
+    rows = conn.execute(
+        select(tx.receiver_account_id, accounts_table.c.account_number, amount, func.count())
+        .join(accounts_table, accounts_table.c.id == tx.receiver_account_id)
+        .where(tx.timestamp >= start)
+        .where(tx.timestamp < end)
+        .group_by(tx.receiver_account_id, accounts_table.c.account_number)
+        .order_by(amount.desc(), tx.receiver_account_id)
+        .limit(limit)
+    ).all()
+    return [{"account_id": account_id, "account_number": number, "amount": round(total, 2),
+             "transfers": int(count)} for account_id, number, total, count in rows]
+
+
+def _differences(expected, actual, key):
+    """Filas de ``expected`` que no coinciden con ``actual`` (comparadas por ``key``)."""
+    actual_by_key = {row[key]: row for row in actual}
+    mismatches = []
+    for row in expected:
+        other = actual_by_key.pop(row[key], None)
+        if other is None or any(
+            abs(row[field] - other[field]) > FLOAT_TOLERANCE * max(1.0, abs(row[field]))
+            for field in row if field != key and isinstance(row[field], (int, float))
+        ):
+            mismatches.append({"scan": row, "rollup": other})
+    mismatches.extend({"scan": None, "rollup": row} for row in actual_by_key.values())
+    return mismatches
+
+
+def check_rollups(conn, date_from, date_to, limit=DEFAULT_TOP_LIMIT):
+    """Compara cada consulta de los rollups con su recorrido completo; incluye los tiempos (ms)."""
+    checks = (
+        ("deposits_by_type", "account_type", lambda: deposits_by_type(conn), lambda: scan_deposits_by_type(conn)),
+        ("daily_volume", "date", lambda: daily_volume(conn, date_from, date_to),
+         lambda: scan_daily_volume(conn, date_from, date_to)),
+        ("top_receivers", "account_id", lambda: top_receivers(conn, date_from, date_to, limit),
+         lambda: scan_top_receivers(conn, date_from, date_to, limit)),
+    )
+    report = {"from": date_from.isoformat(), "to": date_to.isoformat(), "consistent": True, "checks": {}}
+    for name, key, from_rollups, from_scan in checks:
+        begin = time.perf_counter()
+        rollup_rows = from_rollups()
+        rollup_ms = (time.perf_counter() - begin) * 1000
+        begin = time.perf_counter()
+        scan_rows = from_scan()
+        scan_ms = (time.perf_counter() - begin) * 1000
+        mismatches = _differences(scan_rows, rollup_rows, key)
+        report["consistent"] &= not mismatches
+        report["checks"][name] = {
+            "consistent": not mismatches,
+            "rollup_ms": round(rollup_ms, 2),
+            "scan_ms": round(scan_ms, 2),
+            "mismatches": mismatches[:20],
+        }
+    return report
+
+
+def rebuild_rollups():
+    """
+    Recalcula ambas tablas desde el libro mayor y las fechas de apertura de las
+    cuentas, en una sola transacción. Devuelve ``(filas por tipo, filas por cuenta)``.
+    """
+    e = ledger_table.c
+    a = accounts_table.c
+    day = func.date(e.created_at)
+    is_transfer = e.entry_type == ENTRY_TRANSFER
+
+    def count_if(condition):
+        return func.sum(case((condition, 1), else_=0))
+
+    def sum_if(condition, value):
+        return func.coalesce(func.sum(case((condition, value), else_=0.0)), 0.0)
+
+    credit = and_(is_transfer, e.amount > 0)
+    debit = and_(is_transfer, e.amount < 0)
+    with db.engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Las transferencias que lleguen mientras tanto esperan a que termine la reconstrucción
+            conn.execute(text("LOCK TABLE rollup_daily_account_type, rollup_daily_account IN EXCLUSIVE MODE"))
+        conn.execute(delete(type_table))
+        conn.execute(delete(account_rollup_table))
+
+        conn.execute(insert(type_table).from_select(
+            ["day", "account_type", "shard", "accounts_opened", "transfers_in", "amount_in",
+             "transfers_out", "amount_out", "other_amount"],
+            select(day, a.account_type, literal(0), literal(0), count_if(credit), sum_if(credit, e.amount),
+                   count_if(debit), sum_if(debit, -e.amount), sum_if(~is_transfer, e.amount))
+            .join(accounts_table, a.id == e.account_id)
+            .group_by(day, a.account_type),
+        ))
+        conn.execute(insert(account_rollup_table).from_select(
+            ["day", "account_id", "shard", "transfers_in", "amount_in", "transfers_out", "amount_out"],
+            select(day, e.account_id, literal(0), count_if(credit), sum_if(credit, e.amount),
+                   count_if(debit), sum_if(debit, -e.amount))
+            .where(is_transfer)
+            .group_by(day, e.account_id),
+        ))
+
+        # Cuentas abiertas por día (las anteriores a accounts.created_at, en la fecha de apertura del libro)
+        opened_day = func.date(func.coalesce(a.created_at, OPENING_TIMESTAMP))
+        opened = conn.execute(
+            select(opened_day, a.account_type, func.count()).group_by(opened_day, a.account_type)
+        ).all()
+        _upsert(conn, type_table, TYPE_KEYS, TYPE_VALUES, [
+            {"day": _as_date(d), "account_type": account_type, "shard": 0,
+             **dict.fromkeys(TYPE_VALUES, 0), "accounts_opened": count}
+            for d, account_type, count in opened
+        ])
+        type_rows = conn.execute(select(func.count()).select_from(type_table)).scalar_one()
+        account_rows = conn.execute(select(func.count()).select_from(account_rollup_table)).scalar_one()
+    logger.info("Rollups reconstruidos: %s filas por tipo, %s por cuenta", type_rows, account_rows)
+    return type_rows, account_rows
@@ -0,0 +1,264 @@
+# backend/services/serialization.py
+"""
+Serialización de las respuestas de la API.
+
+Registro de serializadores por modelo: cada ``ModelSerializer`` fija una sola
+vez los campos de salida y las columnas de las que salen. ``columns()`` da las
+columnas etiquetadas para un ``select`` (filas, sin hidratar entidades del ORM)
+y ``from_row`` arma el dict con un ``zip`` sobre la tupla; ``from_object``
+sirve para entidades que ya están cargadas por otro motivo (un ``attrgetter``
+precompilado).
+
+``FastJSONProvider`` reemplaza el proveedor JSON de Flask, así que todas las
+rutas que responden con ``jsonify`` pasan por él: codifica con orjson si está
+instalado (si no, con el módulo ``json`` estándar) y responde MessagePack
+(``application/msgpack``, requiere el paquete ``msgpack``) cuando el cliente lo
+prefiere en ``Accept``. Las fechas se codifican como lo hacía Flask (HTTP date).
+Las respuestas guardadas por claves de idempotencia se repiten byte a byte, así
+que siempre salen en JSON, igual que los arrays JSON en streaming (``GET
+/api/admin/accounts``: un array MessagePack necesita su longitud por adelantado).
+
+``response_etag``/``not_modified``/``set_etag`` implementan el GET condicional
+de las rutas que conocen la versión de sus datos sin consultarlos (el ETag
+cambia con el formato negociado, así que una caché no mezcla JSON y MessagePack).
+"""
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+from operator import attrgetter
+
+from flask import current_app, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+from werkzeug.http import http_date
+
+from backend.database.models.account import Account
+from backend.database.models.card import Card
+from backend.database.models.client import Client
+
+try:
+    import orjson
+except ImportError:  # el proveedor cae al módulo json estándar
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # sin msgpack se responde siempre JSON
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class ModelSerializer:
+    """
+    Campos de salida -> columna. Cada campo es un atributo del modelo o una tupla
+    ``(expresión SQL, función sobre la entidad)`` para los campos calculados.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = dict(fields)
+        self.keys = tuple(self.fields)
+        self._columns = tuple(
+            (spec[0] if isinstance(spec, tuple) else spec).label(key) for key, spec in self.fields.items()
+        )
+        if all(isinstance(spec, InstrumentedAttribute) for spec in self.fields.values()):
+            getter = attrgetter(*(spec.key for spec in self.fields.values()))
+            self._values = getter if len(self.keys) > 1 else (lambda obj: (getter(obj),))
+        else:
+            getters = tuple(
+                spec[1] if isinstance(spec, tuple) else attrgetter(spec.key) for spec in self.fields.values()
+            )
+            self._values = lambda obj: tuple(get(obj) for get in getters)
+        self._subsets = {}
+
+    def columns(self):
+        return self._columns
+
+    def select(self):
+        return select(*self._columns)
+
+    def from_row(self, row):
+        return dict(zip(self.keys, row))
+
+    def from_rows(self, rows):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+    def from_object(self, obj):
+        return dict(zip(self.keys, self._values(obj)))
+
+    def fetch(self, session, *criteria, order_by=None):
+        """Filas que cumplen ``criteria`` ya convertidas en dicts."""
+        stmt = self.select().where(*criteria)
+        if order_by is not None:
+            stmt = stmt.order_by(order_by)
+        return self.from_rows(session.execute(stmt))
+
+    def only(self, keys):
+        """Serializador con un subconjunto de los campos (se compila una vez por combinación)."""
+        keys = tuple(keys)
+        subset = self._subsets.get(keys)
+        if subset is None:
+            subset = ModelSerializer(f"{self.name}[{','.join(keys)}]", {key: self.fields[key] for key in keys})
+            self._subsets[keys] = subset
+        return subset
+
+
+SERIALIZERS = {}
+
+
+def register_serializer(name, fields):
+    serializer = ModelSerializer(name, fields)
+    SERIALIZERS[name] = serializer
+    return serializer
+
+
+def get_serializer(name):
+    return SERIALIZERS[name]
+
+
+CLIENT = register_serializer("client", {
+    "id": Client.id,
+    "full_name": Client.full_name,
+    "email": Client.email,
+    "phone_number": Client.phone_number,
+    "cip": Client.cip,
+    "is_admin": Client.is_admin,
+})
+ACCOUNT = register_serializer("account", {
+    "id": Account.id,
+    "account_type": Account.account_type,
+    "balance": Account.total_balance,
+    "account_number": Account.account_number,
+})
+DASHBOARD_ACCOUNT = register_serializer("dashboard_account", {
+    "id": Account.id,
+    "account_type": Account.account_type,
+    "balance": Account.total_balance,
+    "available_balance": (Account.total_balance - Account.held_amount,
+                          lambda account: account.total_balance - account.held_amount),
+    "account_number": Account.account_number,
+})
+# Listados y exportaciones de administración (requiere JOIN con clients)
+ACCOUNT_EXPORT = register_serializer("account_export", {
+    "id": Account.id,
+    "client_id": Account.client_id,
+    "client_full_name": (Client.full_name, attrgetter("client.full_name")),
+    "account_number": Account.account_number,
+    "account_type": Account.account_type,
+    "balance": Account.total_balance,
+})
+CARD = register_serializer("card", {
+    "id": Card.id,
+    "card_type": Card.card_type,
+    "card_number": Card.card_number,
+    "provider": Card.provider,
+})
+
+
+def _default(obj):
+    # Mismas conversiones que el proveedor por defecto de Flask
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj, indent=False):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps_bytes(obj, indent=False):
+        separators = None if indent else (",", ":")
+        return json.dumps(obj, default=_default, ensure_ascii=False, indent=2 if indent else None,
+                          separators=separators).encode("utf-8")
+
+    def loads(data):
+        return json.loads(data)
+
+
+def dumps(obj):
+    """JSON compacto como ``str`` (para exportaciones por bloques y logs)."""
+    return dumps_bytes(obj).decode("utf-8")
+
+
+def wants_msgpack(req):
+    if msgpack is None:
+        return False
+    return req.accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES) in MSGPACK_MIMETYPES
+
+
+def pack_msgpack(obj):
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def response_etag(version, negotiated=True):
+    """
+    ETag de la respuesta con esa versión de los datos en el formato que se va a
+    servir. ``negotiated=False`` para las respuestas que son siempre JSON.
+    """
+    packed = negotiated and getattr(current_app.json, "msgpack_enabled", False) and wants_msgpack(request)
+    return f"{version}-m" if packed else str(version)
+
+
+def set_etag(response, etag):
+    """Añade el ETag y obliga a revalidar (las respuestas son por cliente y cambian)."""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Accept")
+    return response
+
+
+def not_modified(etag):
+    """Respuesta 304 si ``If-None-Match`` ya trae ``etag``; si no, ``None``."""
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    return set_etag(current_app.response_class(status=304), etag)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Proveedor de ``app.json``: orjson para ``jsonify``/``get_json`` y MessagePack por ``Accept``."""
+
+    msgpack_enabled = True
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.msgpack_enabled and has_request_context() and wants_msgpack(request):
+            response = self._app.response_class(pack_msgpack(obj), mimetype=MSGPACK_MIMETYPES[0])
+        else:
+            indent = (self.compact is None and self._app.debug) or self.compact is False
+            response = self._app.response_class(dumps_bytes(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+        response.vary.add("Accept")
+        return response
+
+
+def init_serialization(app):
+    provider = FastJSONProvider(app)
+    provider.msgpack_enabled = app.config.get("API_MSGPACK_ENABLED", True)
+    app.json = provider
+    return provider
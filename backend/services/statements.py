@@ -0,0 +1,297 @@
+# backend/services/statements.py
+"""
+Estados de cuenta con saldo corrido.
+
+Las filas salen del libro mayor (``ledger_entries``) en orden ``(created_at, id)``.
+El saldo inicial es el saldo a la fecha de inicio (foto + cola, ver ``ledger``).
+Cada fila lleva el saldo corrido, calculado por la base de datos con una
+función de ventana (``SUM(amount) OVER (ORDER BY created_at, id)``) más el saldo
+que se arrastra del bloque anterior. Las filas se leen por bloques con un
+cursor keyset, de modo que ni la petición ni el job tienen el estado completo en
+memoria y no se mantiene abierto un cursor largo.
+
+Rangos cortos se emiten en streaming en la propia petición. Los largos se
+generan en un job de fondo (``StatementJobRunner``). El job escribe el archivo,
+informa el progreso en ``statement_jobs`` y el archivo se descarga con soporte
+de ``Range``.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func, literal, select, tuple_, update
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.statement_job import StatementJob
+from backend.database.models.transaction import Transaction
+from backend.logging_setup import get_logger
+from backend.services.admin_listings import chunked_utf8
+from backend.services.ledger import balance_before, ledger_table
+from backend.services.serialization import dumps
+
+logger = get_logger("statements")
+
+transactions_table = Transaction.__table__
+accounts_table = Account.__table__
+jobs_table = StatementJob.__table__
+
+STATEMENT_FORMATS = ("csv", "json")
+STATEMENT_MIMETYPES = {"csv": "text/csv", "json": "application/json"}
+STATEMENT_FIELDS = ("date", "entry_id", "transaction_id", "description", "counterparty_account",
+                    "debit", "credit", "balance")
+
+DEFAULT_CHUNK_SIZE = 5000
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class StatementQueryError(ValueError):
+    """Parámetro de estado de cuenta no válido."""
+
+
+def parse_statement_args(args, max_days):
+    """Valida ``from``, ``to`` (YYYY-MM-DD, obligatorios) y ``format``."""
+    try:
+        date_from = date.fromisoformat(args.get("from") or "")
+        date_to = date.fromisoformat(args.get("to") or "")
+    except ValueError:
+        raise StatementQueryError("Los parámetros 'from' y 'to' son obligatorios y deben ser fechas YYYY-MM-DD.")
+    if date_from > date_to:
+        raise StatementQueryError("La fecha 'from' no puede ser posterior a 'to'.")
+    if (date_to - date_from).days + 1 > max_days:
+        raise StatementQueryError(f"El rango no puede superar {max_days} días.")
+    output_format = args.get("format", "csv")
+    if output_format not in STATEMENT_FORMATS:
+        raise StatementQueryError(f"Formato no soportado. Usa uno de: {', '.join(STATEMENT_FORMATS)}.")
+    return date_from, date_to, output_format
+
+
+def _bounds(date_from, date_to):
+    start = datetime.combine(date_from, datetime.min.time())
+    return start, datetime.combine(date_to, datetime.min.time()) + timedelta(days=1)
+
+
+def _chunk_statement(account_id, start, end, carry, after, limit):
+    """Bloque de filas con saldo corrido = ``carry`` + suma acumulada dentro del rango pendiente."""
+    e = ledger_table.c
+    t = transactions_table.c
+    counterparty = accounts_table.alias("counterparty")
+    counterparty_id = case((e.amount < 0, t.receiver_account_id), else_=t.sender_account_id)
+    stmt = (
+        select(
+            e.id.label("entry_id"),
+            e.created_at,
+            e.transaction_id,
+            e.entry_type,
+            e.amount,
+            t.description,
+            counterparty.c.account_number.label("counterparty_account"),
+            (literal(carry) + func.sum(e.amount).over(order_by=(e.created_at, e.id))).label("balance"),
+        )
+        .select_from(ledger_table)
+        .outerjoin(transactions_table, t.id == e.transaction_id)
+        .outerjoin(counterparty, counterparty.c.id == counterparty_id)
+        .where(e.account_id == account_id)
+        .where(e.created_at >= start)
+        .where(e.created_at < end)
+        .order_by(e.created_at, e.id)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(e.created_at, e.id) > tuple_(*after))
+    return stmt
+
+
+def _to_row(row):
+    return {
+        "date": row.created_at.isoformat(),
+        "entry_id": row.entry_id,
+        "transaction_id": row.transaction_id,
+        "description": row.description if row.description is not None else row.entry_type,
+        "counterparty_account": row.counterparty_account,
+        "debit": round(-row.amount, 2) if row.amount < 0 else None,
+        "credit": round(row.amount, 2) if row.amount >= 0 else None,
+        "balance": round(row.balance, 2),
+    }
+
+
+def iter_statement(account_id, date_from, date_to, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Genera ``("opening", saldo)``, luego ``("rows", [filas])`` por bloque y al
+    final ``("closing", saldo)``. Cada bloque usa una conexión corta.
+    """
+    start, end = _bounds(date_from, date_to)
+    with db.engine.connect() as conn:
+        balance = balance_before(conn, account_id, start)
+    yield "opening", balance
+
+    after = None
+    while True:
+        with db.engine.connect() as conn:
+            rows = conn.execute(_chunk_statement(account_id, start, end, balance, after, chunk_size)).all()
+        if not rows:
+            break
+        yield "rows", [_to_row(row) for row in rows]
+        balance = rows[-1].balance
+        after = (rows[-1].created_at, rows[-1].entry_id)
+        if len(rows) < chunk_size:
+            break
+    yield "closing", balance
+
+
+def count_statement_rows(account_id, date_from, date_to):
+    start, end = _bounds(date_from, date_to)
+    with db.engine.connect() as conn:
+        return conn.execute(
+            select(func.count())
+            .select_from(ledger_table)
+            .where(ledger_table.c.account_id == account_id)
+            .where(ledger_table.c.created_at >= start)
+            .where(ledger_table.c.created_at < end)
+        ).scalar_one()
+
+
+def encode_csv(parts):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(STATEMENT_FIELDS)
+    for kind, value in parts:
+        if kind == "rows":
+            for row in value:
+                writer.writerow([row[field] for field in STATEMENT_FIELDS])
+        else:
+            label = "Saldo inicial" if kind == "opening" else "Saldo final"
+            writer.writerow(["", "", "", label, "", "", "", round(value, 2)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def encode_json(parts, account_id, date_from, date_to):
+    header = json.dumps({"account_id": account_id, "from": date_from.isoformat(), "to": date_to.isoformat()})
+    yield header[:-1]  # se abre el objeto y se completa a medida que llegan las partes
+    first = True
+    for kind, value in parts:
+        if kind == "opening":
+            yield f', "opening_balance": {round(value, 2)}, "rows": ['
+        elif kind == "rows":
+            for row in value:
+                yield ("" if first else ",") + dumps(row)
+                first = False
+        else:
+            yield f'], "closing_balance": {round(value, 2)}}}'
+
+
+def encode_statement(output_format, account_id, date_from, date_to, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generador de fragmentos de texto del estado de cuenta en ``output_format``."""
+    parts = iter_statement(account_id, date_from, date_to, chunk_size)
+    if output_format == "csv":
+        return encode_csv(parts)
+    return encode_json(parts, account_id, date_from, date_to)
+
+
+def stream_statement(output_format, account_id, date_from, date_to, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Bytes del estado de cuenta por bloques de ~64 KB (para responder en streaming)."""
+    return chunked_utf8(encode_statement(output_format, account_id, date_from, date_to, chunk_size))
+
+
+def statement_filename(account_id, date_from, date_to, output_format):
+    return f"estado_{account_id}_{date_from.isoformat()}_{date_to.isoformat()}.{output_format}"
+
+
+class StatementJobRunner:
+    """Ejecuta los jobs de estados de cuenta en un pool de hilos del worker."""
+
+    def __init__(self, app, workers=2, output_dir=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.app = app
+        self.output_dir = output_dir or os.path.join(tempfile.gettempdir(), "novabank_statements")
+        self.chunk_size = chunk_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="statement-job")
+
+    def submit(self, account_id, requested_by, date_from, date_to, output_format):
+        job = StatementJob(
+            id=uuid.uuid4().hex,
+            account_id=account_id,
+            requested_by=requested_by,
+            output_format=output_format,
+            date_from=date_from,
+            date_to=date_to,
+            status=JOB_PENDING,
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._executor.submit(self._run, job.id)
+        return job
+
+    def _update(self, job_id, **values):
+        with db.engine.begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.id == job_id).values(**values))
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                self._generate(job_id)
+            except Exception as e:
+                logger.exception("Falló el job de estado de cuenta %s", job_id)
+                self._update(job_id, status=JOB_FAILED, error=str(e)[:255], finished_at=datetime.utcnow())
+
+    def _generate(self, job_id):
+        with db.engine.connect() as conn:
+            job = conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).one()
+        total = count_statement_rows(job.account_id, job.date_from, job.date_to)
+        self._update(job_id, status=JOB_RUNNING, rows_total=total)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{job_id}.{job.output_format}")
+        tmp_path = f"{path}.part"
+        written = 0
+        parts = iter_statement(job.account_id, job.date_from, job.date_to, self.chunk_size)
+
+        def counted(parts):
+            nonlocal written
+            for kind, value in parts:
+                yield kind, value
+                if kind == "rows":
+                    # Al volver aquí, el bloque anterior ya se escribió en el archivo
+                    written += len(value)
+                    self._update(job_id, rows_written=written)
+
+        if job.output_format == "csv":
+            pieces = encode_csv(counted(parts))
+        else:
+            pieces = encode_json(counted(parts), job.account_id, job.date_from, job.date_to)
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            for piece in pieces:
+                f.write(piece)
+        os.replace(tmp_path, path)  # el archivo solo aparece completo
+        self._update(job_id, status=JOB_DONE, rows_written=written, file_path=path,
+                     finished_at=datetime.utcnow())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def init_statement_jobs(app):
+    config = app.config
+    runner = StatementJobRunner(
+        app,
+        workers=config.get("STATEMENT_JOB_WORKERS", 2),
+        output_dir=config.get("STATEMENT_OUTPUT_DIR"),
+        chunk_size=config.get("STATEMENT_CHUNK_SIZE", DEFAULT_CHUNK_SIZE),
+    )
+    app.extensions["statement_jobs"] = runner
+    return runner
+
+
+def get_statement_jobs():
+    return current_app.extensions["statement_jobs"]
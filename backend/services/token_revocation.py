@@ -0,0 +1,355 @@
+# backend/services/token_revocation.py
+"""
+Revocación de tokens JWT con una lista en base de datos y un filtro de Bloom delante.
+
+``revoked_tokens`` guarda dos tipos de entradas: ``jti:<jti>`` revoca un token
+concreto (logout, rotación de refresh tokens) y ``client:<id>`` revoca todos los
+tokens de un cliente emitidos antes de ``revoked_at`` (credenciales
+comprometidas, un administrador al que se le quita el rol). Como ``iat`` va en
+segundos enteros, se compara con ``revoked_at`` truncado al segundo: los tokens
+del mismo segundo de la revocación siguen valiendo.
+
+``JWTManager`` consulta la lista en cada petición protegida mediante
+``token_in_blocklist_loader``. Consultar la tabla en cada petición añadiría un
+viaje a la base de datos a todas ellas, así que cada worker mantiene un filtro
+de Bloom con las claves revocadas. Si el filtro dice "no está", el token es
+válido sin tocar la base de datos. Solo un positivo (revocado de verdad o falso
+positivo, ~``TOKEN_DENYLIST_ERROR_RATE``) consulta la tabla, y el resultado se
+cachea unos segundos.
+
+Cada worker sincroniza su filtro cada ``TOKEN_DENYLIST_SYNC_INTERVAL`` segundos
+con las entradas nuevas (``revoked_at`` posterior a la última sincronización,
+con un margen para transacciones que confirmaron tarde). Una revocación se ve
+al instante en el worker que la hizo y, en el resto, como mucho un intervalo de
+sincronización después. Las entradas vencidas (el token ya expiró) se purgan y
+el filtro se reconstruye cada ``TOKEN_DENYLIST_REBUILD_INTERVAL`` segundos.
+"""
+import hashlib
+import math
+import threading
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, jsonify
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from backend.database.models import db
+from backend.database.models.revoked_token import RevokedToken
+from backend.logging_setup import get_logger
+from backend.services.cache import MISSING, LRUCache
+
+logger = get_logger("token_revocation")
+
+revoked_table = RevokedToken.__table__
+
+CHECK_MODES = ("bloom", "db", "off")
+
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un ``bytearray`` (doble hashing con BLAKE2b)."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        with self._lock:  # las lecturas no toman el lock; dos escrituras sí se excluyen
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def saturated(self):
+        return self.count > self.capacity
+
+
+def jti_key(jti):
+    return f"jti:{jti}"
+
+
+def client_key(client_id):
+    return f"client:{client_id}"
+
+
+def _timestamp(value):
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TokenDenylist:
+    """Lista de revocación de un worker: filtro de Bloom + LRU de consultas a ``revoked_tokens``."""
+
+    def __init__(self, mode="bloom", capacity=100000, error_rate=0.001, sync_interval=5.0, sync_overlap=60.0):
+        if mode not in CHECK_MODES:
+            raise ValueError(f"TOKEN_REVOCATION_CHECK no válido: {mode} (usa uno de: {', '.join(CHECK_MODES)})")
+        self.mode = mode
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_overlap = sync_overlap
+        # Resultado de las consultas a la tabla por clave: fecha de revocación o None
+        self.lookups = LRUCache(max_entries=10000, ttl=sync_interval)
+        self.checks = 0
+        self.filter_positives = 0
+        self.db_lookups = 0
+        self._filter = None
+        self._watermark = None
+        self._recent = {}  # claves ya añadidas dentro del margen de sincronización -> revoked_at
+        self._lock = threading.Lock()
+
+    # Filtro
+
+    def load(self, conn):
+        """Reconstruye el filtro con todas las entradas vigentes."""
+        now = datetime.utcnow()
+        rows = conn.execute(
+            select(revoked_table.c.key, revoked_table.c.revoked_at).where(revoked_table.c.expires_at > now)
+        ).all()
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for row in rows:
+            bloom.add(row.key)
+        watermark = max((row.revoked_at for row in rows), default=now)
+        horizon = watermark - timedelta(seconds=self.sync_overlap)
+        with self._lock:
+            self._filter, self._watermark = bloom, watermark
+            self._recent = {row.key: row.revoked_at for row in rows if row.revoked_at > horizon}
+        self.lookups.clear()
+        return len(rows)
+
+    def sync(self, conn):
+        """Añade al filtro las entradas nuevas desde la última sincronización. Devuelve cuántas añadió."""
+        if self._filter is None:
+            return self.load(conn)
+        horizon = self._watermark - timedelta(seconds=self.sync_overlap)
+        rows = conn.execute(
+            select(revoked_table.c.key, revoked_table.c.revoked_at).where(revoked_table.c.revoked_at > horizon)
+        ).all()
+        bloom = self._filter
+        added = 0
+        for row in rows:
+            # El margen vuelve a leer entradas ya vistas: solo se añaden las nuevas (o re-revocadas)
+            if self._recent.get(row.key) == row.revoked_at:
+                continue
+            self._recent[row.key] = row.revoked_at
+            bloom.add(row.key)
+            self.lookups.delete(row.key)
+            added += 1
+        if rows:
+            self._watermark = max(self._watermark, max(row.revoked_at for row in rows))
+            horizon = self._watermark - timedelta(seconds=self.sync_overlap)
+            self._recent = {key: at for key, at in self._recent.items() if at > horizon}
+        if bloom.saturated:
+            self.load(conn)
+        return added
+
+    def _ensure_loaded(self):
+        if self._filter is None:
+            with db.engine.connect() as conn:
+                self.load(conn)
+
+    # Consulta
+
+    def _query(self, keys):
+        self.db_lookups += 1
+        with db.engine.connect() as conn:
+            return dict(conn.execute(
+                select(revoked_table.c.key, revoked_table.c.revoked_at).where(revoked_table.c.key.in_(keys))
+            ).all())
+
+    def _revoked_at(self, keys):
+        """``{clave: revoked_at}`` de las claves indicadas (LRU y, si no está, la tabla)."""
+        found, missing = {}, []
+        for key in keys:
+            cached = self.lookups.get(key)
+            if cached is MISSING:
+                missing.append(key)
+            elif cached is not None:
+                found[key] = cached
+        if missing:
+            rows = self._query(missing)
+            for key in missing:
+                self.lookups.set(key, rows.get(key))
+            found.update(rows)
+        return found
+
+    def is_revoked(self, payload):
+        if self.mode == "off":
+            return False
+        self.checks += 1
+        keys = [jti_key(payload["jti"]), client_key(payload["sub"])]
+        if self.mode == "db":
+            # Sin filtro: una consulta a la tabla en cada petición (referencia para medir el filtro)
+            revoked = self._query(keys)
+        else:
+            self._ensure_loaded()
+            bloom = self._filter
+            keys = [key for key in keys if key in bloom]
+            if not keys:
+                return False
+            self.filter_positives += 1
+            revoked = self._revoked_at(keys)
+        if jti_key(payload["jti"]) in revoked:
+            return True
+        client_revoked_at = revoked.get(client_key(payload["sub"]))
+        # "iat" va en segundos enteros: sin truncar, un token emitido en el mismo
+        # segundo pero después de la revocación (el login tras cambiar la
+        # contraseña) quedaría revocado
+        return client_revoked_at is not None and payload.get("iat", 0) < int(_timestamp(client_revoked_at))
+
+    # Revocación
+
+    def revoke(self, conn, key, expires_at, client_id=None, token_type=None, reason=None):
+        """
+        Escribe la entrada dentro de la transacción de ``conn``. Para una clave
+        ``client:`` ya existente se adelanta ``revoked_at`` a ahora. Devuelve
+        ``(insertada, revoked_at)``; ``insertada`` es ``False`` si la clave
+        ``jti:`` ya estaba revocada (p. ej. un refresh token reutilizado).
+        Después del commit hay que llamar a ``remember``.
+        """
+        now = datetime.utcnow()
+        row = {"key": key, "client_id": client_id, "token_type": token_type, "reason": reason,
+               "revoked_at": now, "expires_at": expires_at}
+        dialect_insert = _UPSERTS.get(conn.dialect.name)
+        is_client = key.startswith("client:")
+        if dialect_insert is not None:
+            stmt = dialect_insert(revoked_table).values(row)
+            if is_client:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[revoked_table.c.key],
+                    set_={"revoked_at": now, "reason": reason, "expires_at": expires_at},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing()
+            inserted = conn.execute(stmt).rowcount == 1
+        else:
+            exists = conn.execute(select(revoked_table.c.key).where(revoked_table.c.key == key)).first()
+            if exists is None:
+                conn.execute(insert(revoked_table).values(row))
+            elif is_client:
+                conn.execute(update(revoked_table).where(revoked_table.c.key == key)
+                             .values(revoked_at=now, reason=reason, expires_at=expires_at))
+            inserted = exists is None or is_client
+        return inserted, now
+
+    def remember(self, key, revoked_at):
+        """Refleja una revocación en este worker sin esperar a la sincronización."""
+        if self._filter is not None:
+            self._filter.add(key)
+            self._recent[key] = revoked_at
+        self.lookups.set(key, revoked_at)
+
+    def purge(self):
+        """Borra las entradas de tokens ya vencidos. Devuelve cuántas borró."""
+        with db.engine.begin() as conn:
+            return conn.execute(delete(revoked_table).where(revoked_table.c.expires_at <= datetime.utcnow())).rowcount
+
+    def stats(self):
+        bloom = self._filter
+        return {
+            "mode": self.mode,
+            "entries_in_filter": bloom.count if bloom is not None else None,
+            "filter_bits": bloom.size if bloom is not None else None,
+            "filter_hashes": bloom.hashes if bloom is not None else None,
+            "checks": self.checks,
+            "filter_positives": self.filter_positives,
+            "db_lookups": self.db_lookups,
+            "lookup_cache": self.lookups.stats(),
+        }
+
+
+def _expires_at(payload):
+    return datetime.utcfromtimestamp(payload["exp"]) if payload.get("exp") else \
+        datetime.utcnow() + current_app.config["JWT_REFRESH_TOKEN_EXPIRES"]
+
+
+def revoke_token(payload, reason=None):
+    """Revoca el token con ``payload`` (claims decodificados). Devuelve ``False`` si ya estaba revocado."""
+    denylist = get_token_denylist()
+    key = jti_key(payload["jti"])
+    with db.engine.begin() as conn:
+        inserted, revoked_at = denylist.revoke(conn, key, _expires_at(payload), client_id=int(payload["sub"]),
+                                               token_type=payload.get("type"), reason=reason)
+    denylist.remember(key, revoked_at)
+    return inserted
+
+
+def revoke_client_tokens(client_id, reason=None):
+    """Revoca todos los tokens emitidos hasta ahora para el cliente (access y refresh)."""
+    config = current_app.config
+    lifetime = max(config["JWT_ACCESS_TOKEN_EXPIRES"], config["JWT_REFRESH_TOKEN_EXPIRES"])
+    denylist = get_token_denylist()
+    key = client_key(client_id)
+    with db.engine.begin() as conn:
+        _, revoked_at = denylist.revoke(conn, key, datetime.utcnow() + lifetime, client_id=client_id, reason=reason)
+    denylist.remember(key, revoked_at)
+
+
+def get_token_denylist():
+    return current_app.extensions["token_denylist"]
+
+
+def _sync_loop(app, interval, rebuild_interval, stop):
+    since_rebuild = 0.0
+    while not stop.wait(interval):
+        with app.app_context():
+            denylist = get_token_denylist()
+            try:
+                since_rebuild += interval
+                if rebuild_interval and since_rebuild >= rebuild_interval:
+                    since_rebuild = 0.0
+                    purged = denylist.purge()
+                    with db.engine.connect() as conn:
+                        loaded = denylist.load(conn)
+                    logger.debug("Lista de revocación reconstruida: %s entradas (%s purgadas)", loaded, purged)
+                else:
+                    with db.engine.connect() as conn:
+                        denylist.sync(conn)
+            except Exception:
+                logger.exception("Error al sincronizar la lista de revocación de tokens")
+
+
+def init_token_revocation(app, jwt):
+    config = app.config
+    denylist = TokenDenylist(
+        mode=config.get("TOKEN_REVOCATION_CHECK", "bloom"),
+        capacity=config.get("TOKEN_DENYLIST_CAPACITY", 100000),
+        error_rate=config.get("TOKEN_DENYLIST_ERROR_RATE", 0.001),
+        sync_interval=config.get("TOKEN_DENYLIST_SYNC_INTERVAL", 5.0),
+    )
+    app.extensions["token_denylist"] = denylist
+
+    @jwt.token_in_blocklist_loader
+    def _token_revoked(jwt_header, jwt_payload):
+        return get_token_denylist().is_revoked(jwt_payload)
+
+    @jwt.revoked_token_loader
+    def _revoked_response(jwt_header, jwt_payload):
+        return jsonify({"message": "La sesión fue revocada. Inicia sesión de nuevo."}), 401
+
+    interval = config.get("TOKEN_DENYLIST_SYNC_INTERVAL", 5.0)
+    if interval and denylist.mode == "bloom":
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=_sync_loop,
+            args=(app, interval, config.get("TOKEN_DENYLIST_REBUILD_INTERVAL", 3600.0), stop),
+            name="token-denylist-sync", daemon=True,
+        )
+        thread.start()
+        app.extensions["token_denylist_sync"] = stop
+    return denylist
@@ -0,0 +1,152 @@
+# backend/services/transaction_history.py
+"""
+Historial de transacciones paginado por cursor (keyset) sobre ``(timestamp, id)``.
+
+Cada página se resuelve con un UNION ALL de dos recorridos por rango sobre los
+índices compuestos ``(sender_account_id, timestamp, id)`` y
+``(receiver_account_id, timestamp, id)``, por lo que pedir la página N cuesta
+lo mismo que pedir la primera. Los nombres de las contrapartes se resuelven con
+una sola consulta por página.
+"""
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, literal, or_, select, union_all
+
+from backend.database.models.account import Account
+from backend.database.models.client import Client
+from backend.database.models.transaction import Transaction
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+DIRECTION_ALL = "all"
+DIRECTION_SENT = "sent"
+DIRECTION_RECEIVED = "received"
+DIRECTIONS = (DIRECTION_ALL, DIRECTION_SENT, DIRECTION_RECEIVED)
+
+
+class HistoryQueryError(ValueError):
+    """Parámetro de consulta del historial no válido."""
+
+
+def encode_cursor(timestamp, transaction_id):
+    raw = f"{timestamp.isoformat()}|{transaction_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, transaction_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(transaction_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HistoryQueryError("Cursor de paginación no válido.")
+
+
+def parse_history_args(args):
+    """Valida los parámetros ``limit``, ``cursor``, ``from``, ``to`` y ``direction`` de la petición."""
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise HistoryQueryError("El parámetro 'limit' debe ser un número entero.")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    direction = args.get("direction", DIRECTION_ALL)
+    if direction not in DIRECTIONS:
+        raise HistoryQueryError(f"El parámetro 'direction' debe ser uno de: {', '.join(DIRECTIONS)}.")
+
+    dates = {}
+    for name in ("from", "to"):
+        value = args.get(name)
+        if value:
+            try:
+                dates[name] = datetime.fromisoformat(value)
+            except ValueError:
+                raise HistoryQueryError(f"El parámetro '{name}' debe ser una fecha ISO 8601.")
+
+    cursor = args.get("cursor")
+    return {
+        "limit": limit,
+        "direction": direction,
+        "date_from": dates.get("from"),
+        "date_to": dates.get("to"),
+        "cursor": decode_cursor(cursor) if cursor else None,
+    }
+
+
+def _side_query(account_column, account_id, transaction_type, limit, date_from, date_to, cursor):
+    t = Transaction.__table__.c
+    conditions = [account_column == account_id]
+    if date_from is not None:
+        conditions.append(t.timestamp >= date_from)
+    if date_to is not None:
+        conditions.append(t.timestamp < date_to)
+    if cursor is not None:
+        cursor_ts, cursor_id = cursor
+        conditions.append(or_(t.timestamp < cursor_ts, and_(t.timestamp == cursor_ts, t.id < cursor_id)))
+    return (
+        select(
+            t.id, t.sender_account_id, t.receiver_account_id, t.amount, t.description, t.timestamp,
+            literal(transaction_type).label("type"),
+        )
+        .where(*conditions)
+        .order_by(t.timestamp.desc(), t.id.desc())
+        .limit(limit)
+    )
+
+
+def build_page_statement(account_id, limit, direction=DIRECTION_ALL, date_from=None, date_to=None, cursor=None):
+    """Sentencia que devuelve hasta ``limit + 1`` filas (la extra indica si hay más páginas)."""
+    t = Transaction.__table__.c
+    fetch = limit + 1
+    sides = []
+    if direction in (DIRECTION_ALL, DIRECTION_SENT):
+        sides.append(_side_query(t.sender_account_id, account_id, DIRECTION_SENT, fetch, date_from, date_to, cursor))
+    if direction in (DIRECTION_ALL, DIRECTION_RECEIVED):
+        sides.append(_side_query(t.receiver_account_id, account_id, DIRECTION_RECEIVED, fetch, date_from, date_to, cursor))
+    if len(sides) == 1:
+        return sides[0]
+    merged = union_all(*(side.subquery().select() for side in sides)).subquery()
+    return select(merged).order_by(merged.c.timestamp.desc(), merged.c.id.desc()).limit(fetch)
+
+
+def build_names_statement(account_ids):
+    """Nombre del titular de cada cuenta, en una sola consulta."""
+    return (
+        select(Account.id, Client.full_name)
+        .join(Client, Account.client_id == Client.id)
+        .where(Account.id.in_(account_ids))
+    )
+
+
+def build_page(rows, names, limit):
+    """Arma la respuesta de la página a partir de las filas y el mapa ``{account_id: nombre}``."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    transactions = [
+        {
+            "id": row.id,
+            "sender_account_id": row.sender_account_id,
+            "receiver_account_id": row.receiver_account_id,
+            "amount": row.amount,
+            "description": row.description,
+            "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+            "type": row.type,
+            "sender_username": names.get(row.sender_account_id, "N/A"),
+            "receiver_username": names.get(row.receiver_account_id, "N/A"),
+        }
+        for row in rows
+    ]
+    next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more and rows else None
+    return {"transactions": transactions, "next_cursor": next_cursor, "has_more": has_more}
+
+
+def fetch_history_page(session, account_id, limit, direction=DIRECTION_ALL, date_from=None, date_to=None, cursor=None):
+    """Ejecuta la página del historial: una consulta de filas y una de nombres."""
+    rows = session.execute(
+        build_page_statement(account_id, limit, direction, date_from, date_to, cursor)
+    ).all()
+    counterparty_ids = {row.sender_account_id for row in rows[:limit]} | {row.receiver_account_id for row in rows[:limit]}
+    names = dict(session.execute(build_names_statement(counterparty_ids)).all()) if counterparty_ids else {}
+    return build_page(rows, names, limit)
@@ -0,0 +1,248 @@
+# backend/services/transfer_engine.py
+"""
+Motor de transferencias seguro ante concurrencia.
+
+El débito se hace con un único UPDATE condicionado
+(``balance = balance - :amt WHERE id = :id AND balance - held_amount >= :amt``),
+de modo que la base de datos es quien decide si hay fondos disponibles (el saldo
+menos lo retenido por pagos con tarjeta, ver ``card_payments``) y no se pierden
+actualizaciones entre peticiones concurrentes. Las filas de ambas cuentas se bloquean siempre
+en orden ascendente de id para descartar interbloqueos, y los fallos de
+serialización se reintentan con un backoff exponencial acotado. Cada
+transferencia escribe sus dos asientos en el libro mayor (``ledger``) y los
+suma a los totales diarios (``rollups``) en la misma transacción.
+
+Los créditos a cuentas "calientes" (ver ``hot_accounts``) no bloquean la fila
+de la cuenta destino: suman a uno de sus sub-saldos.
+
+Este camino usa SQLAlchemy Core directamente sobre ``db.engine`` y no pasa por
+la unidad de trabajo del ORM (``db.session``).
+"""
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import DBAPIError
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.transaction import Transaction
+from backend.logging_setup import get_logger
+from backend.services.dashboard import invalidate_clients
+from backend.services.hot_accounts import credit_slot, fold_slots, get_hot_accounts
+from backend.services.ledger import record_entries, transfer_entries
+from backend.services.rollups import apply_entries
+
+logger = get_logger("transfer_engine")
+
+accounts_table = Account.__table__
+transactions_table = Transaction.__table__
+
+# Códigos SQLSTATE de PostgreSQL que indican que la transacción puede reintentarse
+RETRYABLE_PGCODES = {"40001", "40P01"}  # serialization_failure, deadlock_detected
+
+
+class TransferError(Exception):
+    """Error de negocio al procesar una transferencia (se traduce a una respuesta HTTP)."""
+
+    status_code = 400
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class AccountNotFoundError(TransferError):
+    status_code = 404
+
+
+class InsufficientFundsError(TransferError):
+    status_code = 400
+
+
+class TransferRetryExhaustedError(TransferError):
+    status_code = 503
+
+
+@dataclass
+class TransferResult:
+    transaction_id: int
+    sender_account_id: int
+    receiver_account_id: int
+    amount: float
+    client_ids: frozenset = frozenset()  # titulares afectados (para invalidar cachés)
+    attempts: int = 1
+
+
+def is_retryable_error(exc):
+    """Indica si un error de la base de datos es transitorio (serialización, deadlock, bloqueo)."""
+    orig = getattr(exc, "orig", None)
+    if getattr(orig, "pgcode", None) in RETRYABLE_PGCODES:
+        return True
+    message = str(orig or exc).lower()
+    return (
+        "database is locked" in message
+        or "deadlock" in message
+        or "could not serialize" in message
+    )
+
+
+def lock_accounts(conn, account_ids):
+    """
+    Bloquea (SELECT ... FOR UPDATE) las cuentas indicadas en orden ascendente de id
+    y devuelve un dict ``{id: fila}`` (con ``balance``, ``held_amount``,
+    ``client_id`` y ``account_type``) de las que existen. En SQLite el
+    FOR UPDATE se ignora y la exclusión la garantiza el bloqueo de escritura de
+    la propia base de datos.
+    """
+    ordered_ids = sorted(set(account_ids))
+    rows = conn.execute(
+        select(accounts_table.c.id, accounts_table.c.balance, accounts_table.c.held_amount,
+               accounts_table.c.client_id, accounts_table.c.account_type)
+        .where(accounts_table.c.id.in_(ordered_ids))
+        .order_by(accounts_table.c.id)
+        .with_for_update()
+    )
+    return {row.id: row for row in rows}
+
+
+def apply_transfer(conn, sender_id, receiver_id, amount, description="", release_hold=0.0):
+    """
+    Aplica una transferencia dentro de la transacción abierta en ``conn``.
+    Devuelve un ``TransferResult`` con el id de la fila creada en ``transactions``.
+    No hace commit.
+
+    ``release_hold`` libera esa parte de lo retenido en la cuenta de origen en el
+    mismo UPDATE del débito (captura de un pago con tarjeta).
+    """
+    hot_receiver = get_hot_accounts(conn).get(receiver_id)
+    # Si el destino es una cuenta caliente, solo se bloquea la fila de origen
+    existing = lock_accounts(conn, (sender_id,) if hot_receiver else (sender_id, receiver_id))
+    if sender_id not in existing:
+        raise AccountNotFoundError("Cuenta de origen no encontrada.")
+    if not hot_receiver and receiver_id not in existing:
+        raise AccountNotFoundError("Cuenta de destino no encontrada.")
+
+    # Débito condicionado: si no hay fondos disponibles, no se actualiza ninguna fila
+    values = {"balance": accounts_table.c.balance - amount}
+    if release_hold:
+        values["held_amount"] = accounts_table.c.held_amount - release_hold
+    debit = (
+        update(accounts_table)
+        .where(accounts_table.c.id == sender_id)
+        .where(accounts_table.c.balance - (accounts_table.c.held_amount - release_hold) >= amount)
+        .values(**values)
+    )
+    debited = conn.execute(debit).rowcount
+    if debited != 1 and any(fold_slots(conn, [sender_id]).values()):
+        # Cuenta caliente: los fondos estaban en los sub-saldos
+        debited = conn.execute(debit).rowcount
+    if debited != 1:
+        raise InsufficientFundsError("Fondos insuficientes en la cuenta de origen.")
+
+    hot_slots = None
+    if hot_receiver and credit_slot(conn, receiver_id, amount, hot_receiver[1]):
+        receiver_client_id, receiver_type = hot_receiver[0], hot_receiver[2]
+        hot_slots = {receiver_id: hot_receiver[1]}
+    else:
+        if hot_receiver:
+            # La cuenta dejó de ser caliente desde que se leyó el registro: camino normal
+            existing.update(lock_accounts(conn, (receiver_id,)))
+            if receiver_id not in existing:
+                raise AccountNotFoundError("Cuenta de destino no encontrada.")
+        conn.execute(
+            update(accounts_table)
+            .where(accounts_table.c.id == receiver_id)
+            .values(balance=accounts_table.c.balance + amount)
+        )
+        receiver_client_id = existing[receiver_id].client_id
+        receiver_type = existing[receiver_id].account_type
+
+    now = datetime.utcnow()
+    result = conn.execute(
+        insert(transactions_table).values(
+            sender_account_id=sender_id,
+            receiver_account_id=receiver_id,
+            amount=amount,
+            description=description,
+            timestamp=now,
+        )
+    )
+    transaction_id = result.inserted_primary_key[0]
+    entries = transfer_entries(transaction_id, sender_id, receiver_id, amount, now)
+    record_entries(conn, entries)
+    apply_entries(conn, entries, {sender_id: existing[sender_id].account_type, receiver_id: receiver_type},
+                  hot_slots)
+    return TransferResult(
+        transaction_id=transaction_id,
+        sender_account_id=sender_id,
+        receiver_account_id=receiver_id,
+        amount=amount,
+        client_ids=frozenset({existing[sender_id].client_id, receiver_client_id}),
+    )
+
+
+def _backoff_delay(attempt, base_delay, max_delay):
+    # Backoff exponencial con "full jitter" para no sincronizar a los reintentos
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def run_with_retries(work, max_retries=None):
+    """
+    Ejecuta ``work(conn)`` dentro de una transacción nueva sobre ``db.engine`` y la
+    repite, con backoff exponencial acotado, mientras falle por errores transitorios.
+    Devuelve ``(resultado, intentos)``.
+    """
+    config = current_app.config
+    if max_retries is None:
+        max_retries = config.get("TRANSFER_MAX_RETRIES", 5)
+    base_delay = config.get("TRANSFER_RETRY_BASE_DELAY", 0.01)
+    max_delay = config.get("TRANSFER_RETRY_MAX_DELAY", 0.5)
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            with db.engine.begin() as conn:
+                return work(conn), attempt
+        except DBAPIError as e:
+            if not is_retryable_error(e):
+                raise
+            if attempt == max_retries:
+                logger.warning("Operación abortada tras %s intentos: %s", attempt, e)
+                raise TransferRetryExhaustedError(
+                    "La transferencia no pudo completarse por alta concurrencia. Intenta de nuevo."
+                ) from e
+            time.sleep(_backoff_delay(attempt, base_delay, max_delay))
+
+
+def transfer_response_body(result):
+    """Cuerpo de la respuesta de ``/api/transactions/transfer`` (el mismo que se guarda para los reintentos)."""
+    return {"message": "Transferencia realizada con éxito.", "transaction_id": result.transaction_id}
+
+
+def execute_transfer(sender_id, receiver_id, amount, description="", max_retries=None, idempotency=None):
+    """
+    Ejecuta una transferencia completa en su propia transacción, reintentando
+    los fallos transitorios. Lanza ``TransferError`` (o una subclase) si la
+    transferencia no puede realizarse.
+
+    Con ``idempotency`` (un ``IdempotentRequest``) la clave se reclama y la
+    respuesta se guarda en la misma transacción; si la clave ya estaba
+    reclamada se lanza ``IdempotencyKeyInUse`` sin haber movido saldos.
+    """
+    def work(conn):
+        if idempotency is not None:
+            idempotency.claim(conn)
+        result = apply_transfer(conn, sender_id, receiver_id, amount, description)
+        if idempotency is not None:
+            idempotency.complete(conn, transfer_response_body(result))
+        return result
+
+    result, attempts = run_with_retries(work, max_retries=max_retries)
+    result.attempts = attempts
+    if idempotency is not None:
+        idempotency.committed()
+    invalidate_clients(result.client_ids)
+    return result
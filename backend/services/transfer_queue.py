@@ -0,0 +1,236 @@
+# backend/services/transfer_queue.py
+"""
+Transferencias asíncronas con "group commit".
+
+En modo síncrono cada transferencia es una transacción con su propio commit,
+así que en hora punta el techo es la latencia del commit. En modo asíncrono
+``/api/transactions/transfer`` valida la petición, la encola y responde 202 con
+un ``transfer_id``. Un grupo de hilos vacía la cola en micro-lotes: espera como
+mucho ``TRANSFER_QUEUE_BATCH_WAIT`` segundos a juntar hasta
+``TRANSFER_QUEUE_BATCH_SIZE`` transferencias y las aplica con el motor de lotes
+(``batch_transfers``, modo ``best_effort``): un bloqueo por cuenta, un UPDATE
+por conjunto de cuentas con el delta neto de cada una y un único commit. El
+estado de cada transferencia (``queued_transfers``) se escribe en esa misma
+transacción.
+
+La cola vive en memoria del proceso y está acotada: si está llena la petición
+falla de inmediato con ``TransferQueueFullError`` (503 + ``Retry-After``).
+Una transferencia aceptada no es durable hasta que su lote hace commit; hasta
+entonces solo el proceso que la aceptó la ve como ``queued``. Al terminar el
+proceso se vacía la cola antes de salir (``atexit``).
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert
+
+from backend.database.models import db
+from backend.database.models.queued_transfer import QueuedTransfer
+from backend.logging_setup import get_logger
+from backend.services.batch_transfers import MODE_BEST_EFFORT, execute_batch
+
+logger = get_logger("transfer_queue")
+
+queued_table = QueuedTransfer.__table__
+
+STATUS_QUEUED = "queued"
+STATUS_FAILED = "failed"
+
+ASYNC_MODES = ("off", "prefer", "always")
+
+
+class TransferQueueFullError(Exception):
+    """La cola de transferencias está llena (se traduce a 503)."""
+
+    status_code = 503
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+@dataclass
+class QueuedLeg:
+    id: str
+    client_id: int
+    leg: dict
+    created_at: datetime
+
+
+class TransferQueue:
+    def __init__(self, app, workers=2, batch_size=500, batch_wait=0.005, max_pending=10000):
+        self.app = app
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_pending = max_pending
+        self.accepted = 0
+        self.rejected_full = 0
+        self.batches = 0
+        self.processed = 0
+        self._reset()
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+
+    def _ensure_workers(self):
+        # Los hilos se arrancan con la primera transferencia del proceso (y de nuevo tras un fork)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._reset()
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"transfer-queue-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+
+    def submit(self, client_id, leg):
+        """Encola una transferencia ya validada (ver ``batch_transfers.parse_leg``). Devuelve su id."""
+        self._ensure_workers()
+        item = QueuedLeg(uuid.uuid4().hex, int(client_id), leg, datetime.utcnow())
+        with self._lock:
+            self._pending[item.id] = item
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(item.id, None)
+            self.rejected_full += 1
+            raise TransferQueueFullError("Hay demasiadas transferencias en cola. Intenta de nuevo en unos segundos.")
+        self.accepted += 1
+        return item.id
+
+    def pending(self, transfer_id):
+        """La transferencia si sigue en la cola de este proceso (aún sin commit), o ``None``."""
+        return self._pending.get(transfer_id)
+
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            # Al parar se sigue vaciando la cola hasta que quede vacía
+            while not (self._stop.is_set() and self._queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._process(batch)
+
+    @staticmethod
+    def _status_rows(batch, results):
+        now = datetime.utcnow()
+        return [
+            {
+                "id": item.id,
+                "requested_by": item.client_id,
+                "sender_account_id": item.leg["sender_account_id"],
+                "receiver_account_id": item.leg["receiver_account_id"],
+                "amount": item.leg["amount"],
+                "description": item.leg["description"],
+                "status": result["status"],
+                "transaction_id": result.get("transaction_id"),
+                "message": result.get("message"),
+                "created_at": item.created_at,
+                "processed_at": now,
+            }
+            for item, result in zip(batch, results)
+        ]
+
+    def _process(self, batch):
+        def write_statuses(conn, results):
+            conn.execute(insert(queued_table), self._status_rows(batch, [results[i] for i in range(len(batch))]))
+
+        try:
+            summary = execute_batch([item.leg for item in batch], mode=MODE_BEST_EFFORT,
+                                    before_commit=write_statuses)
+            self.batches += 1
+            self.processed += len(batch)
+            logger.debug("Lote de la cola: %s/%s aplicadas", summary["applied"], summary["total"])
+        except Exception as e:
+            # El lote se revirtió entero: se registra el fallo de cada transferencia para que el cliente lo vea
+            logger.exception("Falló un lote de %s transferencias encoladas", len(batch))
+            failed = {"status": STATUS_FAILED, "message": f"No se pudo procesar la transferencia: {e}"[:255]}
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(insert(queued_table), self._status_rows(batch, [failed] * len(batch)))
+            except Exception:
+                logger.exception("No se pudo registrar el fallo del lote")
+        finally:
+            with self._lock:
+                for item in batch:
+                    self._pending.pop(item.id, None)
+            for _ in batch:
+                self._queue.task_done()
+
+    def join(self):
+        """Espera a que se procese todo lo encolado hasta ahora."""
+        self._queue.join()
+
+    def shutdown(self, timeout=10.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "max_pending": self.max_pending,
+            "accepted": self.accepted,
+            "rejected_full": self.rejected_full,
+            "batches": self.batches,
+            "processed": self.processed,
+        }
+
+
+def wants_async(req):
+    """Indica si la transferencia debe encolarse según ``TRANSFER_ASYNC_MODE`` y la cabecera ``Prefer``."""
+    mode = current_app.config.get("TRANSFER_ASYNC_MODE", "prefer")
+    if mode == "always":
+        return True
+    return mode == "prefer" and "respond-async" in req.headers.get("Prefer", "").lower()
+
+
+def init_transfer_queue(app):
+    config = app.config
+    transfer_queue = TransferQueue(
+        app,
+        workers=config.get("TRANSFER_QUEUE_WORKERS", 2),
+        batch_size=config.get("TRANSFER_QUEUE_BATCH_SIZE", 500),
+        batch_wait=config.get("TRANSFER_QUEUE_BATCH_WAIT", 0.005),
+        max_pending=config.get("TRANSFER_QUEUE_MAX_PENDING", 10000),
+    )
+    app.extensions["transfer_queue"] = transfer_queue
+    atexit.register(transfer_queue.shutdown)
+    return transfer_queue
+
+
+def get_transfer_queue():
+    return current_app.extensions["transfer_queue"]
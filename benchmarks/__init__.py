@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# Scripts de carga y rendimiento. Se ejecutan desde la raíz del repositorio, p. ej.:
+#   python -m benchmarks.transfer_stress --threads 16 --accounts 4
@@ -0,0 +1,101 @@
+# benchmarks/admin_clients_query_count.py
+"""
+Verifica que /api/admin/clients emite un número fijo de consultas SQL por
+página, sin importar cuántos clientes (ni cuántas cuentas/tarjetas) existan.
+Termina con código 1 si el número de consultas varía entre tamaños o páginas.
+
+Uso:
+    python -m benchmarks.admin_clients_query_count --sizes 10 100 1000
+"""
+import argparse
+import sys
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert, select
+
+from backend.database.models import db, Client, Account, Card
+from benchmarks.common import default_database_url, make_app
+
+
+def seed(app, n_clients):
+    with app.app_context():
+        db.session.execute(insert(Client.__table__), [
+            {"full_name": f"Cliente {i}", "email": f"c{i}@novabank.test", "phone_number": "0",
+             "cip": f"CIP{i}", "password_hash": "x", "is_admin": False}
+            for i in range(n_clients)
+        ])
+        client_ids = db.session.execute(select(Client.id)).scalars().all()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": cid, "account_type": "ahorro" if n % 2 else "corriente", "balance": 0.0,
+             "account_number": f"{cid:07d}{n:03d}"}
+            for cid in client_ids for n in range(2)
+        ])
+        db.session.execute(insert(Card.__table__), [
+            {"client_id": cid, "card_number": f"{cid:016d}", "card_type": "debito",
+             "provider": "VISA" if cid % 2 else "MasterCard"}
+            for cid in client_ids
+        ])
+        db.session.commit()
+
+
+def count_queries_per_page(app, query_string):
+    with app.app_context():
+        token = create_access_token(identity="1", additional_claims={"is_admin": True})
+        engine = db.engine
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    # La primera petición del worker carga la lista de revocación de tokens: no cuenta
+    client.get("/api/admin/clients", query_string={"limit": 1}, headers=headers)
+    counter = {"n": 0}
+
+    def on_execute(*_):
+        counter["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    counts = []
+    cursor = None
+    try:
+        while True:
+            counter["n"] = 0
+            params = dict(query_string, **({"cursor": cursor} if cursor else {}))
+            response = client.get("/api/admin/clients", query_string=params, headers=headers)
+            assert response.status_code == 200, response.json
+            counts.append(counter["n"])
+            cursor = response.json["next_cursor"]
+            if not cursor:
+                break
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    scenarios = {
+        "completo": {"limit": args.limit},
+        "filtrado": {"limit": args.limit, "card_provider": "VISA", "account_type": "ahorro"},
+        "solo_cuentas": {"limit": args.limit, "fields": "id,full_name,accounts"},
+    }
+    failed = False
+    for name, query_string in scenarios.items():
+        seen = set()
+        for size in args.sizes:
+            app = make_app(default_database_url(f"clients_{size}"))
+            seed(app, size)
+            counts = count_queries_per_page(app, query_string)
+            # La última página puede venir vacía de relaciones; se comparan las páginas completas
+            full_pages = counts[:-1] or counts
+            seen.update(full_pages)
+            print(f"{name:>13} | {size:>6} clientes | {len(counts):>3} páginas | consultas por página: {sorted(set(counts))}")
+        if len(seen) != 1:
+            print(f"ERROR: el escenario '{name}' no tiene un número fijo de consultas por página: {sorted(seen)}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# benchmarks/admin_export_memory.py
+"""
+Mide el pico de memoria de la exportación en streaming de cuentas para
+distintos tamaños de banco. El pico debe mantenerse plano al crecer N.
+
+Uso:
+    python -m benchmarks.admin_export_memory --sizes 10000 50000 200000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from backend.database.models import db, Client, Account
+from backend.services.admin_listings import export_accounts
+from benchmarks.common import default_database_url, make_app
+
+
+def seed(app, n_accounts):
+    with app.app_context():
+        client = Client(full_name="Export", email="export@novabank.test", phone_number="0",
+                        cip="EXPORT", password_hash="x")
+        db.session.add(client)
+        db.session.flush()
+        for start in range(0, n_accounts, 10000):
+            db.session.execute(insert(Account.__table__), [
+                {"client_id": client.id, "account_type": "ahorro", "balance": float(i),
+                 "account_number": str(i).zfill(10)}
+                for i in range(start, min(start + 10000, n_accounts))
+            ])
+        db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    args = parser.parse_args(argv)
+
+    for size in args.sizes:
+        app = make_app(default_database_url(f"export_{size}"))
+        seed(app, size)
+        with app.app_context():
+            tracemalloc.start()
+            start = time.perf_counter()
+            total_bytes = sum(len(chunk) for chunk in export_accounts(db.session, args.format))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        print(f"{size:>9} cuentas: {total_bytes / 1e6:8.1f} MB emitidos en {elapsed:6.2f}s, "
+              f"pico de memoria {peak / 1e6:6.2f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
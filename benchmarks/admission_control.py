@@ -0,0 +1,200 @@
+# benchmarks/admission_control.py
+"""
+Límites de tasa y descarte de carga en el login y en las transferencias.
+
+Comprueba que:
+  * durante un relleno de credenciales (varios hilos probando contraseñas desde
+    una IP), el login de usuarios legítimos desde otras IP mantiene su
+    latencia: se compara su p50/p99 con y sin límites de tasa, y
+    se cuenta cuántos intentos del atacante llegaron a calcular el hash,
+  * el límite por correo frena los intentos contra una cuenta desde muchas IP,
+  * un cliente que supera su límite de transferencias recibe 429 con
+    ``Retry-After`` y vuelve a poder transferir al reponerse el bucket,
+  * con ``RATE_LIMIT_BACKEND=local`` dos workers comparten los buckets,
+  * con ``LOAD_SHED_MAX_INFLIGHT`` una ráfaga de logins concurrentes se
+    recorta con 503 + ``Retry-After`` en lugar de hacer esperar a todos,
+y que los contadores de ``/api/admin/limits/stats`` cuadran con lo rechazado.
+Termina con código 1 si algo no cuadra.
+
+Uso:
+    python -m benchmarks.admission_control --seconds 3 --attackers 8
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert, text, update
+
+from backend.database.models import db, Account, Client
+from backend.services.rate_limiting import admission_stats
+from benchmarks.common import default_database_url, make_app
+
+PASSWORD = "secreto123"
+HASH_METHOD = "pbkdf2:sha256:60000"
+LOGIN_RULES = "auth.login@ip=20/60:5,auth.login@client=10/300:5"
+TRANSFER_RULES = "transaction_bp.transfer@client=5/1:5"
+
+
+def overrides(**extra):
+    return dict(LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0, IDEMPOTENCY_PURGE_INTERVAL=0,
+                CARD_HOLD_SWEEP_INTERVAL=0, TOKEN_DENYLIST_SYNC_INTERVAL=0, PASSWORD_HASH_WORKERS=0,
+                PASSWORD_HASH_METHOD=HASH_METHOD, **extra)
+
+
+def register(app, n):
+    email = f"admision{n}@novabank.test"
+    app.test_client().post("/api/auth/register", json={
+        "full_name": f"Admisión {n}", "email": email, "phone_number": "0", "cip": f"ADM{n}", "password": PASSWORD})
+    return email
+
+
+def login(http, email, password, ip):
+    return http.post("/api/auth/login", json={"email": email, "password": password},
+                     environ_base={"REMOTE_ADDR": ip})
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def stuffing_run(app, victim, users, seconds, attackers):
+    """Hilos atacantes contra ``victim`` desde una IP; usuarios legítimos entran por turnos desde otras."""
+    stop = threading.Event()
+    attempts = {"total": 0, "429": 0}
+    lock = threading.Lock()
+
+    def attack():
+        http = app.test_client()
+        n = 0
+        while not stop.is_set():
+            n += 1
+            status = login(http, victim, f"mala{n}", "203.0.113.7").status_code
+            with lock:
+                attempts["total"] += 1
+                attempts["429"] += status == 429
+
+    threads = [threading.Thread(target=attack) for _ in range(attackers)]
+    for thread in threads:
+        thread.start()
+    http = app.test_client()
+    samples, statuses = [], {}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        n = len(samples)
+        begin = time.perf_counter()
+        status = login(http, users[n % len(users)], PASSWORD, f"198.51.100.{n % 250 + 1}").status_code
+        samples.append(time.perf_counter() - begin)
+        statuses[status] = statuses.get(status, 0) + 1
+        time.sleep(0.05)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return samples, statuses, attempts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0, help="duración de cada ataque simulado")
+    parser.add_argument("--attackers", type=int, default=8, help="hilos del atacante")
+    args = parser.parse_args(argv)
+    failed = False
+
+    # Relleno de credenciales: sin límites frente a con límites
+    url = default_database_url("admission_control")
+    base = make_app(url, **overrides())
+    victim, legit = register(base, 1), register(base, 2)
+    users = [legit] + [register(base, n) for n in range(3, 12)]
+    results = {}
+    for mode, extra in (("sin límites", {}), ("con límites", {"RATE_LIMIT_ENABLED": True, "RATE_LIMITS": LOGIN_RULES})):
+        app = make_app(url, **overrides(**extra))
+        samples, statuses, attempts = stuffing_run(app, victim, users, args.seconds, args.attackers)
+        results[mode] = (samples, statuses, attempts)
+        hashed = attempts["total"] - attempts["429"]
+        print(f"  {mode}: login legítimo p50 {statistics.median(samples) * 1000:.1f} ms, "
+              f"p99 {percentile(samples, 0.99) * 1000:.1f} ms {statuses}; atacante {attempts['total']} intentos, "
+              f"{hashed} llegaron al hash")
+        if mode == "con límites":
+            with app.app_context():
+                rules = admission_stats()["rate_limits"]["rules"]
+            failed |= hashed > 10 or rules["auth.login@ip"]["rejected"] + rules["auth.login@client"]["rejected"] \
+                != attempts["429"]
+        failed |= set(statuses) != {200}
+    unlimited, limited = results["sin límites"][0], results["con límites"][0]
+    failed |= percentile(limited, 0.99) > percentile(unlimited, 0.99)
+
+    # Límite por correo: muchos intentos contra una cuenta, cada uno desde una IP distinta
+    app = make_app(url, **overrides(RATE_LIMIT_ENABLED=True, RATE_LIMITS=LOGIN_RULES))
+    http = app.test_client()
+    spread = [login(http, legit, "mala", f"192.0.2.{n}").status_code for n in range(1, 21)]
+    print(f"  20 intentos contra una cuenta desde 20 IP: {spread.count(401)} x 401, {spread.count(429)} x 429")
+    failed |= spread.count(401) != 5 or spread.count(429) != 15
+
+    # Transferencias: límite por cliente, Retry-After y reposición del bucket
+    with app.app_context():
+        client_id = db.session.query(Client.id).filter_by(email=victim).scalar()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client_id, "account_type": "ahorro", "balance": 1000.0, "account_number": f"99000000{n}"}
+            for n in range(2)
+        ])
+        db.session.commit()
+        accounts = db.session.execute(
+            text("SELECT id FROM accounts WHERE account_number LIKE '99000000%' ORDER BY id")).scalars().all()
+        db.session.execute(update(Client.__table__).where(Client.id == client_id).values(is_admin=True))
+        db.session.commit()
+        token = create_access_token(identity=str(client_id), additional_claims={"is_admin": True})
+    headers = {"Authorization": f"Bearer {token}"}
+    transfer = {"sender_account_id": accounts[0], "receiver_account_id": accounts[1], "amount": 1}
+    workers = [make_app(url, **overrides(RATE_LIMIT_ENABLED=True, RATE_LIMITS=TRANSFER_RULES,
+                                         RATE_LIMIT_BACKEND="local")) for _ in range(2)]
+    clients = [worker.test_client() for worker in workers]
+    burst = [clients[n % 2].post("/api/transactions/transfer", json=transfer, headers=headers) for n in range(8)]
+    codes = [response.status_code for response in burst]
+    retry_after = next((response.headers.get("Retry-After") for response in burst if response.status_code == 429),
+                       None)
+    time.sleep(1.0)
+    refilled = clients[0].post("/api/transactions/transfer", json=transfer, headers=headers).status_code
+    print(f"  8 transferencias alternando 2 workers con buckets compartidos (5/s): {codes}, "
+          f"Retry-After={retry_after}; 1 s después -> {refilled}")
+    failed |= codes != [200] * 5 + [429] * 3 or retry_after != "1" or refilled != 200
+
+    # Descarte de carga: 2 en curso, 2 esperando como mucho 0.2 s
+    shed_app = make_app(url, **overrides(LOAD_SHED_MAX_INFLIGHT=2, LOAD_SHED_MAX_QUEUE=2, LOAD_SHED_QUEUE_TIMEOUT=0.2))
+    outcomes, lock = [], threading.Lock()
+
+    def burst_login(n):
+        begin = time.perf_counter()
+        response = login(shed_app.test_client(), legit, PASSWORD, f"10.0.0.{n}")
+        with lock:
+            outcomes.append((response.status_code, response.headers.get("Retry-After"),
+                             time.perf_counter() - begin))
+
+    threads = [threading.Thread(target=burst_login, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    shed = [outcome for outcome in outcomes if outcome[0] == 503]
+    ok = [outcome for outcome in outcomes if outcome[0] == 200]
+    with shed_app.app_context():
+        shedding = admission_stats()["load_shedding"]
+    print(f"  ráfaga de 16 logins con 2 en curso + 2 en cola: {len(ok)} x 200, {len(shed)} x 503 "
+          f"(Retry-After {sorted({outcome[1] for outcome in shed})}, rechazo más lento "
+          f"{max((outcome[2] for outcome in shed), default=0) * 1000:.0f} ms); contadores {shedding}")
+    failed |= not shed or len(ok) + len(shed) != 16 or any(outcome[1] != "1" for outcome in shed)
+    failed |= shedding["rejected_queue_full"] + shedding["rejected_timeout"] != len(shed)
+    failed |= shedding["peak_inflight"] > 2 or shedding["inflight"] != 0
+
+    # Los contadores son por worker: entre los dos suman los rechazos de la ráfaga
+    stats = [client.get("/api/admin/limits/stats", headers=headers).get_json() for client in clients]
+    rejected = [worker["rate_limits"]["rules"]["transaction_bp.transfer@client"]["rejected"] for worker in stats]
+    print(f"  /api/admin/limits/stats: transferencias rechazadas por worker {rejected}")
+    failed |= sum(rejected) != 3
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+# benchmarks/async_reads.py
+"""
+Lecturas asyncio (``backend.asgi``) frente al servidor WSGI con hilos.
+
+Carga el banco sintético (``benchmarks.dataset``) en una base de datos SQLite
+temporal y levanta, cada uno en su proceso:
+  * sync: la aplicación Flask en un servidor WSGI con un pool fijo de
+    ``--sync-threads`` hilos (como gunicorn con ``--threads``),
+  * async: ``create_asgi_app`` en uvicorn (dashboard, historial y listados de
+    admin con las vistas asíncronas; el resto por a2wsgi).
+
+Primero comprueba que las dos sirven lo mismo: cuerpos JSON, ETag y 304 del
+dashboard y de los listados, deltas con ``?since``, 400/403/404, errores de JWT
+(401/422), HEAD, que una transferencia hecha por el camino WSGI del servidor
+ASGI se ve en el dashboard asíncrono, y que ``/metrics`` cuenta las consultas
+de las vistas asíncronas con la regla de Flask como ruta.
+
+Después las carga con ``--concurrency`` clientes a la vez que piden
+dashboards, historiales y páginas de admin. SQLite local responde en
+microsegundos; para medir lo que pasa con un PostgreSQL en otra máquina, cada
+sentencia espera ``--db-latency`` segundos en los servidores (``time.sleep`` en
+el motor síncrono, ``asyncio.sleep`` en el asíncrono: lo que hace cada driver
+mientras espera la red). Informa de peticiones/s, latencias p50/p95/p99,
+errores y los hilos del proceso servidor. Termina con código 1 si algo de lo
+anterior no cuadra, si alguna petición falla (los 503 del descarte de carga se
+cuentan aparte), si el servidor asíncrono necesita
+más de ``--max-async-threads`` hilos para atender a todos los clientes o si no
+llega a ``--min-speedup`` veces las peticiones/s del síncrono (por defecto no se
+exige: con la CPU saturada, aiosqlite paga un salto de hilo por cada llamada al
+driver y el camino asíncrono rinde algo menos; gana cuando los hilos del
+síncrono se quedan esperando a la base de datos).
+
+Uso:
+    python -m benchmarks.async_reads --concurrency 1000 --requests 6000
+    python -m benchmarks.async_reads --db-latency 0.2 --min-speedup 1  # base de datos lenta
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.util.concurrency import await_, in_greenlet
+from werkzeug.serving import BaseWSGIServer
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from benchmarks.common import default_database_url, make_app
+from benchmarks.dataset import generate
+from benchmarks.suite import Fixtures, percentile
+
+# Misma configuración en los dos servidores (sin hilos de fondo ni control de admisión)
+METRICS_TOKEN = "benchmark-metrics"
+SERVER_OVERRIDES = dict(LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0, IDEMPOTENCY_PURGE_INTERVAL=0,
+                        CARD_HOLD_SWEEP_INTERVAL=0, TOKEN_DENYLIST_SYNC_INTERVAL=0, METRICS_TOKEN=METRICS_TOKEN)
+MIX = ("dashboard", "dashboard", "dashboard", "dashboard", "dashboard", "history", "history", "history", "history",
+       "admin")
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Servidor WSGI de werkzeug que atiende las conexiones con un pool fijo de hilos."""
+
+    multithread = True
+    request_queue_size = 4096
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def add_statement_latency(seconds):
+    """Cada sentencia de cualquier motor espera ``seconds`` (la red hasta la base de datos)."""
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _network_round_trip(*_):
+        if in_greenlet():
+            await_(asyncio.sleep(seconds))  # motor asíncrono: libera el bucle de eventos
+        else:
+            time.sleep(seconds)
+
+
+def serve(mode, database_url, port, sync_threads, db_latency):
+    """Proceso servidor (``--serve``)."""
+    if db_latency:
+        add_statement_latency(db_latency)
+    app = make_app(database_url, pool_size=sync_threads if mode == "sync" else 5, **SERVER_OVERRIDES)
+    if mode == "sync":
+        PooledWSGIServer("127.0.0.1", port, app, sync_threads).serve_forever()
+        return
+    import uvicorn
+    from backend.asgi import create_asgi_app
+
+    uvicorn.run(create_asgi_app(flask_app=app), host="127.0.0.1", port=port, log_level="error", backlog=4096,
+                lifespan="on")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, database_url, sync_threads, db_latency, log_path):
+    port = free_port()
+    log_file = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.async_reads", "--serve", mode, "--database-url", database_url,
+         "--port", str(port), "--sync-threads", str(sync_threads), "--db-latency", str(db_latency)],
+        stdout=log_file, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            if fetch(port, "GET", "/metrics", token=METRICS_TOKEN)[0] == 200:
+                return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    with open(log_path) as f:
+        print(f.read()[-3000:])
+    raise RuntimeError(f"El servidor {mode} no arrancó")
+
+
+def fetch(port, method, path, token=None, headers=None, body=None):
+    """``(estado, cabeceras, cuerpo)`` de una petición HTTP al servidor local."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        all_headers = dict(headers or {})
+        if token is not None:
+            all_headers["Authorization"] = f"Bearer {token}"
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            all_headers["Content-Type"] = "application/json"
+        connection.request(method, path, body=payload, headers=all_headers)
+        response = connection.getresponse()
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, response.read()
+    finally:
+        connection.close()
+
+
+def server_threads(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+# Paridad de respuestas
+
+def parity_requests(fixtures, missing_account):
+    user = fixtures.users[0]
+    other = fixtures.users[1]
+    account = user["accounts"][0]
+    admin = fixtures.admin_token
+    return [
+        ("dashboard", "/api/auth/dashboard", user["token"]),
+        ("dashboard de otro cliente", "/api/auth/dashboard", other["token"]),
+        ("historial", f"/api/transactions/history/{account}?limit=20", user["token"]),
+        ("historial, enviadas", f"/api/transactions/history/{account}?limit=5&direction=sent", user["token"]),
+        ("historial, parámetro erróneo", f"/api/transactions/history/{account}?limit=abc", user["token"]),
+        ("historial, cuenta inexistente", f"/api/transactions/history/{missing_account}", user["token"]),
+        ("historial de otro cliente", f"/api/transactions/history/{account}?limit=5", other["token"]),
+        ("historial, como admin", f"/api/transactions/history/{account}?limit=5", admin),
+        ("página de cuentas", "/api/admin/accounts/page?limit=50", admin),
+        ("página de cuentas, filtro", "/api/admin/accounts/page?limit=20&account_type=ahorro", admin),
+        ("página de clientes", "/api/admin/clients?limit=30", admin),
+        ("página de clientes, campos", "/api/admin/clients?limit=10&fields=id,full_name,accounts", admin),
+        ("página de clientes, filtro erróneo", "/api/admin/clients?fields=password", admin),
+        ("listado sin ser admin", "/api/admin/clients?limit=10", user["token"]),
+        ("sin token", "/api/auth/dashboard", None),
+        ("token ilegible", "/api/auth/dashboard", "no-es-un-jwt"),
+    ]
+
+
+def check_parity(ports, fixtures, missing_account):
+    ok = True
+    for name, path, token in parity_requests(fixtures, missing_account):
+        results = {mode: fetch(port, "GET", path, token) for mode, port in ports.items()}
+        (sync_status, _, sync_body), (async_status, _, async_body) = results["sync"], results["async"]
+        same = sync_status == async_status and json.loads(sync_body) == json.loads(async_body)
+        ok &= same
+        print(f"  {name:38s} sync {sync_status} / async {async_status}  {'igual' if same else 'DISTINTO'}")
+    return ok
+
+
+def check_conditional(ports, fixtures):
+    """ETag y 304 (dashboard y listados), ?since y HEAD en los dos servidores."""
+    ok = True
+    user = fixtures.users[2]
+    etags = {}
+    for mode, port in ports.items():
+        status, headers, body = fetch(port, "GET", "/api/auth/dashboard", user["token"])
+        etag = headers.get("etag")
+        etags[mode] = etag
+        revalidated = fetch(port, "GET", "/api/auth/dashboard", user["token"], {"If-None-Match": etag})[0]
+        version = json.loads(body)["version"]
+        delta = json.loads(fetch(port, "GET", f"/api/auth/dashboard?since={version}", user["token"])[2])
+        head_status, head_headers, head_body = fetch(port, "HEAD", "/api/auth/dashboard", user["token"])
+        listing_status, listing_headers, _ = fetch(port, "GET", "/api/admin/accounts/page?limit=10",
+                                                   fixtures.admin_token)
+        listing_revalidated = fetch(port, "GET", "/api/admin/accounts/page?limit=10", fixtures.admin_token,
+                                    {"If-None-Match": listing_headers.get("etag")})[0]
+        mode_ok = (status == 200 and etag is not None and revalidated == 304 and delta.get("full") is False
+                   and head_status == 200 and head_headers.get("etag") == etag and head_body == b""
+                   and listing_status == 200 and listing_revalidated == 304)
+        ok &= mode_ok
+        print(f"  {mode}: dashboard 200 -> If-None-Match {revalidated}, ?since full={delta.get('full')}, "
+              f"HEAD {head_status} ({len(head_body)} bytes), listado {listing_status} -> {listing_revalidated}"
+              f"  {'correcto' if mode_ok else 'INCORRECTO'}")
+    # La versión del dashboard depende solo del contenido: el mismo ETag en los dos
+    ok &= etags["sync"] == etags["async"]
+    return ok
+
+
+def check_write_then_read(port, fixtures):
+    """Una transferencia por el camino WSGI del servidor ASGI invalida el dashboard asíncrono."""
+    sender, receiver = fixtures.users[3], fixtures.users[4]
+    _, before_headers, before = fetch(port, "GET", "/api/auth/dashboard", sender["token"])
+    status, _, _ = fetch(port, "POST", "/api/transactions/transfer", sender["token"], body={
+        "sender_account_id": sender["accounts"][0], "receiver_account_id": receiver["accounts"][0],
+        "amount": 1.25, "description": "Benchmark lecturas asíncronas"})
+    _, after_headers, after = fetch(port, "GET", "/api/auth/dashboard", sender["token"])
+    balance = {account["id"]: account["balance"] for account in json.loads(before)["accounts"]}
+    new_balance = {account["id"]: account["balance"] for account in json.loads(after)["accounts"]}
+    account = sender["accounts"][0]
+    moved = round(float(balance[account]) - float(new_balance[account]), 2)
+    ok = status in (200, 201) and moved == 1.25 and before_headers["etag"] != after_headers["etag"]
+    print(f"  transferencia por WSGI {status}, el dashboard asíncrono baja {moved} y cambia de ETag "
+          f"{'correcto' if ok else 'INCORRECTO'}")
+    return ok
+
+
+def check_metrics(port):
+    text = fetch(port, "GET", "/metrics", token=METRICS_TOKEN)[2].decode("utf-8")
+    routes = ("/api/auth/dashboard", "/api/transactions/history/<int:account_id>", "/api/admin/clients")
+    ok = True
+    for route in routes:
+        key = f'novabank_db_queries_per_request_sum{{route="{route}",method="GET"}}'
+        value = next((float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(key)), 0.0)
+        ok &= value > 0
+        print(f"  /metrics del servidor async: {route} -> {value:.0f} consultas")
+    return ok
+
+
+# Carga
+
+def build_path(kind, n, fixtures):
+    user = fixtures.users[n % len(fixtures.users)]
+    if kind == "dashboard":
+        return "/api/auth/dashboard", user["token"]
+    if kind == "history":
+        return f"/api/transactions/history/{user['accounts'][0]}?limit=20", user["token"]
+    if n % 2:
+        return "/api/admin/accounts/page?limit=50", fixtures.admin_token
+    return "/api/admin/clients?limit=20", fixtures.admin_token
+
+
+async def get(port, path, token):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write((f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {token}\r\n"
+                      f"Connection: close\r\n\r\n").encode("ascii"))
+        await writer.drain()
+        response = await reader.read()
+        return int(response.split(b" ", 2)[1]) if response else 0
+    finally:
+        writer.close()
+
+
+async def run_load(port, pid, fixtures, requests, concurrency):
+    counter = iter(range(requests))
+    latencies, statuses = [], {}
+    peak_threads = [server_threads(pid) or 0]
+
+    async def client():
+        for n in counter:
+            path, token = build_path(MIX[n % len(MIX)], n, fixtures)
+            begin = time.perf_counter()
+            try:
+                status = await get(port, path, token)
+            except (OSError, ValueError, IndexError):
+                status = 0
+            latencies.append(time.perf_counter() - begin)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async def sample_threads():
+        while True:
+            await asyncio.sleep(0.25)
+            peak_threads[0] = max(peak_threads[0], server_threads(pid) or 0)
+
+    sampler = asyncio.create_task(sample_threads())
+    begin = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - begin
+    sampler.cancel()
+    return {
+        "throughput": requests / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        # 503: descarte de carga (la espera por turno venció), como en benchmarks.suite
+        "shed": statuses.get(503, 0),
+        "errors": sum(count for status, count in statuses.items() if status not in (200, 503)),
+        "statuses": dict(sorted(statuses.items())),
+        "threads": peak_threads[0],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000, help="clientes del banco sintético")
+    parser.add_argument("--transactions", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=1000, help="clientes HTTP a la vez")
+    parser.add_argument("--requests", type=int, default=6000)
+    parser.add_argument("--warmup", type=int, default=600)
+    parser.add_argument("--db-latency", type=float, default=0.05, help="espera (s) por sentencia SQL")
+    parser.add_argument("--sync-threads", type=int, default=32, help="hilos del servidor síncrono")
+    parser.add_argument("--min-speedup", type=float, default=0.0,
+                        help="el servidor async debe dar al menos estas veces las peticiones/s del sync")
+    parser.add_argument("--max-async-threads", type=int, default=100,
+                        help="hilos que puede tener el servidor async con todos los clientes conectados")
+    parser.add_argument("--serve", choices=("sync", "async"), help=argparse.SUPPRESS)
+    parser.add_argument("--database-url", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve:
+        serve(args.serve, args.database_url, args.port, args.sync_threads, args.db_latency)
+        return 0
+
+    url = default_database_url("async_reads")
+    app = make_app(url, **SERVER_OVERRIDES)
+    generate(app, args.clients, args.transactions, log=lambda *_: None)
+    fixtures = Fixtures(app)
+    with app.app_context():
+        missing_account = (db.session.execute(select(Account.id).order_by(Account.id.desc())).scalar() or 0) + 1000
+    print(f"Banco: {args.clients} clientes, {args.transactions} transacciones ({url})")
+
+    failed = False
+    processes, ports = {}, {}
+    try:
+        for mode in ("sync", "async"):
+            log_path = os.path.join(tempfile.gettempdir(), f"novabank_async_reads_{mode}.log")
+            processes[mode], ports[mode] = start_server(mode, url, args.sync_threads, args.db_latency, log_path)
+
+        print("Respuestas (sync frente a async):")
+        failed |= not check_parity(ports, fixtures, missing_account)
+        failed |= not check_conditional(ports, fixtures)
+        failed |= not check_write_then_read(ports["async"], fixtures)
+        failed |= not check_metrics(ports["async"])
+
+        print(f"Carga: {args.requests} peticiones, {args.concurrency} clientes a la vez, "
+              f"{args.db_latency * 1000:.0f} ms por sentencia SQL")
+        results = {}
+        for mode in ("sync", "async"):
+            pid = processes[mode].pid
+            asyncio.run(run_load(ports[mode], pid, fixtures, args.warmup, min(args.concurrency, 100)))
+            results[mode] = result = asyncio.run(
+                run_load(ports[mode], pid, fixtures, args.requests, args.concurrency))
+            print(f"  {mode:5s} {result['throughput']:8.0f} pet/s  p50 {result['p50_ms']:7.1f} ms  "
+                  f"p95 {result['p95_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms  "
+                  f"descartadas {result['shed']}  errores {result['errors']}  hilos del servidor {result['threads']}  {result['statuses']}")
+            failed |= result["errors"] > 0
+        speedup = results["async"]["throughput"] / results["sync"]["throughput"]
+        print(f"  async / sync: {speedup:.2f}x")
+        failed |= speedup < args.min_speedup
+        failed |= results["async"]["threads"] > args.max_async_threads
+    finally:
+        for process in processes.values():
+            process.terminate()
+            process.wait(timeout=10)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
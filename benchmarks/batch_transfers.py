@@ -0,0 +1,85 @@
+# benchmarks/batch_transfers.py
+"""
+Compara una nómina aplicada transferencia a transferencia con el motor por lotes.
+
+Uso:
+    python -m benchmarks.batch_transfers --legs 10000 --employees 2000
+"""
+import argparse
+import random
+import sys
+import time
+
+from sqlalchemy import func, insert, select
+
+from backend.database.models import db, Client, Account
+from backend.services.batch_transfers import execute_batch, MODE_BEST_EFFORT
+from backend.services.transfer_engine import execute_transfer
+from benchmarks.common import default_database_url, make_app
+
+
+def seed(app, n_accounts, payer_balance):
+    with app.app_context():
+        client = Client(full_name="Payroll", email="payroll@novabank.test", phone_number="0",
+                        cip="PAYROLL", password_hash="x")
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client.id, "account_type": "corriente", "balance": payer_balance if i == 0 else 0.0,
+             "account_number": str(i).zfill(10)}
+            for i in range(n_accounts + 1)
+        ])
+        db.session.commit()
+        return [row.id for row in db.session.execute(select(Account.id).order_by(Account.id))]
+
+
+def make_legs(account_ids, n_legs):
+    payer, employees = account_ids[0], account_ids[1:]
+    return [{"sender_account_id": payer, "receiver_account_id": random.choice(employees),
+             "amount": round(random.uniform(100, 900), 2), "description": "nomina"}
+            for _ in range(n_legs)]
+
+
+def total_balance(app):
+    with app.app_context():
+        return db.session.execute(select(func.sum(Account.balance))).scalar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--legs", type=int, default=10000)
+    parser.add_argument("--employees", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for label in ("por_transferencia", "lote"):
+        url = args.database_url or default_database_url(f"batch_{label}")
+        app = make_app(url)
+        account_ids = seed(app, args.employees, payer_balance=args.legs * 1000.0)
+        legs = make_legs(account_ids, args.legs)
+        with app.app_context():
+            start = time.perf_counter()
+            if label == "lote":
+                summary = execute_batch(legs, mode=MODE_BEST_EFFORT)
+                applied = summary["applied"]
+            else:
+                applied = 0
+                for leg in legs:
+                    execute_transfer(leg["sender_account_id"], leg["receiver_account_id"],
+                                     leg["amount"], leg["description"])
+                    applied += 1
+            elapsed = time.perf_counter() - start
+        results[label] = elapsed
+        print(f"{label:>18}: {applied} transferencias en {elapsed:.2f}s ({applied / elapsed:.0f}/s), "
+              f"saldo total {total_balance(app):.2f}")
+        if args.database_url:
+            with app.app_context():
+                db.drop_all()
+
+    print(f"Aceleración del lote: x{results['por_transferencia'] / results['lote']:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
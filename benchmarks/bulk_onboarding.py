@@ -0,0 +1,120 @@
+# benchmarks/bulk_onboarding.py
+"""
+Rendimiento de ``flask clients import`` frente a /api/auth/register.
+
+Genera un NDJSON de clientes (con un porcentaje de contraseñas ya hasheadas,
+duplicados e inválidos), lo importa con la CLI y mide clientes/s. Después
+interrumpe una segunda importación a mitad (``--stop-after``) y comprueba que
+al reanudar desde el checkpoint no se crea ningún cliente dos veces.
+Termina con código 1 si el número de clientes o cuentas no es el esperado.
+
+Uso:
+    python -m benchmarks.bulk_onboarding --clients 20000 --chunk-size 1000 --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from backend.database.models import db, Account, Client
+from backend.services.password_kdf import hash_password
+from benchmarks.common import default_database_url, make_app
+
+PASSWORD = "secreto123"
+
+
+def write_clients(path, n_clients, prehashed_ratio, method):
+    prehashed = hash_password(PASSWORD, method, 12)
+    expected = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n_clients):
+            record = {"full_name": f"Cliente {i}", "email": f"m{i}@partner.test", "phone_number": "0",
+                      "cip": f"P-{i}"}
+            if i % 100 == 99:
+                record["email"] = f"m{i - 2}@partner.test"  # duplicado de un registro válido
+            elif i % 100 == 98:
+                record["cip"] = ""  # inválido
+            else:
+                expected += 1
+            if (i % 100) / 100 < prehashed_ratio:
+                record["password_hash"] = prehashed
+            else:
+                record["password"] = PASSWORD
+            f.write(json.dumps(record) + "\n")
+    return expected
+
+
+def count_rows(app):
+    with app.app_context():
+        return (db.session.execute(select(func.count()).select_from(Client)).scalar_one(),
+                db.session.execute(select(func.count(func.distinct(Account.account_number)))).scalar_one())
+
+
+def register_rate(app, n):
+    client = app.test_client()
+    start = time.perf_counter()
+    for i in range(n):
+        client.post("/api/auth/register", json={"full_name": f"R {i}", "email": f"r{i}@novabank.test",
+                                                "phone_number": "0", "cip": f"R-{i}", "password": PASSWORD})
+    return n / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--method", default="pbkdf2:sha256:10000",
+                        help="KDF para las contraseñas en claro del archivo")
+    parser.add_argument("--prehashed", type=float, default=0.5,
+                        help="fracción de registros que ya traen password_hash")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="novabank_onboarding_")
+    path = os.path.join(workdir, "clientes.ndjson")
+    expected = write_clients(path, args.clients, args.prehashed, args.method)
+    overrides = dict(PASSWORD_HASH_METHOD=args.method, PASSWORD_HASH_WORKERS=0, LOG_LEVEL="ERROR")
+
+    app = make_app(default_database_url("onboarding_register"), **overrides)
+    print(f"== /api/auth/register secuencial: {register_rate(app, 200):.0f} clientes/s")
+
+    app = make_app(default_database_url("onboarding"), **overrides)
+    runner = app.test_cli_runner()
+    start = time.perf_counter()
+    result = runner.invoke(args=["clients", "import", path, "--chunk-size", str(args.chunk_size),
+                                 "--workers", str(args.workers), "--restart"])
+    wall = time.perf_counter() - start
+    clients, accounts = count_rows(app)
+    print(f"== clients import: {args.clients} registros en {wall:.1f} s "
+          f"({args.clients / wall:.0f} registros/s)  clientes {clients}  cuentas {accounts}")
+    print("   " + result.output.strip().splitlines()[-1])
+    failed = clients != expected or accounts != expected
+
+    # Reanudación: checkpoint a mitad del archivo y una parte de ese bloque ya confirmada
+    app = make_app(default_database_url("onboarding_resume"), **overrides)
+    runner = app.test_cli_runner()
+    half = (args.clients // 2 // args.chunk_size) * args.chunk_size
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    partial = os.path.join(workdir, "parcial.ndjson")
+    with open(partial, "w", encoding="utf-8") as f:
+        f.writelines(lines[:half + args.chunk_size])
+    runner.invoke(args=["clients", "import", partial, "--chunk-size", str(args.chunk_size), "--workers", "0",
+                        "--checkpoint", os.path.join(workdir, "ck.json"), "--restart"])
+    # Se simula la caída entre el commit del último bloque y su checkpoint
+    with open(os.path.join(workdir, "ck.json"), "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(path), "next_index": half}, f)
+    result = runner.invoke(args=["clients", "import", path, "--chunk-size", str(args.chunk_size),
+                                 "--workers", "0", "--checkpoint", os.path.join(workdir, "ck.json")])
+    clients, accounts = count_rows(app)
+    print(f"== reanudación desde {half}: clientes {clients}  cuentas {accounts}  (esperados {expected})")
+    failed |= clients != expected or accounts != expected
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# benchmarks/card_authorizations.py
+"""
+Rendimiento de las autorizaciones de pagos con tarjeta (retenciones).
+
+Varios terminales concurrentes (hilos) autorizan pagos contra un conjunto
+pequeño de tarjetas, de modo que todas compiten por las mismas pocas cuentas.
+Informa autorizaciones por segundo y latencias, y después comprueba el ciclo
+completo:
+  * captura parcial de un tercio, anulación de otro tercio y barrido de las
+    vencidas, con capturas concurrentes al barrido que deben fallar con 409,
+  * al final no queda nada retenido, el dinero total no cambia y el comercio
+    recibió exactamente lo capturado,
+  * una autorización sin saldo disponible se rechaza (402) y lo retenido no se
+    puede transferir.
+Termina con código 1 si algo no cuadra.
+
+Uso:
+    python -m benchmarks.card_authorizations --cards 8 --terminals 8 --authorizations 250
+"""
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func, insert, select, update
+
+from backend.database.models import db, Client, Account, Card, PaymentHold
+from backend.services.card_payments import get_card_index, sweep_expired_holds
+from benchmarks.common import default_database_url, make_app
+
+INITIAL_BALANCE = 1_000_000.0
+
+
+def seed(app, cards):
+    with app.app_context():
+        client = Client(full_name="Tarjetas", email="cards@novabank.test", phone_number="0", cip="CARD",
+                        password_hash="x")
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client.id, "account_type": "ahorro", "balance": INITIAL_BALANCE if i else 0.0,
+             "account_number": str(i).zfill(10)}
+            for i in range(cards + 2)  # 0 = comercio, la última = cuenta con poco saldo
+        ])
+        account_ids = db.session.execute(select(Account.id).order_by(Account.id)).scalars().all()
+        merchant, funded, poor = account_ids[0], account_ids[1:-1], account_ids[-1]
+        db.session.execute(update(Account.__table__).where(Account.id == poor).values(balance=10.0))
+        db.session.execute(insert(Card.__table__), [
+            {"client_id": client.id, "card_number": f"400000{i:010d}", "card_type": "debito", "provider": "VISA",
+             "account_id": account_id}
+            for i, account_id in enumerate(funded + [poor])
+        ])
+        db.session.commit()
+        token = create_access_token(identity=str(client.id))
+        numbers = [f"400000{i:010d}" for i in range(len(funded) + 1)]
+        return merchant, funded + [poor], numbers, {"Authorization": f"Bearer {token}"}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=8)
+    parser.add_argument("--terminals", type=int, default=8, help="hilos autorizando a la vez")
+    parser.add_argument("--authorizations", type=int, default=250, help="autorizaciones por terminal")
+    args = parser.parse_args(argv)
+
+    url = default_database_url("card_authorizations")
+    app = make_app(url, pool_size=args.terminals + 4, LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0,
+                   IDEMPOTENCY_PURGE_INTERVAL=0, CARD_HOLD_SWEEP_INTERVAL=0)
+    merchant, accounts, numbers, headers = seed(app, args.cards)
+    card_numbers, poor_card = numbers[:-1], numbers[-1]
+    with app.app_context():
+        get_card_index().warm(db.session.connection())
+    failed = False
+
+    holds, latencies, statuses = [], [], {}
+    lock = threading.Lock()
+
+    def terminal(seed_value):
+        rng = random.Random(seed_value)
+        http = app.test_client()
+        for _ in range(args.authorizations):
+            body = {"card_number": rng.choice(card_numbers), "amount": rng.randint(1, 100),
+                    "merchant_account_id": merchant}
+            begin = time.perf_counter()
+            response = http.post("/api/payments", json=body, headers=headers)
+            elapsed = time.perf_counter() - begin
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 201:
+                    data = response.get_json()
+                    holds.append((data["payment_id"], data["amount"]))
+
+    total = args.terminals * args.authorizations
+    begin = time.perf_counter()
+    threads = [threading.Thread(target=terminal, args=(n,)) for n in range(args.terminals)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - begin
+    with app.app_context():
+        index_stats = get_card_index().cache.stats()
+    print(f"  {total} autorizaciones sobre {len(card_numbers)} tarjetas en {elapsed:.2f} s "
+          f"({total / elapsed:.0f}/s) {statuses}")
+    print(f"  latencia p50 {statistics.median(latencies) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms;"
+          f" índice de tarjetas: {index_stats['hits']} aciertos, {index_stats['misses']} fallos")
+    failed |= len(holds) != total
+
+    http = app.test_client()
+    thirds = len(holds) // 3
+    captured = 0.0
+    for payment_id, amount in holds[:thirds]:
+        response = http.post(f"/api/payments/{payment_id}/capture", json={"amount": amount / 2}, headers=headers)
+        failed |= response.status_code != 200
+        captured += amount / 2
+    for payment_id, _ in holds[thirds:2 * thirds]:
+        failed |= http.post(f"/api/payments/{payment_id}/void", headers=headers).status_code != 200
+
+    stale = [payment_id for payment_id, _ in holds[2 * thirds:]]
+    with app.app_context():
+        db.session.execute(update(PaymentHold.__table__).where(PaymentHold.id.in_(stale))
+                           .values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+
+    late_captures = {}
+
+    def capture_late(ids):
+        client = app.test_client()
+        for payment_id in ids:
+            status = client.post(f"/api/payments/{payment_id}/capture", headers=headers).status_code
+            with lock:
+                late_captures[status] = late_captures.get(status, 0) + 1
+
+    def sweep():
+        with app.app_context():
+            swept.append(sweep_expired_holds(chunk_size=100))
+
+    swept = []
+    racers = [threading.Thread(target=sweep), threading.Thread(target=capture_late, args=(stale[:50],))]
+    for t in racers:
+        t.start()
+    for t in racers:
+        t.join()
+    with app.app_context():
+        swept.append(sweep_expired_holds(chunk_size=100))
+    print(f"  capturadas {thirds} (parcialmente), anuladas {thirds}, vencidas por el barrido {sum(swept)} "
+          f"de {len(stale)}; capturas tardías: {late_captures}")
+    failed |= sum(swept) != len(stale) or bool(set(late_captures) - {409})
+
+    with app.app_context():
+        held = db.session.execute(select(func.sum(Account.held_amount))).scalar_one()
+        total_balance = db.session.execute(select(func.sum(Account.balance))).scalar_one()
+        merchant_balance = db.session.get(Account, merchant).total_balance
+        by_status = dict(db.session.execute(select(PaymentHold.status, func.count()).group_by(PaymentHold.status)).all())
+    expected_total = INITIAL_BALANCE * (len(accounts) - 1) + 10.0
+    print(f"  retenido al final {held:.6f}, descuadre del total {abs(total_balance - expected_total):.6f}, "
+          f"comercio {merchant_balance:.2f} (capturado {captured:.2f}); estados {by_status}")
+    failed |= abs(held) > 1e-6 or abs(total_balance - expected_total) > 1e-6 or abs(merchant_balance - captured) > 1e-6
+
+    poor_account = accounts[-1]
+    held_ok = http.post("/api/payments", json={"card_number": poor_card, "amount": 8, "merchant_account_id": merchant},
+                        headers=headers).status_code
+    declined = http.post("/api/payments", json={"card_number": poor_card, "amount": 5, "merchant_account_id": merchant},
+                         headers=headers).status_code
+    transfer = http.post("/api/transactions/transfer", headers=headers, json={
+        "sender_account_id": poor_account, "receiver_account_id": merchant, "amount": 5}).status_code
+    print(f"  cuenta con 10.00: retención de 8 -> {held_ok}, otra de 5 -> {declined}, transferencia de 5 -> {transfer}")
+    failed |= held_ok != 201 or declined != 402 or transfer != 400
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
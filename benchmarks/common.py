@@ -0,0 +1,40 @@
+# benchmarks/common.py
+"""Utilidades compartidas por los scripts de benchmarks."""
+import os
+import tempfile
+
+from backend.main import create_app
+from backend.database.models import db
+
+
+def default_database_url(name):
+    """Base de datos SQLite desechable en el directorio temporal del sistema."""
+    path = os.path.join(tempfile.gettempdir(), f"novabank_{name}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    return f"sqlite:///{path}"
+
+
+def make_app(database_url, pool_size=5, **overrides):
+    """
+    Crea la aplicación apuntando a ``database_url`` y con el esquema creado.
+    Para bases de datos locales (SQLite o un PostgreSQL de pruebas) basta con
+    ``db.create_all()``; no se ejecutan las migraciones. Los límites de tasa y
+    el descarte de carga van desactivados salvo que se pidan: los scripts miden
+    el sistema, no el control de admisión. Todo corre en un proceso, así que la
+    caché del dashboard usa el backend compartido local.
+    """
+    config = {
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "SQLALCHEMY_ENGINE_OPTIONS": {"pool_size": pool_size, "max_overflow": pool_size},
+        "RATE_LIMIT_ENABLED": False,
+        "LOAD_SHED_MAX_INFLIGHT": 0,
+        "DASHBOARD_CACHE_BACKEND": "local",
+    }
+    if database_url.startswith("sqlite"):
+        config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"] = {"timeout": 30}
+    config.update(overrides)
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+    return app
@@ -0,0 +1,204 @@
+# benchmarks/dashboard_etags.py
+"""
+GET condicional (ETag/304) y sincronización por deltas del dashboard y de los
+listados de administración.
+
+Con ``--clients`` clientes (una cuenta y una tarjeta cada uno) comprueba que:
+  * un ``If-None-Match`` vigente en ``/api/auth/dashboard`` se responde 304 sin
+    ninguna sentencia SQL, y deja de valer después de una transferencia,
+  * ``?since=<versión>`` devuelve solo la cuenta cambiada y la transacción nueva,
+    y aplicar el delta a la copia anterior da lo mismo que la respuesta completa,
+  * una versión desconocida o de otro cliente cae a la respuesta completa,
+  * el vencimiento de una retención (barrido en segundo plano) también cambia
+    la versión,
+  * ``/api/admin/accounts/page`` y ``/api/admin/clients`` responden 304 sin SQL
+    hasta la siguiente escritura, y el ETag de MessagePack es distinto del JSON.
+Informa los bytes y la latencia mediana de una visita sin cambios (304) frente a
+la respuesta completa. Termina con código 1 si algo no cuadra.
+
+Uso:
+    python -m benchmarks.dashboard_etags --clients 50 --requests 500
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert, text, update
+
+from backend.database.models import db, Account, Card, Client, PaymentHold
+from backend.services import serialization
+from backend.services.card_payments import sweep_expired_holds
+from backend.services.dashboard import invalidate_clients
+from benchmarks.common import default_database_url, make_app
+
+INITIAL_BALANCE = 1000.0
+
+
+def seed(app, clients):
+    with app.app_context():
+        db.session.execute(insert(Client.__table__), [
+            {"full_name": f"ETag {n}", "email": f"etag{n}@novabank.test", "phone_number": "0", "cip": f"ETG{n}",
+             "password_hash": "x", "is_admin": n == 0}
+            for n in range(clients)
+        ])
+        client_ids = db.session.execute(text("SELECT id FROM clients ORDER BY id")).scalars().all()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client_id, "account_type": "ahorro", "balance": INITIAL_BALANCE,
+             "account_number": str(client_id).zfill(10)}
+            for client_id in client_ids
+        ])
+        db.session.execute(insert(Card.__table__), [
+            {"client_id": client_id, "card_type": "debito", "card_number": str(client_id).zfill(16),
+             "provider": "VISA"}
+            for client_id in client_ids
+        ])
+        db.session.commit()
+        account_ids = db.session.execute(text("SELECT id FROM accounts ORDER BY client_id")).scalars().all()
+        tokens = [create_access_token(identity=str(client_id), additional_claims={"is_admin": n == 0})
+                  for n, client_id in enumerate(client_ids)]
+    return client_ids, account_ids, [{"Authorization": f"Bearer {token}"} for token in tokens]
+
+
+def count_statements(app):
+    counter = {"statements": 0}
+
+    def count(*_):
+        counter["statements"] += 1
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count)
+    return counter
+
+
+def conditional(http, path, headers, etag):
+    return http.get(path, headers={**headers, "If-None-Match": etag})
+
+
+def apply_delta(previous, delta):
+    """Lo mismo que hace el frontend (authService.getDashboard) con un delta."""
+    def merge(items, changed, removed):
+        by_id = {item["id"]: item for item in items}
+        for item_id in removed:
+            by_id.pop(item_id, None)
+        by_id.update((item["id"], item) for item in changed)
+        return sorted(by_id.values(), key=lambda item: item["id"])
+
+    return {
+        "client": delta.get("client", previous["client"]),
+        "accounts": merge(previous["accounts"], delta["accounts"], delta["removed_accounts"]),
+        "cards": merge(previous["cards"], delta["cards"], delta["removed_cards"]),
+    }
+
+
+def median_latency(http, path, headers, requests):
+    samples = []
+    for _ in range(requests):
+        begin = time.perf_counter()
+        http.get(path, headers=headers)
+        samples.append(time.perf_counter() - begin)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500, help="peticiones por medición de latencia")
+    args = parser.parse_args(argv)
+
+    app = make_app(default_database_url("dashboard_etags"), LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0,
+                   IDEMPOTENCY_PURGE_INTERVAL=0, CARD_HOLD_SWEEP_INTERVAL=0, TOKEN_DENYLIST_SYNC_INTERVAL=0)
+    client_ids, accounts, headers = seed(app, args.clients)
+    http = app.test_client()
+    http.get("/api/auth/dashboard", headers=headers[0])  # carga la lista de revocación
+    counter = count_statements(app)
+    failed = False
+    dashboard, user = "/api/auth/dashboard", headers[1]
+
+    # 304 sin SQL mientras nada cambia
+    first = http.get(dashboard, headers=user)
+    etag, version = first.headers.get("ETag"), first.get_json()["version"]
+    counter["statements"] = 0
+    unchanged = conditional(http, dashboard, user, etag)
+    statements_304 = counter["statements"]
+    print(f"  dashboard: 200 con ETag {etag} ({len(first.data)} bytes); If-None-Match -> {unchanged.status_code} "
+          f"({len(unchanged.data)} bytes, {statements_304} sentencias SQL)")
+    failed |= etag is None or unchanged.status_code != 304 or statements_304 != 0
+
+    full_latency = median_latency(http, dashboard, {**user, "Cache-Control": "no-cache"}, args.requests)
+    not_modified_latency = median_latency(http, dashboard, {**user, "If-None-Match": etag}, args.requests)
+    print(f"  latencia mediana: respuesta completa (desde la caché) {full_latency * 1e6:.0f} µs, "
+          f"304 {not_modified_latency * 1e6:.0f} µs")
+
+    # Una transferencia cambia la versión; el delta trae solo lo cambiado
+    status = http.post("/api/transactions/transfer", headers=user, json={
+        "sender_account_id": accounts[1], "receiver_account_id": accounts[2], "amount": 100}).status_code
+    stale = conditional(http, dashboard, user, etag).status_code
+    delta_response = http.get(f"{dashboard}?since={version}", headers=user)
+    delta = delta_response.get_json()
+    after = http.get(dashboard, headers=user).get_json()
+    merged = apply_delta(first.get_json(), delta)
+    expected = {key: after[key] for key in ("client", "accounts", "cards")}
+    print(f"  transferencia {status}; ETag viejo -> {stale}; delta ({len(delta_response.data)} bytes): "
+          f"{len(delta['accounts'])} cuentas, {len(delta['cards'])} tarjetas, "
+          f"{len(delta['transactions'])} transacciones, cliente incluido={'client' in delta}; "
+          f"delta aplicado == completo: {merged == expected}")
+    failed |= status != 200 or stale != 200 or delta["full"] or merged != expected
+    failed |= [account["balance"] for account in delta["accounts"]] != [INITIAL_BALANCE - 100]
+    failed |= len(delta["transactions"]) != 1 or delta["cards"] or "client" in delta
+
+    # Versiones desconocidas o de otro cliente: respuesta completa
+    other = http.get(dashboard, headers=headers[2]).get_json()["version"]
+    fallbacks = [http.get(f"{dashboard}?since={since}", headers=user).get_json()["full"]
+                 for since in ("basura", other, f"{client_ids[1]}.999.00000000")]
+    print(f"  versiones desconocidas / de otro cliente -> respuesta completa: {fallbacks}")
+    failed |= fallbacks != [True, True, True]
+
+    # El barrido de retenciones vencidas también invalida el dashboard
+    with app.app_context():
+        past = datetime.utcnow() - timedelta(minutes=5)
+        db.session.execute(insert(PaymentHold.__table__).values(
+            id=uuid.uuid4().hex, client_id=client_ids[1], account_id=accounts[1], merchant_account_id=accounts[3],
+            amount=50.0, status="authorized", created_at=past, expires_at=past))
+        db.session.execute(update(Account.__table__).where(Account.id == accounts[1]).values(held_amount=50.0))
+        db.session.commit()
+        invalidate_clients([client_ids[1]])  # como al autorizar el pago
+    version = http.get(dashboard, headers=user).get_json()["version"]
+    with app.app_context():
+        swept = sweep_expired_holds()
+    swept_delta = http.get(f"{dashboard}?since={version}", headers=user).get_json()
+    print(f"  barrido de retenciones: {swept} vencida(s); versión {version} -> {swept_delta['version']}, "
+          f"cuentas en el delta {len(swept_delta['accounts'])}")
+    failed |= swept != 1 or swept_delta["version"] == version or len(swept_delta["accounts"]) != 1
+
+    # Listados de administración
+    admin = headers[0]
+    listing_results = []
+    for path in ("/api/admin/accounts/page?limit=100", "/api/admin/clients?limit=20"):
+        response = http.get(path, headers=admin)
+        listing_etag = response.headers.get("ETag")
+        counter["statements"] = 0
+        repeated = conditional(http, path, admin, listing_etag)
+        statements = counter["statements"]
+        http.post("/api/transactions/transfer", headers=headers[3], json={
+            "sender_account_id": accounts[3], "receiver_account_id": accounts[4], "amount": 1})
+        changed = conditional(http, path, admin, listing_etag)
+        print(f"  {path}: If-None-Match -> {repeated.status_code} ({statements} sentencias SQL); "
+              f"tras una transferencia -> {changed.status_code} (ETag nuevo {changed.headers.get('ETag')})")
+        listing_results.append((repeated.status_code, statements, changed.status_code))
+        failed |= listing_etag is None or changed.headers.get("ETag") == listing_etag
+    failed |= any(result != (304, 0, 200) for result in listing_results)
+
+    if serialization.msgpack is not None:
+        packed = http.get("/api/admin/accounts/page?limit=100", headers={**admin, "Accept": "application/msgpack"})
+        plain = http.get("/api/admin/accounts/page?limit=100", headers=admin)
+        print(f"  ETag JSON {plain.headers.get('ETag')} / MessagePack {packed.headers.get('ETag')}")
+        failed |= packed.headers.get("ETag") == plain.headers.get("ETag")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
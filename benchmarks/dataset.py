@@ -0,0 +1,289 @@
+# benchmarks/dataset.py
+"""
+Generador determinista de un banco sintético grande para los benchmarks.
+
+Con la misma semilla y los mismos tamaños produce siempre las mismas filas:
+  * clientes (el primero es administrador; todos con la contraseña
+    ``PASSWORD``, hasheada una sola vez con el método configurado),
+  * cuentas: 1 a 4 por cliente, sesgado hacia 1, con números de cuenta válidos
+    (dígito de control) y saldos de apertura log-normales,
+  * tarjetas: 0 a 3 por cliente, con BIN del proveedor y Luhn válidos,
+  * transacciones repartidas en ``days`` días hasta ``end``: los emisores con un
+    sesgo suave y los receptores con uno fuerte (unas pocas cuentas "comercio"
+    reciben gran parte de los pagos). Ninguna deja un saldo negativo.
+Los saldos finales cuadran con las transacciones y, salvo ``derived=False``,
+también se escriben los asientos del libro mayor (apertura y transferencias) y
+se reconstruyen los totales diarios, así que todas las rutas ven datos
+coherentes. Las series de números se adelantan por encima de lo generado.
+
+Se inserta por bloques con un commit por bloque (executemany), con ids
+explícitos a partir del mayor existente. Funciona sobre SQLite y PostgreSQL.
+
+Uso:
+    python -m benchmarks.dataset --database-url sqlite:////tmp/banco.db --profile 100k
+    python -m benchmarks.dataset --database-url postgresql+psycopg://localhost/novabank_bench --profile 10m
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.card import Card
+from backend.database.models.client import Client
+from backend.database.models.ledger import LedgerEntry
+from backend.database.models.number_sequence import NumberSequence
+from backend.database.models.transaction import Transaction
+from backend.services.ledger import ENTRY_OPENING, transfer_entries
+from backend.services.number_allocator import (
+    ACCOUNT_NUMBER_LENGTH,
+    ACCOUNT_SEQUENCE,
+    CARD_NUMBER_LENGTH,
+    account_check_digit,
+    luhn_check_digit,
+    parse_bin_prefixes,
+)
+from backend.services.password_kdf import hash_password
+from backend.services.rollups import rebuild_rollups
+
+PASSWORD = "benchmark123"
+DEFAULT_SEED = 20240601
+DEFAULT_END = datetime(2024, 6, 1)
+CHUNK_SIZE = 10000
+
+# Tamaños predefinidos: (clientes, transacciones). Cuentas ~1.6 y tarjetas ~1.2 por cliente
+PROFILES = {
+    "1k": (1000, 5000),
+    "10k": (10000, 50000),
+    "100k": (100000, 500000),
+    "1m": (1000000, 5000000),
+    "10m": (2000000, 10000000),
+}
+
+ACCOUNT_TYPES = ("ahorro", "corriente")
+CARD_TYPES = ("debito", "credito")
+ACCOUNTS_PER_CLIENT = (1, 2, 3, 4)
+ACCOUNTS_WEIGHTS = (60, 25, 10, 5)
+CARDS_PER_CLIENT = (0, 1, 2, 3)
+CARDS_WEIGHTS = (20, 50, 20, 10)
+SENDER_SKEW = 1.5  # índice = n * u ** sesgo: cuanto mayor, más concentrado en las primeras cuentas
+RECEIVER_SKEW = 4.0
+DESCRIPTIONS = ("Pago de servicios", "Transferencia", "Compra", "Alquiler", "Nómina", "Reembolso")
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _next_id(conn, column):
+    return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _account_number(serial):
+    body = str(serial).zfill(ACCOUNT_NUMBER_LENGTH - 1)
+    return body + account_check_digit(body)
+
+
+def _card_number(prefix, serial):
+    body = prefix + str(serial).zfill(CARD_NUMBER_LENGTH - 1 - len(prefix))
+    return body + luhn_check_digit(body)
+
+
+def _max_serial(conn, column, prefix, length):
+    """Mayor serial ya usado con ese formato (los números generados van por encima)."""
+    number = conn.execute(
+        select(func.max(column)).where(func.length(column) == length).where(column.like(f"{prefix}%"))
+    ).scalar()
+    serial = number[len(prefix):-1] if number else ""
+    return int(serial) if serial.isdigit() else 0
+
+
+def _advance_sequence(conn, name, next_value):
+    """Deja la serie del asignador por encima de los números generados."""
+    table = NumberSequence.__table__
+    current = conn.execute(select(table.c.next_value).where(table.c.name == name)).scalar()
+    if current is None:
+        conn.execute(insert(table).values(name=name, next_value=next_value))
+    elif current < next_value:
+        conn.execute(update(table).where(table.c.name == name).values(next_value=next_value))
+
+
+def generate(app, clients, transactions, seed=DEFAULT_SEED, days=90, end=DEFAULT_END, derived=True, log=print):
+    """
+    Carga el banco sintético en la base de datos de ``app``. Devuelve un resumen
+    con los tamaños, los ids del primer cliente y cuenta generados y los tiempos.
+    """
+    rng = random.Random(seed)
+    config = app.config
+    timings = {}
+    begin = time.perf_counter()
+    with app.app_context():
+        engine = db.engine
+        password_hash = hash_password(PASSWORD, config.get("PASSWORD_HASH_METHOD", "scrypt"),
+                                      config.get("PASSWORD_BCRYPT_ROUNDS", 12))
+        prefixes = sorted(parse_bin_prefixes(config.get("CARD_BIN_PREFIXES")).items())
+        with engine.connect() as conn:
+            first_client = _next_id(conn, Client.id)
+            first_account = _next_id(conn, Account.id)
+            first_card = _next_id(conn, Card.id)
+            first_transaction = _next_id(conn, Transaction.id)
+            account_serial = _max_serial(conn, Account.account_number, "", ACCOUNT_NUMBER_LENGTH) + 1
+            card_serials = {prefix: _max_serial(conn, Card.card_number, prefix, CARD_NUMBER_LENGTH) + 1
+                            for _, prefix in prefixes}
+
+        start = end - timedelta(days=days)
+        balances = []
+        counts = {"clients": 0, "accounts": 0, "cards": 0}
+        for chunk_start in range(0, clients, CHUNK_SIZE):
+            client_rows, account_rows, card_rows = [], [], []
+            for n in range(chunk_start, min(clients, chunk_start + CHUNK_SIZE)):
+                client_id = first_client + n
+                client_rows.append({
+                    "id": client_id, "full_name": f"Cliente Sintético {client_id}",
+                    "email": f"bench{client_id}@novabank.test", "phone_number": f"6{client_id % 10 ** 7:07d}",
+                    "cip": f"BN{client_id:010d}", "password_hash": password_hash, "is_admin": n == 0,
+                })
+                for _ in range(rng.choices(ACCOUNTS_PER_CLIENT, ACCOUNTS_WEIGHTS)[0]):
+                    balance = round(rng.lognormvariate(7.5, 1.2), 2)
+                    account_rows.append({
+                        "id": first_account + len(balances), "client_id": client_id,
+                        "account_type": ACCOUNT_TYPES[rng.random() < 0.3], "balance": balance,
+                        "account_number": _account_number(account_serial + len(balances)),
+                        "created_at": start - timedelta(days=rng.randrange(1, 3650)),
+                    })
+                    balances.append(balance)
+                for _ in range(rng.choices(CARDS_PER_CLIENT, CARDS_WEIGHTS)[0]):
+                    provider, prefix = prefixes[rng.randrange(len(prefixes))]
+                    card_rows.append({
+                        "id": first_card + counts["cards"] + len(card_rows), "client_id": client_id,
+                        "card_type": CARD_TYPES[rng.random() < 0.4], "provider": provider,
+                        "card_number": _card_number(prefix, card_serials[prefix]),
+                    })
+                    card_serials[prefix] += 1
+            with engine.begin() as conn:
+                conn.execute(insert(Client.__table__), client_rows)
+                conn.execute(insert(Account.__table__), account_rows)
+                if card_rows:
+                    conn.execute(insert(Card.__table__), card_rows)
+                if derived:
+                    conn.execute(insert(LedgerEntry.__table__), [
+                        {"account_id": row["id"], "transaction_id": None, "entry_type": ENTRY_OPENING,
+                         "amount": row["balance"], "created_at": row["created_at"]}
+                        for row in account_rows
+                    ])
+            counts["clients"] += len(client_rows)
+            counts["accounts"] += len(account_rows)
+            counts["cards"] += len(card_rows)
+        timings.update(counts)
+        log(f"  {counts['clients']} clientes, {counts['accounts']} cuentas, {counts['cards']} tarjetas "
+            f"({time.perf_counter() - begin:.1f} s)")
+
+        n_accounts = len(balances)
+        step = days * 86400 / max(1, transactions)
+        ledger = []
+
+        def transaction_rows():
+            for n in range(transactions):
+                for _ in range(8):  # busca un emisor con saldo
+                    sender = int(n_accounts * rng.random() ** SENDER_SKEW)
+                    if balances[sender] >= 1:
+                        break
+                receiver = int(n_accounts * rng.random() ** RECEIVER_SKEW)
+                if receiver == sender:
+                    receiver = (receiver + 1) % n_accounts
+                amount = round(min(rng.lognormvariate(3.5, 1.1), balances[sender] * 0.5), 2)
+                if amount < 0.01:
+                    continue
+                balances[sender] = round(balances[sender] - amount, 2)
+                balances[receiver] = round(balances[receiver] + amount, 2)
+                transaction_id = first_transaction + n
+                timestamp = start + timedelta(seconds=n * step + rng.random() * step)
+                sender_id, receiver_id = first_account + sender, first_account + receiver
+                if derived:
+                    ledger.extend(transfer_entries(transaction_id, sender_id, receiver_id, amount, timestamp))
+                yield {"id": transaction_id, "sender_account_id": sender_id, "receiver_account_id": receiver_id,
+                       "amount": amount, "description": DESCRIPTIONS[n % len(DESCRIPTIONS)], "timestamp": timestamp}
+
+        table = Transaction.__table__
+        timings["transactions"] = 0
+        timings["ledger_entries"] = counts["accounts"] if derived else 0
+        for chunk in _chunks(transaction_rows()):
+            with engine.begin() as conn:
+                conn.execute(insert(table), chunk)
+                if ledger:
+                    conn.execute(insert(LedgerEntry.__table__), ledger)
+            timings["transactions"] += len(chunk)
+            timings["ledger_entries"] += len(ledger)
+            ledger.clear()
+        log(f"  {timings['transactions']} transacciones ({time.perf_counter() - begin:.1f} s)")
+
+        # Saldos finales (las transacciones ya están aplicadas en memoria)
+        accounts = Account.__table__
+        for chunk in _chunks(range(n_accounts)):
+            with engine.begin() as conn:
+                conn.execute(
+                    update(accounts).where(accounts.c.id == bindparam("account_id"))
+                    .values(balance=bindparam("final_balance")),
+                    [{"account_id": first_account + i, "final_balance": balances[i]} for i in chunk],
+                )
+
+        with engine.begin() as conn:
+            _advance_sequence(conn, ACCOUNT_SEQUENCE, account_serial + n_accounts)
+            for _, prefix in prefixes:
+                _advance_sequence(conn, f"card:{prefix}", card_serials[prefix])
+        if derived:
+            rebuild_rollups()
+    timings["seconds"] = round(time.perf_counter() - begin, 2)
+    log(f"  listo en {timings['seconds']} s")
+    return {
+        "seed": seed,
+        "clients": clients,
+        "accounts": n_accounts,
+        "cards": counts["cards"],
+        "transactions": timings["transactions"],
+        "first_client_id": first_client,
+        "first_account_id": first_account,
+        "timings": timings,
+    }
+
+
+def profile_sizes(profile, clients=None, transactions=None):
+    base_clients, base_transactions = PROFILES[profile]
+    return clients or base_clients, transactions if transactions is not None else base_transactions
+
+
+def main(argv=None):
+    from benchmarks.common import default_database_url, make_app
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="por defecto, un SQLite temporal")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="1k")
+    parser.add_argument("--clients", type=int, help="sobrescribe el número de clientes del perfil")
+    parser.add_argument("--transactions", type=int, help="sobrescribe el número de transacciones del perfil")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--no-derived", action="store_true", help="sin libro mayor ni totales diarios")
+    args = parser.parse_args(argv)
+
+    url = args.database_url or default_database_url("dataset")
+    app = make_app(url, LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0, IDEMPOTENCY_PURGE_INTERVAL=0,
+                   CARD_HOLD_SWEEP_INTERVAL=0, TOKEN_DENYLIST_SYNC_INTERVAL=0)
+    clients, transactions = profile_sizes(args.profile, args.clients, args.transactions)
+    print(f"Generando {clients} clientes y {transactions} transacciones en {url} (semilla {args.seed})")
+    generate(app, clients, transactions, seed=args.seed, days=args.days, derived=not args.no_derived)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# benchmarks/hot_account_credits.py
+"""
+Créditos por segundo hacia una única cuenta de comercio, con y sin sub-saldos.
+
+Cada hilo paga desde su propia cuenta al mismo comercio, de modo que el único
+punto de contención es la cuenta destino. Se ejecuta primero con la cuenta en
+modo normal y luego en modo caliente (``--slots``), con la compactación de
+fondo activa. Al final se retira todo el saldo del comercio (lo que obliga a
+tomar prestado de los sub-saldos) y se verifica que la suma de saldos reales
+no cambió. Termina con código 1 si hay deriva.
+
+En SQLite toda escritura toma el bloqueo de la base entera, así que la mejora
+solo se aprecia en PostgreSQL:
+    python -m benchmarks.hot_account_credits --database-url postgresql://localhost/novabank_bench
+    python -m benchmarks.hot_account_credits --threads 16 --transfers 200 --slots 16
+"""
+import argparse
+import sys
+import threading
+import time
+
+from sqlalchemy import func, insert, select
+
+from backend.database.models import db, Client, Account
+from backend.services.hot_accounts import enable_hot_account
+from backend.services.transfer_engine import execute_transfer, TransferError
+from benchmarks.common import default_database_url, make_app
+
+INITIAL_BALANCE = 1_000_000.0
+FLOAT_TOLERANCE = 1e-4
+
+
+def seed(app, n_payers):
+    with app.app_context():
+        client = Client(full_name="Comercio", email="hot@novabank.test", phone_number="0",
+                        cip="HOT", password_hash="x")
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client.id, "account_type": "corriente",
+             "balance": 0.0 if i == 0 else INITIAL_BALANCE, "account_number": str(i).zfill(10)}
+            for i in range(n_payers + 1)
+        ])
+        db.session.commit()
+        ids = db.session.execute(select(Account.id).order_by(Account.id)).scalars().all()
+        return ids[0], ids[1:]
+
+
+def total_balance(app):
+    with app.app_context():
+        return db.session.execute(select(func.sum(Account.total_balance))).scalar_one()
+
+
+def run(app, merchant_id, payer_ids, n_transfers):
+    errors = []
+
+    def worker(payer_id):
+        with app.app_context():
+            for _ in range(n_transfers):
+                try:
+                    execute_transfer(payer_id, merchant_id, 1.25, "pago")
+                except TransferError as e:
+                    errors.append(e.message)
+
+    threads = [threading.Thread(target=worker, args=(payer_id,)) for payer_id in payer_ids]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--transfers", type=int, default=200, help="pagos por hilo")
+    parser.add_argument("--slots", type=int, default=16)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for slots in (0, args.slots):
+        url = args.database_url or default_database_url(f"hot_{slots}")
+        app = make_app(url, pool_size=args.threads + 2, LOG_LEVEL="ERROR",
+                       HOT_ACCOUNT_COMPACTION_INTERVAL=0.5 if slots else 0)
+        merchant_id, payer_ids = seed(app, args.threads)
+        if slots:
+            with app.app_context():
+                enable_hot_account(merchant_id, slots)
+        before = total_balance(app)
+        wall, errors = run(app, merchant_id, payer_ids, args.transfers)
+        credits = args.threads * args.transfers - len(errors)
+
+        # Retiro total: en modo caliente obliga a tomar prestado de los sub-saldos
+        with app.app_context():
+            merchant_total = db.session.get(Account, merchant_id).total_balance
+            execute_transfer(merchant_id, payer_ids[0], merchant_total, "retiro")
+            merchant_after = db.session.execute(
+                select(Account.total_balance).where(Account.id == merchant_id)).scalar_one()
+        drift = abs(total_balance(app) - before)
+        failed |= drift > FLOAT_TOLERANCE or abs(merchant_after) > FLOAT_TOLERANCE
+        label = f"{slots} sub-saldos" if slots else "modo normal"
+        print(f"== {label:>14}: {credits / wall:8.0f} créditos/s  errores {len(errors)}  "
+              f"saldo del comercio {merchant_total:.2f}  deriva {drift:.6f}")
+        if slots:
+            app.extensions["hot_accounts_compaction"].set()  # detiene el hilo de compactación
+        if args.database_url:
+            with app.app_context():
+                db.drop_all()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
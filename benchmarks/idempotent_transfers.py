@@ -0,0 +1,134 @@
+# benchmarks/idempotent_transfers.py
+"""
+Reintentos agresivos de transferencias con ``Idempotency-Key``.
+
+Simula clientes que reintentan cada transferencia varias veces, a la vez y
+contra dos "workers" (dos aplicaciones sobre la misma base de datos, cada una
+con su LRU), y comprueba que:
+  * cada clave mueve saldos una sola vez y todas sus respuestas son idénticas,
+  * reutilizar una clave con otro cuerpo responde 422,
+  * un error de negocio (fondos insuficientes) también se repite tal cual,
+  * las claves vencidas se purgan.
+Informa la latencia de una transferencia nueva y de un reintento servido desde
+el LRU y desde la tabla. Termina con código 1 si algo no cuadra.
+
+Uso:
+    python -m benchmarks.idempotent_transfers --keys 200 --retries 4
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func, insert, select
+
+from backend.database.models import db, Client, Account, Transaction, IdempotencyKey
+from benchmarks.common import default_database_url, make_app
+
+INITIAL_BALANCE = 1_000_000.0
+
+
+def seed(app):
+    with app.app_context():
+        client = Client(full_name="Reintentos", email="idem@novabank.test", phone_number="0",
+                        cip="IDEM", password_hash="x")
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client.id, "account_type": "ahorro", "balance": balance, "account_number": str(i).zfill(10)}
+            for i, balance in enumerate((INITIAL_BALANCE, 0.0, 5.0))
+        ])
+        db.session.commit()
+        ids = db.session.execute(select(Account.id).order_by(Account.id)).scalars().all()
+        token = create_access_token(identity=str(client.id))
+        return ids, {"Authorization": f"Bearer {token}"}
+
+
+def post(app, headers, key, body):
+    begin = time.perf_counter()
+    response = app.test_client().post("/api/transactions/transfer", json=body,
+                                      headers={**headers, "Idempotency-Key": key})
+    return response.status_code, response.get_data(as_text=True), response.headers.get("Idempotent-Replayed"), \
+        time.perf_counter() - begin
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--retries", type=int, default=4, help="peticiones simultáneas por clave")
+    args = parser.parse_args(argv)
+
+    url = default_database_url("idempotency")
+    overrides = dict(LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0, IDEMPOTENCY_PURGE_INTERVAL=0)
+    workers = [make_app(url, pool_size=args.retries + 2, **overrides) for _ in range(2)]
+    (payer, payee, poor), headers = seed(workers[0])
+    failed = False
+
+    responses = {}
+    lock = threading.Lock()
+
+    def attempt(app, key, body):
+        result = post(app, headers, key, body)
+        with lock:
+            responses.setdefault(key, []).append(result)
+
+    begin = time.perf_counter()
+    for n in range(args.keys):
+        key = uuid.uuid4().hex
+        body = {"sender_account_id": payer, "receiver_account_id": payee, "amount": 1.0, "description": f"pago {n}"}
+        threads = [threading.Thread(target=attempt, args=(workers[i % 2], key, body)) for i in range(args.retries)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - begin
+
+    with workers[0].app_context():
+        transfers = db.session.execute(select(func.count()).select_from(Transaction)).scalar_one()
+        balance = db.session.get(Account, payee).total_balance
+    divergent = sum(1 for results in responses.values() if len({(s, b) for s, b, _, _ in results}) != 1)
+    statuses = {}
+    for results in responses.values():
+        for status, _, replayed, _ in results:
+            label = f"{status}{' (repetida)' if replayed else ''}"
+            statuses[label] = statuses.get(label, 0) + 1
+    print(f"  {args.keys} claves x {args.retries} intentos simultáneos en {elapsed:.2f} s: {statuses}")
+    print(f"  transferencias aplicadas {transfers} (esperadas {args.keys}), saldo del destino {balance:.2f}, "
+          f"claves con respuestas distintas {divergent}")
+    failed |= transfers != args.keys or abs(balance - args.keys) > 1e-6 or bool(divergent)
+
+    key, body = next(iter(responses)), {"sender_account_id": payer, "receiver_account_id": payee, "amount": 2.0}
+    reused = post(workers[0], headers, key, body)[0]
+    poor_key = uuid.uuid4().hex
+    poor_body = {"sender_account_id": poor, "receiver_account_id": payee, "amount": 50.0}
+    first, second = post(workers[0], headers, poor_key, poor_body), post(workers[1], headers, poor_key, poor_body)
+    print(f"  clave reutilizada con otro cuerpo -> {reused}; fondos insuficientes -> {first[0]}, "
+          f"reintento -> {second[0]} (repetida={second[2]}, mismo cuerpo={first[1] == second[1]})")
+    failed |= reused != 422 or first[0] != 400 or second[:2] != first[:2] or second[2] != "true"
+
+    fresh, lru, table = [], [], []
+    for n in range(100):
+        key = uuid.uuid4().hex
+        body = {"sender_account_id": payer, "receiver_account_id": payee, "amount": 1.0}
+        fresh.append(post(workers[0], headers, key, body)[3])
+        lru.append(post(workers[0], headers, key, body)[3])
+        table.append(post(workers[1], headers, key, body)[3])  # el otro worker no la tiene en su LRU
+    print(f"  latencia mediana: nueva {statistics.median(fresh) * 1000:.2f} ms, "
+          f"reintento desde el LRU {statistics.median(lru) * 1000:.2f} ms, "
+          f"desde la tabla {statistics.median(table) * 1000:.2f} ms")
+
+    with workers[0].app_context():
+        store = workers[0].extensions["idempotency"]
+        store.ttl = 0
+        purged = store.purge(chunk_size=50)
+        left = db.session.execute(select(func.count()).select_from(IdempotencyKey)).scalar_one()
+    print(f"  purga con TTL 0: {purged} claves borradas, quedan {left}")
+    failed |= left != 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
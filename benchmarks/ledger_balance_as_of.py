@@ -0,0 +1,121 @@
+# benchmarks/ledger_balance_as_of.py
+"""
+Saldo a una fecha con fotos diarias frente a recorrer todo el libro.
+
+Genera transferencias "históricas" repartidas en ``--days`` días (sin asientos,
+como las anteriores al libro), las asienta con ``flask ledger backfill``,
+construye las fotos con ``flask ledger snapshot`` en dos tandas (para probar la
+construcción incremental) y compara, para fechas al azar:
+  * el saldo con foto + cola del libro, y
+  * la suma de todos los asientos de la cuenta hasta esa fecha.
+También comprueba que el saldo "a ahora" coincide con ``Account.total_balance``.
+Termina con código 1 si algún saldo no coincide.
+
+Uso:
+    python -m benchmarks.ledger_balance_as_of --accounts 10 --transfers 50000 --days 365
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+
+from backend.database.models import db, Client, Account, Transaction, LedgerEntry
+from backend.services.ledger import balance_as_of, daily_balances
+from benchmarks.common import default_database_url, make_app
+
+INITIAL_BALANCE = 10_000.0
+FLOAT_TOLERANCE = 1e-4
+
+
+def seed(app, n_accounts, n_transfers, days):
+    start = datetime.utcnow() - timedelta(days=days)
+    rng = random.Random(7)
+    with app.app_context():
+        client = Client(full_name="Libro", email="ledger@novabank.test", phone_number="0",
+                        cip="LEDGER", password_hash="x")
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client.id, "account_type": "ahorro", "balance": INITIAL_BALANCE,
+             "account_number": str(i).zfill(10)}
+            for i in range(n_accounts)
+        ])
+        ids = db.session.execute(select(Account.id)).scalars().all()
+        rows = []
+        net = {account_id: 0.0 for account_id in ids}
+        for n in range(n_transfers):
+            sender, receiver = rng.sample(ids, 2)
+            amount = round(rng.uniform(1, 20), 2)
+            net[sender] -= amount
+            net[receiver] += amount
+            rows.append({"sender_account_id": sender, "receiver_account_id": receiver, "amount": amount,
+                         "description": "histórica", "timestamp": start + timedelta(seconds=n * days * 86400 / n_transfers)})
+        db.session.execute(insert(Transaction.__table__), rows)
+        for account_id, delta in net.items():
+            db.session.execute(update(Account.__table__).where(Account.id == account_id)
+                               .values(balance=INITIAL_BALANCE + delta))
+        db.session.commit()
+        return ids, start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--transfers", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    app = make_app(default_database_url("ledger"), LOG_LEVEL="ERROR", LEDGER_SNAPSHOT_LAG=0,
+                   HOT_ACCOUNT_COMPACTION_INTERVAL=0)
+    ids, start = seed(app, args.accounts, args.transfers, args.days)
+    runner = app.test_cli_runner()
+    print(runner.invoke(args=["ledger", "backfill"]).output.strip())
+
+    middle = (start + timedelta(days=args.days // 2)).strftime("%Y-%m-%d")
+    for until in (middle, None):
+        begin = time.perf_counter()
+        output = runner.invoke(args=["ledger", "snapshot", "--chunk-size", "50"]
+                               + (["--until", until] if until else [])).output.strip()
+        print(f"{output}  ({time.perf_counter() - begin:.2f} s)")
+
+    rng = random.Random(11)
+    failed = False
+    fast = full = 0.0
+    with app.app_context():
+        conn = db.session.connection()
+        entries = LedgerEntry.__table__.c
+        for _ in range(args.samples):
+            account_id = rng.choice(ids)
+            at = start + timedelta(seconds=rng.uniform(0, args.days * 86400))
+            begin = time.perf_counter()
+            balance = balance_as_of(conn, account_id, at)
+            fast += time.perf_counter() - begin
+            begin = time.perf_counter()
+            expected = conn.execute(select(func.coalesce(func.sum(entries.amount), 0.0))
+                                    .where(entries.account_id == account_id)
+                                    .where(entries.created_at <= at)).scalar_one()
+            full += time.perf_counter() - begin
+            if abs(balance - expected) > FLOAT_TOLERANCE:
+                failed = True
+                print(f"  DIFERENCIA cuenta {account_id} al {at}: {balance} != {expected}")
+
+        now = datetime.utcnow()
+        mismatched = sum(
+            1 for account in db.session.execute(select(Account)).scalars()
+            if abs(balance_as_of(conn, account.id, now) - account.total_balance) > FLOAT_TOLERANCE
+        )
+        series = daily_balances(conn, ids[0], (now - timedelta(days=29)).date(), now.date())
+    failed |= bool(mismatched)
+    print(f"Saldo a una fecha: {fast / args.samples * 1000:.2f} ms con fotos, "
+          f"{full / args.samples * 1000:.2f} ms recorriendo el libro ({args.samples} consultas)")
+    print(f"Cuentas cuyo saldo actual no cuadra con el libro: {mismatched}")
+    print(f"Serie diaria de 30 días para la cuenta {ids[0]}: último cierre {series[-1]}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+# benchmarks/login_latency.py
+"""
+Latencia de /api/auth/login (p50/p99) a distintos niveles de concurrencia, con
+el KDF en línea (PASSWORD_HASH_WORKERS=0) y en el pool de procesos. También
+mide la latencia de /api/auth/dashboard concurrente con la avalancha de logins,
+que es lo que el pool protege.
+
+Uso:
+    python -m benchmarks.login_latency --concurrency 1 8 32 --requests 64
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+from sqlalchemy import insert
+
+from backend.database.models import db, Client
+from backend.services.password_kdf import hash_password
+from benchmarks.common import default_database_url, make_app
+
+PASSWORD = "secreto123"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(app, n_clients, method):
+    password_hash = hash_password(PASSWORD, method, 12)
+    with app.app_context():
+        db.session.execute(insert(Client.__table__), [
+            {"full_name": f"Cliente {i}", "email": f"c{i}@novabank.test", "phone_number": "0",
+             "cip": f"CIP{i}", "password_hash": password_hash, "is_admin": False}
+            for i in range(n_clients)
+        ])
+        db.session.commit()
+
+
+def run_level(app, concurrency, n_requests, dashboard_token):
+    latencies, statuses, dashboard_latencies = [], {}, []
+    lock = threading.Lock()
+    per_thread = max(1, n_requests // concurrency)
+    done = threading.Event()
+
+    def login_worker(worker_id):
+        client = app.test_client()
+        for i in range(per_thread):
+            start = time.perf_counter()
+            response = client.post("/api/auth/login", json={
+                "email": f"c{(worker_id * per_thread + i) % 200}@novabank.test", "password": PASSWORD})
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    def dashboard_worker():
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {dashboard_token}"}
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get("/api/auth/dashboard", headers=headers)
+            dashboard_latencies.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_worker, args=(n,)) for n in range(concurrency)]
+    probe = threading.Thread(target=dashboard_worker)
+    start = time.perf_counter()
+    probe.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    done.set()
+    probe.join()
+    wall = time.perf_counter() - start
+    return latencies, statuses, dashboard_latencies, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="logins por nivel de concurrencia")
+    parser.add_argument("--method", default="scrypt")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    for label, workers in (("en línea", 0), (f"pool x{args.workers}", args.workers)):
+        app = make_app(default_database_url(f"login_{workers}"), pool_size=max(args.concurrency) + 2,
+                       PASSWORD_HASH_METHOD=args.method, PASSWORD_HASH_WORKERS=workers,
+                       LOG_LEVEL="ERROR")
+        seed(app, 200, args.method)
+        token = app.test_client().post("/api/auth/login", json={
+            "email": "c0@novabank.test", "password": PASSWORD}).json["token"]
+        print(f"== KDF {label} ({args.method})")
+        for concurrency in args.concurrency:
+            latencies, statuses, dashboard, wall = run_level(app, concurrency, args.requests, token)
+            print(f"  concurrencia {concurrency:>3}: login p50 {percentile(latencies, 50) * 1000:7.1f} ms  "
+                  f"p99 {percentile(latencies, 99) * 1000:7.1f} ms  {len(latencies) / wall:6.1f} logins/s  "
+                  f"estados {statuses}  | dashboard p50 "
+                  f"{(statistics.median(dashboard) if dashboard else 0) * 1000:6.1f} ms")
+        app.extensions["password_hasher"].shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
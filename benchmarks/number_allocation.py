@@ -0,0 +1,121 @@
+# benchmarks/number_allocation.py
+"""
+Tasa de asignación de números de cuenta con muchos registros concurrentes.
+
+1. Asignador directo: varios hilos piden números a la vez, con distintos
+   tamaños de bloque; se informa números/s y viajes a la base de datos.
+2. Registros completos (/api/auth/register) concurrentes.
+
+En ambos casos se verifica que no haya números repetidos ni dígitos de control
+inválidos. Como referencia se ejecuta el generador anterior (milisegundos de
+``time.time()``) con los mismos hilos y se cuentan los números que repite.
+Termina con código 1 si el asignador emite algún duplicado o número inválido.
+
+Uso:
+    python -m benchmarks.number_allocation --threads 16 --numbers 2000 --registrations 400
+"""
+import argparse
+import sys
+import threading
+import time
+
+from backend.database.models import db, Account
+from backend.services.number_allocator import get_number_allocator, is_valid_account_number
+from benchmarks.common import default_database_url, make_app
+
+
+def legacy_account_number():
+    # Generador anterior, sin la consulta de sondeo: solo para contar colisiones
+    return str(int(time.time() * 1000) % 10000000000).zfill(10)
+
+
+def run_threads(n_threads, per_thread, produce):
+    numbers = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(n_threads)
+
+    def worker():
+        local = []
+        barrier.wait()
+        for _ in range(per_thread):
+            local.append(produce())
+        with lock:
+            numbers.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return numbers, time.perf_counter() - start
+
+
+def bench_allocator(n_threads, per_thread, block_sizes):
+    failed = False
+    for block_size in block_sizes:
+        app = make_app(default_database_url(f"alloc_{block_size}"), pool_size=n_threads,
+                       NUMBER_ALLOCATOR_BLOCK_SIZE=block_size, LOG_LEVEL="ERROR")
+
+        def produce():
+            with app.app_context():
+                return get_number_allocator().account_number()
+
+        numbers, wall = run_threads(n_threads, per_thread, produce)
+        allocator = app.extensions["number_allocator"]
+        duplicates = len(numbers) - len(set(numbers))
+        invalid = sum(1 for n in numbers if not is_valid_account_number(n))
+        failed |= bool(duplicates or invalid)
+        print(f"  bloque {block_size:>5}: {len(numbers) / wall:>10.0f} números/s  "
+              f"viajes a la BD {allocator.leases:>6}  duplicados {duplicates}  inválidos {invalid}")
+    return failed
+
+
+def bench_registrations(n_threads, n_registrations):
+    app = make_app(default_database_url("alloc_register"), pool_size=n_threads + 2,
+                   PASSWORD_HASH_METHOD="pbkdf2:sha256:1000", PASSWORD_HASH_WORKERS=0, LOG_LEVEL="ERROR")
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(n_registrations * 2))
+
+    def register():
+        with lock:
+            i = next(counter)
+        response = app.test_client().post("/api/auth/register", json={
+            "full_name": f"Cliente {i}", "email": f"r{i}@novabank.test", "phone_number": "0",
+            "cip": f"CIP{i}", "password": "secreto123"})
+        with lock:
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    _, wall = run_threads(n_threads, max(1, n_registrations // n_threads), register)
+    with app.app_context():
+        numbers = db.session.execute(db.select(Account.account_number)).scalars().all()
+    duplicates = len(numbers) - len(set(numbers))
+    invalid = sum(1 for n in numbers if not is_valid_account_number(n))
+    print(f"  {sum(statuses.values())} registros en {wall:.2f} s ({sum(statuses.values()) / wall:.0f}/s)  "
+          f"estados {statuses}  cuentas {len(numbers)}  duplicados {duplicates}  inválidos {invalid}")
+    return bool(duplicates or invalid)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--numbers", type=int, default=2000, help="números por hilo")
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--registrations", type=int, default=400)
+    args = parser.parse_args(argv)
+
+    numbers, wall = run_threads(args.threads, args.numbers, legacy_account_number)
+    print(f"== Generador anterior: {len(numbers) / wall:.0f} números/s, "
+          f"{len(numbers) - len(set(numbers))} repetidos de {len(numbers)} (cada uno, un sondeo y un reintento)")
+
+    print(f"== Asignador por bloques ({args.threads} hilos x {args.numbers} números)")
+    failed = bench_allocator(args.threads, args.numbers, args.block_sizes)
+
+    print(f"== Registros concurrentes ({args.threads} hilos)")
+    failed |= bench_registrations(args.threads, args.registrations)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# benchmarks/read_replicas.py
+"""
+Enrutado de lecturas a una réplica, lectura de lo propio y timeout por sentencia.
+
+Usa dos archivos SQLite: el primario y una "réplica" que es una copia del
+primario (``sqlite3`` backup) y que solo se pone al día cuando el script lo
+pide, así que su retraso es visible. Comprueba que:
+  * las vistas de solo lectura (dashboard, historial, listados de admin)
+    consultan la réplica y no el primario,
+  * justo después de transferir, el emisor y el receptor ven su saldo nuevo
+    (sus lecturas van al primario) mientras un tercero sigue leyendo la réplica,
+  * al vencer ``DB_REPLICA_STICKY_SECONDS`` vuelven a la réplica (y ven el saldo
+    nuevo en cuanto la réplica se pone al día),
+  * una sentencia que supera ``DB_STATEMENT_TIMEOUT_MS`` se interrumpe.
+También informa cuántas sentencias atendió cada motor en una mezcla de lecturas.
+Termina con código 1 si algo no cuadra.
+
+Uso:
+    python -m benchmarks.read_replicas --reads 500
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+from backend.database.models import db, Client, Account
+from backend.database.routing import get_read_router, pool_stats
+from benchmarks.common import default_database_url, make_app
+
+STICKY_SECONDS = 0.5
+INITIAL_BALANCE = 1000.0
+
+
+def replicate(primary_url, replica_url):
+    """Pone la réplica al día copiando el primario página a página."""
+    source = sqlite3.connect(make_url(primary_url).database)
+    target = sqlite3.connect(make_url(replica_url).database)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+def seed(app, clients):
+    with app.app_context():
+        db.session.execute(insert(Client.__table__), [
+            {"full_name": f"Réplica {n}", "email": f"replica{n}@novabank.test", "phone_number": "0",
+             "cip": f"REP{n}", "password_hash": "x", "is_admin": n == 0}
+            for n in range(clients)
+        ])
+        client_ids = db.session.execute(text("SELECT id FROM clients ORDER BY id")).scalars().all()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client_id, "account_type": "ahorro", "balance": INITIAL_BALANCE,
+             "account_number": str(client_id).zfill(10)}
+            for client_id in client_ids
+        ])
+        db.session.commit()
+        account_ids = db.session.execute(text("SELECT id FROM accounts ORDER BY client_id")).scalars().all()
+        tokens = [create_access_token(identity=str(client_id), additional_claims={"is_admin": n == 0})
+                  for n, client_id in enumerate(client_ids)]
+    return account_ids, [{"Authorization": f"Bearer {token}"} for token in tokens]
+
+
+def count_statements(app):
+    counts = {}
+    with app.app_context():
+        engines = {"primary": db.engine, **get_read_router().replicas}
+        for name, engine in engines.items():
+            counts[name] = 0
+
+            def count(*_, name=name):
+                counts[name] += 1
+
+            event.listen(engine, "before_cursor_execute", count)
+    return counts
+
+
+def balance(http, headers):
+    return http.get("/api/auth/dashboard", headers=headers).get_json()["accounts"][0]["balance"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=500, help="peticiones de lectura en la mezcla")
+    parser.add_argument("--clients", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    primary_url = default_database_url("replicas_primary")
+    replica_url = default_database_url("replicas_replica")
+    app = make_app(primary_url, LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0, IDEMPOTENCY_PURGE_INTERVAL=0,
+                   CARD_HOLD_SWEEP_INTERVAL=0, TOKEN_DENYLIST_SYNC_INTERVAL=0, DASHBOARD_CACHE_ENABLED=False,
+                   DATABASE_REPLICA_URLS=replica_url, DB_REPLICA_STICKY_SECONDS=STICKY_SECONDS)
+    accounts, headers = seed(app, args.clients)
+    replicate(primary_url, replica_url)
+    counts = count_statements(app)
+    http = app.test_client()
+    failed = False
+
+    # Mezcla de lecturas: dashboard, historial y listados de administración
+    paths = ["/api/auth/dashboard", f"/api/transactions/history/{accounts[1]}", "/api/admin/accounts/page",
+             "/api/admin/clients?limit=50"]
+    begin = time.perf_counter()
+    statuses = {}
+    for n in range(args.reads):
+        status = http.get(paths[n % len(paths)], headers=headers[0]).status_code
+        statuses[status] = statuses.get(status, 0) + 1
+    elapsed = time.perf_counter() - begin
+    print(f"  {args.reads} lecturas en {elapsed:.2f} s {statuses}; sentencias por motor: {counts}")
+    failed |= set(statuses) != {200} or counts["replica_0"] == 0 or counts["primary"] > args.reads * 0.05
+
+    # Lectura de lo propio: emisor y receptor leen del primario; un tercero, de la réplica
+    sender, receiver, bystander = headers[1], headers[2], headers[3]
+    status = http.post("/api/transactions/transfer", headers=sender, json={
+        "sender_account_id": accounts[1], "receiver_account_id": accounts[2], "amount": 100}).status_code
+    fresh = (balance(http, sender), balance(http, receiver))
+    with app.app_context():
+        db.session.execute(text("UPDATE accounts SET balance = balance + 1 WHERE id = :id"), {"id": accounts[3]})
+        db.session.commit()
+    stale_bystander = balance(http, bystander)
+    print(f"  transferencia {status}; saldos leídos al instante: emisor {fresh[0]}, receptor {fresh[1]}, "
+          f"tercero (cambio sin invalidar, réplica) {stale_bystander}")
+    failed |= status != 200 or fresh != (INITIAL_BALANCE - 100, INITIAL_BALANCE + 100)
+    failed |= stale_bystander != INITIAL_BALANCE
+
+    time.sleep(STICKY_SECONDS * 2)
+    lagged = balance(http, sender)
+    replicate(primary_url, replica_url)
+    caught_up = (balance(http, sender), balance(http, bystander))
+    with app.app_context():
+        routing = get_read_router().stats()
+        pools = pool_stats(db)
+    print(f"  tras {STICKY_SECONDS * 2:.1f} s: emisor desde la réplica atrasada {lagged}, "
+          f"con la réplica al día {caught_up[0]} (tercero {caught_up[1]})")
+    print(f"  enrutado: {routing['replica_reads']} a réplica, {routing['sticky_primary_reads']} al primario por escritura"
+          f" reciente; pools: {pools}")
+    failed |= lagged != INITIAL_BALANCE or caught_up != (INITIAL_BALANCE - 100, INITIAL_BALANCE + 1)
+    failed |= routing["sticky_primary_reads"] < 2
+
+    # Timeout por sentencia (en SQLite, con un progress handler)
+    timeout_app = make_app(primary_url, LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0,
+                           IDEMPOTENCY_PURGE_INTERVAL=0, CARD_HOLD_SWEEP_INTERVAL=0, TOKEN_DENYLIST_SYNC_INTERVAL=0,
+                           DB_STATEMENT_TIMEOUT_MS=100)
+    slow = text("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n")
+    with timeout_app.app_context():
+        begin = time.perf_counter()
+        try:
+            db.session.execute(slow).scalar()
+            interrupted = False
+        except OperationalError:
+            interrupted = True
+            db.session.rollback()
+        elapsed = time.perf_counter() - begin
+        quick = db.session.execute(text("SELECT count(*) FROM accounts")).scalar()
+    print(f"  sentencia sin fin con timeout de 100 ms: interrumpida={interrupted} a los {elapsed * 1000:.0f} ms; "
+          f"la siguiente consulta responde {quick}")
+    failed |= not interrupted or elapsed > 1.0 or quick != args.clients
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
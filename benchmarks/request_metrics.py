@@ -0,0 +1,203 @@
+# benchmarks/request_metrics.py
+"""
+Métricas por ruta, detector de N+1 y /metrics.
+
+Comprueba que:
+  * ``/metrics`` cuenta todas las peticiones hechas (por ruta, método y estado)
+    y que las consultas por petición coinciden con un contador independiente
+    sobre el motor,
+  * ``Server-Timing`` trae el número de consultas de la propia petición,
+  * una vista con el patrón 2N+1 de la antigua lista de clientes (una consulta
+    de clientes y, por cliente, una de cuentas y otra de tarjetas) dispara el
+    aviso de N+1 y el contador, y ``/api/admin/clients`` no,
+  * el tamaño de las exportaciones en streaming llega al histograma de tamaños,
+  * sin ``METRICS_TOKEN`` el endpoint exige el JWT de un administrador y, con
+    él, el token,
+y mide el coste de tener las métricas activas (peticiones/s del dashboard con y
+sin ``METRICS_ENABLED``, por rondas alternas). Termina con código 1 si algo no
+cuadra o si el coste supera ``--max-overhead``.
+
+Uso:
+    python -m benchmarks.request_metrics --clients 20 --requests 500
+"""
+import argparse
+import logging
+import re
+import statistics
+import sys
+import time
+
+from flask import jsonify
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, select
+
+from backend.database.models import db, Account, Card, Client
+from benchmarks.admin_clients_query_count import seed
+from benchmarks.common import default_database_url, make_app
+
+SERVER_TIMING = re.compile(r'db;dur=[\d.]+;desc="(\d+) consultas", app;dur=[\d.]+')
+
+
+def overrides(**extra):
+    # WARNING: el aviso de N+1 se registra con ese nivel
+    return dict(LOG_LEVEL="WARNING", HOT_ACCOUNT_COMPACTION_INTERVAL=0, IDEMPOTENCY_PURGE_INTERVAL=0,
+                CARD_HOLD_SWEEP_INTERVAL=0, TOKEN_DENYLIST_SYNC_INTERVAL=0, **extra)
+
+
+def clients_with_details_n_plus_one():
+    """La lista de clientes tal como estaba antes de paginarla: 2N+1 consultas."""
+    result = []
+    for client in db.session.execute(select(Client)).scalars().all():
+        accounts = db.session.execute(select(Account).where(Account.client_id == client.id)).scalars().all()
+        cards = db.session.execute(select(Card).where(Card.client_id == client.id)).scalars().all()
+        result.append({"id": client.id, "accounts": [a.id for a in accounts], "cards": [c.id for c in cards]})
+    return jsonify(result), 200
+
+
+def parse_metrics(text):
+    """``{(nombre, etiquetas): valor}`` del texto de Prometheus."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name_labels, value = line.rsplit(" ", 1)
+            samples[name_labels] = float(value)
+    return samples
+
+
+class Captured(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def throughput(app, headers, requests):
+    http = app.test_client()
+    begin = time.perf_counter()
+    for _ in range(requests):
+        http.get("/api/auth/dashboard", headers=headers)
+    return requests / (time.perf_counter() - begin)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="peticiones por ronda al medir el coste")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-overhead", type=float, default=0.15, help="coste admitido (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+    failed = False
+
+    url = default_database_url("request_metrics")
+    app = make_app(url, **overrides())
+    app.add_url_rule("/bench/clients-n-plus-one", view_func=clients_with_details_n_plus_one)
+    seed(app, args.clients)
+    with app.app_context():
+        client_id = db.session.execute(select(Client.id).order_by(Client.id)).scalar()
+        token = create_access_token(identity=str(client_id), additional_claims={"is_admin": True})
+        engine = db.engine
+    headers = {"Authorization": f"Bearer {token}"}
+    http = app.test_client()
+    http.get("/api/auth/dashboard", headers=headers)  # carga la lista de revocación de tokens
+
+    # Consultas: /metrics frente a un contador propio sobre el motor
+    counter = {"n": 0}
+
+    def count(*_):
+        counter["n"] += 1
+
+    plan = [("/api/auth/dashboard", 5), ("/api/admin/clients?limit=10", 3), ("/api/admin/accounts/page?limit=10", 3),
+            ("/no-existe", 2)]
+    timing_ok = True
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        before = parse_metrics(http.get("/metrics", headers=headers).get_data(as_text=True))
+        counter["n"] = 0
+        for path, times in plan:
+            for _ in range(times):
+                start = counter["n"]
+                response = http.get(path, headers=headers)
+                match = SERVER_TIMING.search(response.headers.get("Server-Timing", ""))
+                timing_ok &= match is not None and int(match.group(1)) == counter["n"] - start
+        counted = counter["n"]
+        after = parse_metrics(http.get("/metrics", headers=headers).get_data(as_text=True))
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    def delta(prefix):
+        keys = [key for key in after if key.startswith(prefix)]
+        return sum(after[key] - before.get(key, 0) for key in keys)
+
+    requests = delta("novabank_http_requests_total{")
+    queries = delta("novabank_db_queries_per_request_sum{")
+    not_found = delta('novabank_http_requests_total{route="unmatched",method="GET",status="404"}')
+    print(f"  {sum(times for _, times in plan)} peticiones -> /metrics cuenta {requests:.0f} (y la propia /metrics), "
+          f"{queries:.0f} consultas frente a {counted} del contador del motor; 404 agrupados: {not_found:.0f}; "
+          f"Server-Timing {'correcto' if timing_ok else 'INCORRECTO'}")
+    # La primera /metrics también queda contada en el segundo volcado
+    failed |= requests != sum(times for _, times in plan) + 1 or queries != counted or not_found != 2
+    failed |= not timing_ok
+
+    # Detector de N+1
+    captured = Captured()
+    metrics_log = logging.getLogger("novabank.metrics")
+    metrics_log.addHandler(captured)
+    try:
+        listing = http.get("/api/admin/clients?limit=100", headers=headers)
+        legacy = http.get("/bench/clients-n-plus-one", headers=headers)
+    finally:
+        metrics_log.removeHandler(captured)
+    samples = parse_metrics(http.get("/metrics", headers=headers).get_data(as_text=True))
+    detections = {key: value for key, value in samples.items() if key.startswith("novabank_db_n_plus_one_total") and value}
+    warning = captured.records[0] if captured.records else None
+    print(f"  lista paginada: {listing.headers['Server-Timing']}")
+    print(f"  lista 2N+1 con {args.clients} clientes: {legacy.headers['Server-Timing']}")
+    print(f"  avisos: {[record.getMessage() for record in captured.records]}; contadores {detections}")
+    failed |= len(captured.records) != 1 or list(detections) != [
+        'novabank_db_n_plus_one_total{route="/bench/clients-n-plus-one",method="GET"}']
+    failed |= warning is None or warning.fields["repetitions"] != args.clients
+
+    # Exportación en streaming: su tamaño se registra al terminar de enviar el cuerpo
+    export = http.get("/api/admin/accounts/export?format=csv", headers=headers)
+    exported = len(export.get_data())
+    samples = parse_metrics(http.get("/metrics", headers=headers).get_data(as_text=True))
+    size_sum = samples.get('novabank_http_response_size_bytes_sum{route="/api/admin/accounts/export",method="GET"}')
+    print(f"  exportación en streaming: {exported} bytes enviados, histograma de tamaños {size_sum}")
+    failed |= size_sum != exported
+
+    # Acceso a /metrics: sin token configurado, solo administradores
+    with app.app_context():
+        user_token = create_access_token(identity=str(client_id))
+    anonymous = http.get("/metrics").status_code
+    not_admin = http.get("/metrics", headers={"Authorization": f"Bearer {user_token}"}).status_code
+    print(f"  sin METRICS_TOKEN: anónimo {anonymous}, cliente sin rol de administrador {not_admin}")
+    failed |= anonymous != 401 or not_admin != 403
+
+    # Token de /metrics
+    guarded = make_app(url, **overrides(METRICS_TOKEN="secreto-metricas"))
+    guarded_http = guarded.test_client()
+    denied = guarded_http.get("/metrics").status_code
+    allowed = guarded_http.get("/metrics", headers={"Authorization": "Bearer secreto-metricas"})
+    print(f"  con METRICS_TOKEN: sin token {denied}, con token {allowed.status_code} ({allowed.content_type})")
+    failed |= denied != 401 or allowed.status_code != 200 or not allowed.content_type.startswith("text/plain")
+
+    # Coste: dashboard (cacheado, lo más barato que sirve la API) con y sin métricas
+    apps = {"con métricas": app, "sin métricas": make_app(url, **overrides(METRICS_ENABLED=False))}
+    rates = {name: [] for name in apps}
+    for name, candidate in apps.items():
+        throughput(candidate, headers, 50)
+    for _ in range(args.rounds):
+        for name, candidate in apps.items():
+            rates[name].append(throughput(candidate, headers, args.requests))
+    enabled, disabled = (statistics.median(rates[name]) for name in ("con métricas", "sin métricas"))
+    overhead = 1 - enabled / disabled
+    print(f"  dashboard: {disabled:.0f} pet/s sin métricas, {enabled:.0f} pet/s con métricas "
+          f"(coste {overhead:.1%})")
+    failed |= overhead > args.max_overhead
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
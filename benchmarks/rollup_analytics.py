@@ -0,0 +1,158 @@
+# benchmarks/rollup_analytics.py
+"""
+Analítica de administración desde los rollups frente a recorrer las tablas.
+
+1. Siembra cuentas de dos tipos y transferencias "históricas" sin asientos, las
+   asienta con ``flask ledger backfill`` y reconstruye los rollups con
+   ``flask rollups rebuild``.
+2. Sobre eso aplica tráfico en vivo que mantiene los rollups de forma
+   incremental: registros por la API, transferencias individuales desde varios
+   hilos (incluida una cuenta caliente) y lotes.
+3. Consulta los endpoints de analítica y ``/api/admin/analytics/check``, que
+   compara cada total con un recorrido completo e informa los tiempos.
+Termina con código 1 si algún total no coincide.
+
+Uso:
+    python -m benchmarks.rollup_analytics --accounts 2000 --history 200000 --live 2000
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert, select, update
+
+from backend.database.models import db, Client, Account, Transaction
+from backend.services.batch_transfers import MODE_BEST_EFFORT, execute_batch
+from backend.services.hot_accounts import enable_hot_account
+from backend.services.transfer_engine import TransferError, execute_transfer
+from benchmarks.common import default_database_url, make_app
+
+INITIAL_BALANCE = 10_000.0
+ACCOUNT_TYPES = ("ahorro", "corriente")
+
+
+def seed(app, n_accounts, n_history, days):
+    rng = random.Random(5)
+    start = datetime.utcnow() - timedelta(days=days)
+    with app.app_context():
+        client = Client(full_name="Analítica", email="rollups@novabank.test", phone_number="0",
+                        cip="ROLLUPS", password_hash="x")
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client.id, "account_type": ACCOUNT_TYPES[i % 2], "balance": INITIAL_BALANCE,
+             "account_number": str(i).zfill(10), "created_at": start + timedelta(days=i % days)}
+            for i in range(n_accounts)
+        ])
+        ids = db.session.execute(select(Account.id)).scalars().all()
+        net = dict.fromkeys(ids, 0.0)
+        rows = []
+        for n in range(n_history):
+            sender, receiver = rng.sample(ids, 2)
+            amount = round(rng.uniform(1, 10), 2)
+            net[sender] -= amount
+            net[receiver] += amount
+            rows.append({"sender_account_id": sender, "receiver_account_id": receiver, "amount": amount,
+                         "description": "histórica", "timestamp": start + timedelta(seconds=n * days * 86400 / n_history)})
+        db.session.execute(insert(Transaction.__table__), rows)
+        for account_id, delta in net.items():
+            if delta:
+                db.session.execute(update(Account.__table__).where(Account.id == account_id)
+                                   .values(balance=INITIAL_BALANCE + delta))
+        db.session.commit()
+        return ids, client.id
+
+
+def live_traffic(app, ids, n_live, n_threads):
+    rng = random.Random(9)
+    merchant = ids[0]
+    with app.app_context():
+        enable_hot_account(merchant, 8)
+    client = app.test_client()
+    for i in range(20):
+        client.post("/api/auth/register", json={
+            "full_name": f"Nuevo {i}", "email": f"nuevo{i}@novabank.test", "phone_number": "0",
+            "cip": f"NUEVO{i}", "password": "secreto123"})
+
+    legs = [(rng.choice(ids[1:]), merchant if n % 3 == 0 else rng.choice(ids), round(rng.uniform(1, 5), 2))
+            for n in range(n_live)]
+    legs = [leg for leg in legs if leg[0] != leg[1]]
+    per_thread = len(legs) // n_threads
+    rejected = []
+
+    def worker(chunk):
+        with app.app_context():
+            for sender, receiver, amount in chunk:
+                try:
+                    execute_transfer(sender, receiver, amount, "en vivo")
+                except TransferError as e:
+                    rejected.append(e.message)
+
+    threads = [threading.Thread(target=worker, args=(legs[i * per_thread:(i + 1) * per_thread],))
+               for i in range(n_threads)]
+    begin = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - begin
+    with app.app_context():
+        batch = execute_batch([
+            {"sender_account_id": rng.choice(ids[1:]), "receiver_account_id": rng.choice(ids[1:]), "amount": 1.5}
+            for _ in range(500)
+        ], mode=MODE_BEST_EFFORT)
+    print(f"  {per_thread * n_threads} transferencias en vivo en {elapsed:.2f} s "
+          f"({per_thread * n_threads / elapsed:.0f}/s, {len(rejected)} rechazadas); "
+          f"lote: {batch['applied']} aplicadas, {batch['rejected']} rechazadas")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--live", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    app = make_app(default_database_url("rollups"), pool_size=args.threads + 2, LOG_LEVEL="ERROR",
+                   HOT_ACCOUNT_COMPACTION_INTERVAL=0, PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+                   PASSWORD_HASH_WORKERS=0)
+    ids, admin_id = seed(app, args.accounts, args.history, args.days)
+    runner = app.test_cli_runner()
+    for command in (["ledger", "backfill"], ["rollups", "rebuild"]):
+        begin = time.perf_counter()
+        output = runner.invoke(args=command).output.strip().splitlines()
+        print(f"  {' '.join(command)}: {output[0]} ({time.perf_counter() - begin:.2f} s)")
+
+    live_traffic(app, ids, args.live, args.threads)
+
+    with app.app_context():
+        headers = {"Authorization": "Bearer " + create_access_token(identity=str(admin_id),
+                                                                     additional_claims={"is_admin": True})}
+    client = app.test_client()
+    today = datetime.utcnow().date()
+    date_from = today - timedelta(days=89)
+    query = f"from={date_from}&to={today}"
+    for path in ("/api/admin/analytics/deposits", f"/api/admin/analytics/daily-volume?{query}",
+                 f"/api/admin/analytics/top-receivers?{query}&limit=5"):
+        begin = time.perf_counter()
+        response = client.get(path, headers=headers)
+        print(f"  GET {path.split('?')[0]:<36} {response.status_code}  {(time.perf_counter() - begin) * 1000:7.2f} ms")
+    print(f"  depósitos por tipo: {client.get('/api/admin/analytics/deposits', headers=headers).json['deposits']}")
+
+    report = client.get(f"/api/admin/analytics/check?{query}", headers=headers).json
+    for name, check in report["checks"].items():
+        print(f"  {name:<18} coincide={check['consistent']!s:<5}  rollups {check['rollup_ms']:8.2f} ms  "
+              f"recorrido {check['scan_ms']:8.2f} ms")
+        for mismatch in check["mismatches"][:5]:
+            print(f"      recorrido={mismatch['scan']}  rollups={mismatch['rollup']}")
+    return 0 if report["consistent"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# benchmarks/serialization.py
+"""
+Coste de serializar cuentas: antes y después del registro de serializadores.
+
+Con ``--accounts`` cuentas (100k por defecto) mide, por separado, armar los
+dicts y codificarlos:
+  * antes: entidades ``Account`` hidratadas por el ORM, dict a mano por cuenta y
+    ``json.dumps`` del módulo estándar (como hacía ``jsonify``),
+  * después: ``select`` de columnas con ``ACCOUNT.fetch`` (tuplas -> dict por
+    ``zip``) y el codificador rápido (orjson), y también MessagePack.
+Comprueba que ambos caminos producen los mismos datos y que una ruta responde
+MessagePack cuando se pide en ``Accept`` (y JSON en cualquier otro caso).
+Termina con código 1 si algo no cuadra.
+
+Uso:
+    python -m benchmarks.serialization --accounts 100000
+"""
+import argparse
+import json
+import sys
+import time
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+
+from backend.database.models import db, Client, Account
+from backend.services import serialization
+from backend.services.serialization import ACCOUNT, dumps_bytes
+from benchmarks.common import default_database_url, make_app
+
+
+def seed(app, n_accounts):
+    with app.app_context():
+        client = Client(full_name="Serialización", email="ser@novabank.test", phone_number="0", cip="SER",
+                        password_hash="x", is_admin=True)
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client.id, "account_type": "ahorro" if n % 2 else "corriente", "balance": n * 1.25,
+             "account_number": str(n).zfill(10)}
+            for n in range(n_accounts)
+        ])
+        db.session.commit()
+        return client.id, create_access_token(identity=str(client.id), additional_claims={"is_admin": True})
+
+
+def timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones (se informa la mejor)")
+    args = parser.parse_args(argv)
+
+    app = make_app(default_database_url("serialization"), LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0,
+                   IDEMPOTENCY_PURGE_INTERVAL=0, CARD_HOLD_SWEEP_INTERVAL=0, TOKEN_DENYLIST_SYNC_INTERVAL=0)
+    client_id, token = seed(app, args.accounts)
+    failed = False
+
+    with app.app_context():
+        def build_before():
+            db.session.expunge_all()
+            return [
+                {
+                    "id": account.id,
+                    "account_type": account.account_type,
+                    "balance": account.total_balance,
+                    "account_number": account.account_number,
+                }
+                for account in Account.query.order_by(Account.id).all()
+            ]
+
+        def build_after():
+            return ACCOUNT.fetch(db.session, order_by=Account.id)
+
+        build_old, before = timed(build_before, args.repeat)
+        build_new, after = timed(build_after, args.repeat)
+        encode_old, old_bytes = timed(lambda: json.dumps(before, separators=(",", ":")).encode("utf-8"), args.repeat)
+        encode_new, new_bytes = timed(lambda: dumps_bytes(after), args.repeat)
+        if serialization.msgpack is not None:
+            encode_pack, packed = timed(lambda: serialization.pack_msgpack(after), args.repeat)
+        else:
+            encode_pack, packed = None, None
+
+    print(f"  {args.accounts} cuentas ({'orjson' if serialization.orjson else 'json estándar'})")
+    print(f"  armar dicts: antes (ORM) {build_old * 1000:.0f} ms, después (columnas) {build_new * 1000:.0f} ms "
+          f"(x{build_old / build_new:.1f})")
+    print(f"  codificar: antes (json) {encode_old * 1000:.0f} ms, después {encode_new * 1000:.0f} ms "
+          f"(x{encode_old / encode_new:.1f}); {len(new_bytes) / 1e6:.1f} MB")
+    print(f"  total: antes {(build_old + encode_old) * 1000:.0f} ms, después {(build_new + encode_new) * 1000:.0f} ms "
+          f"(x{(build_old + encode_old) / (build_new + encode_new):.1f})")
+    if packed is not None:
+        print(f"  MessagePack: {encode_pack * 1000:.0f} ms, {len(packed) / 1e6:.1f} MB")
+    failed |= json.loads(old_bytes) != json.loads(new_bytes) or before != after
+    failed |= build_new + encode_new > build_old + encode_old
+
+    # Negociación de contenido en una ruta real
+    http = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    as_json = http.get("/api/admin/accounts/page?limit=100", headers=headers)
+    as_any = http.get("/api/admin/accounts/page?limit=100", headers={**headers, "Accept": "*/*"})
+    print(f"  /api/admin/accounts/page: sin Accept -> {as_json.mimetype}, Accept */* -> {as_any.mimetype}", end="")
+    failed |= as_json.mimetype != "application/json" or as_any.mimetype != "application/json"
+    if serialization.msgpack is not None:
+        as_pack = http.get("/api/admin/accounts/page?limit=100", headers={**headers, "Accept": "application/msgpack"})
+        same = serialization.msgpack.unpackb(as_pack.data) == as_json.get_json()
+        print(f", Accept msgpack -> {as_pack.mimetype} ({len(as_pack.data)} frente a {len(as_json.data)} bytes, "
+              f"mismos datos={same})")
+        failed |= as_pack.mimetype != "application/msgpack" or not same
+    else:
+        print(" (msgpack no instalado)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# benchmarks/statement_generation.py
+"""
+Estados de cuenta: saldo corrido, memoria acotada, jobs de fondo y descargas con Range.
+
+Reutiliza el sembrado de ``benchmarks.ledger_balance_as_of`` (transferencias
+históricas asentadas con ``flask ledger backfill``) y comprueba:
+  * que el saldo corrido de cada fila coincide con ``balance_as_of`` en el
+    instante del asiento (en una muestra) y que cuadra fila a fila,
+  * que la memoria pico al emitir el estado en streaming no crece con el
+    número de filas (se comparan un cuarto del rango y el rango completo),
+  * que un job de fondo informa su progreso, termina y su archivo es idéntico
+    al estado servido en streaming,
+  * que la descarga admite ``Range`` (206 con los bytes pedidos).
+Termina con código 1 si algo no cuadra.
+
+Uso:
+    python -m benchmarks.statement_generation --transfers 50000 --days 365
+"""
+import argparse
+import csv
+import io
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from backend.database.models import db, Client
+from backend.services.ledger import balance_as_of
+from benchmarks.common import default_database_url, make_app
+from benchmarks.ledger_balance_as_of import FLOAT_TOLERANCE, seed
+
+
+def stream(client, url, headers):
+    """Consume la respuesta en streaming; devuelve (bytes, memoria pico en bytes, segundos)."""
+    with tempfile.TemporaryFile() as f:
+        # Al archivo y no a un buffer: la memoria medida es solo la de la respuesta
+        tracemalloc.start()
+        begin = time.perf_counter()
+        response = client.get(url, headers=headers, buffered=False)
+        for piece in response.response:
+            f.write(piece)
+        response.close()
+        elapsed = time.perf_counter() - begin
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        f.seek(0)
+        return response.status_code, f.read(), peak, elapsed
+
+
+def check_rows(app, account_id, body, samples):
+    rows = list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+    opening, entries, closing = rows[0], rows[1:-1], rows[-1]
+    balance = float(opening["balance"])
+    drift = 0
+    for row in entries:
+        balance += float(row["credit"] or 0) - float(row["debit"] or 0)
+        if abs(balance - float(row["balance"])) > 0.011:
+            drift += 1
+        balance = float(row["balance"])
+    mismatched = 0
+    with app.app_context():
+        conn = db.session.connection()
+        for row in random.Random(3).sample(entries, min(samples, len(entries))):
+            expected = balance_as_of(conn, account_id, datetime.fromisoformat(row["date"]))
+            if abs(round(expected, 2) - float(row["balance"])) > FLOAT_TOLERANCE:
+                mismatched += 1
+    if abs(float(closing["balance"]) - balance) > FLOAT_TOLERANCE:
+        drift += 1
+    return len(entries), drift, mismatched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=4)
+    parser.add_argument("--transfers", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    app = make_app(default_database_url("statements"), LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0,
+                   STATEMENT_INLINE_MAX_DAYS=args.days + 1, STATEMENT_CHUNK_SIZE=args.chunk_size)
+    ids, start = seed(app, args.accounts, args.transfers, args.days)
+    print(app.test_cli_runner().invoke(args=["ledger", "backfill"]).output.strip())
+    account_id = ids[0]
+    with app.app_context():
+        owner = db.session.execute(db.select(Client.id)).scalar_one()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(owner))}"}
+    client = app.test_client()
+    failed = False
+
+    date_from = start.date()
+    date_to = (start + timedelta(days=args.days)).date()
+    quarter = (start + timedelta(days=args.days // 4)).date()
+    peaks = {}
+    for label, until in (("1/4 del rango", quarter), ("rango completo", date_to)):
+        url = f"/api/transactions/statements/{account_id}?from={date_from}&to={until}&format=csv"
+        status, body, peak, elapsed = stream(client, url, headers)
+        rows, drift, mismatched = check_rows(app, account_id, body, args.samples)
+        peaks[label] = peak
+        failed |= status != 200 or bool(drift or mismatched)
+        print(f"  {label:<15} {rows:>7} filas en {elapsed:.2f} s ({rows / elapsed:.0f} filas/s)  "
+              f"memoria pico {peak / 1024 / 1024:.1f} MB  descuadres {drift}  distintos de balance_as_of {mismatched}")
+    growth = peaks["rango completo"] / max(peaks["1/4 del rango"], 1)
+    print(f"  crecimiento de la memoria pico con 4x filas: x{growth:.2f}")
+    failed |= growth > 2.0
+
+    status, json_body, _, _ = stream(
+        client, f"/api/transactions/statements/{account_id}?from={date_from}&to={date_to}&format=json", headers)
+    failed |= status != 200 or not json_body.endswith(b"}")
+
+    response = client.post("/api/transactions/statements/jobs", headers=headers, json={
+        "account_id": account_id, "from": str(date_from), "to": str(date_to), "format": "csv"})
+    job_url = response.json["status_url"]
+    progress = []
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        job = client.get(job_url, headers=headers).json
+        progress.append(job["progress"]["rows_written"])
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    print(f"  job {job['status']}: {job['progress']}  progreso observado {sorted(set(progress))[:6]}...")
+    failed |= job["status"] != "done"
+
+    if job["status"] == "done":
+        download = client.get(job["download_url"], headers=headers)
+        _, inline, _, _ = stream(client, f"/api/transactions/statements/{account_id}?from={date_from}"
+                                         f"&to={date_to}&format=csv", headers)
+        same = download.data == inline
+        partial = client.get(job["download_url"], headers={**headers, "Range": "bytes=100-1099"})
+        range_ok = partial.status_code == 206 and partial.data == download.data[100:1100]
+        print(f"  archivo {len(download.data) / 1024:.0f} KB, idéntico al streaming: {same}; "
+              f"Range 100-1099 -> {partial.status_code} ({len(partial.data)} bytes) correcto: {range_ok}")
+        failed |= not (same and range_ok)
+
+    over = client.get(f"/api/transactions/statements/{account_id}?from=2000-01-01&to={date_to}", headers=headers)
+    print(f"  rango mayor que el límite en línea -> {over.status_code}")
+    failed |= over.status_code != 400
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
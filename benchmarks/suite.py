@@ -0,0 +1,367 @@
+# benchmarks/suite.py
+"""
+Suite reproducible de rendimiento sobre el banco sintético de ``benchmarks.dataset``.
+
+Carga el banco (o reutiliza uno ya cargado con ``--reuse``) y recorre los
+escenarios con ``create_app()``:
+    register, login, dashboard, transfer, history, admin_accounts, admin_clients
+cada uno con ``--concurrency`` hilos que envían ``--requests`` peticiones en
+total, a través del cliente de pruebas de Flask (``--driver test``) o de un
+servidor WSGI local con hilos (``--driver wsgi``, HTTP real por loopback).
+Por escenario informa el rendimiento (peticiones/s), la latencia p50/p95/p99,
+las sentencias SQL por petición y los códigos de estado, y puede guardarlo en
+JSON (``--output``).
+
+Con ``--baseline`` compara contra una medición guardada y termina con código 1
+si algún escenario empeora más de ``--tolerance`` en p95 o en rendimiento, si
+hace más consultas por petición o si aparecen errores. Las latencias dependen
+de la máquina: la línea base se genera en la misma máquina que la compara
+(``--save-baseline``). ``benchmarks/baselines/`` guarda la del perfil por
+defecto.
+
+Uso:
+    python -m benchmarks.suite --profile 1k --concurrency 8 --output resultados.json
+    python -m benchmarks.suite --baseline benchmarks/baselines/sqlite-1k.json
+    python -m benchmarks.suite --database-url postgresql+psycopg://localhost/novabank_bench --profile 1m --reuse
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, select
+from werkzeug.serving import make_server
+
+from backend.database.models import db
+from backend.database.models.account import Account
+from backend.database.models.client import Client
+from backend.database.routing import get_read_router
+from backend.services.password_hashing import get_password_hasher
+from benchmarks.common import default_database_url, make_app
+from benchmarks.dataset import DEFAULT_SEED, PASSWORD, PROFILES, generate, profile_sizes
+
+SCENARIOS = ("register", "login", "dashboard", "transfer", "history", "admin_accounts", "admin_clients")
+# Escenarios que pasan por el KDF: su concurrencia se acota a la cola del pool de hashing
+# (por encima, el pool responde 503 a propósito y se mediría el rechazo, no el login)
+KDF_SCENARIOS = ("register", "login")
+SAMPLE_CLIENTS = 200
+DEFAULT_TOLERANCE = 0.25
+SHED_STATUSES = (429, 503)
+QUERY_TOLERANCE = 0.5  # sentencias por petición de más que se aceptan (reintentos, cargas perezosas)
+
+
+class Fixtures:
+    """Clientes de muestra con su token y sus cuentas, y el administrador."""
+
+    def __init__(self, app, sample=SAMPLE_CLIENTS):
+        with app.app_context():
+            admin_id = db.session.execute(
+                select(Client.id).where(Client.is_admin.is_(True)).order_by(Client.id).limit(1)).scalar()
+            rows = db.session.execute(
+                select(Client.id, Client.email, Account.id)
+                .join(Account, Account.client_id == Client.id)
+                .where(Client.is_admin.is_(False))
+                .order_by(Client.id, Account.id)
+                .limit(sample * 2)
+            ).all()
+            self.users = []
+            seen = {}
+            for client_id, email, account_id in rows:
+                if client_id not in seen:
+                    seen[client_id] = {"id": client_id, "email": email, "accounts": [],
+                                       "token": create_access_token(identity=str(client_id),
+                                                                    additional_claims={"is_admin": False})}
+                    self.users.append(seen[client_id])
+                seen[client_id]["accounts"].append(account_id)
+            self.users = self.users[:sample]
+            self.account_ids = [account for user in self.users for account in user["accounts"]]
+            self.admin_token = create_access_token(identity=str(admin_id), additional_claims={"is_admin": True})
+        # Identificador corto de la ejecución: los registros no chocan con los de otra anterior
+        self.run_id = format(time.time_ns() // 1000000 % 36 ** 8, "x")
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def build_request(scenario, n, fixtures):
+    """``(método, ruta, cabeceras, json)`` de la petición ``n`` del escenario."""
+    user = fixtures.users[n % len(fixtures.users)]
+    if scenario == "register":
+        tag = f"{fixtures.run_id}-{n}"
+        return "POST", "/api/auth/register", {}, {
+            "full_name": f"Suite {tag}", "email": f"suite-{tag}@novabank.test", "phone_number": "0",
+            "cip": f"S{tag}", "password": PASSWORD}
+    if scenario == "login":
+        return "POST", "/api/auth/login", {}, {"email": user["email"], "password": PASSWORD}
+    if scenario == "dashboard":
+        return "GET", "/api/auth/dashboard", bearer(user["token"]), None
+    if scenario == "transfer":
+        receiver = fixtures.account_ids[(n * 7919) % len(fixtures.account_ids)]
+        if receiver == user["accounts"][0]:
+            receiver = fixtures.account_ids[(n * 7919 + 1) % len(fixtures.account_ids)]
+        return "POST", "/api/transactions/transfer", bearer(user["token"]), {
+            "sender_account_id": user["accounts"][0], "receiver_account_id": receiver, "amount": 0.01,
+            "description": "Suite de benchmarks"}
+    if scenario == "history":
+        return "GET", f"/api/transactions/history/{user['accounts'][0]}?limit=50", bearer(user["token"]), None
+    if scenario == "admin_accounts":
+        return "GET", "/api/admin/accounts/page?limit=100", bearer(fixtures.admin_token), None
+    if scenario == "admin_clients":
+        return "GET", "/api/admin/clients?limit=100", bearer(fixtures.admin_token), None
+    raise ValueError(f"Escenario desconocido: {scenario}")
+
+
+class TestClientDriver:
+    """Peticiones en proceso con el cliente de pruebas de Flask (uno por hilo)."""
+
+    name = "test"
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, headers, body):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client.open(path, method=method, headers=headers, json=body).status_code
+
+    def close(self):
+        pass
+
+
+class WSGIDriver:
+    """Servidor WSGI local con hilos y HTTP real por loopback (sin proxies ni TLS)."""
+
+    name = "wsgi"
+
+    def __init__(self, app):
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.port = self.server.server_port
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def request(self, method, path, headers, body):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        try:
+            payload = json.dumps(body).encode("utf-8") if body is not None else None
+            all_headers = {**headers, "Content-Type": "application/json"} if payload is not None else headers
+            connection.request(method, path, body=payload, headers=all_headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+DRIVERS = {"test": TestClientDriver, "wsgi": WSGIDriver}
+
+
+def count_statements(app):
+    """Contador de sentencias SQL de todos los motores (primario y réplicas)."""
+    counter = {"statements": 0}
+    lock = threading.Lock()
+
+    def count(*_):
+        with lock:
+            counter["statements"] += 1
+
+    with app.app_context():
+        router = get_read_router()
+        for engine in [*db.engines.values(), *(router.replicas.values() if router is not None else ())]:
+            event.listen(engine, "before_cursor_execute", count)
+    return counter
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_scenario(driver, scenario, fixtures, requests, concurrency, counter, offset=0):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    next_index = iter(range(offset, offset + requests))
+
+    def worker():
+        while True:
+            with lock:
+                n = next(next_index, None)
+            if n is None:
+                return
+            method, path, headers, body = build_request(scenario, n, fixtures)
+            begin = time.perf_counter()
+            status = driver.request(method, path, headers, body)
+            elapsed = time.perf_counter() - begin
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    statements_before = counter["statements"]
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - begin
+    # 429/503 son rechazos de control de admisión (límites, pools saturados): se cuentan aparte
+    shed = sum(count for status, count in statuses.items() if status in SHED_STATUSES)
+    errors = sum(count for status, count in statuses.items() if status >= 400) - shed
+    return {
+        "requests": requests,
+        "seconds": round(wall, 4),
+        "throughput": round(requests / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "concurrency": concurrency,
+        "queries_per_request": round((counter["statements"] - statements_before) / requests, 3),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "shed": shed,
+        "errors": errors,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Lista de regresiones de ``results`` frente a ``baseline`` (vacía si no hay)."""
+    problems = []
+    keys = ("profile", "clients", "transactions", "driver", "concurrency", "requests", "database", "hash_method")
+    mismatched = [key for key in keys if results["meta"].get(key) != baseline["meta"].get(key)]
+    if mismatched:
+        problems.append(f"la línea base se midió con otra configuración ({', '.join(mismatched)})")
+        return problems
+    for scenario, current in results["scenarios"].items():
+        reference = baseline["scenarios"].get(scenario)
+        if reference is None:
+            continue
+        if current["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            problems.append(f"{scenario}: p95 {current['p95_ms']:.1f} ms frente a {reference['p95_ms']:.1f} ms")
+        if current["throughput"] < reference["throughput"] * (1 - tolerance):
+            problems.append(f"{scenario}: {current['throughput']:.1f} pet/s frente a {reference['throughput']:.1f}")
+        if current["queries_per_request"] > reference["queries_per_request"] + QUERY_TOLERANCE:
+            problems.append(f"{scenario}: {current['queries_per_request']} consultas por petición frente a "
+                            f"{reference['queries_per_request']}")
+        if current["shed"] > reference.get("shed", 0) * (1 + tolerance) + current["requests"] * 0.01:
+            problems.append(f"{scenario}: {current['shed']} peticiones rechazadas por saturación frente a "
+                            f"{reference.get('shed', 0)}")
+        if current["errors"] > reference["errors"]:
+            problems.append(f"{scenario}: {current['errors']} respuestas de error ({current['statuses']})")
+    return problems
+
+
+def print_table(results, baseline=None):
+    print(f"  {'escenario':<15} {'hilos':>5} {'pet/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'SQL/pet':>8}  estados")
+    for scenario, row in results["scenarios"].items():
+        line = (f"  {scenario:<15} {row['concurrency']:>5} {row['throughput']:>9.1f} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+                f"{row['p99_ms']:>9.2f} {row['queries_per_request']:>8.2f}  {row['statuses']}")
+        reference = (baseline or {}).get("scenarios", {}).get(scenario)
+        if reference:
+            line += f"  (p95 {(row['p95_ms'] / reference['p95_ms'] - 1) * 100:+.0f}%, " \
+                    f"pet/s {(row['throughput'] / reference['throughput'] - 1) * 100:+.0f}%)"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="SQLite o PostgreSQL local (por defecto, un SQLite temporal)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="1k")
+    parser.add_argument("--clients", type=int)
+    parser.add_argument("--transactions", type=int)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--reuse", action="store_true", help="no generar: la base de datos ya tiene el banco")
+    parser.add_argument("--driver", choices=sorted(DRIVERS), default="test")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="peticiones por escenario")
+    parser.add_argument("--warmup", type=int, default=40, help="peticiones previas por escenario (no se miden)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--hash-method", help="KDF de las contraseñas (por defecto, PASSWORD_HASH_METHOD)")
+    parser.add_argument("--output", help="archivo JSON con los resultados")
+    parser.add_argument("--baseline", help="JSON de una medición anterior con la que comparar")
+    parser.add_argument("--save-baseline", help="guarda los resultados como línea base en este archivo")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="empeoramiento admitido en p95 y rendimiento (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    url = args.database_url or (default_database_url("suite") if not args.reuse else None)
+    if url is None:
+        parser.error("--reuse necesita --database-url")
+    overrides = {"PASSWORD_HASH_METHOD": args.hash_method} if args.hash_method else {}
+    app = make_app(url, LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0, IDEMPOTENCY_PURGE_INTERVAL=0,
+                   CARD_HOLD_SWEEP_INTERVAL=0, TOKEN_DENYLIST_SYNC_INTERVAL=0, **overrides)
+    clients, transactions = profile_sizes(args.profile, args.clients, args.transactions)
+    if not args.reuse:
+        print(f"Generando el perfil {args.profile}: {clients} clientes, {transactions} transacciones")
+        generate(app, clients, transactions, seed=args.seed)
+
+    fixtures = Fixtures(app)
+    counter = count_statements(app)
+    driver = DRIVERS[args.driver](app)
+    with app.app_context():
+        database = db.engine.dialect.name
+        hasher = get_password_hasher()
+        kdf_concurrency = min(args.concurrency, hasher.max_pending) if hasher.workers else args.concurrency
+    results = {
+        "meta": {
+            "profile": args.profile, "clients": clients, "transactions": transactions, "seed": args.seed,
+            "driver": args.driver, "concurrency": args.concurrency, "requests": args.requests,
+            "database": database, "hash_method": app.config["PASSWORD_HASH_METHOD"],
+            "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "measured_at": datetime.utcnow().isoformat(),
+        },
+        "scenarios": {},
+    }
+    print(f"Driver {args.driver}, concurrencia {args.concurrency}, {args.requests} peticiones por escenario "
+          f"({database}, {urlsplit(url).scheme})")
+    try:
+        for scenario in args.scenarios:
+            concurrency = kdf_concurrency if scenario in KDF_SCENARIOS else args.concurrency
+            if args.warmup:
+                run_scenario(driver, scenario, fixtures, args.warmup, concurrency, counter, offset=args.requests)
+            results["scenarios"][scenario] = run_scenario(driver, scenario, fixtures, args.requests, concurrency,
+                                                          counter)
+    finally:
+        driver.close()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write("\n")
+            print(f"Resultados guardados en {path}")
+
+    if baseline is not None:
+        problems = compare(results, baseline, args.tolerance)
+        if problems:
+            print(f"REGRESIÓN frente a {args.baseline} (tolerancia {args.tolerance:.0%}):")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1
+        print(f"Sin regresiones frente a {args.baseline} (tolerancia {args.tolerance:.0%})")
+    return 1 if any(row["errors"] for row in results["scenarios"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
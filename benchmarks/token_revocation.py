@@ -0,0 +1,164 @@
+# benchmarks/token_revocation.py
+"""
+Coste por petición de la lista de revocación de tokens y su corrección.
+
+Con la lista cargada con ``--revoked`` entradas, mide la latencia mediana de
+una ruta protegida barata (``/api/auth/dashboard`` servida desde la caché) en
+tres modos: sin comprobación (``off``), con el filtro de Bloom (``bloom``) y con
+una consulta a la tabla en cada petición (``db``). Mide también la tasa real de
+falsos positivos del filtro. Después comprueba con dos workers (dos
+aplicaciones sobre la misma base de datos) que:
+  * un logout invalida el token al instante en su worker y en el otro tras la
+    sincronización,
+  * un refresh token canjeado no se puede volver a usar,
+  * al quitarle el rol a un administrador sus tokens dejan de valer y al
+    volver a entrar ya no tiene acceso de administrador.
+Termina con código 1 si algo no cuadra.
+
+Uso:
+    python -m benchmarks.token_revocation --requests 2000 --revoked 20000
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+
+from backend.database.models import db, Client, RevokedToken
+from backend.services.token_revocation import get_token_denylist, jti_key
+from benchmarks.common import default_database_url, make_app
+
+SYNC_INTERVAL = 0.2
+PASSWORD = "secreto123"
+
+
+def register(app, n):
+    email = f"token{n}@novabank.test"
+    app.test_client().post("/api/auth/register", json={
+        "full_name": f"Token {n}", "email": email, "phone_number": "0", "cip": f"TOK{n}", "password": PASSWORD})
+    with app.app_context():
+        return db.session.query(Client.id).filter_by(email=email).scalar(), email
+
+
+def login(app, email):
+    data = app.test_client().post("/api/auth/login", json={"email": email, "password": PASSWORD}).get_json()
+    return data["token"], data["refresh_token"]
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def median_latency(app, token, requests):
+    http = app.test_client()
+    headers = bearer(token)
+    http.get("/api/auth/dashboard", headers=headers)  # llena la caché del dashboard
+    samples = []
+    for _ in range(requests):
+        begin = time.perf_counter()
+        status = http.get("/api/auth/dashboard", headers=headers).status_code
+        samples.append(time.perf_counter() - begin)
+        assert status == 200, status
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--revoked", type=int, default=20000, help="entradas en la lista de revocación")
+    args = parser.parse_args(argv)
+
+    url = default_database_url("token_revocation")
+    overrides = dict(LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0, IDEMPOTENCY_PURGE_INTERVAL=0,
+                     CARD_HOLD_SWEEP_INTERVAL=0, PASSWORD_HASH_WORKERS=0,
+                     PASSWORD_HASH_METHOD="pbkdf2:sha256:1000", TOKEN_DENYLIST_SYNC_INTERVAL=SYNC_INTERVAL)
+    workers = [make_app(url, **overrides) for _ in range(2)]
+    app = workers[0]
+    failed = False
+
+    user_id, user_email = register(app, 1)
+    admin_id, admin_email = register(app, 2)
+    target_id, target_email = register(app, 3)
+    revoked_at = datetime.utcnow() - timedelta(hours=1)
+    with app.app_context():
+        db.session.execute(update(Client.__table__).where(Client.id.in_([admin_id, target_id])).values(is_admin=True))
+        db.session.execute(insert(RevokedToken.__table__), [
+            {"key": jti_key(uuid.uuid4()), "client_id": None, "token_type": "access", "revoked_at": revoked_at,
+             "expires_at": revoked_at + timedelta(days=1)}
+            for _ in range(args.revoked)
+        ])
+        db.session.commit()
+
+    token, _ = login(app, user_email)
+    latencies = {}
+    for mode in ("off", "bloom", "db"):
+        mode_app = make_app(url, **{**overrides, "TOKEN_REVOCATION_CHECK": mode, "TOKEN_DENYLIST_SYNC_INTERVAL": 0})
+        latencies[mode] = median_latency(mode_app, token, args.requests)
+        if mode == "bloom":
+            with mode_app.app_context():
+                stats = get_token_denylist().stats()
+    print(f"  {args.revoked} entradas revocadas; latencia mediana de /dashboard: "
+          + ", ".join(f"{mode} {value * 1e6:.0f} µs" for mode, value in latencies.items()))
+    print(f"  sobrecoste por petición: filtro de Bloom {(latencies['bloom'] - latencies['off']) * 1e6:+.0f} µs, "
+          f"consulta a la tabla {(latencies['db'] - latencies['off']) * 1e6:+.0f} µs; "
+          f"consultas a la tabla con el filtro: {stats['db_lookups']} de {stats['checks']} comprobaciones")
+    failed |= stats["db_lookups"] > stats["checks"] * 0.01 + 1
+
+    with app.app_context():
+        denylist = get_token_denylist()
+        denylist.sync(db.session.connection())
+        probes = 100000
+        begin = time.perf_counter()
+        positives = sum(1 for _ in range(probes) if jti_key(uuid.uuid4()) in denylist._filter)
+        per_check = (time.perf_counter() - begin) / probes
+        stats = denylist.stats()
+    print(f"  filtro: {stats['filter_bits']} bits, {stats['filter_hashes']} hashes; falsos positivos "
+          f"{positives / probes:.4%} (objetivo {app.config['TOKEN_DENYLIST_ERROR_RATE']:.4%}), "
+          f"{per_check * 1e6:.1f} µs por consulta al filtro")
+    failed |= positives / probes > app.config["TOKEN_DENYLIST_ERROR_RATE"] * 3
+
+    # Logout: inmediato en el worker que lo atiende, en el otro tras la sincronización
+    for worker in workers:
+        worker.test_client().get("/api/auth/dashboard", headers=bearer(token))  # carga el filtro
+    a, b = (worker.test_client() for worker in workers)
+    a.post("/api/auth/logout", headers=bearer(token))
+    same_worker = a.get("/api/auth/dashboard", headers=bearer(token)).status_code
+    time.sleep(SYNC_INTERVAL * 3)
+    other_worker = b.get("/api/auth/dashboard", headers=bearer(token)).status_code
+    print(f"  logout -> mismo worker {same_worker}, otro worker tras sincronizar {other_worker}")
+    failed |= same_worker != 401 or other_worker != 401
+
+    # Rotación de refresh tokens
+    token, refresh = login(app, user_email)
+    rotated = a.post("/api/auth/refresh", headers=bearer(refresh))
+    reused = b.post("/api/auth/refresh", headers=bearer(refresh)).status_code
+    new_token_ok = b.get("/api/auth/dashboard", headers=bearer(rotated.get_json()["token"])).status_code
+    print(f"  refresh -> {rotated.status_code}, reutilizado -> {reused}, token nuevo -> {new_token_ok}")
+    failed |= rotated.status_code != 200 or reused != 401 or new_token_ok != 200
+
+    # Un administrador pierde el rol: sus tokens dejan de valer en ambos workers
+    admin_token, _ = login(app, admin_email)
+    target_token, target_refresh = login(app, target_email)
+    before = b.get("/api/admin/cache/stats", headers=bearer(target_token)).status_code
+    # "iat" tiene resolución de segundos: los tokens emitidos en el mismo segundo
+    # que la revocación siguen valiendo, así que los viejos tienen que ser de antes
+    time.sleep(1.0)
+    demoted = a.put(f"/api/admin/clients/{target_id}/admin", json={"is_admin": False},
+                    headers=bearer(admin_token)).status_code
+    # El login justo después de la revocación no queda revocado (403: ya no es administrador)
+    new_token, _ = login(app, target_email)
+    relogin = a.get("/api/admin/cache/stats", headers=bearer(new_token)).status_code
+    time.sleep(SYNC_INTERVAL * 3)
+    after = [client.get("/api/admin/cache/stats", headers=bearer(target_token)).status_code for client in (a, b)]
+    refreshed = b.post("/api/auth/refresh", headers=bearer(target_refresh)).status_code
+    print(f"  admin degradado: antes {before}, cambio de rol {demoted}, token viejo {after}, "
+          f"refresh viejo {refreshed}, nuevo login en ruta de admin {relogin}")
+    failed |= before != 200 or demoted != 200 or after != [401, 401] or refreshed != 401 or relogin != 403
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
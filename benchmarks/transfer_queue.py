@@ -0,0 +1,152 @@
+# benchmarks/transfer_queue.py
+"""
+Transferencias síncronas frente a la cola con "group commit".
+
+Varios clientes concurrentes (hilos) envían transferencias entre un conjunto
+de cuentas, primero en modo síncrono (un commit por transferencia) y luego con
+``Prefer: respond-async`` (la cola las aplica en micro-lotes con un commit por
+lote). Para el modo asíncrono el tiempo cuenta hasta que la cola queda vacía,
+es decir, hasta que todas las transferencias aceptadas están confirmadas.
+Comprueba que:
+  * el dinero total no cambia y el saldo de cada cuenta cuadra con las
+    transferencias aplicadas,
+  * cada transferencia aceptada tiene un estado final consultable,
+  * con la cola llena la API responde 503 con ``Retry-After``.
+Termina con código 1 si algo no cuadra.
+
+Uso:
+    python -m benchmarks.transfer_queue --clients 8 --transfers 300 --accounts 20
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func, insert, select
+
+from backend.database.models import db, Client, Account, Transaction, QueuedTransfer
+from benchmarks.common import default_database_url, make_app
+
+INITIAL_BALANCE = 1_000_000.0
+
+
+def seed(app, accounts):
+    with app.app_context():
+        client = Client(full_name="Cola", email="cola@novabank.test", phone_number="0", cip="COLA", password_hash="x")
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client.id, "account_type": "ahorro", "balance": INITIAL_BALANCE,
+             "account_number": str(i).zfill(10)}
+            for i in range(accounts)
+        ])
+        db.session.commit()
+        ids = db.session.execute(select(Account.id).order_by(Account.id)).scalars().all()
+        token = create_access_token(identity=str(client.id))
+        return ids, {"Authorization": f"Bearer {token}"}
+
+
+def run_clients(app, headers, account_ids, clients, per_client, async_mode):
+    extra = {"Prefer": "respond-async"} if async_mode else {}
+    accepted, statuses = [], {}
+    lock = threading.Lock()
+
+    def client_loop(seed_value):
+        rng = random.Random(seed_value)
+        http = app.test_client()
+        for _ in range(per_client):
+            sender, receiver = rng.sample(account_ids, 2)
+            response = http.post("/api/transactions/transfer", headers={**headers, **extra}, json={
+                "sender_account_id": sender, "receiver_account_id": receiver, "amount": rng.randint(1, 100)})
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 202:
+                    accepted.append(response.get_json()["transfer_id"])
+
+    begin = time.perf_counter()
+    threads = [threading.Thread(target=client_loop, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if async_mode:
+        app.extensions["transfer_queue"].join()
+    return time.perf_counter() - begin, statuses, accepted
+
+
+def check_balances(app, account_ids):
+    """Total conservado y saldo de cada cuenta = inicial + lo recibido - lo enviado."""
+    with app.app_context():
+        total = sum(db.session.get(Account, i).total_balance for i in account_ids)
+        t = Transaction.__table__.c
+        received = dict(db.session.execute(select(t.receiver_account_id, func.sum(t.amount))
+                                           .group_by(t.receiver_account_id)).all())
+        sent = dict(db.session.execute(select(t.sender_account_id, func.sum(t.amount))
+                                       .group_by(t.sender_account_id)).all())
+        drift = max(
+            abs(db.session.get(Account, i).total_balance - (INITIAL_BALANCE + received.get(i, 0) - sent.get(i, 0)))
+            for i in account_ids
+        )
+    return abs(total - INITIAL_BALANCE * len(account_ids)), drift
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--transfers", type=int, default=300, help="transferencias por cliente")
+    parser.add_argument("--accounts", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    url = default_database_url("transfer_queue")
+    overrides = dict(LOG_LEVEL="ERROR", HOT_ACCOUNT_COMPACTION_INTERVAL=0, IDEMPOTENCY_PURGE_INTERVAL=0)
+    app = make_app(url, pool_size=args.clients + 4, **overrides)
+    account_ids, headers = seed(app, args.accounts)
+    total = args.clients * args.transfers
+    failed = False
+
+    elapsed, statuses, _ = run_clients(app, headers, account_ids, args.clients, args.transfers, async_mode=False)
+    sync_rate = total / elapsed
+    print(f"  síncrono: {total} transferencias en {elapsed:.2f} s ({sync_rate:.0f}/s) {statuses}")
+
+    elapsed, statuses, accepted = run_clients(app, headers, account_ids, args.clients, args.transfers,
+                                              async_mode=True)
+    async_rate = total / elapsed
+    queue_stats = app.extensions["transfer_queue"].stats()
+    print(f"  en cola: {total} transferencias en {elapsed:.2f} s ({async_rate:.0f}/s) {statuses}, "
+          f"{queue_stats['batches']} lotes (x{async_rate / sync_rate:.1f})")
+    failed |= len(accepted) != total
+
+    http = app.test_client()
+    final = {}
+    for transfer_id in accepted[:200]:
+        status = http.get(f"/api/transactions/transfer/{transfer_id}", headers=headers).get_json().get("status")
+        final[status] = final.get(status, 0) + 1
+    with app.app_context():
+        recorded = db.session.execute(select(QueuedTransfer.status, func.count())
+                                      .group_by(QueuedTransfer.status)).all()
+    print(f"  estado consultado (muestra de {min(200, len(accepted))}): {final}; en la tabla: {dict(recorded)}")
+    failed |= sum(count for _, count in recorded) != len(accepted) or "queued" in final or None in final
+
+    total_drift, account_drift = check_balances(app, account_ids)
+    print(f"  descuadre del total {total_drift:.6f}, máximo descuadre por cuenta {account_drift:.6f}")
+    failed |= total_drift > 1e-6 or account_drift > 1e-6
+
+    tiny = make_app(url, pool_size=4, TRANSFER_QUEUE_MAX_PENDING=1, TRANSFER_QUEUE_BATCH_WAIT=0.05, **overrides)
+    http = tiny.test_client()
+    responses = [
+        http.post("/api/transactions/transfer", headers={**headers, "Prefer": "respond-async"}, json={
+            "sender_account_id": account_ids[0], "receiver_account_id": account_ids[1], "amount": 1})
+        for _ in range(50)
+    ]
+    tiny.extensions["transfer_queue"].join()
+    rejected = [r for r in responses if r.status_code == 503]
+    print(f"  cola de 1 plaza: {len(responses) - len(rejected)} aceptadas, {len(rejected)} rechazadas con 503 "
+          f"(Retry-After={rejected[0].headers.get('Retry-After') if rejected else None})")
+    failed |= not rejected or any(r.headers.get("Retry-After") is None for r in rejected)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
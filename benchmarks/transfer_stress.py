@@ -0,0 +1,129 @@
+# benchmarks/transfer_stress.py
+"""
+Prueba de estrés del motor de transferencias.
+
+Muchos hilos transfieren montos aleatorios entre un puñado de cuentas. Al final
+se verifica que no hay deriva de saldos:
+  * la suma total de saldos es la misma que al inicio, y
+  * el saldo de cada cuenta = saldo inicial + recibido - enviado según ``transactions``.
+Se informa el número de transferencias por segundo.
+
+Uso:
+    python -m benchmarks.transfer_stress --threads 16 --accounts 4 --transfers 200
+    python -m benchmarks.transfer_stress --database-url postgresql://localhost/novabank_bench
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from sqlalchemy import func, insert, select
+
+from backend.database.models import db, Client, Account, Transaction
+from backend.services.transfer_engine import (
+    execute_transfer,
+    InsufficientFundsError,
+    TransferRetryExhaustedError,
+)
+from benchmarks.common import default_database_url, make_app
+
+INITIAL_BALANCE = 1000.0
+FLOAT_TOLERANCE = 1e-4  # el saldo es Float: se tolera el error de redondeo acumulado
+
+
+def seed(app, n_accounts):
+    with app.app_context():
+        client = Client(full_name="Stress", email="stress@novabank.test", phone_number="0",
+                        cip="STRESS", password_hash="x")
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(insert(Account.__table__), [
+            {"client_id": client.id, "account_type": "ahorro", "balance": INITIAL_BALANCE,
+             "account_number": str(i).zfill(10)}
+            for i in range(n_accounts)
+        ])
+        db.session.commit()
+        return [row.id for row in db.session.execute(select(Account.id))]
+
+
+def worker(app, account_ids, n_transfers, stats, lock):
+    local = {"ok": 0, "insufficient": 0, "exhausted": 0, "retries": 0}
+    with app.app_context():
+        for _ in range(n_transfers):
+            sender, receiver = random.sample(account_ids, 2)
+            amount = round(random.uniform(1, 50), 2)
+            try:
+                result = execute_transfer(sender, receiver, amount, "stress")
+                local["ok"] += 1
+                local["retries"] += result.attempts - 1
+            except InsufficientFundsError:
+                local["insufficient"] += 1
+            except TransferRetryExhaustedError:
+                local["exhausted"] += 1
+    with lock:
+        for key, value in local.items():
+            stats[key] += value
+
+
+def check_drift(app, account_ids):
+    """Devuelve la lista de cuentas cuyo saldo no cuadra con el historial de transacciones."""
+    with app.app_context():
+        balances = dict(db.session.execute(select(Account.id, Account.balance)).all())
+        sent = dict(db.session.execute(
+            select(Transaction.sender_account_id, func.sum(Transaction.amount))
+            .group_by(Transaction.sender_account_id)).all())
+        received = dict(db.session.execute(
+            select(Transaction.receiver_account_id, func.sum(Transaction.amount))
+            .group_by(Transaction.receiver_account_id)).all())
+
+    drifted = []
+    for account_id in account_ids:
+        expected = INITIAL_BALANCE + received.get(account_id, 0.0) - sent.get(account_id, 0.0)
+        if abs(balances[account_id] - expected) > FLOAT_TOLERANCE:
+            drifted.append((account_id, balances[account_id], expected))
+    total = sum(balances.values())
+    return drifted, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--accounts", type=int, default=4)
+    parser.add_argument("--transfers", type=int, default=200, help="transferencias por hilo")
+    args = parser.parse_args(argv)
+
+    app = make_app(args.database_url or default_database_url("transfer_stress"), pool_size=args.threads,
+                   TRANSFER_MAX_RETRIES=20)
+    account_ids = seed(app, args.accounts)
+
+    stats = {"ok": 0, "insufficient": 0, "exhausted": 0, "retries": 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=worker, args=(app, account_ids, args.transfers, stats, lock))
+               for _ in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    drifted, total = check_drift(app, account_ids)
+    expected_total = INITIAL_BALANCE * len(account_ids)
+
+    print(f"Hilos: {args.threads}  Cuentas: {args.accounts}  Intentos: {args.threads * args.transfers}")
+    print(f"Completadas: {stats['ok']}  Fondos insuficientes: {stats['insufficient']}  "
+          f"Abortadas: {stats['exhausted']}  Reintentos: {stats['retries']}")
+    print(f"Tiempo: {elapsed:.2f}s  Transferencias/seg: {stats['ok'] / elapsed:.1f}")
+    print(f"Saldo total: {total:.2f} (esperado {expected_total:.2f})")
+
+    if drifted or abs(total - expected_total) > FLOAT_TOLERANCE:
+        print(f"ERROR: deriva de saldos detectada en {len(drifted)} cuentas: {drifted}")
+        return 1
+    print("OK: sin deriva de saldos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import React, { createContext, useState, useEffect } from "react";
+import { clearDashboardCache, logout as logoutSession } from "../services/authService";
 
 export const AuthContext = createContext();
 
@@ -17,7 +18,11 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    // Revoca el token y el refresh token en el servidor (si falla, la sesión local se cierra igual)
+    logoutSession().catch(() => {});
     localStorage.removeItem("token");
+    localStorage.removeItem("refresh_token");
+    clearDashboardCache();
     setIsAuthenticated(false);
   };
 
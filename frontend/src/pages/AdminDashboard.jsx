@@ -7,8 +7,46 @@ const AdminDashboard = () => {
   const [accounts, setAccounts] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [accountType, setAccountType] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
 
+  // Pide una página del listado paginado (/api/admin/accounts/page) con los filtros actuales
+  const fetchAccountsPage = async (token, cursor) => {
+    const params = new URLSearchParams({ limit: '100' });
+    if (accountType) params.append('account_type', accountType);
+    if (cursor) params.append('cursor', cursor);
+
+    const response = await fetch(`http://localhost:5000/api/admin/accounts/page?${params.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+        'Content-Type': 'application/json',
+      },
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.message || 'Error al cargar las cuentas de administración.');
+    }
+    return response.json();
+  };
+
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const data = await fetchAccountsPage(localStorage.getItem('token'), nextCursor);
+      setAccounts((prev) => [...prev, ...data.accounts]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error('Error al cargar más cuentas:', err);
+      setError(err.message || 'No se pudieron cargar más cuentas. Intenta de nuevo.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     const fetchAllAccounts = async () => {
       setLoading(true);
@@ -32,21 +70,9 @@ const AdminDashboard = () => {
           return;
         }
 
-        const response = await fetch('http://localhost:5000/api/admin/accounts', {
-          method: 'GET',
-          headers: {
-            'Authorization': `Bearer ${token}`,
-            'Content-Type': 'application/json',
-          },
-        });
-
-        if (!response.ok) {
-          const errorData = await response.json();
-          throw new Error(errorData.message || 'Error al cargar las cuentas de administración.');
-        }
-
-        const data = await response.json();
-        setAccounts(data); 
+        const data = await fetchAccountsPage(token, null);
+        setAccounts(data.accounts);
+        setNextCursor(data.next_cursor);
       } catch (err) {
         console.error('Error al cargar las cuentas del administrador:', err);
         setError(err.message || 'No se pudieron cargar las cuentas. Intenta de nuevo.');
@@ -60,7 +86,7 @@ const AdminDashboard = () => {
     };
 
     fetchAllAccounts();
-  }, [navigate]);
+  }, [navigate, accountType]);
 
   return (
     <div className="min-h-screen flex flex-col items-center bg-gradient-to-tr from-blue-100 to-purple-100 py-8 px-4">
@@ -82,6 +108,18 @@ const AdminDashboard = () => {
           Panel de <span className="text-purple-600">Administración de Cuentas</span>
         </h2>
 
+        <div className="mb-6 flex justify-end">
+          <select
+            value={accountType}
+            onChange={(e) => setAccountType(e.target.value)}
+            className="border border-gray-300 rounded-lg px-3 py-2 text-sm text-gray-700"
+          >
+            <option value="">Todos los tipos de cuenta</option>
+            <option value="ahorro">Ahorro</option>
+            <option value="corriente">Corriente</option>
+          </select>
+        </div>
+
         {loading && <p className="text-blue-500 text-lg mb-4">Cargando cuentas...</p>}
         {error && <p className="text-red-500 text-lg mb-4 font-semibold">{error}</p>}
 
@@ -117,6 +155,16 @@ const AdminDashboard = () => {
             </table>
           </div>
         )}
+
+        {!loading && !error && nextCursor && (
+          <button
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+            className="mt-6 bg-blue-600 text-white px-6 py-2 rounded-lg hover:bg-blue-700 transition duration-150 disabled:opacity-50"
+          >
+            {loadingMore ? 'Cargando...' : 'Cargar más'}
+          </button>
+        )}
       </div>
     </div>
   );
@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from "react";
 import { jwtDecode } from "jwt-decode";
 import { useNavigate } from "react-router-dom";
+import { clearDashboardCache, getDashboard } from "../services/authService";
 
 const Dashboard = () => {
   const [client, setClient] = useState(null);
@@ -22,18 +23,7 @@ const Dashboard = () => {
         return;
       }
 
-      fetch("http://localhost:5000/api/auth/dashboard", {
-        method: "GET",
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      })
-        .then((res) => {
-          if (!res.ok) {
-            throw new Error(`Error HTTP: ${res.status} - ${res.statusText}`);
-          }
-          return res.json();
-        })
+      getDashboard(token)
         .then((data) => {
           if (data && data.client) {
             setClient(data.client);
@@ -59,7 +49,8 @@ const Dashboard = () => {
         .catch((err) => {
           console.error("Error en fetch:", err);
           setError("No se pudo cargar la información. Intenta más tarde.");
-          if (err.message.includes("401")) {
+          if (err.status === 401) {
+            clearDashboardCache();
             localStorage.removeItem("token");
             navigate("/login");
           }
@@ -71,6 +62,7 @@ const Dashboard = () => {
   }, [navigate]);
 
   const handleLogout = () => {
+    clearDashboardCache();
     localStorage.removeItem("token");
     navigate("/login");
   };
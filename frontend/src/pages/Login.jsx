@@ -2,7 +2,7 @@
 
 import React, { useState } from "react";
 import { Link, useNavigate } from "react-router-dom";
-import { login } from "../services/authService";
+import { clearDashboardCache, login } from "../services/authService";
 import { jwtDecode } from "jwt-decode"; // Importa jwtDecode
 
 const Login = () => {
@@ -21,13 +21,16 @@ const Login = () => {
     try {
       // Limpia sesiones antiguas
       localStorage.removeItem("token");
+      localStorage.removeItem("refresh_token");
       localStorage.removeItem("user");
+      clearDashboardCache();
 
       // Login API
       const data = await login({ email, password }); // Envía email y password como objeto
 
       // Guarda sesión
       localStorage.setItem("token", data.token);
+      localStorage.setItem("refresh_token", data.refresh_token); // Para renovar el token sin volver a iniciar sesión
       localStorage.setItem("user", JSON.stringify(data.client)); // Guarda el objeto cliente
 
       console.log("Login exitoso:", data);
@@ -103,9 +103,8 @@ const PaymentForm = () => {
     }
 
     try {
-      // NOTA: El endpoint '/api/payments' aún no está implementado en el backend.
-      // Este formulario está listo para enviar los datos a ese endpoint.
-      // Necesitarás crear la ruta y la lógica en Flask para manejar pagos de servicios.
+      // Pago de servicio desde la cuenta: se autoriza y se cobra en el acto ("capture": true).
+      // El destino es la cuenta recaudadora del banco (PAYMENTS_SETTLEMENT_ACCOUNT_ID).
       const response = await fetch('http://localhost:5000/api/payments', {
         method: 'POST',
         headers: {
@@ -118,6 +117,7 @@ const PaymentForm = () => {
           amount: parsedAmount,
           reference_number: referenceNumber,
           description: description,
+          capture: true,
         }),
       });
 
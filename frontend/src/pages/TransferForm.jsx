@@ -1,8 +1,47 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { jwtDecode } from 'jwt-decode';
+import { getDashboard } from '../services/authService';
 import NovaBankLogo from '../assets/novabank-logo.png'; // <<--- asegúrate de tener esta imagen en la carpeta correcta
 
+// Reintentos de la transferencia: todos con la misma Idempotency-Key, así que el
+// servidor aplica la transferencia una sola vez y devuelve la misma respuesta
+const TRANSFER_TIMEOUT_MS = 5000;
+const TRANSFER_MAX_ATTEMPTS = 4;
+
+const postTransferWithRetries = async (token, payload) => {
+  const idempotencyKey = crypto.randomUUID();
+  for (let attempt = 1; ; attempt++) {
+    const controller = new AbortController();
+    const timer = setTimeout(() => controller.abort(), TRANSFER_TIMEOUT_MS);
+    try {
+      const response = await fetch('http://localhost:5000/api/transactions/transfer', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${token}`,
+          'Idempotency-Key': idempotencyKey,
+        },
+        body: JSON.stringify(payload),
+        signal: controller.signal,
+      });
+      // 5xx y 409 (misma clave aún en curso) se pueden reintentar; el resto es la respuesta final
+      if ((response.status >= 500 || response.status === 409) && attempt < TRANSFER_MAX_ATTEMPTS) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+      return response;
+    } catch (err) {
+      if (attempt >= TRANSFER_MAX_ATTEMPTS) {
+        throw err;
+      }
+      // Backoff exponencial con jitter: 200 ms, 400 ms, 800 ms...
+      await new Promise((resolve) => setTimeout(resolve, Math.random() * 200 * 2 ** (attempt - 1)));
+    } finally {
+      clearTimeout(timer);
+    }
+  }
+};
+
 const TransferForm = () => {
   const [senderAccount, setSenderAccount] = useState('');
   const [receiverAccountNumber, setReceiverAccountNumber] = useState(''); // Cambiado a Number por AccountNumber
@@ -34,20 +73,7 @@ const TransferForm = () => {
         const decodedToken = jwtDecode(token);
         // const clientId = decodedToken.sub; // Puedes usar esto si necesitas el ID del cliente para el endpoint
 
-        const response = await fetch('http://localhost:5000/api/auth/dashboard', {
-          method: 'GET',
-          headers: {
-            'Authorization': `Bearer ${token}`,
-            'Content-Type': 'application/json',
-          },
-        });
-
-        if (!response.ok) {
-          const errorData = await response.json();
-          throw new Error(errorData.message || 'Error al cargar las cuentas.');
-        }
-
-        const data = await response.json();
+        const data = await getDashboard(token);
         if (data.accounts && Array.isArray(data.accounts)) {
           setUserAccounts(data.accounts);
           if (data.accounts.length > 0) {
@@ -60,7 +86,7 @@ const TransferForm = () => {
       } catch (err) {
         console.error('Error al cargar las cuentas:', err);
         setError(err.message || 'No se pudieron cargar las cuentas. Intenta de nuevo.');
-        if (err.message.includes('token') || err.message.includes('sesión')) {
+        if (err.status === 401) {
           localStorage.removeItem('token');
           navigate('/login');
         }
@@ -116,20 +142,13 @@ const TransferForm = () => {
     // y el backend tendrá que manejar la búsqueda por número de cuenta.
 
     try {
-      const response = await fetch('http://localhost:5000/api/transactions/transfer', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`,
-        },
-        body: JSON.stringify({
-          sender_account_id: parseInt(senderAccount), // ID de la cuenta de origen
-          receiver_account_number: receiverAccountNumber, // Número de cuenta del destinatario
-          receiver_name: receiverName, // Nombre del destinatario
-          receiver_bank: receiverBank, // Banco del destinatario
-          amount: parsedAmount,
-          description: description,
-        }),
+      const response = await postTransferWithRetries(token, {
+        sender_account_id: parseInt(senderAccount), // ID de la cuenta de origen
+        receiver_account_number: receiverAccountNumber, // Número de cuenta del destinatario
+        receiver_name: receiverName, // Nombre del destinatario
+        receiver_bank: receiverBank, // Banco del destinatario
+        amount: parsedAmount,
+        description: description,
       });
 
       const data = await response.json();
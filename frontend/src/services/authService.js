@@ -18,23 +18,96 @@ export const login = async (userData) => {
   return response.data;
 };
 
-// Obtener datos del dashboard
+// Canjea el refresh token por un token nuevo (el refresh token también se renueva)
+export const refreshSession = async () => {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) {
+    throw new Error("No hay sesión para renovar");
+  }
+  const response = await axios.post("/auth/refresh", null, {
+    headers: { Authorization: `Bearer ${refreshToken}` },
+  });
+  localStorage.setItem("token", response.data.token);
+  localStorage.setItem("refresh_token", response.data.refresh_token);
+  return response.data.token;
+};
+
+// Cierra la sesión en el servidor: revoca el token de acceso y el refresh token
+export const logout = async () => {
+  const token = localStorage.getItem("token");
+  if (!token) {
+    return;
+  }
+  await axios.post("/auth/logout", { refresh_token: localStorage.getItem("refresh_token") }, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+};
+
+// Copia local del dashboard (payload + versión) para pedir solo los cambios
+const DASHBOARD_CACHE_KEY = "dashboard";
+const DASHBOARD_MAX_TRANSACTIONS = 100;
+
+export const clearDashboardCache = () => sessionStorage.removeItem(DASHBOARD_CACHE_KEY);
+
+const readDashboardCache = () => {
+  try {
+    return JSON.parse(sessionStorage.getItem(DASHBOARD_CACHE_KEY));
+  } catch {
+    return null;
+  }
+};
+
+// Aplica altas/cambios y bajas por id sobre una lista
+const mergeById = (items, changed = [], removed = []) => {
+  const byId = new Map(items.map((item) => [item.id, item]));
+  removed.forEach((id) => byId.delete(id));
+  changed.forEach((item) => byId.set(item.id, item));
+  return [...byId.values()];
+};
+
+const applyDashboardDelta = (cached, delta) => ({
+  ...cached,
+  client: delta.client ?? cached.client,
+  accounts: mergeById(cached.accounts, delta.accounts, delta.removed_accounts),
+  cards: mergeById(cached.cards, delta.cards, delta.removed_cards),
+  // El delta puede repetir transacciones (solape de tiempo): se deduplican por id
+  transactions: mergeById(cached.transactions || [], delta.transactions).slice(-DASHBOARD_MAX_TRANSACTIONS),
+});
+
+// Obtener datos del dashboard. Con una copia guardada se pide ?since=<versión> con
+// If-None-Match: si nada cambió el servidor responde 304 y, si no, solo los cambios
 export async function getDashboard(token) {
-  const response = await fetch("http://localhost:5000/api/auth/dashboard", {
+  const cached = readDashboardCache();
+  const url = new URL("http://localhost:5000/api/auth/dashboard");
+  const headers = { "Authorization": `Bearer ${token}` };
+  if (cached?.version) {
+    url.searchParams.set("since", cached.version);
+    headers["If-None-Match"] = `"${cached.version}"`;
+  }
+
+  const response = await fetch(url, {
     method: "GET",
-    headers: {
-      "Content-Type": "application/json",
-      "Authorization": `Bearer ${token}`
-    },
-    credentials: "include"
+    headers,
+    credentials: "include",
+    cache: "no-store",
   });
 
+  if (response.status === 304 && cached) {
+    return cached.data;
+  }
   if (!response.ok) {
-    const data = await response.json();
-    throw new Error(data.message || "Error al obtener dashboard");
+    const data = await response.json().catch(() => ({}));
+    const error = new Error(data.message || "Error al obtener dashboard");
+    error.status = response.status;
+    throw error;
   }
 
-  return await response.json();
+  const body = await response.json();
+  const data = body.full || !cached ? { ...body, transactions: [] } : applyDashboardDelta(cached.data, body);
+  if (body.version) {
+    sessionStorage.setItem(DASHBOARD_CACHE_KEY, JSON.stringify({ version: body.version, data }));
+  } else {
+    clearDashboardCache();
+  }
+  return data;
 }
-
-
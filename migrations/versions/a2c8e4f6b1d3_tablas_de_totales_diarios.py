@@ -0,0 +1,53 @@
+"""totales diarios (rollups) por tipo de cuenta y por cuenta, y fecha de apertura de las cuentas
+
+Revision ID: a2c8e4f6b1d3
+Revises: f1b7d3a9c5e2
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2c8e4f6b1d3'
+down_revision = 'f1b7d3a9c5e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+
+    op.create_table('rollup_daily_account_type',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('account_type', sa.String(length=20), nullable=False),
+    sa.Column('shard', sa.SmallInteger(), nullable=False),
+    sa.Column('accounts_opened', sa.Integer(), nullable=False),
+    sa.Column('transfers_in', sa.Integer(), nullable=False),
+    sa.Column('amount_in', sa.Float(), nullable=False),
+    sa.Column('transfers_out', sa.Integer(), nullable=False),
+    sa.Column('amount_out', sa.Float(), nullable=False),
+    sa.Column('other_amount', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'account_type', 'shard')
+    )
+    op.create_table('rollup_daily_account',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.SmallInteger(), nullable=False),
+    sa.Column('transfers_in', sa.Integer(), nullable=False),
+    sa.Column('amount_in', sa.Float(), nullable=False),
+    sa.Column('transfers_out', sa.Integer(), nullable=False),
+    sa.Column('amount_out', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('day', 'account_id', 'shard')
+    )
+    # Los totales se calculan con: flask --app backend.main rollups rebuild
+
+
+def downgrade():
+    op.drop_table('rollup_daily_account')
+    op.drop_table('rollup_daily_account_type')
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
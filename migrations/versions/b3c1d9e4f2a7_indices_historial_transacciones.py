@@ -0,0 +1,28 @@
+"""indices compuestos para historial de transacciones
+
+Revision ID: b3c1d9e4f2a7
+Revises: 98921692b2f2
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3c1d9e4f2a7'
+down_revision = '98921692b2f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_sender_timestamp_id', ['sender_account_id', 'timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_transactions_receiver_timestamp_id', ['receiver_account_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_receiver_timestamp_id')
+        batch_op.drop_index('ix_transactions_sender_timestamp_id')
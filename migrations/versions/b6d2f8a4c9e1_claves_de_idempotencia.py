@@ -0,0 +1,38 @@
+"""claves de idempotencia (idempotency_keys)
+
+Revision ID: b6d2f8a4c9e1
+Revises: a2c8e4f6b1d3
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2f8a4c9e1'
+down_revision = 'a2c8e4f6b1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_keys',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('status_code', sa.SmallInteger(), nullable=True),
+    sa.Column('response_body', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.PrimaryKeyConstraint('client_id', 'key')
+    )
+    with op.batch_alter_table('idempotency_keys', schema=None) as batch_op:
+        batch_op.create_index('ix_idempotency_keys_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_keys', schema=None) as batch_op:
+        batch_op.drop_index('ix_idempotency_keys_created_at')
+
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,39 @@
+"""estado de las transferencias asíncronas (queued_transfers)
+
+Revision ID: c3e9a5b7d2f4
+Revises: b6d2f8a4c9e1
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e9a5b7d2f4'
+down_revision = 'b6d2f8a4c9e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('queued_transfers',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('requested_by', sa.Integer(), nullable=False),
+    sa.Column('sender_account_id', sa.Integer(), nullable=False),
+    sa.Column('receiver_account_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('description', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=True),
+    sa.Column('message', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['requested_by'], ['clients.id'], ),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('queued_transfers')
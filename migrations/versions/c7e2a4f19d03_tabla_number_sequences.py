@@ -0,0 +1,28 @@
+"""tabla number_sequences para el asignador de numeros de cuenta y tarjeta
+
+Revision ID: c7e2a4f19d03
+Revises: b3c1d9e4f2a7
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2a4f19d03'
+down_revision = 'b3c1d9e4f2a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('number_sequences',
+    sa.Column('name', sa.String(length=40), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('number_sequences')
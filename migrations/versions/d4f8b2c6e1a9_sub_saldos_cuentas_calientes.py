@@ -0,0 +1,41 @@
+"""sub-saldos para cuentas calientes
+
+Revision ID: d4f8b2c6e1a9
+Revises: c7e2a4f19d03
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f8b2c6e1a9'
+down_revision = 'c7e2a4f19d03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('balance_slots', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('account_balance_slots',
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('slot', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('account_id', 'slot')
+    )
+
+
+def downgrade():
+    # Antes de quitar los sub-saldos se trasladan a la fila de cada cuenta
+    op.execute(
+        "UPDATE accounts SET balance = balance + "
+        "(SELECT COALESCE(SUM(s.balance), 0) FROM account_balance_slots s WHERE s.account_id = accounts.id) "
+        "WHERE balance_slots > 0"
+    )
+    op.drop_table('account_balance_slots')
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.drop_column('balance_slots')
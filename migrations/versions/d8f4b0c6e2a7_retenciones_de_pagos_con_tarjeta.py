@@ -0,0 +1,71 @@
+"""retenciones de pagos con tarjeta (payment_holds, accounts.held_amount, cards.account_id)
+
+Revision ID: d8f4b0c6e2a7
+Revises: c3e9a5b7d2f4
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f4b0c6e2a7'
+down_revision = 'c3e9a5b7d2f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('held_amount', sa.Float(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('cards', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('account_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_cards_account_id_accounts', 'accounts', ['account_id'], ['id'])
+
+    # Las tarjetas existentes quedan asociadas a la primera cuenta de su titular
+    op.execute(
+        "UPDATE cards SET account_id = "
+        "(SELECT MIN(accounts.id) FROM accounts WHERE accounts.client_id = cards.client_id)"
+    )
+
+    op.create_table('payment_holds',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('card_id', sa.Integer(), nullable=True),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('merchant_account_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('captured_amount', sa.Float(), nullable=True),
+    sa.Column('description', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('resolved_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.ForeignKeyConstraint(['card_id'], ['cards.id'], ),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['merchant_account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('payment_holds', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_holds_account_id', ['account_id'], unique=False)
+        batch_op.create_index('ix_payment_holds_status_expires_at', ['status', 'expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment_holds', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_holds_status_expires_at')
+        batch_op.drop_index('ix_payment_holds_account_id')
+
+    op.drop_table('payment_holds')
+
+    with op.batch_alter_table('cards', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_cards_account_id_accounts', type_='foreignkey')
+        batch_op.drop_column('account_id')
+
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.drop_column('held_amount')
@@ -0,0 +1,40 @@
+"""lista de revocación de tokens JWT (revoked_tokens)
+
+Revision ID: e2a6c8f0b4d1
+Revises: d8f4b0c6e2a7
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a6c8f0b4d1'
+down_revision = 'd8f4b0c6e2a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revoked_tokens',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('token_type', sa.String(length=10), nullable=True),
+    sa.Column('reason', sa.String(length=100), nullable=True),
+    sa.Column('revoked_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.create_index('ix_revoked_tokens_expires_at', ['expires_at'], unique=False)
+        batch_op.create_index('ix_revoked_tokens_revoked_at', ['revoked_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.drop_index('ix_revoked_tokens_revoked_at')
+        batch_op.drop_index('ix_revoked_tokens_expires_at')
+
+    op.drop_table('revoked_tokens')
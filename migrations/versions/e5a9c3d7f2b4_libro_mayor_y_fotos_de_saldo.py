@@ -0,0 +1,52 @@
+"""libro mayor (ledger_entries) y fotos diarias de saldo (balance_snapshots)
+
+Revision ID: e5a9c3d7f2b4
+Revises: d4f8b2c6e1a9
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3d7f2b4'
+down_revision = 'd4f8b2c6e1a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ledger_entries',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=True),
+    sa.Column('entry_type', sa.String(length=20), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ledger_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_ledger_entries_account_created_id', ['account_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_ledger_entries_created_at', ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ledger_entries_transaction_id'), ['transaction_id'], unique=False)
+
+    op.create_table('balance_snapshots',
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('as_of', sa.DateTime(), nullable=False),
+    sa.Column('balance', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('account_id', 'as_of')
+    )
+
+
+def downgrade():
+    op.drop_table('balance_snapshots')
+    with op.batch_alter_table('ledger_entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ledger_entries_transaction_id'))
+        batch_op.drop_index('ix_ledger_entries_created_at')
+        batch_op.drop_index('ix_ledger_entries_account_created_id')
+
+    op.drop_table('ledger_entries')
@@ -0,0 +1,41 @@
+"""jobs de estados de cuenta (statement_jobs)
+
+Revision ID: f1b7d3a9c5e2
+Revises: e5a9c3d7f2b4
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b7d3a9c5e2'
+down_revision = 'e5a9c3d7f2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('statement_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('requested_by', sa.Integer(), nullable=False),
+    sa.Column('output_format', sa.String(length=10), nullable=False),
+    sa.Column('date_from', sa.Date(), nullable=False),
+    sa.Column('date_to', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('rows_written', sa.Integer(), nullable=False),
+    sa.Column('rows_total', sa.Integer(), nullable=True),
+    sa.Column('file_path', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['requested_by'], ['clients.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('statement_jobs')
@@ -0,0 +1,31 @@
+"""reinicia la serie de numeros de cuenta en el espacio completo de seriales
+
+La serie arrancaba por encima del mayor numero de cuenta existente, que con los
+numeros del generador anterior (milisegundos) queda cerca del final del rango.
+Al borrar su fila el asignador la vuelve a crear desde el 1 y salta los
+numeros que ya existen.
+
+Revision ID: f6c0a2e4b8d5
+Revises: e2a6c8f0b4d1
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6c0a2e4b8d5'
+down_revision = 'e2a6c8f0b4d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    number_sequences = sa.table('number_sequences', sa.column('name', sa.String))
+    op.execute(number_sequences.delete().where(number_sequences.c.name == 'account'))
+
+
+def downgrade():
+    # La fila se vuelve a crear sola; no hay nada que deshacer
+    pass